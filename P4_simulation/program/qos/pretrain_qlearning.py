@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Pre-train the Q-learning WRR controller's table offline on wrr_env.VecWRREnv.
+
+--envs environments run in lockstep; every step each one takes an
+epsilon-greedy action from one shared QTable and all transitions go into a
+single batched update. Epsilon decays like the live controller
+(x0.95 every 20 steps, floor 0.1). At the end the greedy policy is evaluated
+against a fixed EF quantum and the table is saved with numpy.save; load it in
+the live runtime with
+    python3 qos_runtime.py --q-table pretrained_q.npy
+
+Usage:
+    python3 pretrain_qlearning.py [--envs 4096] [--steps 2000] [--output pretrained_q.npy]
+                                  [--d-ub 50] [--eps-ub 0.05] [--lambda 1.0] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+if _script_dir not in sys.path:
+    sys.path.insert(0, _script_dir)
+
+from qlearning_controller import ACTION_DELTAS, EF_QUANTUM_MIN
+from qtable_engine import QTable
+from wrr_env import VecWRREnv
+
+
+def make_env(args, seed):
+    return VecWRREnv(args.envs, d_ub_ms=args.d_ub, eps_ub=args.eps_ub,
+                     lambda_tradeoff=args.lambda_tradeoff, n_ratio_bins=args.n_ratio_bins, seed=seed)
+
+
+def train(args, on_step=None):
+    """Train a QTable on args.envs environments for args.steps lockstep steps.
+    on_step(step, epsilon, rewards, info) is called after every step."""
+    env = make_env(args, args.seed)
+    qt = QTable(env.n_states, env.n_actions, alpha=args.alpha, gamma=args.gamma, seed=args.seed)
+    states, _ = env.reset()
+    epsilon = args.epsilon
+    for step in range(1, args.steps + 1):
+        actions = qt.choose_actions(states, epsilon)
+        next_states, reward, _, _, info = env.step(actions)
+        qt.update_batch(states, actions, reward, next_states)
+        states = next_states
+        if step % 20 == 0:
+            epsilon = max(args.epsilon_min, epsilon * args.epsilon_decay)
+        if on_step is not None:
+            on_step(step, epsilon, reward, info)
+    return qt
+
+
+def progress_printer(args):
+    t0 = time.perf_counter()
+
+    def on_step(step, epsilon, reward, info):
+        if step % args.report_every == 0 or step == args.steps:
+            elapsed = time.perf_counter() - t0
+            violation = np.mean(info["latency_ms"] > args.d_ub)
+            print(f"step {step:>6}  {step * args.envs / elapsed:>12,.0f} env-steps/s  "
+                  f"eps={epsilon:.3f}  reward={reward.mean():+.3f}  violation={violation:.3f}  "
+                  f"EF={info['ef_quantum'].mean():.0f}", flush=True)
+    return on_step
+
+
+def evaluate(args, policy, steps=400, initial_ef=6000):
+    """Mean reward, violation rate and EF quantum of policy(states, info) -> actions."""
+    env = make_env(args, args.seed + 1)
+    env.initial_ef = initial_ef
+    states, info = env.reset()
+    total_reward, violations, ef = 0.0, 0.0, 0.0
+    for _ in range(steps):
+        states, reward, _, _, info = env.step(policy(states, info))
+        total_reward += reward.mean()
+        violations += np.mean(info["latency_ms"] > args.d_ub)
+        ef += info["ef_quantum"].mean()
+    return total_reward / steps, violations / steps, ef / steps
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-train the Q-learning WRR table on the offline WRR model")
+    ap.add_argument("--envs", type=int, default=4096, help="Environments stepped in lockstep (default: 4096)")
+    ap.add_argument("--steps", type=int, default=2000, help="Lockstep steps (default: 2000)")
+    ap.add_argument("--output", default=os.path.join(_script_dir, "pretrained_q.npy"),
+                    help="Where to save the Q table (default: <qos_dir>/pretrained_q.npy)")
+    ap.add_argument("--d-ub", type=float, default=50.0, help="Delay upper bound (ms)")
+    ap.add_argument("--eps-ub", type=float, default=0.05, help="Violation probability")
+    ap.add_argument("--lambda", dest="lambda_tradeoff", type=float, default=1.0, help="QoS vs weight tradeoff")
+    ap.add_argument("--n-ratio-bins", type=int, default=5, help="EF/(AF+EF) ratio bins in the state (default: 5)")
+    ap.add_argument("--alpha", type=float, default=0.05,
+                    help="Learning rate (default: 0.05; each batch already averages many transitions per cell)")
+    ap.add_argument("--gamma", type=float, default=0.9, help="Discount (default: 0.9)")
+    ap.add_argument("--epsilon", type=float, default=0.4, help="Initial exploration rate (default: 0.4)")
+    ap.add_argument("--epsilon-decay", type=float, default=0.95, help="Epsilon factor every 20 steps (default: 0.95)")
+    ap.add_argument("--epsilon-min", type=float, default=0.1, help="Epsilon floor (default: 0.1)")
+    ap.add_argument("--report-every", type=int, default=200, help="Progress line every N steps (default: 200)")
+    ap.add_argument("--seed", type=int, default=0, help="Seed for the environments and the table (default: 0)")
+    args = ap.parse_args()
+
+    qt = train(args, progress_printer(args))
+
+    hold = np.flatnonzero(ACTION_DELTAS == 0)[0]
+    results = {
+        "pre-trained greedy": evaluate(args, lambda s, info: qt.greedy_actions(s)),
+        "fixed EF=6000": evaluate(args, lambda s, info: np.full(s.shape, hold)),
+        f"fixed EF={EF_QUANTUM_MIN}": evaluate(args, lambda s, info: np.full(s.shape, hold),
+                                              initial_ef=EF_QUANTUM_MIN),
+    }
+    print(f"\n  {'Policy':<20}{'Reward':>9}{'Violation':>11}{'Mean EF':>9}")
+    for name, (r, v, ef) in results.items():
+        print(f"  {name:<20}{r:>+9.3f}{v:>11.3f}{ef:>9.0f}")
+
+    np.save(args.output, qt.table)
+    print(f"\nQ table ({qt.n_states} states x {qt.n_actions} actions) saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
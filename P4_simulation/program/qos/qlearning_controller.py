@@ -7,11 +7,21 @@ Q-learning controller for adaptive WRR.
   r'_t = eps_ub*lambda if d_t <= d_ub else -(1-eps_ub)*lambda
   J = lambda*(P(d<=d_ub) - (1-eps_ub)) - E[w_e]
 - AF quantum fixed at 6000, EF quantum variable
+- Q values live in a utils/qtable_engine.py QTable of shape (n_states, n_actions),
+  saved/restored with save_checkpoint/load_checkpoint (.npz + JSON metadata)
 """
 
 import math
+import os
+import sys
+
 import numpy as np
-from collections import defaultdict
+
+_utils_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "utils"))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from qtable_engine import QTable
 
 # Constants from user spec
 AF_QUANTUM_FIXED = 6000
@@ -20,6 +30,12 @@ EF_QUANTUM_MAX = 30000
 DELTA = 1500
 NQ = 10  # queue depth range [0, 10]
 NUM_ACTIONS = 3  # -1: decrease EF, 0: hold, +1: increase EF
+# Epsilon schedule applied by qos_runtime: x EPSILON_DECAY every EPSILON_DECAY_EVERY steps
+EPSILON_DECAY = 0.95
+EPSILON_DECAY_EVERY = 20
+EPSILON_MIN = 0.1
+# EF quantum change per action index, as QLearningWRRController.action_to_delta
+ACTION_DELTAS = np.array([0, DELTA, -DELTA])
 
 
 def discretize_qdepth(qdepth_raw):
@@ -49,6 +65,20 @@ def idx_to_state(idx, n_ratio_bins=5):
     return qdepth_disc, ratio_disc
 
 
+def state_indices(qdepth_raw, ef_quantum, n_ratio_bins=5):
+    """Array version of QLearningWRRController.get_state for many observations."""
+    qd = np.clip(np.trunc(qdepth_raw), 0, NQ).astype(np.intp)
+    ratio = np.asarray(ef_quantum) / (AF_QUANTUM_FIXED + np.asarray(ef_quantum))
+    rd = np.minimum(n_ratio_bins - 1, (ratio * n_ratio_bins).astype(np.intp))
+    return qd * n_ratio_bins + rd
+
+
+def rewards(d_t, ef_quantum, d_ub_ms=50.0, eps_ub=0.05, lambda_tradeoff=1.0):
+    """Array version of QLearningWRRController.compute_reward: r'_t - w_e(t)."""
+    r_prime = np.where(np.asarray(d_t) <= d_ub_ms, eps_ub * lambda_tradeoff, -(1 - eps_ub) * lambda_tradeoff)
+    return r_prime - np.asarray(ef_quantum) / EF_QUANTUM_MAX
+
+
 class QLearningWRRController:
     def __init__(
         self,
@@ -59,6 +89,7 @@ class QLearningWRRController:
         eps_ub=0.05,
         lambda_tradeoff=1.0,
         n_ratio_bins=5,
+        seed=None,
     ):
         self.alpha = alpha
         self.gamma = gamma
@@ -69,8 +100,10 @@ class QLearningWRRController:
         self.n_ratio_bins = n_ratio_bins
         self.n_states = (NQ + 1) * n_ratio_bins
         self.n_actions = NUM_ACTIONS
-        self.q_table = defaultdict(lambda: np.zeros(self.n_actions))
+        self.engine = QTable(self.n_states, self.n_actions, alpha=alpha, gamma=gamma, seed=seed)
+        self.q_table = self.engine.table  # (n_states, n_actions) view
         self.ef_quantum = 6000  # initial, will be clamped to [3000,30000]
+        self.steps = 0
         self._last_state = None
         self._last_action = None
         self._latency_history = []
@@ -87,10 +120,7 @@ class QLearningWRRController:
 
     def choose_action(self, state_idx):
         """Epsilon-greedy action: -1 (decrease), 0 (hold), +1 (increase)."""
-        if np.random.random() < self.epsilon:
-            return np.random.randint(0, self.n_actions)
-        q_vals = self.q_table[state_idx]
-        return int(np.argmax(q_vals))
+        return self.engine.choose_action(state_idx, self.epsilon)
 
     def action_to_delta(self, action):
         """Map action index to EF quantum delta."""
@@ -126,11 +156,7 @@ class QLearningWRRController:
 
     def update_q(self, state, action, reward, next_state):
         """Q(s,a) += alpha * (r + gamma * max_a' Q(s',a') - Q(s,a))"""
-        old_q = self.q_table[state][action]
-        max_next = np.max(self.q_table[next_state]) if next_state is not None else 0
-        td_target = reward + self.gamma * max_next
-        new_q = old_q + self.alpha * (td_target - old_q)
-        self.q_table[state][action] = new_q
+        self.engine.update(state, action, reward, next_state, alpha=self.alpha, gamma=self.gamma)
 
     def step(self, qdepth_raw, latency_ms):
         """
@@ -142,7 +168,9 @@ class QLearningWRRController:
         new_ef = self.apply_action(action)
         reward = self.compute_reward(latency_ms, self.ef_quantum)
         next_state = self.get_state(qdepth_raw, self.ef_quantum)
-        self.update_q(state, action, reward, next_state)
+        if not self.engine.read_only:  # a memory-mapped checkpoint is served as-is
+            self.update_q(state, action, reward, next_state)
+        self.steps += 1
         self._last_state = state
         self._last_action = action
         self._latency_history.append(latency_ms)
@@ -150,7 +178,54 @@ class QLearningWRRController:
         action_names = ["decrease", "hold", "increase"]
         return new_ef, reward, action_names[action]
 
-    def decay_epsilon(self, factor=0.95, min_eps=0.1):
+    def load_q_table(self, path):
+        """Load a table saved with numpy.save (e.g. by pretrain_qlearning.py)."""
+        table = np.load(path)
+        if table.shape != self.q_table.shape:
+            raise ValueError(f"{path}: Q table shape {table.shape}, controller expects {self.q_table.shape} "
+                             f"(n_ratio_bins={self.n_ratio_bins})")
+        self.q_table[...] = table
+
+    def save_checkpoint(self, path):
+        """Save the Q table with everything needed to resume or serve it."""
+        self.engine.save(
+            path,
+            controller="qos_wrr",
+            state_encoding={"index": "qdepth_bin * n_ratio_bins + ratio_bin", "qdepth_bins": NQ + 1,
+                            "n_ratio_bins": self.n_ratio_bins, "af_quantum": AF_QUANTUM_FIXED},
+            action_deltas=ACTION_DELTAS.tolist(),
+            epsilon=self.epsilon,
+            epsilon_schedule={"every": EPSILON_DECAY_EVERY, "factor": EPSILON_DECAY, "min": EPSILON_MIN},
+            learning_rate={"alpha": self.alpha, "schedule": "constant"},
+            reward={"d_ub_ms": self.d_ub, "eps_ub": self.eps_ub, "lambda_tradeoff": self.lambda_tradeoff},
+            steps=self.steps,
+            ef_quantum=self.ef_quantum,
+        )
+
+    def load_checkpoint(self, path, mmap=False):
+        """Resume from save_checkpoint(): Q table, n_ratio_bins, alpha/gamma, epsilon, step count and EF quantum.
+        mmap=True maps the table read-only (shared between processes); step() then stops learning."""
+        engine = QTable.load(path, mmap=mmap)
+        meta = engine.meta
+        encoding = meta.get("state_encoding", {})
+        if meta.get("controller") != "qos_wrr":
+            raise ValueError(f"{path}: checkpoint of controller {meta.get('controller')!r}, expected 'qos_wrr'")
+        if encoding.get("qdepth_bins") != NQ + 1 or meta.get("action_deltas") != ACTION_DELTAS.tolist():
+            raise ValueError(f"{path}: state encoding {encoding} / actions {meta.get('action_deltas')} "
+                             f"do not match this controller")
+        self.n_ratio_bins = encoding["n_ratio_bins"]
+        self.n_states = engine.n_states
+        self.engine = engine
+        self.q_table = engine.table
+        self.alpha = engine.alpha
+        self.gamma = engine.gamma
+        self.epsilon = meta["epsilon"]
+        self.steps = meta["steps"]
+        if "ef_quantum" in meta:
+            self.set_ef_quantum(meta["ef_quantum"])
+        return meta
+
+    def decay_epsilon(self, factor=EPSILON_DECAY, min_eps=EPSILON_MIN):
         self.epsilon = max(min_eps, self.epsilon * factor)
 
     def set_ef_quantum(self, value):
@@ -2,6 +2,10 @@
 """
 Q-learning WRR runtime: reads telemetry state, runs Q-learning, pushes EF quantum via P4Runtime.
 Run on host after Mininet is up. Requires: telemetry_receiver on c1, telemetry_sender on h3.
+
+Observations are pushed by telemetry_receiver over a Unix datagram socket and
+each one wakes the controller (--min-interval rate-limits decisions). The old
+polled state file is still available with --state-file.
 """
 
 import argparse
@@ -11,7 +15,6 @@ import time
 
 # Add utils for p4runtime_lib
 _script_dir = os.path.dirname(os.path.abspath(__file__))
-STATE_FILE = os.path.join(_script_dir, "qos_qlearning_state.txt")
 _utils_dir = os.path.abspath(os.path.join(_script_dir, "..", "..", "utils"))
 _p4runtime_path = os.path.join(_utils_dir, "p4runtime_lib")
 if _utils_dir not in sys.path:
@@ -22,66 +25,40 @@ if _p4runtime_path not in sys.path:
 try:
     from p4runtime_lib import bmv2
     from p4runtime_lib import helper
-    from p4.v1 import p4runtime_pb2
-    from p4runtime_lib.convert import encode
+    from p4runtime_lib.write_template import TableWriter
 except ImportError as e:
     print(f"Error: {e}. Run from P4_simulation directory.", file=sys.stderr)
     sys.exit(1)
 
-from qlearning_controller import QLearningWRRController, AF_QUANTUM_FIXED, EF_QUANTUM_MIN, EF_QUANTUM_MAX
+from telemetry_channel import DEFAULT_SOCKET_NAME, LatencyStats, TelemetrySubscriber
+from qlearning_controller import (QLearningWRRController, AF_QUANTUM_FIXED, EF_QUANTUM_MIN, EF_QUANTUM_MAX,
+                                  EPSILON_DECAY_EVERY)
 
 # Queue indices: 0=AF (fixed), 1=EF (variable)
 QUEUE_AF = 0
 QUEUE_EF = 1
 
-CONTROL_INTERVAL_SEC = 0.5
+CONTROL_INTERVAL_SEC = 0.5  # --state-file poll interval
+STATE_SOCKET = os.path.join(_script_dir, DEFAULT_SOCKET_NAME)
 
 
-def set_quantum_via_p4runtime(sw, p4info_helper, queue_idx, quantum_value, reset_quota=True):
-    """Set quantum for a queue via P4Runtime set_quantum_table."""
+def set_quantums_via_p4runtime(sw, quantum_writer, quantums, reset_quota=True):
+    """Set {queue_idx: quantum} via set_quantum_table in one WriteRequest.
+    quantum_writer (a write_template.TableWriter) knows which entries exist, so new
+    ones are inserted and existing ones modified, and unchanged quantums are not sent."""
     try:
-        table = p4info_helper.get("tables", name="set_quantum_table")
-        if not table.match_fields:
-            raise Exception("set_quantum_table has no match fields")
-        match_field = table.match_fields[0]
-        match_field_id = match_field.id
-        match_field_bitwidth = match_field.bitwidth
-
-        table_entry = p4runtime_pb2.TableEntry()
-        table_entry.table_id = p4info_helper.get_tables_id("set_quantum_table")
-        field_match = p4runtime_pb2.FieldMatch()
-        field_match.field_id = match_field_id
-        field_match.exact.value = encode(queue_idx, match_field_bitwidth)
-        table_entry.match.extend([field_match])
-
-        action_info = p4info_helper.get("actions", name="set_wrr_quantum")
-        action = table_entry.action.action
-        action.action_id = action_info.preamble.id
-        param_map = {p.name: p.id for p in action_info.params}
-
-        p1 = action.params.add()
-        p1.param_id = param_map["queue_idx"]
-        p1.value = encode(queue_idx, 48)
-        p2 = action.params.add()
-        p2.param_id = param_map["quantum_value"]
-        p2.value = encode(quantum_value, 48)
-        p3 = action.params.add()
-        p3.param_id = param_map["reset_quota"]
-        p3.value = encode(1 if reset_quota else 0, 1)
-
-        try:
-            sw.ModifyTableEntry(table_entry)
-        except Exception as e:
-            if "NOT_FOUND" in str(e).upper() or "UNKNOWN" in str(e).upper():
-                sw.WriteTableEntry(table_entry)
-            else:
-                raise
+        quantum_writer.write(sw, [((q,), (q, v, 1 if reset_quota else 0)) for q, v in sorted(quantums.items())])
         return True
     except Exception as e:
         print(f"  set_quantum failed: {e}", file=sys.stderr)
         return False
 
 
+def set_quantum_via_p4runtime(sw, quantum_writer, queue_idx, quantum_value, reset_quota=True):
+    """Set quantum for a queue via P4Runtime set_quantum_table."""
+    return set_quantums_via_p4runtime(sw, quantum_writer, {queue_idx: quantum_value}, reset_quota)
+
+
 def read_state(state_file):
     """Read q_ef, q_af, latency_ms from state file. Returns (q_ef, q_af, latency_ms) or None."""
     try:
@@ -100,18 +77,45 @@ def read_state(state_file):
         return None
 
 
+def format_ms(ms):
+    """CSV cell for an optional latency (empty in --state-file mode)."""
+    return "" if ms is None else f"{ms:.3f}"
+
+
 def main():
     parser = argparse.ArgumentParser(description="Q-learning WRR controller runtime")
     parser.add_argument("--grpc-port", type=int, default=50051, help="s1 gRPC port")
-    parser.add_argument("--state-file", default=STATE_FILE, help="Telemetry state file")
-    parser.add_argument("--interval", type=float, default=CONTROL_INTERVAL_SEC, help="Control interval (s)")
+    parser.add_argument("--state-socket", default=STATE_SOCKET,
+                        help=f"Unix datagram socket telemetry_receiver pushes to (default: <qos_dir>/{DEFAULT_SOCKET_NAME})")
+    parser.add_argument("--min-interval", type=float, default=0.0,
+                        help="Minimum seconds between decisions; observations in between are coalesced "
+                             "to the newest (default: 0, one decision per observation)")
+    parser.add_argument("--state-file", default=None,
+                        help="Poll this state file instead of the socket (telemetry_receiver.py --state-file)")
+    parser.add_argument("--interval", type=float, default=CONTROL_INTERVAL_SEC,
+                        help="Poll interval for --state-file (s)")
     parser.add_argument("--p4info", default=None, help="Path to qos.p4info.txt")
     parser.add_argument("--bmv2-json", default=None, help="Path to qos.json")
     parser.add_argument("--d-ub", type=float, default=50.0, help="Delay upper bound (ms)")
     parser.add_argument("--eps-ub", type=float, default=0.05, help="Violation probability")
     parser.add_argument("--lambda", dest="lambda_tradeoff", type=float, default=1.0, help="QoS vs weight tradeoff")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--q-table", default=None,
+                       help="Start from a pre-trained Q table (.npy from pretrain_qlearning.py)")
+    start.add_argument("--warm-start", default=None,
+                       help="Resume from a checkpoint (.npz): Q table, n_ratio_bins, epsilon, step count")
+    parser.add_argument("--read-only", action="store_true",
+                        help="Memory-map the --warm-start table read-only (shared, no learning, no checkpoints)")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file (.npz). Default: logs/qlearning_checkpoint.npz")
+    parser.add_argument("--checkpoint-every", type=int, default=100,
+                        help="Checkpoint every N decisions, and on exit (0: only on exit)")
+    parser.add_argument("--epsilon", type=float, default=None,
+                        help="Initial exploration rate (default: 0.4, or the --warm-start checkpoint's)")
     parser.add_argument("--log-file", default=None, help="Log file for decisions (CSV). Default: logs/qlearning_decisions.csv")
     args = parser.parse_args()
+    if args.read_only and not args.warm_start:
+        parser.error("--read-only needs --warm-start")
 
     project_root = os.path.abspath(os.path.join(_script_dir, "..", ".."))
     p4info_path = args.p4info or os.path.join(_script_dir, "build", "qos.p4.p4info.txt")
@@ -132,6 +136,7 @@ def main():
     os.makedirs(logs_dir, exist_ok=True)
     proto_dump = os.path.join(logs_dir, "qlearning-p4runtime.txt")
     log_file = args.log_file or os.path.join(logs_dir, "qlearning_decisions.csv")
+    checkpoint = None if args.read_only else args.checkpoint or os.path.join(logs_dir, "qlearning_checkpoint.npz")
 
     print("Connecting to switch...", flush=True)
     sw = bmv2.Bmv2SwitchConnection(
@@ -141,6 +146,7 @@ def main():
         proto_dump_file=proto_dump,
     )
     p4info_helper = helper.P4InfoHelper(p4info_path)
+    quantum_writer = TableWriter(p4info_helper, "set_quantum_table", "set_wrr_quantum")
 
     # Ensure pipeline is set (assume run_exercise already did; we only push table entries)
     try:
@@ -151,36 +157,75 @@ def main():
     controller = QLearningWRRController(
         alpha=0.2,
         gamma=0.9,
-        epsilon=0.4,
+        epsilon=0.4 if args.epsilon is None else args.epsilon,
         d_ub_ms=args.d_ub,
         eps_ub=args.eps_ub,
         lambda_tradeoff=args.lambda_tradeoff,
     )
-
-    # Initial EF quantum
-    ef_quantum = 6000
+    if args.q_table:
+        try:
+            controller.load_q_table(args.q_table)
+        except (OSError, ValueError) as e:
+            print(f"Cannot load Q table: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Loaded pre-trained Q table from {args.q_table}", flush=True)
+    if args.warm_start:
+        try:
+            meta = controller.load_checkpoint(args.warm_start, mmap=args.read_only)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Cannot load checkpoint: {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.epsilon is not None:
+            controller.epsilon = args.epsilon
+        mode = "read-only, shared" if args.read_only else "learning"
+        print(f"Warm start from {args.warm_start} ({mode}): {meta['steps']} steps, "
+              f"n_ratio_bins={controller.n_ratio_bins}, epsilon={controller.epsilon:.3f}, EF={controller.ef_quantum}", flush=True)
+
+    # Initial EF quantum: 6000, or where the --warm-start checkpoint left off
+    ef_quantum = controller.ef_quantum if args.warm_start else 6000
     controller.set_ef_quantum(ef_quantum)
 
-    # Set initial quantums: AF=6000 (fixed), EF=6000
-    print("Setting initial quantums: AF=6000, EF=6000", flush=True)
-    set_quantum_via_p4runtime(sw, p4info_helper, QUEUE_AF, AF_QUANTUM_FIXED, reset_quota=True)
-    set_quantum_via_p4runtime(sw, p4info_helper, QUEUE_EF, ef_quantum, reset_quota=True)
-
-    print(f"Q-learning controller started. State file: {args.state_file}, interval: {args.interval}s", flush=True)
+    # Set initial quantums: AF=6000 (fixed), EF=6000 (or the checkpoint's)
+    print(f"Setting initial quantums: AF={AF_QUANTUM_FIXED}, EF={ef_quantum}", flush=True)
+    set_quantums_via_p4runtime(sw, quantum_writer, {QUEUE_AF: AF_QUANTUM_FIXED, QUEUE_EF: ef_quantum},
+                               reset_quota=True)
+
+    subscriber = None
+    if args.state_file:
+        source = f"state file {args.state_file}, poll interval: {args.interval}s"
+    else:
+        subscriber = TelemetrySubscriber(args.state_socket)
+        source = f"state socket {args.state_socket}, min interval: {args.min_interval}s"
+    print(f"Q-learning controller started. {source}", flush=True)
     print(f"Log file: {log_file}", flush=True)
+    if checkpoint:
+        print(f"Checkpoint: {checkpoint} (every {args.checkpoint_every or 'exit'})", flush=True)
     print("---", flush=True)
 
     # Write CSV header
     with open(log_file, "w") as f:
-        f.write("timestamp,step,q_ef,q_af,latency_ms,action,EF,reward\n")
-
-    step_count = 0
+        f.write("timestamp,step,q_ef,q_af,latency_ms,action,EF,reward,probe_to_decision_ms,recv_to_decision_ms\n")
+
+    # continue the step count (and so the epsilon decay schedule) of a warm start
+    step_count = first_step = controller.steps
+    # probe sent on h3 -> quantum written, and probe received on c1 -> quantum written
+    probe_latency = LatencyStats()
+    recv_latency = LatencyStats()
+    last_decision = 0.0
     while True:
         try:
-            state = read_state(args.state_file)
-            if state is None:
-                time.sleep(args.interval)
-                continue
+            obs = None
+            if subscriber is None:
+                state = read_state(args.state_file)
+                if state is None:
+                    time.sleep(args.interval)
+                    continue
+            else:
+                wait = last_decision + args.min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                obs = subscriber.recv_latest()
+                state = (obs.q_ef, obs.q_af, obs.latency_ms)
 
             q_ef, q_af, latency_ms = state
             step_count += 1
@@ -189,25 +234,50 @@ def main():
             new_ef, reward, action_name = controller.step(q_ef, latency_ms)
 
             # Push EF quantum only (AF stays fixed)
-            ok = set_quantum_via_p4runtime(sw, p4info_helper, QUEUE_EF, new_ef, reset_quota=True)
+            ok = set_quantum_via_p4runtime(sw, quantum_writer, QUEUE_EF, new_ef, reset_quota=True)
+            decided_ts = time.time()
+            last_decision = time.monotonic()
+            probe_ms = recv_ms = None
+            if obs is not None:
+                recv_ms = (decided_ts - obs.recv_ts) * 1000
+                recv_latency.add(recv_ms)
+                if obs.probe_ts > 0:
+                    probe_ms = (decided_ts - obs.probe_ts) * 1000
+                    probe_latency.add(probe_ms)
             if ok:
-                print(f"[{step_count}] q_ef={q_ef:.0f} lat={latency_ms:.1f}ms -> {action_name} -> EF={new_ef} r={reward:.3f}", flush=True)
+                e2e = f" e2e={probe_ms:.1f}ms" if probe_ms is not None else ""
+                print(f"[{step_count}] q_ef={q_ef:.0f} lat={latency_ms:.1f}ms -> {action_name} -> EF={new_ef} r={reward:.3f}{e2e}", flush=True)
                 # Append to log file (CSV)
                 with open(log_file, "a") as f:
-                    f.write(f"{time.time():.3f},{step_count},{q_ef:.2f},{q_af:.2f},{latency_ms:.2f},{action_name},{new_ef},{reward:.4f}\n")
+                    f.write(f"{decided_ts:.3f},{step_count},{q_ef:.2f},{q_af:.2f},{latency_ms:.2f},{action_name},{new_ef},{reward:.4f},"
+                            f"{format_ms(probe_ms)},{format_ms(recv_ms)}\n")
             else:
                 print(f"[{step_count}] set_quantum failed", flush=True)
 
             # Decay epsilon periodically
-            if step_count % 20 == 0:
+            if step_count % EPSILON_DECAY_EVERY == 0:
                 controller.decay_epsilon()
+            if checkpoint and args.checkpoint_every and step_count % args.checkpoint_every == 0:
+                controller.save_checkpoint(checkpoint)
 
         except KeyboardInterrupt:
             print("\nStopped.", flush=True)
             break
         except Exception as e:
             print(f"Error: {e}", file=sys.stderr)
-        time.sleep(args.interval)
+        if subscriber is None:
+            time.sleep(args.interval)
+
+    print(f"Quantum writes: {quantum_writer.sent} sent in {quantum_writer.requests} requests, "
+          f"{quantum_writer.skipped} unchanged skipped", flush=True)
+    if checkpoint and step_count > first_step:
+        controller.save_checkpoint(checkpoint)
+        print(f"Checkpoint saved to {checkpoint} ({controller.steps} steps)", flush=True)
+    if subscriber is not None:
+        print(f"Observations: {subscriber.received} received, {subscriber.coalesced} coalesced", flush=True)
+        print(f"Probe -> decision latency: {probe_latency.summary()}", flush=True)
+        print(f"Receiver -> decision latency: {recv_latency.summary()}", flush=True)
+        subscriber.close()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,30 @@
 #!/usr/bin/env python3
 """
 MRI-style receiver for P4_simulation.
-Sniffs UDP port 4321 and displays full packet structure including MRI options (swid, qdepth).
+Sniffs UDP port 4321 and displays MRI options (swid, qdepth) per packet.
+Frames are decoded once from raw bytes by utils/mri_decoder.py; the full Scapy
+show2() dump is only printed with --dump.
 Used with send.py for MRI_STYLE_TEST_GUIDE.md testing.
 """
 
 import os
+import signal
 import sys
 import time
 
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+_utils_dir = os.path.abspath(os.path.join(_script_dir, "..", "..", "utils"))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from mri_decoder import decode_frame, frame_bytes, select_trace
+from payload_stamp import STAMP_OFFSET, format_stamp, read_stamp
+from readiness import ReadyMarker
+from recv_log import RecvLogWriter
+from ring_capture import bpf_udp_port, open_ring_or_none
+
 from scapy.all import (
-    IP,
+    Ether,
     FieldLenField,
     IntField,
     IPOption,
@@ -62,184 +76,110 @@ class IPOption_MRI(IPOption):
     ]
 
 
-def find_mri_option(pkt):
-    """Find MRI option (option 31) in IP packet. Returns parsed mri or None."""
-    if IP not in pkt:
-        return None
-    opts = pkt[IP].options
-    for opt in opts:
-        if isinstance(opt, IPOption_MRI):
-            return opt
-        if getattr(opt, "option", None) == 31:
-            return opt
-        # Scapy may parse unknown options as (type, raw_bytes) tuple
-        if isinstance(opt, tuple) and len(opt) >= 2 and opt[0] == 31:
-            return ("raw", opt[1])
-    return None
+# Running stats: total qdepth and per-flow depth (from all traces per packet)
+_stats = {"total_sum": 0, "total_cnt": 0, "flow1_sum": 0, "flow2_sum": 0, "flow1_cnt": 0, "flow2_cnt": 0}
 
+# For --state-file: last (q_ef, q_af) from s1 trace
+_state_file_path = None
 
-def parse_mri_from_raw(raw_bytes):
-    """Parse MRI from raw option bytes: count(2) + traces. Supports 16 and 20 byte traces."""
-    try:
-        if len(raw_bytes) < 4:
-            return None
-        count = (raw_bytes[0] << 8) | raw_bytes[1]
-        trace_bytes = len(raw_bytes) - 2
-        if count == 0:
-            return []
-        if trace_bytes < count * 16:
-            return None
-        bytes_per_trace = trace_bytes // count
-        if bytes_per_trace not in (16, 20):
-            return None
-        traces = []
-        off = 2
-        for _ in range(count):
-            if bytes_per_trace == 16:
-                t = {
-                    "swid": int.from_bytes(raw_bytes[off:off+4], "big"),
-                    "qdepth": int.from_bytes(raw_bytes[off+4:off+8], "big"),
-                    "flow1_qdepth": int.from_bytes(raw_bytes[off+8:off+12], "big"),
-                    "flow2_qdepth": int.from_bytes(raw_bytes[off+12:off+16], "big"),
-                    "latency": 0,
-                }
-            else:
-                t = {
-                    "swid": int.from_bytes(raw_bytes[off:off+4], "big"),
-                    "qdepth": int.from_bytes(raw_bytes[off+4:off+8], "big"),
-                    "flow1_qdepth": int.from_bytes(raw_bytes[off+8:off+12], "big"),
-                    "flow2_qdepth": int.from_bytes(raw_bytes[off+12:off+16], "big"),
-                    "latency": int.from_bytes(raw_bytes[off+16:off+20], "big"),
-                }
-            traces.append(t)
-            off += bytes_per_trace
-        return traces
-    except Exception:
-        return None
+# For --dump: print the full Scapy show2() dissection of every packet
+_dump_packets = False
 
+# For --log-format=bin: binary record writer
+_bin_log = None
 
-def parse_mri_manual(pkt):
-    """Manually parse MRI from raw bytes. Supports both 16-byte and 20-byte trace format.
-    Returns list of dicts: [{"swid", "qdepth", "flow1_qdepth", "flow2_qdepth", "latency?"}, ...]
-    or None if parse fails.
-    """
-    try:
-        raw = bytes(pkt)
-        # Skip Ethernet (14 bytes) to get IP header
-        if len(raw) < 34:
-            return None
-        raw = raw[14:]
-        ihl = (raw[0] & 0x0f) * 4
-        if ihl < 20:
-            return None
-        # Find option 31 in IP options (between byte 20 and ihl)
-        opt_start = 20
-        while opt_start < ihl - 1:
-            opt_type = raw[opt_start]
-            opt_len = raw[opt_start + 1]
-            if opt_len < 2:
-                break
-            if opt_type == 31:  # MRI
-                if opt_len < 6:  # need at least 4 + 2 for count
-                    return None
-                count = (raw[opt_start + 2] << 8) | raw[opt_start + 3]
-                trace_bytes = opt_len - 4
-                if count == 0:
-                    return []
-                bytes_per_trace = trace_bytes // count
-                if bytes_per_trace not in (16, 20):
-                    return None
-                traces = []
-                off = opt_start + 4
-                for _ in range(count):
-                    if bytes_per_trace == 16:
-                        t = {
-                            "swid": int.from_bytes(raw[off:off+4], "big"),
-                            "qdepth": int.from_bytes(raw[off+4:off+8], "big"),
-                            "flow1_qdepth": int.from_bytes(raw[off+8:off+12], "big"),
-                            "flow2_qdepth": int.from_bytes(raw[off+12:off+16], "big"),
-                            "latency": 0,
-                        }
-                    else:
-                        t = {
-                            "swid": int.from_bytes(raw[off:off+4], "big"),
-                            "qdepth": int.from_bytes(raw[off+4:off+8], "big"),
-                            "flow1_qdepth": int.from_bytes(raw[off+8:off+12], "big"),
-                            "flow2_qdepth": int.from_bytes(raw[off+12:off+16], "big"),
-                            "latency": int.from_bytes(raw[off+16:off+20], "big"),
-                        }
-                    traces.append(t)
-                    off += bytes_per_trace
-                return traces
-            opt_start += opt_len
-    except Exception:
-        pass
-    return None
+# For --ready-file: readiness / first packet marker for the experiment runner
+_ready = None
 
 
-# Running stats: total qdepth and per-flow depth (from all traces per packet)
-_stats = {"total_sum": 0, "total_cnt": 0, "flow1_sum": 0, "flow2_sum": 0, "flow1_cnt": 0, "flow2_cnt": 0}
-
-# For --state-file: last (q_ef, q_af) from s1 trace
-_state_file_path = None
+def write_state(t_s1):
+    q_ef, q_af = t_s1.flow1_qdepth, t_s1.flow2_qdepth
+    try:
+        with open(_state_file_path, "w") as f:
+            f.write("%d,%d\n" % (q_ef, q_af))
+    except Exception as e:
+        print(f"  (state file write failed: {e})", file=sys.stderr)
 
 
 def handle_pkt(pkt):
+    if _ready is not None and not _ready.first_seen:
+        _ready.packet(time.time())
+    if _bin_log is not None:
+        handle_frame_bin(frame_bytes(pkt), time.time())
+    else:
+        handle_frame(frame_bytes(pkt), time.time(), pkt)
+
+
+def handle_batch(batch):
+    """Ring backend callback: batch of (kernel timestamp, frame)."""
+    if _ready is not None and not _ready.first_seen and batch:
+        _ready.packet(batch[0][0])
+    if _bin_log is not None:
+        for recv_ts, frame in batch:
+            handle_frame_bin(frame, recv_ts)
+    else:
+        for recv_ts, frame in batch:
+            handle_frame(frame, recv_ts)
+
+
+def handle_frame_bin(frame, recv_ts):
+    """--log-format=bin: one fixed-width record per UDP packet, nothing printed.
+    seq/tx_ns/flow_id come from the payload stamp (seq 0 for unstamped packets)."""
+    decoded = decode_frame(frame)
+    if decoded is None or decoded.payload is None:
+        return
+    t_s1 = select_trace(decoded.traces) if decoded.traces else None
+    stamp = read_stamp(decoded.payload)
+    if stamp is None:
+        _bin_log.append(recv_ts, 0, decoded.ip_id, t_s1)
+    else:
+        flow_id, seq, tx_ns = stamp
+        _bin_log.append(recv_ts, seq, decoded.ip_id, t_s1, tx_ns, flow_id)
+    if t_s1 is not None and _state_file_path:
+        write_state(t_s1)
+
+
+def handle_frame(frame, recv_ts, pkt=None):
+    """Log one received frame. `pkt` (Scapy) is only used for --dump."""
     print("got a packet")
-    print("packet received at time:", time.time())
-    pkt.show2()
-    traces_data = None
-    mri = find_mri_option(pkt)
-    if mri is not None:
-        if isinstance(mri, tuple) and mri[0] == "raw":
-            raw_opt = mri[1] if isinstance(mri[1], bytes) else bytes(mri[1])
-            if len(raw_opt) >= 3:
-                traces_data = parse_mri_from_raw(raw_opt[1:])
+    print("packet is received at time :", recv_ts)
+    decoded = decode_frame(frame)
+    if _dump_packets:
+        (pkt if pkt is not None else Ether(bytes(frame))).show2()
+    elif decoded is not None and decoded.payload is not None:
+        print(f"  id={decoded.ip_id} sport={decoded.sport} dport={decoded.dport}")
+        stamp = read_stamp(decoded.payload)
+        if stamp is None:
+            print("  load = '%s'" % bytes(decoded.payload).decode("latin-1"))
         else:
-            try:
-                traces = getattr(mri, "swtraces", [])
-                traces_data = []
-                for tr in traces:
-                    traces_data.append({
-                        "swid": getattr(tr, "swid", 0),
-                        "qdepth": getattr(tr, "qdepth", 0),
-                        "flow1_qdepth": getattr(tr, "flow1_qdepth", 0),
-                        "flow2_qdepth": getattr(tr, "flow2_qdepth", 0),
-                    })
-            except Exception as e:
-                print(f"  (MRI parse: {e})")
-    if traces_data is None:
-        traces_data = parse_mri_manual(pkt)
-    if traces_data is not None:
+            # the stamp is binary: print it decoded, before the load line that ends the packet
+            print(format_stamp(stamp))
+            print("  load = '%s'" % bytes(decoded.payload[:STAMP_OFFSET]).decode("latin-1"))
+    traces_data = decoded.traces if decoded is not None else None
+    if traces_data:
         try:
             # Use s1 (swid=1) trace for state file; fallback to first
-            t_s1 = next((x for x in traces_data if x.get("swid") == 1), traces_data[0])
-            q_ef, q_af = t_s1.get("flow1_qdepth", 0), t_s1.get("flow2_qdepth", 0)
+            t_s1 = select_trace(traces_data)
             if _state_file_path:
-                try:
-                    with open(_state_file_path, "w") as f:
-                        f.write("%d,%d\n" % (q_ef, q_af))
-                except Exception as e:
-                    print(f"  (state file write failed: {e})", file=sys.stderr)
+                write_state(t_s1)
             print("--- MRI summary ---")
             print(f"  count={len(traces_data)}")
             for i, t in enumerate(traces_data):
-                qd = t["qdepth"]
-                f1 = t["flow1_qdepth"]
-                f2 = t["flow2_qdepth"]
-                print(f"  trace[{i}] swid={t['swid']} qdepth={qd} flow1={f1} flow2={f2}")
+                qd = t.qdepth
+                f1 = t.flow1_qdepth
+                f2 = t.flow2_qdepth
+                print(f"  trace[{i}] swid={t.swid} qdepth={qd} flow1={f1} flow2={f2}")
                 _stats["total_sum"] += qd
                 _stats["total_cnt"] += 1
                 _stats["flow1_sum"] += f1
                 _stats["flow2_sum"] += f2
                 _stats["flow1_cnt"] += 1
                 _stats["flow2_cnt"] += 1
-            if traces_data:
-                n = _stats["total_cnt"]
-                avg_total = _stats["total_sum"] / n
-                avg_f1 = _stats["flow1_sum"] / n if n else 0
-                avg_f2 = _stats["flow2_sum"] / n if n else 0
-                print(f"  --- running avg (n={n}) --- total_qdepth={avg_total:.1f} flow1={avg_f1:.1f} flow2={avg_f2:.1f}")
+            n = _stats["total_cnt"]
+            avg_total = _stats["total_sum"] / n
+            avg_f1 = _stats["flow1_sum"] / n if n else 0
+            avg_f2 = _stats["flow2_sum"] / n if n else 0
+            print(f"  --- running avg (n={n}) --- total_qdepth={avg_total:.1f} flow1={avg_f1:.1f} flow2={avg_f2:.1f}")
         except Exception as e:
             print(f"  (MRI stats: {e})")
     print("---")
@@ -252,11 +192,25 @@ def main():
     ap.add_argument("--iface", default="eth0", help="Interface to sniff")
     ap.add_argument("--port", type=int, default=4322, help="UDP port to sniff. 4321=MRI telemetry, 4322=data (h1/h2)")
     ap.add_argument("--state-file", default=None, help="Write q_ef,q_af to file for rule_based_controller")
+    ap.add_argument("--dump", action="store_true", help="Print full Scapy show2() dump per packet (slow, debugging only)")
+    ap.add_argument("--capture-backend", choices=("scapy", "ring"), default="scapy",
+                    help="scapy: sniff(); ring: AF_PACKET TPACKET_V3 ring + kernel BPF (falls back to scapy)")
+    ap.add_argument("--log-format", choices=("text", "bin"), default="text",
+                    help="text: per-packet printout (debugging); bin: fixed-width records to --log-file")
+    ap.add_argument("--log-file", default=None, help="Binary log path for --log-format=bin (e.g. outputs/receiver_h_r1.bin)")
+    ap.add_argument("--flow-id", type=int, default=0, help="Flow id stored in binary log records of unstamped packets (stamped ones carry their own)")
+    ap.add_argument("--ready-file", default=None,
+                    help="Marker written once capturing (then the first packet's time) for the experiment runner; "
+                         "see utils/readiness.py")
     args = ap.parse_args()
-    global _state_file_path
+    if args.log_format == "bin" and not args.log_file:
+        ap.error("--log-format=bin requires --log-file")
+    global _state_file_path, _dump_packets, _bin_log, _ready
+    if args.ready_file:
+        _ready = ReadyMarker(args.ready_file)
+    _dump_packets = args.dump
     _state_file_path = args.state_file
     if _state_file_path and not os.path.isabs(_state_file_path):
-        _script_dir = os.path.dirname(os.path.abspath(__file__))
         _state_file_path = os.path.join(_script_dir, _state_file_path)
         os.makedirs(os.path.dirname(_state_file_path), exist_ok=True)
     iface = args.iface
@@ -270,9 +224,30 @@ def main():
             print("  (created initial state file)")
         except Exception as e:
             print(f"  (failed to create state file: {e})", file=sys.stderr)
+    if args.log_format == "bin":
+        _bin_log = RecvLogWriter(args.log_file, flow_id=args.flow_id)
+        print(f"writing binary records to {args.log_file}")
+        # Mininet stops receivers with SIGTERM: exit through finally to flush the log
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     print("the simulation started at time:", time.time())
     sys.stdout.flush()
-    sniff(filter=f"udp and port {port}", iface=iface, prn=handle_pkt)
+    try:
+        if args.capture_backend == "ring":
+            cap = open_ring_or_none(iface, bpf_udp_port(port))
+            if cap is not None:
+                if _ready is not None:
+                    _ready.ready()
+                try:
+                    cap.run(handle_batch)
+                finally:
+                    cap.close()
+                return
+        sniff(filter=f"udp and port {port}", iface=iface, prn=handle_pkt, store=False,
+              started_callback=_ready.ready if _ready is not None else None)
+    finally:
+        if _bin_log is not None:
+            _bin_log.close()
+            print(f"binary log closed: {_bin_log.count} records", flush=True)
 
 
 if __name__ == "__main__":
@@ -3,13 +3,23 @@
 MRI-style probe sender for P4_simulation.
 Sends low-rate packets with IPOption_MRI (option 31) for in-band telemetry.
 Used with receive.py for MRI_STYLE_TEST_GUIDE.md testing.
+With --trace, sends at the times of one flow of a binary workload trace
+(utils/workload_gen.py) instead of at --rate, with the trace's rank in ip.id
+and the probe padded to the trace's frame size.
 """
 
 import argparse
+import os
 import socket
 import sys
+import time
 from time import sleep
 
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+_utils_dir = os.path.abspath(os.path.join(_script_dir, "..", "..", "utils"))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
 from scapy.all import (
     IP,
     UDP,
@@ -68,6 +78,37 @@ class IPOption_MRI(IPOption):
     ]
 
 
+def send_trace(args, pkt, iface):
+    """Send copies of pkt at the trace times of flow --flow-id, for at most args.duration seconds."""
+    from workload_trace import load_flow
+    try:
+        trace = load_flow(args.trace, args.flow_id)
+    except (OSError, ValueError) as e:
+        print(f"--trace: {e}")
+        sys.exit(1)
+    trace = trace[trace["t_ns"] < args.duration * 1e9]
+    base_len = len(pkt)
+    print(f"Sending MRI probes to {pkt[IP].dst}, {len(trace)} packets of flow {args.flow_id} from {args.trace}")
+
+    start = time.time()
+    try:
+        for i, (t_ns, rank, size) in enumerate(zip(trace["t_ns"].tolist(), trace["rank"].tolist(),
+                                                   trace["size"].tolist())):
+            delay = start + t_ns / 1e9 - time.time()
+            if delay > 0:
+                sleep(delay)
+            probe = pkt.copy()
+            probe[IP].id = rank & 0xffff
+            if size > base_len:
+                probe = probe / (b"\x00" * (size - base_len))
+            sendp(probe, iface=iface, verbose=False)
+            if (i + 1) % 100 == 0:
+                print(f"sent #{i + 1}")
+    except KeyboardInterrupt:
+        print("\nInterrupted")
+        raise
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="MRI-style probe sender. Sends packets with MRI option for qdepth telemetry."
@@ -97,6 +138,18 @@ def main():
         default=1.0,
         help="Send rate in packets per second (default: 1). Use higher rate (e.g. 50) to see qdepth>1 under congestion."
     )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help="Binary workload trace (utils/workload_gen.py): send at its times, ranks and frame sizes "
+             "(at most `duration` seconds of it)"
+    )
+    parser.add_argument(
+        "--flow-id",
+        type=int,
+        default=1,
+        help="Flow of --trace to send (default: 1)"
+    )
     args = parser.parse_args()
 
     addr = socket.gethostbyname(args.des)
@@ -110,6 +163,10 @@ def main():
         / args.message
     )
 
+    if args.trace:
+        send_trace(args, pkt, iface)
+        return
+
     interval = 1.0 / args.rate if args.rate > 0 else 1.0
     total_pkts = int(args.duration * args.rate)
     print(f"Sending MRI probes to {addr}, {total_pkts} packets at {args.rate} pps")
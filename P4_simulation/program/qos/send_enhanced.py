@@ -6,13 +6,29 @@ Supports:
 - Auto-stop (based on time or packet count)
 - Create congestion scenarios to test WRR weight allocation
 - --fast: high-speed mode (pre-build packets + sendpfast, minimal logging; no per-packet timestamps, not for latency analysis; requires tcpreplay)
+- --raw: raw AF_PACKET mode (utils/raw_sender.py: pre-serialized frame, sendmmsg batches; thousands of pps
+  with the real send time of every packet)
+Every packet carries a (flow_id, seq, tx_ns) stamp after "P4 is cool" (utils/payload_stamp.py), so the
+receivers log each packet's seq and send time and no per-packet sender log is needed (--log-every=0).
+Only --fast stamps tx_ns=0 (send times are not known when the packets are built); its theoretical
+timestamps are still written with --log-every.
+- --trace FILE: replay flow --flow-id of a binary workload trace (utils/workload_gen.py): every packet
+  at its trace time with its rank and frame size, instead of --pps and a fixed rank; all three modes
 """
 
 import argparse
+import os
 import socket
 import sys
 import time
 
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+_utils_dir = os.path.abspath(os.path.join(_script_dir, "..", "..", "utils"))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from payload_stamp import STAMPED_LEN, stamped_payload
+from raw_sender import DEFAULT_BATCH, RawSender
 from scapy.all import sendp, sendpfast, get_if_list, get_if_hwaddr, get_if_addr
 from scapy.all import Ether, IP, UDP
 
@@ -29,13 +45,86 @@ def get_if():
     return iface
 
 
+def load_trace_flow(path, flow_id):
+    """This flow's records of a workload trace, or exit with the reason."""
+    from workload_trace import load_flow
+    try:
+        trace = load_flow(path, flow_id)
+    except (OSError, ValueError) as e:
+        print(f"Error: --trace: {e}")
+        sys.exit(1)
+    if not len(trace):
+        print(f"Error: --trace: flow {flow_id} has no packets in {path}")
+        sys.exit(1)
+    return trace
+
+
+def trace_padding(size):
+    """Zero bytes after the stamp that make a Scapy Ether/IP/UDP frame `size` bytes long."""
+    return bytes(max(0, int(size) - 42 - STAMPED_LEN))
+
+
+def describe_trace(trace):
+    span = trace["t_ns"][-1] / 1e9
+    print(f"  Trace: {len(trace)} packets over {span:.2f} s, ranks {trace['rank'].min()}..{trace['rank'].max()}, "
+          f"frames {trace['size'].min()}..{trace['size'].max()} bytes")
+
+
+def send_raw(args, addr, iface, ranks, rank_value, max_packets, max_time, trace=None):
+    pps = 1.0 / args.rate
+    max_frame = int(trace["size"].max()) if trace is not None else None
+    tx = RawSender(iface, addr, args.port, flow_id=args.flow_id, batch=args.batch, max_frame=max_frame)
+    if trace is not None:
+        print(f"Flow {args.flow_id}: Raw mode – replaying {args.trace} to {addr} "
+              f"(batches of up to {args.batch} per sendmmsg)")
+        describe_trace(trace)
+    else:
+        print(f"Flow {args.flow_id}: Raw mode – sending to {addr} at {pps:.0f} pps "
+              f"(batches of up to {args.batch} per sendmmsg)")
+        print(f"  Rank value: {rank_value} (fixed)")
+    if args.log_every > 0:
+        print(f"  Log every {args.log_every} packets (real send timestamps)")
+    log_every = args.log_every
+
+    def on_batch(first_seq, stamps):
+        if log_every <= 0:
+            return
+        for seq, tx_ns in enumerate(stamps, first_seq):
+            if seq == 1 or seq % log_every == 0:
+                print(f"This host has sent {seq} packets until now : {tx_ns / 1e9}")
+
+    t0 = time.time()
+    try:
+        if trace is not None:
+            sent = tx.run_trace(trace["t_ns"], trace["rank"], trace["size"], max_packets=max_packets,
+                                deadline=max_time, on_batch=on_batch)
+        else:
+            sent = tx.run(ranks, pps, max_packets=max_packets, deadline=max_time, on_batch=on_batch)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted: sent {tx.sent} packets")
+        raise
+    finally:
+        tx.close()
+    elapsed = time.time() - t0
+    print(f"\nFlow {args.flow_id}: Raw mode completed")
+    print(f"  Total packets: {sent}")
+    print(f"  Send calls: {tx.syscalls}")
+    print(f"  Total time: {elapsed:.2f} seconds")
+    if elapsed > 0:
+        print(f"  Average rate: {sent/elapsed:.2f} packets/sec")
+    sys.stdout.flush()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Enhanced traffic sending script (fixed rank)")
     parser.add_argument("--h", help="Workload file path (optional, if provided read from file)", type=str, default=None)
+    parser.add_argument("--trace", help="Binary workload trace (utils/workload_gen.py): send flow --flow-id at the "
+                        "trace times, ranks and frame sizes (overrides --h, --pps, --rank-value)", type=str, default=None)
     parser.add_argument("--des", help="Destination IP address (required for send; h1->10.0.2.1, h2->10.0.2.2)", type=str, default=None)
     parser.add_argument("--rate", help="Send rate: sleep time between packets (seconds), lower value = higher rate", type=float, default=None)
     parser.add_argument("--pps", help="Send rate in packets per second (overrides --rate if set). Default 100", type=float, default=100)
-    parser.add_argument("--log-every", help="Log send timestamp every N packets. Default 100", type=int, default=100)
+    parser.add_argument("--log-every", help="Log send timestamp every N packets (0 = none; packets carry their "
+                        "own send time except with --fast). Default 100", type=int, default=100)
 
     # Fixed rank options
     parser.add_argument("--num-packets", help="Number of packets. Default 100000", type=int, default=100000)
@@ -46,11 +135,15 @@ def main():
     parser.add_argument("--max-packets", help="Maximum packet count limit", type=int, default=None)
 
     # Flow mode
-    parser.add_argument("--flow-id", help="Flow ID (for logging). h1=1, h2=2", type=int, default=1)
+    parser.add_argument("--flow-id", help="Flow ID (for logging and the payload stamp). h1=1, h2=2", type=int, default=1)
     parser.add_argument("--port", help="UDP destination port. Default 4322 (data traffic; 4321 reserved for telemetry)", type=int, default=4322)
     parser.add_argument("--fast", action="store_true", help="High-speed mode (default)")
     parser.add_argument("--no-fast", dest="fast", action="store_false", help="Disable fast mode")
     parser.set_defaults(fast=True)
+    parser.add_argument("--raw", action="store_true",
+                        help="Raw AF_PACKET mode with real per-packet timestamps (takes precedence over --fast)")
+    parser.add_argument("--batch", help=f"--raw: max packets per sendmmsg call. Default {DEFAULT_BATCH}",
+                        type=int, default=DEFAULT_BATCH)
 
     args = parser.parse_args()
 
@@ -59,7 +152,13 @@ def main():
         args.log_every = 0
 
     # Determine packet count and rank value
-    if args.h:
+    trace = None
+    if args.trace:
+        trace = load_trace_flow(args.trace, args.flow_id)
+        num_packets = len(trace)
+        ranks = trace["rank"].tolist()
+        rank_value = ranks[0]
+    elif args.h:
         # Read from file
         with open(args.h, 'r') as f:
             ranks = [int(line.strip()) for line in f if line.strip()]
@@ -98,27 +197,54 @@ def main():
     # Initialize network
     addr = socket.gethostbyname(args.des)
     iface = get_if()
-    args.m = "P4 is cool"
+
+    # ---------- Raw mode: frame template + sendmmsg, real per-packet timestamps ----------
+    if args.raw:
+        send_raw(args, addr, iface, ranks, rank_value, max_packets, max_time, trace)
+        return
 
     # ---------- Fast mode: pre-build + sendpfast, minimal logging ----------
     if args.fast:
         target_pps = int(1.0 / args.rate)
-        n_pkts = min(max_packets, int(args.duration * target_pps)) if max_time else max_packets
+        if trace is not None:
+            n_pkts = max_packets
+            if max_time:
+                n_pkts = min(n_pkts, int(trace["t_ns"].searchsorted(int(args.duration * 1e9))))
+        else:
+            n_pkts = min(max_packets, int(args.duration * target_pps)) if max_time else max_packets
         if n_pkts <= 0:
             print("Fast mode: no packets to send (duration too short or max_packets=0)")
         else:
-            print(f"Flow {args.flow_id}: Fast mode – pre-building {n_pkts} packets, then sendpfast at {target_pps} pps")
-            print(f"  Rank value: {rank_value} (fixed)")
+            if trace is not None:
+                print(f"Flow {args.flow_id}: Fast mode – pre-building {n_pkts} packets, then sendpfast "
+                      f"at the trace times (realtime)")
+                describe_trace(trace[:n_pkts])
+            else:
+                print(f"Flow {args.flow_id}: Fast mode – pre-building {n_pkts} packets, then sendpfast at {target_pps} pps")
+                print(f"  Rank value: {rank_value} (fixed)")
             if args.log_every > 0:
                 print(f"  Will write theoretical timestamps (every {args.log_every} pkts) after send for latency analysis")
             else:
                 print(f"  No timestamps (use --log-every=N to write theoretical timestamps after send)")
             base = Ether(src=get_if_hwaddr(iface), dst="ff:ff:ff:ff:ff:ff", type=0x800) / IP(
                 src=get_if_addr(iface), dst=addr, id=(rank_value & 0xffff)
-            ) / UDP(dport=args.port, sport=1234) / args.m
-            pkts = [base.copy() for _ in range(n_pkts)]
-            t0 = time.time()
-            sendpfast(pkts, pps=target_pps, loop=1, iface=iface)
+            ) / UDP(dport=args.port, sport=1234)
+            # seq stamped now; tx_ns=0: sendpfast decides the send times
+            if trace is not None:
+                # per-packet rank and size; tcpreplay follows the pcap timestamps (realtime)
+                pkts = []
+                for n, (t_ns, rank, size) in enumerate(zip(trace["t_ns"][:n_pkts].tolist(), ranks,
+                                                           trace["size"][:n_pkts].tolist()), 1):
+                    pkt = base / (stamped_payload(args.flow_id, n) + trace_padding(size))
+                    pkt[IP].id = rank & 0xffff
+                    pkt.time = t_ns / 1e9
+                    pkts.append(pkt)
+                t0 = time.time()
+                sendpfast(pkts, realtime=True, loop=1, iface=iface)
+            else:
+                pkts = [base / stamped_payload(args.flow_id, n) for n in range(1, n_pkts + 1)]
+                t0 = time.time()
+                sendpfast(pkts, pps=target_pps, loop=1, iface=iface)
             elapsed = time.time() - t0
             print(f"\nFlow {args.flow_id}: Fast mode completed")
             print(f"  Total packets: {n_pkts}")
@@ -137,8 +263,14 @@ def main():
 
     # ---------- Normal mode: per-packet send with rate control and optional logging ----------
     print(f"Flow {args.flow_id}: Starting to send traffic to {addr}")
-    print(f"  Rank value: {rank_value} (fixed)")
-    print(f"  Send rate: {args.rate} sec/packet ({1.0/args.rate:.2f} packets/sec)")
+    if trace is not None:
+        describe_trace(trace)
+        send_times = (start_time + trace["t_ns"] / 1e9).tolist()
+        padding = [trace_padding(size) for size in trace["size"].tolist()]
+    else:
+        padding = None
+        print(f"  Rank value: {rank_value} (fixed)")
+        print(f"  Send rate: {args.rate} sec/packet ({1.0/args.rate:.2f} packets/sec)")
     if args.log_every == 0:
         print(f"  No per-packet log (--log-every=0, max pps test)")
     elif args.log_every > 1:
@@ -163,8 +295,10 @@ def main():
                 break
 
             # Wait until next ideal send time (keeps rate accurate under variable send overhead)
+            if trace is not None:
+                next_send_time = send_times[i]
             now = time.time()
-            if sent_count > 0 and now < next_send_time:
+            if (sent_count > 0 or trace is not None) and now < next_send_time:
                 time.sleep(next_send_time - now)
 
             # Construct packet
@@ -176,7 +310,8 @@ def main():
                 src=get_if_addr(iface),
                 dst=addr,
                 id=(rank & 0xffff)
-            ) / UDP(dport=args.port, sport=1234) / args.m
+            ) / UDP(dport=args.port, sport=1234) / (stamped_payload(args.flow_id, sent_count + 1, time.time_ns())
+                                                    + (padding[i] if padding else b""))
 
             # Send packet
             sendp(pkt, iface=iface, verbose=False)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Hyper-parameter sweep for the Q-learning WRR controller on the offline model
+(wrr_env.VecWRREnv), one configuration per worker process.
+
+Every parameter option takes a comma-separated list of values; the sweep runs
+their cartesian product (grid search), or with --random N draws N
+configurations, picking each parameter from its list or uniformly from a
+lo:hi range. Each configuration is trained like pretrain_qlearning.py and
+then its greedy policy is evaluated on fresh environments. One row per
+(configuration, seed) is appended to --output as soon as it finishes:
+
+    steps_to_converge  first step after which every --window-step mean of the
+                       training violation rate stays within --tol of the
+                       mean of the last 10% of windows
+    final_violation    P(EF probe latency > d_ub) under the greedy policy
+    final_reward       mean reward under the greedy policy
+    mean_ef            mean EF quantum under the greedy policy
+
+Configurations already in --output are skipped, so an interrupted sweep
+resumes where it stopped when run again with the same options (random
+search is seeded by --search-seed). At the end the configurations are
+ranked by final violation rate, averaged over seeds.
+
+Usage:
+    python3 sweep_qlearning.py [--d-ub 30,50,80] [--eps-ub 0.05] [--lambda 0.5,1,2]
+                               [--epsilon-decay 0.9,0.95,0.99] [--n-ratio-bins 3,5,8]
+                               [--alpha 0.05] [--gamma 0.9] [--epsilon 0.4] [--epsilon-min 0.1]
+                               [--random N] [--seeds 0,1] [--envs 256] [--steps 1500]
+                               [--workers N] [--output sweep_results.csv]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+if _script_dir not in sys.path:
+    sys.path.insert(0, _script_dir)
+
+from pretrain_qlearning import evaluate, train
+
+# (name, type, default values); names are pretrain_qlearning's args attributes
+PARAMS = [
+    ("d_ub", float, "50"),
+    ("eps_ub", float, "0.05"),
+    ("lambda_tradeoff", float, "1.0"),
+    ("epsilon_decay", float, "0.95"),
+    ("n_ratio_bins", int, "5"),
+    ("alpha", float, "0.05"),
+    ("gamma", float, "0.9"),
+    ("epsilon", float, "0.4"),
+    ("epsilon_min", float, "0.1"),
+]
+METRICS = ["steps_to_converge", "final_violation", "final_reward", "mean_ef", "seconds"]
+COLUMNS = [name for name, _, _ in PARAMS] + ["seed"] + METRICS
+
+
+def parse_values(spec, kind):
+    """'a,b,c' -> [a, b, c]; 'lo:hi' -> (lo, hi) range for random search."""
+    if ":" in spec:
+        lo, hi = spec.split(":", 1)
+        return (kind(lo), kind(hi))
+    return [kind(v) for v in spec.split(",")]
+
+
+def build_configs(args):
+    space = {name: parse_values(getattr(args, name), kind) for name, kind, _ in PARAMS}
+    if args.random:
+        rng = np.random.default_rng(args.search_seed)
+        configs = []
+        for _ in range(args.random):
+            config = {}
+            for name, kind, _ in PARAMS:
+                values = space[name]
+                if isinstance(values, tuple):
+                    lo, hi = values
+                    config[name] = int(rng.integers(lo, hi + 1)) if kind is int else round(float(rng.uniform(lo, hi)), 4)
+                else:
+                    config[name] = values[rng.integers(len(values))]
+            configs.append(config)
+    else:
+        ranges = [name for name, values in space.items() if isinstance(values, tuple)]
+        if ranges:
+            raise SystemExit(f"lo:hi ranges need --random N: {', '.join(ranges)}")
+        names = list(space)
+        configs = [dict(zip(names, values)) for values in itertools.product(*space.values())]
+    seeds = [int(s) for s in args.seeds.split(",")]
+    return [dict(config, seed=seed) for config in configs for seed in seeds]
+
+
+def config_key(config):
+    return json.dumps({name: kind(config[name]) for name, kind, _ in PARAMS + [("seed", int, "")]},
+                      sort_keys=True)
+
+
+def steps_to_converge(violation, window, tol):
+    """First step after which every window mean stays within tol of the final level."""
+    n = len(violation) // window
+    if n == 0:
+        return len(violation)
+    means = np.asarray(violation[:n * window]).reshape(n, window).mean(axis=1)
+    final = means[-max(1, n // 10):].mean()
+    outside = np.flatnonzero(np.abs(means - final) > tol)
+    return 0 if outside.size == 0 else int(outside[-1] + 1) * window
+
+
+def _worker_init():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the parent only
+
+
+def run_config(config, envs, steps, eval_steps, window, tol):
+    """Worker: train and evaluate one configuration, return its result row."""
+    args = argparse.Namespace(envs=envs, steps=steps, **config)
+    violation = []
+
+    def on_step(step, epsilon, reward, info):
+        violation.append(float(np.mean(info["latency_ms"] > args.d_ub)))
+
+    t0 = time.perf_counter()
+    qt = train(args, on_step)
+    reward, final_violation, mean_ef = evaluate(args, lambda s, info: qt.greedy_actions(s), eval_steps)
+    return dict(config,
+                steps_to_converge=steps_to_converge(violation, window, tol),
+                final_violation=round(float(final_violation), 4),
+                final_reward=round(float(reward), 4),
+                mean_ef=round(float(mean_ef)),
+                seconds=round(time.perf_counter() - t0, 1))
+
+
+def load_done(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def print_ranking(rows, varied, top):
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[name] for name in varied), []).append(row)
+    ranked = []
+    for key, runs in groups.items():
+        mean = {m: np.mean([float(r[m]) for r in runs]) for m in METRICS}
+        ranked.append((mean["final_violation"], -mean["final_reward"], key, mean, len(runs)))
+    ranked.sort(key=lambda item: item[:2])
+
+    widths = [max(len(name), 8) + 2 for name in varied]
+    header = "".join(f"{name:>{w}}" for name, w in zip(varied, widths))
+    print(f"\nTop {min(top, len(ranked))} of {len(ranked)} configurations (mean over seeds):")
+    print(f"{header}{'seeds':>6}{'converge':>10}{'violation':>11}{'reward':>9}{'mean EF':>9}")
+    for _, _, key, mean, n in ranked[:top]:
+        values = "".join(f"{v:>{w}}" for v, w in zip(key, widths))
+        print(f"{values}{n:>6}{mean['steps_to_converge']:>10.0f}{mean['final_violation']:>11.3f}"
+              f"{mean['final_reward']:>+9.3f}{mean['mean_ef']:>9.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel hyper-parameter sweep on the offline WRR model")
+    for name, kind, default in PARAMS:
+        flag = "--lambda" if name == "lambda_tradeoff" else "--" + name.replace("_", "-")
+        ap.add_argument(flag, dest=name, default=default,
+                        help=f"Comma-separated values or lo:hi range (default: {default})")
+    ap.add_argument("--random", type=int, default=0, help="Random search: number of configurations (default: grid)")
+    ap.add_argument("--search-seed", type=int, default=0, help="Seed for --random draws (default: 0)")
+    ap.add_argument("--seeds", default="0", help="Comma-separated training seeds per configuration (default: 0)")
+    ap.add_argument("--envs", type=int, default=256, help="Environments per configuration (default: 256)")
+    ap.add_argument("--steps", type=int, default=1500, help="Training steps per configuration (default: 1500)")
+    ap.add_argument("--eval-steps", type=int, default=300, help="Greedy evaluation steps (default: 300)")
+    ap.add_argument("--window", type=int, default=20, help="Convergence window in steps (default: 20)")
+    ap.add_argument("--tol", type=float, default=0.02, help="Convergence tolerance on the violation rate (default: 0.02)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    ap.add_argument("--output", default=os.path.join(_script_dir, "logs", "sweep_results.csv"),
+                    help="Results table, also the resume state (default: logs/sweep_results.csv)")
+    ap.add_argument("--top", type=int, default=10, help="Configurations shown in the final ranking (default: 10)")
+    args = ap.parse_args()
+
+    configs = build_configs(args)
+    varied = [name for name, _, _ in PARAMS if len({c[name] for c in configs}) > 1]
+    fixed = " ".join(f"{name}={configs[0][name]}" for name, _, _ in PARAMS if name not in varied)
+    done = load_done(args.output)
+    done_keys = {config_key(row) for row in done}
+    pending = [c for c in configs if config_key(c) not in done_keys]
+    print(f"{len(configs)} runs, {len(configs) - len(pending)} already in {args.output}, "
+          f"{len(pending)} to go on {args.workers} workers", flush=True)
+    print(f"Fixed: {fixed}", flush=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    new_file = not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+    with open(args.output, "a", newline="") as f, ProcessPoolExecutor(args.workers, initializer=_worker_init) as pool:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+        futures = [pool.submit(run_config, c, args.envs, args.steps, args.eval_steps, args.window, args.tol)
+                   for c in pending]
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                writer.writerow(row)
+                f.flush()  # a finished run survives an interrupt
+                done.append({k: str(v) for k, v in row.items()})
+                print(f"[{i}/{len(pending)}] violation={row['final_violation']:.3f} "
+                      f"converge={row['steps_to_converge']} ({row['seconds']}s)  "
+                      + " ".join(f"{name}={row[name]}" for name in varied + ["seed"]),
+                      flush=True)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"\nInterrupted; run the same command again to resume from {args.output}", flush=True)
+            return
+
+    wanted = {config_key(c) for c in configs}
+    print_ranking([row for row in done if config_key(row) in wanted], varied, args.top)
+
+
+if __name__ == "__main__":
+    main()
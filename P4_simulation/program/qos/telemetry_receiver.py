@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 """
 Telemetry receiver for c1: parses MRI (qdepth, flow1/flow2), computes latency,
-writes state file for Q-learning controller.
+pushes each observation to the Q-learning controller.
 - flow1 = AF (h1), flow2 = EF (h2)
-- State file format: q_ef,q_af,latency_ms (EF queue depth for Q-learning state)
+- Observations go to qos_runtime.py over a Unix datagram socket
+  (utils/telemetry_channel.py); --state-file also writes the old polled
+  state file, format: q_ef,q_af,latency_ms
 - Payload format from telemetry_sender: "seq,start_ts,msg"
+- Frames are decoded in a single pass by utils/mri_decoder.py
 """
 
 import os
@@ -12,10 +15,19 @@ import re
 import sys
 import time
 
-from scapy.all import IP, UDP, get_if_list, sniff
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+_utils_dir = os.path.abspath(os.path.join(_script_dir, "..", "..", "utils"))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
 
-# Import MRI parsing from receive.py
-from receive import parse_mri_manual, parse_mri_from_raw, find_mri_option
+from mri_decoder import decode_frame, frame_bytes, select_trace
+from readiness import ReadyMarker
+from ring_capture import bpf_udp_port, open_ring_or_none
+from telemetry_channel import DEFAULT_SOCKET_NAME, TelemetryPublisher
+
+from scapy.all import get_if_list, sniff
+
+_PAYLOAD_RE = re.compile(rb"^(\d+),([\d.]+),")
 
 
 def get_if():
@@ -27,26 +39,25 @@ def get_if():
     return None
 
 
-def parse_payload_latency(pkt):
-    """Parse 'seq,start_ts,msg' from UDP payload, return (seq, latency_ms) or None."""
-    if UDP not in pkt or IP not in pkt:
+def parse_payload_latency(payload, recv_ts):
+    """Parse 'seq,start_ts,msg' from UDP payload, return (seq, start_ts, latency_ms) or None."""
+    if payload is None:
+        return None
+    m = _PAYLOAD_RE.match(payload)
+    if not m:
         return None
     try:
-        payload = bytes(pkt[UDP].payload)
-        s = payload.decode("utf-8", errors="ignore")
-        m = re.match(r"^(\d+),([\d.]+),", s)
-        if not m:
-            return None
         seq = int(m.group(1))
         start_ts = float(m.group(2))
-        end_ts = time.time()
-        latency_ms = (end_ts - start_ts) * 1000
-        return (seq, latency_ms)
-    except Exception:
+    except ValueError:
         return None
+    latency_ms = (recv_ts - start_ts) * 1000
+    return (seq, start_ts, latency_ms)
 
 
+_publisher = None
 _state_file_path = None
+_ready = None  # --ready-file marker
 # Clamp qdepth to [0, 10] per QCMP
 NQ = 10
 
@@ -56,72 +67,94 @@ def clamp_qdepth(v):
 
 
 def handle_pkt(pkt):
-    traces_data = None
-    mri = find_mri_option(pkt)
-    if mri is not None:
-        if isinstance(mri, tuple) and mri[0] == "raw":
-            raw_opt = mri[1] if isinstance(mri[1], bytes) else bytes(mri[1])
-            if len(raw_opt) >= 3:
-                traces_data = parse_mri_from_raw(raw_opt[1:])
-        else:
-            try:
-                traces = getattr(mri, "swtraces", [])
-                traces_data = []
-                for tr in traces:
-                    traces_data.append({
-                        "swid": getattr(tr, "swid", 0),
-                        "qdepth": getattr(tr, "qdepth", 0),
-                        "flow1_qdepth": getattr(tr, "flow1_qdepth", 0),
-                        "flow2_qdepth": getattr(tr, "flow2_qdepth", 0),
-                    })
-            except Exception:
-                pass
-    if traces_data is None:
-        traces_data = parse_mri_manual(pkt)
-
-    latency_info = parse_payload_latency(pkt)
-
-    if not _state_file_path:
+    if _ready is not None and not _ready.first_seen:
+        _ready.packet(time.time())
+    handle_frame(frame_bytes(pkt), time.time())
+
+
+def handle_batch(batch):
+    """Ring backend callback: batch of (kernel timestamp, frame)."""
+    if _ready is not None and not _ready.first_seen and batch:
+        _ready.packet(batch[0][0])
+    for recv_ts, frame in batch:
+        handle_frame(frame, recv_ts)
+
+
+def handle_frame(frame, recv_ts):
+    if _publisher is None and not _state_file_path:
         return
 
-    if traces_data is None:
+    decoded = decode_frame(frame)
+    if decoded is None or not decoded.traces:
         return
 
-    t_s1 = next((x for x in traces_data if x.get("swid") == 1), traces_data[0])
+    latency_info = parse_payload_latency(decoded.payload, recv_ts)
+
+    t_s1 = select_trace(decoded.traces)
     # flow1=AF (h1), flow2=EF (h2)
-    q_af = clamp_qdepth(t_s1.get("flow1_qdepth", 0))
-    q_ef = clamp_qdepth(t_s1.get("flow2_qdepth", 0))
-    latency_ms = latency_info[1] if latency_info else 0.0
+    q_af = clamp_qdepth(t_s1.flow1_qdepth)
+    q_ef = clamp_qdepth(t_s1.flow2_qdepth)
+    seq, probe_ts, latency_ms = latency_info if latency_info else (0, 0.0, 0.0)
 
-    try:
-        with open(_state_file_path, "w") as f:
-            f.write(f"{q_ef},{q_af},{latency_ms:.2f}\n")
-    except Exception as e:
-        print(f"  (state file write failed: {e})", file=sys.stderr)
+    if _publisher is not None:
+        _publisher.publish(seq, probe_ts, recv_ts, latency_ms, q_ef, q_af)
+    if _state_file_path:
+        try:
+            with open(_state_file_path, "w") as f:
+                f.write(f"{q_ef},{q_af},{latency_ms:.2f}\n")
+        except Exception as e:
+            print(f"  (state file write failed: {e})", file=sys.stderr)
 
 
 def main():
     import argparse
-    ap = argparse.ArgumentParser(description="Telemetry receiver for Q-learning: writes q_ef,q_af,latency_ms")
+    ap = argparse.ArgumentParser(description="Telemetry receiver for Q-learning: pushes q_ef,q_af,latency_ms")
     ap.add_argument("--iface", default="eth0", help="Interface to sniff")
-    _default_state = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qos_qlearning_state.txt")
-    ap.add_argument("--state-file", default=_default_state,
-                    help="State file for controller (default: <qos_dir>/qos_qlearning_state.txt)")
+    ap.add_argument("--state-socket", default=os.path.join(_script_dir, DEFAULT_SOCKET_NAME),
+                    help=f"Controller's Unix datagram socket (default: <qos_dir>/{DEFAULT_SOCKET_NAME}); "
+                         "'' to disable")
+    ap.add_argument("--state-file", default=None,
+                    help="Also write the polled state file, for qos_runtime.py --state-file "
+                         "(e.g. ./qos_qlearning_state.txt)")
     ap.add_argument("--port", type=int, default=4321, help="UDP port (default: 4321)")
+    ap.add_argument("--capture-backend", choices=("scapy", "ring"), default="scapy",
+                    help="scapy: sniff(); ring: AF_PACKET TPACKET_V3 ring + kernel BPF (falls back to scapy)")
+    ap.add_argument("--ready-file", default=None,
+                    help="Marker written once capturing (then the first packet's time) for the experiment runner; "
+                         "see utils/readiness.py")
     args = ap.parse_args()
 
-    global _state_file_path
-    _state_file_path = args.state_file
-    if not os.path.isabs(_state_file_path):
-        _script_dir = os.path.dirname(os.path.abspath(__file__))
-        _state_file_path = os.path.join(_script_dir, _state_file_path)
-    os.makedirs(os.path.dirname(_state_file_path) or ".", exist_ok=True)
-
-    with open(_state_file_path, "w") as f:
-        f.write("0,0,0.0\n")
-
-    print(f"Telemetry receiver: sniffing {args.iface} UDP port {args.port}, writing to {_state_file_path}", flush=True)
-    sniff(filter=f"udp and port {args.port}", iface=args.iface, prn=handle_pkt)
+    global _publisher, _state_file_path, _ready
+    if args.ready_file:
+        _ready = ReadyMarker(args.ready_file)
+    targets = []
+    if args.state_socket:
+        _publisher = TelemetryPublisher(args.state_socket)
+        targets.append(f"pushing to {args.state_socket}")
+    if args.state_file:
+        _state_file_path = args.state_file
+        if not os.path.isabs(_state_file_path):
+            _state_file_path = os.path.join(_script_dir, _state_file_path)
+        os.makedirs(os.path.dirname(_state_file_path) or ".", exist_ok=True)
+        with open(_state_file_path, "w") as f:
+            f.write("0,0,0.0\n")
+        targets.append(f"writing to {_state_file_path}")
+    if not targets:
+        ap.error("nothing to do: give --state-socket and/or --state-file")
+
+    print(f"Telemetry receiver: sniffing {args.iface} UDP port {args.port}, {', '.join(targets)}", flush=True)
+    if args.capture_backend == "ring":
+        cap = open_ring_or_none(args.iface, bpf_udp_port(args.port))
+        if cap is not None:
+            if _ready is not None:
+                _ready.ready()
+            try:
+                cap.run(handle_batch)
+            finally:
+                cap.close()
+            return
+    sniff(filter=f"udp and port {args.port}", iface=args.iface, prn=handle_pkt, store=False,
+          started_callback=_ready.ready if _ready is not None else None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Vectorized offline environment for the Q-learning WRR controller.
+
+Models the two-queue WRR of qos.p4 (queue 0 = AF with AF_QUANTUM_FIXED,
+queue 1 = EF with a quantum in [EF_QUANTUM_MIN, EF_QUANTUM_MAX] moved by
+DELTA per action) as a fluid queue per control step, for n_envs independent
+environments held as NumPy arrays and stepped in lockstep:
+
+    env = VecWRREnv(n_envs=4096, seed=0)
+    states, info = env.reset()
+    states, rewards, terminated, truncated, info = env.step(actions)
+
+States, actions and rewards are those of QLearningWRRController: the state
+index of (EF qdepth clamped to [0, NQ], EF/(AF+EF) ratio bin), actions
+0/1/2 = hold/+DELTA/-DELTA, and the reward of compute_reward() for the EF
+probe latency and the new EF quantum.
+
+Per step of step_ms, each queue receives Poisson arrivals; the link serves
+capacity_pps, split by quantum while both queues are backlogged
+(work-conserving, the unused share goes to the other queue), and each queue
+holds at most `buffer` packets. The EF probe latency is base_delay_ms plus
+the EF backlog divided by the EF service rate. Every env draws its own AF/EF
+rates from af_pps/ef_pps and redraws them every `rate_period` steps, so one
+table is trained over a range of loads. The task is continuing: terminated
+and truncated are always False.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+_script_dir = os.path.dirname(os.path.abspath(__file__))
+if _script_dir not in sys.path:
+    sys.path.insert(0, _script_dir)
+
+from qlearning_controller import (ACTION_DELTAS, AF_QUANTUM_FIXED, EF_QUANTUM_MAX, EF_QUANTUM_MIN,
+                                  NQ, NUM_ACTIONS, rewards, state_indices)
+
+# BMv2 WRR extern: one dequeue every 10 ms
+CAPACITY_PPS = 100.0
+STEP_MS = 500.0  # telemetry probes at 2 pps, one decision per probe
+
+
+class VecWRREnv:
+
+    def __init__(self, n_envs, d_ub_ms=50.0, eps_ub=0.05, lambda_tradeoff=1.0, n_ratio_bins=5,
+                 capacity_pps=CAPACITY_PPS, af_pps=(20.0, 80.0), ef_pps=(10.0, 90.0),
+                 buffer=64, base_delay_ms=2.0, jitter_ms=1.0, step_ms=STEP_MS,
+                 rate_period=200, initial_ef=6000, seed=None):
+        self.n_envs = n_envs
+        self.d_ub = d_ub_ms
+        self.eps_ub = eps_ub
+        self.lambda_tradeoff = lambda_tradeoff
+        self.n_ratio_bins = n_ratio_bins
+        self.n_states = (NQ + 1) * n_ratio_bins
+        self.n_actions = NUM_ACTIONS
+        self.capacity = capacity_pps
+        self.af_pps = af_pps
+        self.ef_pps = ef_pps
+        self.buffer = buffer
+        self.base_delay_ms = base_delay_ms
+        self.jitter_ms = jitter_ms
+        self.dt = step_ms / 1000.0
+        self.rate_period = rate_period
+        self.initial_ef = initial_ef
+        self.rng = np.random.default_rng(seed)
+        self.t = 0
+
+    def _draw_rates(self, mask=None):
+        n = self.n_envs if mask is None else int(mask.sum())
+        af = self.rng.uniform(*self.af_pps, size=n)
+        ef = self.rng.uniform(*self.ef_pps, size=n)
+        if mask is None:
+            self.af_rate, self.ef_rate = af, ef
+        else:
+            self.af_rate[mask], self.ef_rate[mask] = af, ef
+
+    def _observe(self):
+        return state_indices(self.q_ef, self.ef_quantum, self.n_ratio_bins)
+
+    def _info(self, latency_ms):
+        return {"q_af": self.q_af, "q_ef": self.q_ef, "latency_ms": latency_ms,
+                "ef_quantum": self.ef_quantum, "af_rate": self.af_rate, "ef_rate": self.ef_rate}
+
+    def reset(self, seed=None):
+        """Empty queues, EF quantum back to initial_ef, fresh rates. Returns (states, info)."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.t = 0
+        self.q_af = np.zeros(self.n_envs)
+        self.q_ef = np.zeros(self.n_envs)
+        self.ef_quantum = np.full(self.n_envs, self.initial_ef, dtype=np.int64)
+        self._draw_rates()
+        self._age = self.rng.integers(self.rate_period, size=self.n_envs)  # desynchronize the redraws
+        return self._observe(), self._info(np.full(self.n_envs, self.base_delay_ms))
+
+    def step(self, actions):
+        """Apply one action per env. Returns (states, rewards, terminated, truncated, info)."""
+        self.ef_quantum = np.clip(self.ef_quantum + ACTION_DELTAS[actions], EF_QUANTUM_MIN, EF_QUANTUM_MAX)
+
+        cap = self.capacity * self.dt
+        ef_share = self.ef_quantum / (AF_QUANTUM_FIXED + self.ef_quantum)
+        backlog_af = self.q_af + self.rng.poisson(self.af_rate * self.dt)
+        backlog_ef = self.q_ef + self.rng.poisson(self.ef_rate * self.dt)
+        serve_ef = np.minimum(backlog_ef, ef_share * cap)
+        serve_af = np.minimum(backlog_af, cap - serve_ef)
+        # work conserving: EF takes what AF leaves of its share
+        serve_ef = np.minimum(backlog_ef, cap - serve_af)
+        self.q_af = np.minimum(backlog_af - serve_af, self.buffer)
+        self.q_ef = np.minimum(backlog_ef - serve_ef, self.buffer)
+
+        ef_rate = np.maximum(serve_ef / self.dt, ef_share * self.capacity)
+        latency_ms = self.base_delay_ms + self.q_ef / ef_rate * 1000.0
+        if self.jitter_ms:
+            latency_ms = np.maximum(0.0, latency_ms + self.rng.normal(0.0, self.jitter_ms, self.n_envs))
+        reward = rewards(latency_ms, self.ef_quantum, self.d_ub, self.eps_ub, self.lambda_tradeoff)
+
+        self.t += 1
+        self._age += 1
+        expired = self._age >= self.rate_period
+        if expired.any():
+            self._draw_rates(expired)
+            self._age[expired] = 0
+        done = np.zeros(self.n_envs, dtype=bool)
+        return self._observe(), reward, done, done, self._info(latency_ms)
@@ -1,5 +1,6 @@
 import subprocess
 
+import thrift_pool
 from shortest_path import ShortestPath
 
 class AppController:
@@ -31,6 +32,11 @@ class AppController:
 
     def read_register(self, register, idx, thrift_port=9090, sw=None):
         if sw: thrift_port = sw.thrift_port
+        try:
+            # one pooled connection per switch instead of a CLI process per read
+            return long(thrift_pool.get_client(thrift_port).register_read(register, idx))
+        except thrift_pool.ThriftUnavailable:
+            pass
         p = subprocess.Popen(['simple_switch_CLI', '--thrift-port', str(thrift_port)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         stdout, stderr = p.communicate(input="register_read %s %d" % (register, idx))
         reg_val = filter(lambda l: ' %s[%d]' % (register, idx) in l, stdout.split('\n'))[0].split('= ', 1)[1]
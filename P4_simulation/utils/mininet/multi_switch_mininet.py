@@ -31,6 +31,10 @@ from mininet.link import TCLink
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
 
+# appcontroller imports thrift_pool from utils/; appended so that
+# utils/p4_mininet.py does not shadow the one next to this script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
 from p4_mininet import P4Switch, P4Host
 import apptopo
 import appcontroller
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Single-pass decoder for MRI (IPv4 option 31) telemetry frames.
+
+Works directly on the raw Ethernet frame through a memoryview, so a frame is
+walked exactly once (Ethernet -> IPv4 -> options -> UDP) and no intermediate
+bytes objects are created. All header layouts are precompiled struct.Struct
+instances.
+
+Supported switch_t trace layouts (selected from optionLength / count):
+  -  8 bytes: swid, qdepth                                    (QCMP)
+  - 16 bytes: swid, qdepth, flow1_qdepth, flow2_qdepth        (qos, old)
+  - 20 bytes: swid, qdepth, flow1_qdepth, flow2_qdepth, latency (qos)
+
+Shared by program/qos/receive.py, program/qos/telemetry_receiver.py and
+QCMP/receive_queues.py.
+"""
+
+import struct
+from collections import namedtuple
+from functools import partial
+
+ETH_HDR_LEN = 14
+IPV4_MIN_HDR_LEN = 20
+UDP_HDR_LEN = 8
+ETHERTYPE_IPV4 = 0x0800
+IP_PROTO_UDP = 17
+IPOPT_EOL = 0
+IPOPT_NOP = 1
+IPOPT_MRI = 31
+MRI_HDR_LEN = 4  # type(1) + length(1) + count(2)
+
+_OPT_OFF = ETH_HDR_LEN + IPV4_MIN_HDR_LEN
+
+# ethertype + fixed IPv4 header in one unpack: ethertype, ver_ihl, id, proto, src, dst
+_unpack_eth_ipv4 = struct.Struct("!12xHBxxxHxxxBxxII").unpack_from
+_unpack_udp = struct.Struct("!HHH").unpack_from  # sport, dport, length
+
+MRITrace = namedtuple("MRITrace", ["swid", "qdepth", "flow1_qdepth", "flow2_qdepth", "latency"],
+                      defaults=(0, 0, 0))
+
+# trace size -> (unpack_from, size, zero padding for the fields the layout lacks)
+TRACE_LAYOUTS = {
+    size: (struct.Struct(fmt).unpack_from, size, pad)
+    for size, fmt, pad in (
+        (8, "!II", (0, 0, 0)),
+        (16, "!IIII", (0,)),
+        (20, "!IIIII", ()),
+    )
+}
+
+MRIFrame = namedtuple("MRIFrame", ["ip_id", "src", "dst", "sport", "dport", "traces", "payload"])
+
+# tuple.__new__ bound to the namedtuple class: builds instances without the
+# Python-level namedtuple __new__ (arguments are passed as one tuple)
+_new_trace = partial(tuple.__new__, MRITrace)
+_new_frame = partial(tuple.__new__, MRIFrame)
+
+
+def find_mri(mv, opt_start, opt_end):
+    """Scan IPv4 options in mv[opt_start:opt_end] for option 31.
+    Returns (offset, length) of the option, or None.
+    """
+    off = opt_start
+    while off < opt_end:
+        opt_type = mv[off]
+        if opt_type == IPOPT_EOL:
+            break
+        if opt_type == IPOPT_NOP:
+            off += 1
+            continue
+        if off + 1 >= opt_end:
+            break
+        opt_len = mv[off + 1]
+        if opt_len < 2 or off + opt_len > opt_end:
+            break
+        if (opt_type & 0x1f) == IPOPT_MRI:
+            return off, opt_len
+        off += opt_len
+    return None
+
+
+def decode_traces(mv, opt_off, opt_len):
+    """Decode the switch traces of an MRI option found by find_mri().
+    Returns a list of MRITrace, or None if the option is malformed.
+    """
+    if opt_len < MRI_HDR_LEN:
+        return None
+    count = (mv[opt_off + 2] << 8) | mv[opt_off + 3]
+    if count == 0:
+        return []
+    trace_bytes = opt_len - MRI_HDR_LEN
+    entry = TRACE_LAYOUTS.get(trace_bytes // count)
+    if entry is None or trace_bytes % count:
+        return None
+    unpack, size, pad = entry
+    off = opt_off + MRI_HDR_LEN
+    if count == 1:
+        return [_new_trace(unpack(mv, off) + pad)]
+    return [_new_trace(unpack(mv, o) + pad) for o in range(off, off + trace_bytes, size)]
+
+
+def decode_frame(frame):
+    """Decode an Ethernet/IPv4 frame (bytes, bytearray or memoryview).
+
+    Returns MRIFrame(ip_id, src, dst, sport, dport, traces, payload) or None if
+    the frame is not IPv4. src/dst are host-order ints. traces is None when the
+    packet carries no (valid) MRI option. sport/dport are 0 and payload is None
+    for non-UDP packets; otherwise payload is a memoryview over the frame.
+    """
+    mv = memoryview(frame)
+    n = len(mv)
+    if n < ETH_HDR_LEN + IPV4_MIN_HDR_LEN:
+        return None
+    ethertype, ver_ihl, ip_id, proto, src, dst = _unpack_eth_ipv4(mv)
+    if ethertype != ETHERTYPE_IPV4:
+        return None
+    l4_off = ETH_HDR_LEN + (ver_ihl & 0x0f) * 4
+    if l4_off < _OPT_OFF or l4_off > n:
+        return None
+
+    traces = None
+    if l4_off > _OPT_OFF:
+        # the MRI option is normally the first one; only scan when it is not
+        if (mv[_OPT_OFF] & 0x1f) == IPOPT_MRI and _OPT_OFF + 1 < l4_off:
+            opt = (_OPT_OFF, mv[_OPT_OFF + 1])
+        else:
+            opt = find_mri(mv, _OPT_OFF, l4_off)
+        if opt is not None and opt[0] + opt[1] <= l4_off:
+            traces = decode_traces(mv, opt[0], opt[1])
+
+    if proto != IP_PROTO_UDP or l4_off + UDP_HDR_LEN > n:
+        return _new_frame((ip_id, src, dst, 0, 0, traces, None))
+    sport, dport, udp_len = _unpack_udp(mv, l4_off)
+    end = l4_off + udp_len if UDP_HDR_LEN <= udp_len <= n - l4_off else n
+    return _new_frame((ip_id, src, dst, sport, dport, traces, mv[l4_off + UDP_HDR_LEN:end]))
+
+
+def select_trace(traces, swid=1):
+    """Pick the trace written by switch `swid` (s1 by default), else the first one."""
+    for t in traces:
+        if t.swid == swid:
+            return t
+    return traces[0] if traces else None
+
+
+def frame_bytes(pkt):
+    """Raw wire bytes of a sniffed Scapy packet without rebuilding it."""
+    raw = getattr(pkt, "original", None)
+    return raw if raw else bytes(pkt)
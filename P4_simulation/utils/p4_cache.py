@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Content-addressed build cache for the P4 programs (the scheduling policies in
+program/qos/p4 programs/ and qos.p4 itself).
+
+A build is keyed by the sha256 of the P4 source (and of the files it
+#includes with quotes), the compiler flags and the p4c version, and stored
+once under the cache directory:
+
+    <cache>/<key>/program.json          BMv2 JSON
+    <cache>/<key>/program.p4info.txt    P4Info
+    <cache>/<key>/meta.json             source, flags, p4c version, compile time
+
+A policy is selected by linking build/qos.json and build/qos.p4.p4info.txt
+(the files run_exercise.py, the runtime JSONs and qos_runtime.py read) to its
+build; nothing is copied over qos.p4, and selecting a policy that was built
+before does not run p4c. Switching back and forth costs a hash and a symlink.
+
+    p4_cache.py build                    # precompile every policy, one p4c per CPU
+    p4_cache.py select P2_WRR            # or P2, WRR, or a path to a .p4 file
+    p4_cache.py list
+
+The cache directory is $P4_CACHE_DIR, default ~/.cache/p4-build. Entries
+are written to a temporary directory and renamed into place, so parallel
+builds of the same program are safe.
+
+Switches recognize a pipeline they already run by its cookie
+(bmv2.pipelineCookie, SwitchConnection.SetForwardingPipelineConfigIfChanged),
+so pushing the same build twice is skipped as well.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+P4C = "p4c-bm2-ss"
+# the flags the qos Makefile compiled with before the cache
+DEFAULT_FLAGS = ("--p4v", "16", "--emit-externs")
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "p4-build")
+DEFAULT_PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "..", "program", "qos", "p4 programs")
+
+JSON_NAME = "program.json"
+P4INFO_NAME = "program.p4info.txt"
+META_NAME = "meta.json"
+
+LOCAL_INCLUDE = re.compile(rb'^\s*#\s*include\s+"([^"]+)"', re.MULTILINE)
+
+
+class CacheError(Exception):
+    pass
+
+
+class Build:
+    """One cached compilation."""
+
+    def __init__(self, key, path, hit):
+        self.key = key
+        self.path = path
+        self.hit = hit  # found in the cache (p4c not run)
+        self.json = os.path.join(path, JSON_NAME)
+        self.p4info = os.path.join(path, P4INFO_NAME)
+
+    def meta(self):
+        with open(os.path.join(self.path, META_NAME)) as f:
+            return json.load(f)
+
+
+def cache_dir(path=None):
+    return os.path.abspath(os.path.expanduser(path or os.environ.get("P4_CACHE_DIR") or DEFAULT_CACHE_DIR))
+
+
+_p4c_versions = {}
+
+
+def p4c_version(p4c=P4C):
+    """`p4c --version` output (run once per process)."""
+    if p4c not in _p4c_versions:
+        try:
+            out = subprocess.run([p4c, "--version"], capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise CacheError(f"cannot run {p4c} --version: {e}")
+        _p4c_versions[p4c] = out.strip()
+    return _p4c_versions[p4c]
+
+
+def source_digest(source, _seen=None):
+    """sha256 over the source and, recursively, the files it #includes with
+    quotes (angle-bracket includes ship with p4c and are covered by its version)."""
+    seen = set() if _seen is None else _seen
+    digest = hashlib.sha256()
+    path = os.path.realpath(source)
+    if path in seen:
+        return digest
+    seen.add(path)
+    with open(path, "rb") as f:
+        text = f.read()
+    digest.update(text)
+    for name in LOCAL_INCLUDE.findall(text):
+        include = os.path.join(os.path.dirname(path), os.fsdecode(name))
+        if os.path.exists(include):
+            digest.update(name)
+            digest.update(source_digest(include, seen).digest())
+    return digest
+
+
+def build_key(source, flags=DEFAULT_FLAGS, version=None, p4c=P4C):
+    digest = source_digest(source)
+    digest.update(json.dumps([list(flags), version or p4c_version(p4c)]).encode())
+    return digest.hexdigest()
+
+
+def lookup(key, cache=None):
+    path = os.path.join(cache_dir(cache), key)
+    if os.path.exists(os.path.join(path, META_NAME)):
+        return Build(key, path, hit=True)
+    return None
+
+
+def compile_program(source, flags=DEFAULT_FLAGS, cache=None, p4c=P4C, version=None):
+    """The Build of `source`, running p4c only if it is not cached yet."""
+    version = version or p4c_version(p4c)
+    key = build_key(source, flags, version)
+    build = lookup(key, cache)
+    if build is not None:
+        return build
+
+    root = cache_dir(cache)
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{key[:16]}-", dir=root)
+    try:
+        t = time.monotonic()
+        cmd = [p4c, *flags, "--p4runtime-files", os.path.join(tmp, P4INFO_NAME),
+               "-o", os.path.join(tmp, JSON_NAME), source]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise CacheError(f"{source}: {p4c} exited with {proc.returncode}:\n{proc.stderr.strip()}")
+        with open(os.path.join(tmp, META_NAME), "w") as f:
+            json.dump({
+                "source": os.path.abspath(source),
+                "flags": list(flags),
+                "p4c": p4c,
+                "p4c_version": version,
+                "compiled": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "compile_s": round(time.monotonic() - t, 3),
+            }, f, indent=2)
+        path = os.path.join(root, key)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            if lookup(key, cache) is None:  # not a concurrent build of the same program
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return Build(key, os.path.join(root, key), hit=False)
+
+
+def policy_sources(programs_dir=DEFAULT_PROGRAMS_DIR):
+    """{policy name (file stem): path} of the .p4 files in programs_dir."""
+    return {os.path.splitext(name)[0]: os.path.join(programs_dir, name)
+            for name in sorted(os.listdir(programs_dir)) if name.endswith(".p4")}
+
+
+def resolve_policy(name, programs_dir=DEFAULT_PROGRAMS_DIR):
+    """Path of the policy `name`: a .p4 path, a file stem (P2_WRR) or either part of
+    one (P2, WRR), case-insensitive."""
+    if name.endswith(".p4") and os.path.exists(name):
+        return name
+    sources = policy_sources(programs_dir)
+    lower = name.lower()
+    exact = [stem for stem in sources if stem.lower() == lower]
+    if exact:
+        return sources[exact[0]]
+    partial = [stem for stem in sources
+               if lower in (stem.split("_", 1)[0].lower(), stem.split("_", 1)[-1].lower())]
+    if len(partial) == 1:
+        return sources[partial[0]]
+    if partial:
+        raise CacheError(f"policy {name!r} is ambiguous: {', '.join(partial)}")
+    raise CacheError(f"no policy {name!r} in {programs_dir} (have {', '.join(sources)})")
+
+
+def _link(target, link):
+    # symlink next to the link, then rename over it: readers never see it missing
+    tmp = f"{link}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+
+def select(name, out_prefix, programs_dir=DEFAULT_PROGRAMS_DIR, flags=DEFAULT_FLAGS,
+           cache=None, p4c=P4C):
+    """Build (or find) the policy and point <out_prefix>.json and
+    <out_prefix>.p4.p4info.txt at it. Returns the Build."""
+    build = compile_program(resolve_policy(name, programs_dir), flags, cache, p4c)
+    os.makedirs(os.path.dirname(os.path.abspath(out_prefix)), exist_ok=True)
+    _link(build.json, f"{out_prefix}.json")
+    _link(build.p4info, f"{out_prefix}.p4.p4info.txt")
+    return build
+
+
+def _compile_timed(source, flags, cache, p4c, version):
+    t = time.monotonic()
+    try:
+        return compile_program(source, flags, cache, p4c, version), time.monotonic() - t
+    except CacheError as e:
+        return e, time.monotonic() - t
+
+
+def precompile(sources, jobs=None, flags=DEFAULT_FLAGS, cache=None, p4c=P4C):
+    """Compile {name: path} in a process pool (one p4c per worker). Yields
+    (name, Build or CacheError, seconds) in the order of `sources`."""
+    version = p4c_version(p4c)  # once, not in every worker
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(jobs, max(1, len(sources)))) as pool:
+        futures = [(name, pool.submit(_compile_timed, path, flags, cache, p4c, version))
+                   for name, path in sources.items()]
+        for name, future in futures:
+            result, seconds = future.result()
+            yield name, result, seconds
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Content-addressed build cache for the P4 policies")
+    parser.add_argument("--programs", default=DEFAULT_PROGRAMS_DIR,
+                        help="directory of the policy .p4 files (default: program/qos/p4 programs)")
+    parser.add_argument("--cache", default=None,
+                        help=f"cache directory (default: $P4_CACHE_DIR or {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--p4c", default=P4C, help=f"compiler (default: {P4C})")
+    parser.add_argument("--flags", default=" ".join(DEFAULT_FLAGS),
+                        help="compiler flags, part of the cache key (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="precompile policies in parallel")
+    build.add_argument("names", nargs="*", help="policies to build (default: all)")
+    build.add_argument("-j", "--jobs", type=int, default=None,
+                       help="parallel p4c processes (default: number of CPUs)")
+
+    sel = sub.add_parser("select", help="link a policy's build to <out>.json and <out>.p4.p4info.txt")
+    sel.add_argument("name", help="policy name (P2_WRR, P2, WRR) or path to a .p4 file")
+    sel.add_argument("--out", default=os.path.join("build", "qos"),
+                     help="output prefix (default: %(default)s)")
+
+    sub.add_parser("list", help="list the policies and whether they are cached")
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    flags = tuple(args.flags.split())
+    try:
+        if args.command == "build":
+            sources = policy_sources(args.programs)
+            if args.names:
+                sources = {name: resolve_policy(name, args.programs) for name in args.names}
+            failed = 0
+            t = time.monotonic()
+            for name, result, seconds in precompile(sources, args.jobs, flags, args.cache, args.p4c):
+                if isinstance(result, CacheError):
+                    failed += 1
+                    print(f"{name:24s} FAILED {seconds:6.2f} s\n{result}", file=sys.stderr)
+                else:
+                    state = "cached" if result.hit else "compiled"
+                    print(f"{name:24s} {state:8s} {seconds:6.2f} s  {result.key[:16]}")
+            print(f"{len(sources) - failed}/{len(sources)} policies built in {time.monotonic() - t:.2f} s "
+                  f"({cache_dir(args.cache)})")
+            sys.exit(1 if failed else 0)
+
+        if args.command == "select":
+            t = time.monotonic()
+            build = select(args.name, args.out, args.programs, flags, args.cache, args.p4c)
+            state = "cached" if build.hit else "compiled"
+            print(f"{args.out}.json -> {args.name} ({state}, {build.key[:16]}, "
+                  f"{time.monotonic() - t:.2f} s)")
+
+        elif args.command == "list":
+            version = p4c_version(args.p4c)
+            for name, path in policy_sources(args.programs).items():
+                key = build_key(path, flags, version)
+                state = "cached" if lookup(key, args.cache) else "-"
+                print(f"{name:24s} {state:8s} {key[:16]}")
+    except CacheError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
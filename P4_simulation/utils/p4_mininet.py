@@ -20,10 +20,10 @@ from mininet.moduledeps import pathCheck
 from sys import exit
 import os
 import tempfile
+import time
 import socket
-from time import sleep
 
-from netstat import check_listening_on_port
+from netstat import check_listening_on_port, wait_for_port
 
 SWITCH_START_TIMEOUT = 10 # seconds
 
@@ -105,17 +105,25 @@ class P4Switch(Switch):
     def setup(cls):
         pass
 
+    @classmethod
+    def batchStartup(cls, switches, run=None):
+        """Called by Mininet.start() once start() has launched every switch of
+        this class: the switch processes boot concurrently, so startup takes
+        as long as the slowest switch instead of the sum of all of them."""
+        t0 = time.monotonic()
+        for sw in switches:
+            if not sw.check_switch_started(sw.sw_pid):
+                error("P4 switch {} did not start correctly.\n".format(sw.name))
+                exit(1)
+            info("P4 switch {} has been started ({:.2f} s).\n".format(sw.name, time.monotonic() - t0))
+        return switches
+
     def check_switch_started(self, pid):
         """While the process is running (pid exists), we check if the Thrift
         server has been started. If the Thrift server is ready, we assume that
         the switch was started successfully. This is only reliable if the Thrift
         server is started at the end of the init process"""
-        while True:
-            if not os.path.exists(os.path.join("/proc", str(pid))):
-                return False
-            if check_listening_on_port(self.thrift_port):
-                return True
-            sleep(0.5)
+        return wait_for_port(self.thrift_port, pid, SWITCH_START_TIMEOUT)
 
     def start(self, controllers):
         "Start up a new P4 switch"
@@ -156,10 +164,9 @@ class P4Switch(Switch):
             self.cmd(' '.join(args) + ' >' + self.log_file + ' 2>&1 & echo $! >> ' + f.name)
             pid = int(f.read())
         debug("P4 switch {} PID is {}.\n".format(self.name, pid))
-        if not self.check_switch_started(pid):
-            error("P4 switch {} did not start correctly.\n".format(self.name))
-            exit(1)
-        info("P4 switch {} has been started.\n".format(self.name))
+        # readiness is checked for all switches at once in batchStartup(); not
+        # self.pid, which Mininet keeps for the node shell (popen, mnexec)
+        self.sw_pid = pid
 
     def stop(self):
         "Terminate P4 switch."
@@ -12,19 +12,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import hashlib
+import os
+import threading
+
 from switch import SwitchConnection
 from p4.tmp import p4config_pb2
 
+# BMv2 JSON contents by (path, mtime, size): switches programmed together (or
+# in parallel threads) read the file once
+_device_data = {}
+_device_data_lock = threading.Lock()
+
+
+def readDeviceData(bmv2_json_file_path):
+    st = os.stat(bmv2_json_file_path)
+    key = (os.path.realpath(bmv2_json_file_path), st.st_mtime_ns, st.st_size)
+    with _device_data_lock:
+        data = _device_data.get(key)
+        if data is None:
+            with open(bmv2_json_file_path, "rb") as f:  # "rb" added by hang
+                data = f.read()
+            _device_data.clear()  # only the pipeline in use is kept
+            _device_data[key] = data
+    return data
+
 
 def buildDeviceConfig(bmv2_json_file_path=None):
     "Builds the device config for BMv2"
     device_config = p4config_pb2.P4DeviceConfig()
     device_config.reassign = True
-    with open(bmv2_json_file_path, "rb") as f:  # "rb" added by hang
-        device_config.device_data = f.read()
+    device_config.device_data = readDeviceData(bmv2_json_file_path)
     return device_config
 
 
+def pipelineCookie(p4info, bmv2_json_file_path):
+    """64-bit cookie identifying a pipeline: the first 8 bytes of the sha256
+    of the BMv2 JSON and the P4Info. Passed to SetForwardingPipelineConfig so
+    that an identical push can be recognized and skipped."""
+    digest = hashlib.sha256(readDeviceData(bmv2_json_file_path))
+    digest.update(p4info.SerializeToString(deterministic=True))
+    return int.from_bytes(digest.digest()[:8], "big")
+
+
 class Bmv2SwitchConnection(SwitchConnection):
     def buildDeviceConfig(self, **kwargs):
         return buildDeviceConfig(**kwargs)
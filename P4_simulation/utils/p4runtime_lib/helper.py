@@ -18,7 +18,24 @@ import google.protobuf.text_format
 from p4.v1 import p4runtime_pb2
 from p4.config.v1 import p4info_pb2
 
-from convert import encode
+from convert import bitwidthToBytes, encode
+
+# Synthesized name/id getters, see P4InfoHelper.__getattr__
+_ID_GETTER = re.compile(r"^get_(\w+)_id$")
+_NAME_GETTER = re.compile(r"^get_(\w+)_name$")
+
+
+def _make_encoder(bitwidth):
+    """encode(x, bitwidth) for one field, with in-range ints packed directly."""
+    byte_len = bitwidthToBytes(bitwidth)
+    limit = 1 << bitwidth
+
+    def encoder(x):
+        if type(x) == int and 0 <= x < limit:
+            return x.to_bytes(byte_len, 'big')
+        return encode(x, bitwidth)
+    return encoder
+
 
 class P4InfoHelper(object):
     def __init__(self, p4_info_filepath):
@@ -27,24 +44,66 @@ class P4InfoHelper(object):
         with open(p4_info_filepath) as p4info_f:
             google.protobuf.text_format.Merge(p4info_f.read(), p4info)
         self.p4info = p4info
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Name/alias and id maps for every entity type with a preamble, match
+        fields per table and params per action, built once at load time.
+        Lookups return the same object as a scan of the p4info in file order."""
+        self._by_name = {}
+        self._by_id = {}
+        for field in self.p4info.DESCRIPTOR.fields:
+            msg = field.message_type
+            if msg is None or 'preamble' not in msg.fields_by_name:
+                continue
+            by_name = self._by_name[field.name] = {}
+            by_id = self._by_id[field.name] = {}
+            for o in getattr(self.p4info, field.name):
+                pre = o.preamble
+                by_name.setdefault(pre.name, o)
+                by_name.setdefault(pre.alias, o)
+                by_id.setdefault(pre.id, o)
+            by_name.pop('', None)
+
+        encoders = {}
+
+        def encoder(bitwidth):
+            if bitwidth not in encoders:
+                encoders[bitwidth] = _make_encoder(bitwidth)
+            return encoders[bitwidth]
+
+        # table name -> ({match field name: (mf, encoder)}, {match field id: mf})
+        self._match_fields = {}
+        for t in self.p4info.tables:
+            by_name = {}
+            by_id = {}
+            for mf in t.match_fields:
+                by_name.setdefault(mf.name, (mf, encoder(mf.bitwidth)))
+                by_id.setdefault(mf.id, mf)
+            self._match_fields.setdefault(t.preamble.name, (by_name, by_id))
+        # action name -> ({param name: (param, encoder)}, {param id: param})
+        self._action_params = {}
+        for a in self.p4info.actions:
+            by_name = {}
+            by_id = {}
+            for p in a.params:
+                by_name.setdefault(p.name, (p, encoder(p.bitwidth)))
+                by_id.setdefault(p.id, p)
+            self._action_params.setdefault(a.preamble.name, (by_name, by_id))
 
     def get(self, entity_type, name=None, id=None):
         if name is not None and id is not None:
             raise AssertionError("name or id must be None")
 
-        for o in getattr(self.p4info, entity_type):
-            pre = o.preamble
-            if name:
-                if (pre.name == name or pre.alias == name):
-                    return o
-            else:
-                if pre.id == id:
-                    return o
-
         if name:
+            o = self._by_name.get(entity_type, {}).get(name)
+            if o is not None:
+                return o
             raise AttributeError("Could not find %r of type %s" % (name, entity_type))
-        else:
-            raise AttributeError("Could not find id %r of type %s" % (id, entity_type))
+        o = self._by_id.get(entity_type, {}).get(id)
+        if o is not None:
+            return o
+        raise AttributeError("Could not find id %r of type %s" % (id, entity_type))
 
     def get_id(self, entity_type, name):
         return self.get(entity_type, name=name).preamble.id
@@ -58,31 +117,30 @@ class P4InfoHelper(object):
     def __getattr__(self, attr):
         # Synthesize convenience functions for name to id lookups for top-level entities
         # e.g. get_tables_id(name_string) or get_actions_id(name_string)
-        m = re.search("^get_(\w+)_id$", attr)
+        m = _ID_GETTER.match(attr)
         if m:
             primitive = m.group(1)
-            return lambda name: self.get_id(primitive, name)
-
-        # Synthesize convenience functions for id to name lookups
-        # e.g. get_tables_name(id) or get_actions_name(id)
-        m = re.search("^get_(\w+)_name$", attr)
-        if m:
+            getter = lambda name: self.get_id(primitive, name)
+        else:
+            # Synthesize convenience functions for id to name lookups
+            # e.g. get_tables_name(id) or get_actions_name(id)
+            m = _NAME_GETTER.match(attr)
+            if not m:
+                raise AttributeError("%r object has no attribute %r" % (self.__class__, attr))
             primitive = m.group(1)
-            return lambda id: self.get_name(primitive, id)
-
-        raise AttributeError("%r object has no attribute %r" % (self.__class__, attr))
+            getter = lambda id: self.get_name(primitive, id)
+        # Later calls find the getter on the instance and skip __getattr__
+        self.__dict__[attr] = getter
+        return getter
 
     def get_match_field(self, table_name, name=None, id=None):
-        for t in self.p4info.tables:
-            pre = t.preamble
-            if pre.name == table_name:
-                for mf in t.match_fields:
-                    if name is not None:
-                        if mf.name == name:
-                            return mf
-                    elif id is not None:
-                        if mf.id == id:
-                            return mf
+        fields = self._match_fields.get(table_name)
+        if fields is not None:
+            if name is not None:
+                if name in fields[0]:
+                    return fields[0][name][0]
+            elif id in fields[1]:
+                return fields[1][id]
         raise AttributeError("%r has no attribute %r" % (table_name, name if name is not None else id))
 
     def get_match_field_id(self, table_name, match_field_name):
@@ -92,29 +150,33 @@ class P4InfoHelper(object):
         return self.get_match_field(table_name, id=match_field_id).name
 
     def get_match_field_pb(self, table_name, match_field_name, value):
-        p4info_match = self.get_match_field(table_name, match_field_name)
-        bitwidth = p4info_match.bitwidth
         p4runtime_match = p4runtime_pb2.FieldMatch()
+        self._fill_match_field(p4runtime_match, table_name, match_field_name, value)
+        return p4runtime_match
+
+    def _fill_match_field(self, p4runtime_match, table_name, match_field_name, value):
+        fields = self._match_fields.get(table_name)
+        if fields is None or match_field_name not in fields[0]:
+            raise AttributeError("%r has no attribute %r" % (table_name, match_field_name))
+        p4info_match, enc = fields[0][match_field_name]
         p4runtime_match.field_id = p4info_match.id
         match_type = p4info_match.match_type
         if match_type == p4info_pb2.MatchField.EXACT:
-            exact = p4runtime_match.exact
-            exact.value = encode(value, bitwidth)
+            p4runtime_match.exact.value = enc(value)
         elif match_type == p4info_pb2.MatchField.LPM:
-            lpm = p4runtime_match.lpm
-            lpm.value = encode(value[0], bitwidth)
-            lpm.prefix_len = value[1]
+            lpm_entry = p4runtime_match.lpm
+            lpm_entry.value = enc(value[0])
+            lpm_entry.prefix_len = value[1]
         elif match_type == p4info_pb2.MatchField.TERNARY:
-            lpm = p4runtime_match.ternary
-            lpm.value = encode(value[0], bitwidth)
-            lpm.mask = encode(value[1], bitwidth)
+            ternary_entry = p4runtime_match.ternary
+            ternary_entry.value = enc(value[0])
+            ternary_entry.mask = enc(value[1])
         elif match_type == p4info_pb2.MatchField.RANGE:
-            lpm = p4runtime_match.range
-            lpm.low = encode(value[0], bitwidth)
-            lpm.high = encode(value[1], bitwidth)
+            range_entry = p4runtime_match.range
+            range_entry.low = enc(value[0])
+            range_entry.high = enc(value[1])
         else:
             raise Exception("Unsupported match type with type %r" % match_type)
-        return p4runtime_match
 
     def get_match_field_value(self, match_field):
         match_type = match_field.WhichOneof("field_match_type")
@@ -132,17 +194,16 @@ class P4InfoHelper(object):
             raise Exception("Unsupported match type with type %r" % match_type)
 
     def get_action_param(self, action_name, name=None, id=None):
-        for a in self.p4info.actions:
-            pre = a.preamble
-            if pre.name == action_name:
-                for p in a.params:
-                    if name is not None:
-                        if p.name == name:
-                            return p
-                    elif id is not None:
-                        if p.id == id:
-                            return p
-        raise AttributeError("action %r has no param %r, (has: %r)" % (action_name, name if name is not None else id, a.params))
+        params = self._action_params.get(action_name)
+        if params is not None:
+            if name is not None:
+                if name in params[0]:
+                    return params[0][name][0]
+            elif id in params[1]:
+                return params[1][id]
+        raise AttributeError("action %r has no param %r, (has: %r)" % (
+            action_name, name if name is not None else id,
+            list(params[1].values()) if params is not None else []))
 
     def get_action_param_id(self, action_name, param_name):
         return self.get_action_param(action_name, name=param_name).id
@@ -151,12 +212,18 @@ class P4InfoHelper(object):
         return self.get_action_param(action_name, id=param_id).name
 
     def get_action_param_pb(self, action_name, param_name, value):
-        p4info_param = self.get_action_param(action_name, param_name)
         p4runtime_param = p4runtime_pb2.Action.Param()
-        p4runtime_param.param_id = p4info_param.id
-        p4runtime_param.value = encode(value, p4info_param.bitwidth)
+        self._fill_action_param(p4runtime_param, action_name, param_name, value)
         return p4runtime_param
 
+    def _fill_action_param(self, p4runtime_param, action_name, param_name, value):
+        params = self._action_params.get(action_name)
+        if params is None or param_name not in params[0]:
+            raise AttributeError("action %r has no param %r" % (action_name, param_name))
+        p4info_param, enc = params[0][param_name]
+        p4runtime_param.param_id = p4info_param.id
+        p4runtime_param.value = enc(value)
+
     def buildTableEntry(self,
                         table_name,
                         match_fields=None,
@@ -171,12 +238,8 @@ class P4InfoHelper(object):
             table_entry.priority = priority
 
         if match_fields:
-            table_entry.match.extend([
-                self.get_match_field_pb(table_name, match_field_name, value)
-                for match_field_name, value in match_fields.items()  # python3 by hang
-                #for match_field_name, value in match_fields.iteritems()
-
-            ])
+            for match_field_name, value in match_fields.items():
+                self._fill_match_field(table_entry.match.add(), table_name, match_field_name, value)
 
         if default_action:
             table_entry.is_default_action = True
@@ -185,11 +248,8 @@ class P4InfoHelper(object):
             action = table_entry.action.action
             action.action_id = self.get_actions_id(action_name)
             if action_params:
-                action.params.extend([
-                    self.get_action_param_pb(action_name, field_name, value)
-                    for field_name, value in action_params.items()  # by hang
-                    #for field_name, value in action_params.iteritems()
-                ])
+                for field_name, value in action_params.items():
+                    self._fill_action_param(action.params.add(), action_name, field_name, value)
         return table_entry
 
     def buildMulticastGroupEntry(self, multicast_group_id, replicas):
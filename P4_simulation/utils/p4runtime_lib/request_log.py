@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+P4Runtime request logs: the file writer behind GrpcRequestLogger (switch.py)
+and an offline viewer for binary logs.
+
+The controller thread only serializes the request and queues it; a background
+thread keeps the log file open, renders and writes the records, and flushes
+whenever the queue runs empty. When the queue is full, requests are dropped
+and counted, and the count is written to the log; a request that cannot be
+written (undecodable, disk full) leaves an error line and the thread goes on.
+
+Text logs (the default) have one block per RPC, as before:
+
+    [2026-10-18 10:15:08.123] /p4.v1.P4Runtime/Write
+    ---
+    <text format of the request, or "Message too long" past MSG_LOG_MAX_LEN>
+    ---
+
+Binary logs (file names ending in .pblog) keep every request in full as a
+length-prefixed protobuf, and are turned into the same text only when viewed:
+
+    header  b"P4RTLOG\\x01"
+    record  time (f64, time.time()), method length (u16), payload length (u32),
+            method (utf-8), payload (the serialized request)
+
+    python3 request_log.py logs/s1-p4runtime-requests.pblog --method Write
+
+With max_bytes set, a log that grows past it is renamed to <file>.1 (the
+older ones to .2 ... .<backups>) and a new one is started.
+"""
+import argparse
+import atexit
+import os
+import queue
+import struct
+import sys
+import threading
+from datetime import datetime, timezone
+
+from google.protobuf.message import DecodeError
+from p4.v1 import p4runtime_pb2
+
+MAGIC = b"P4RTLOG\x01"
+RECORD = struct.Struct("<dHI")
+BINARY_SUFFIX = ".pblog"
+DEFAULT_BACKUPS = 3
+# Requests waiting for the writer thread; more are dropped (and counted)
+QUEUE_SIZE = 10000
+# Method of the record noting how many requests were dropped (payload: the count)
+DROPPED_METHOD = "#dropped"
+# Method of the record noting a request that could not be logged (payload: the error)
+ERROR_METHOD = "#error"
+
+_CLOSE = object()
+
+
+def request_class(method):
+    """Request message class of an RPC method ('/p4.v1.P4Runtime/Write' ->
+    WriteRequest), or None."""
+    return getattr(p4runtime_pb2, method.rsplit('/', 1)[-1] + 'Request', None)
+
+
+def format_text(ts, method, payload, max_len=None):
+    """Text block of one request, as GrpcRequestLogger text logs have it.
+    Requests of max_len bytes or more (serialized or as text) are not rendered."""
+    stamp = datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    if method == DROPPED_METHOD:
+        return "\n[%s] %s requests dropped (log queue full)\n" % (stamp, payload.decode())
+    if method == ERROR_METHOD:
+        return "\n[%s] request not logged: %s\n" % (stamp, payload.decode(errors='replace'))
+    cls = request_class(method)
+    if max_len and len(payload) >= max_len:
+        body = "Message too long (%d bytes)! Skipping log...\n" % len(payload)
+    elif cls is None:
+        body = "%d bytes of unknown request type\n" % len(payload)
+    else:
+        try:
+            body = str(cls.FromString(payload))
+        except DecodeError as e:
+            body = "%d bytes that do not decode as %s (%s)\n" % (len(payload), cls.__name__, e)
+        if max_len and len(body) >= max_len:
+            body = "Message too long (%d bytes)! Skipping log...\n" % len(body)
+    return "\n[%s] %s\n---\n%s---\n" % (stamp, method, body)
+
+
+class RequestLogWriter(object):
+    """Writes queued requests to one file from a background thread."""
+
+    def __init__(self, path, binary=False, max_bytes=None, backups=DEFAULT_BACKUPS,
+                 max_len=None, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.binary = binary
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_len = max_len
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.errors = 0
+        self._closed = False
+        self._open()
+        self.thread = threading.Thread(target=self._run, name='request-log', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def put(self, ts, method, payload):
+        try:
+            self.queue.put_nowait((ts, method, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Write what is queued and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)  # or every writer stays referenced until exit
+        self.queue.put(_CLOSE)
+        self.thread.join(timeout)
+
+    def _open(self):
+        # one handle for the life of the log, truncated like the old logger did
+        self._file = open(self.path, 'wb', buffering=1 << 20)
+        self._size = 0
+        if self.binary:
+            self._file.write(MAGIC)
+            self._size = len(MAGIC)
+
+    def _rotate(self):
+        # rename first: if that fails, the current file is still open to write to
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists('%s.%d' % (self.path, i)):
+                    os.replace('%s.%d' % (self.path, i), '%s.%d' % (self.path, i + 1))
+            os.replace(self.path, self.path + '.1')
+        self._file.close()
+        self._open()
+
+    def _record(self, ts, method, payload):
+        if self.binary:
+            name = method.encode()
+            return RECORD.pack(ts, len(name), len(payload)) + name + payload
+        return format_text(ts, method, payload, self.max_len).encode()
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _CLOSE:
+                    break
+                if self.dropped:
+                    dropped, self.dropped = self.dropped, 0
+                    self._safe_write(item[0], DROPPED_METHOD, str(dropped).encode())
+                self._safe_write(*item)
+                if self.queue.empty():
+                    try:
+                        self._file.flush()
+                    except (OSError, ValueError):
+                        pass  # disk full: the next records report it
+        finally:
+            try:
+                self._file.close()
+            except (OSError, ValueError):
+                pass
+
+    def _safe_write(self, ts, method, payload):
+        # one bad record (undecodable payload, disk full) must not stop the thread
+        try:
+            self._write(self._record(ts, method, payload))
+        except Exception as e:
+            self.errors += 1
+            try:
+                error = "%s: %s: %s" % (method, type(e).__name__, e)
+                self._write(self._record(ts, ERROR_METHOD, error.encode()))
+            except Exception:
+                pass
+
+    def _write(self, data):
+        if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+            try:
+                self._rotate()
+            except OSError:
+                self._size = 0  # keep the current file; try again after another max_bytes
+                raise
+        self._file.write(data)
+        self._size += len(data)
+
+
+def read_records(path):
+    """(time, method, payload) of every record of a binary log."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s: not a binary P4Runtime request log" % path)
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return  # end of file, or a record cut short by a crash
+            ts, method_len, payload_len = RECORD.unpack(header)
+            method = f.read(method_len).decode()
+            payload = f.read(payload_len)
+            if len(payload) < payload_len:
+                return
+            yield ts, method, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print a binary P4Runtime request log as text')
+    parser.add_argument('logs', nargs='+', help='.pblog files (rotated ones too, oldest first)')
+    parser.add_argument('--method', default=None,
+                        help='only requests whose method contains this (e.g. Write)')
+    parser.add_argument('--max-len', type=int, default=0,
+                        help='skip rendering requests of this many bytes or more (default: render all)')
+    parser.add_argument('--count', action='store_true', help='only count the requests per method')
+    args = parser.parse_args()
+
+    counts = {}
+    try:
+        for path in args.logs:
+            for ts, method, payload in read_records(path):
+                if args.method and args.method not in method and method not in (DROPPED_METHOD, ERROR_METHOD):
+                    continue
+                if args.count:
+                    counts[method] = counts.get(method, 0) + 1
+                else:
+                    sys.stdout.write(format_text(ts, method, payload, args.max_len))
+    except ValueError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        sys.stderr.close()
+        return
+    for method, n in sorted(counts.items()):
+        print("%8d  %s" % (n, method))
+
+
+if __name__ == '__main__':
+    main()
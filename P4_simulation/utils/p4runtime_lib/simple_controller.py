@@ -18,6 +18,7 @@ import argparse
 import json
 import os
 import sys
+import time
 
 import bmv2
 import helper
@@ -35,6 +36,30 @@ class ConfException(Exception):
     pass
 
 
+class ProgramReport(object):
+    """What program_switch did on one switch: the time spent in each phase and
+    the entries that could not be written."""
+
+    PHASES = ('connect', 'pipeline', 'entries')
+
+    def __init__(self, addr, device_id):
+        self.addr = addr
+        self.device_id = device_id
+        self.timings = {}   # phase -> seconds
+        self.entries = 0    # updates sent
+        self.requests = 0   # WriteRequests they were sent in
+        self.errors = []    # one message per configuration error or failed entry
+        self.pipeline_kept = False  # the switch already had this pipeline (same cookie)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+
 def main():
     parser = argparse.ArgumentParser(description='P4Runtime Simple Controller')
 
@@ -57,11 +82,15 @@ def main():
         parser.error("File %s does not exist!" % args.runtime_conf_file)
     workdir = os.path.dirname(os.path.abspath(args.runtime_conf_file))
     with open(args.runtime_conf_file, 'r') as sw_conf_file:
-        program_switch(addr=args.p4runtime_server_addr,
-                       device_id=args.device_id,
-                       sw_conf_file=sw_conf_file,
-                       workdir=workdir,
-                       proto_dump_fpath=args.proto_dump_file)
+        report = program_switch(addr=args.p4runtime_server_addr,
+                                device_id=args.device_id,
+                                sw_conf_file=sw_conf_file,
+                                workdir=workdir,
+                                proto_dump_fpath=args.proto_dump_file)
+    for msg in report.errors:
+        error(msg)
+    if not report.ok:
+        sys.exit(1)
 
 
 def check_switch_conf(sw_conf, workdir):
@@ -89,7 +118,14 @@ def check_switch_conf(sw_conf, workdir):
             raise ConfException("file does not exist %s" % real_path)
 
 
-def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath):
+def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath, name=None):
+    """Program one switch: arbitrate, push the pipeline and write the entries of
+    the runtime configuration. The entries are sent as batched WriteRequests;
+    failed entries are collected in the returned ProgramReport instead of
+    stopping the others. name prefixes the log lines (switches programmed in
+    parallel). Connection and pipeline errors are raised."""
+    prefix = '' if name is None else '[%s] ' % name
+    report = ProgramReport(addr, device_id)
     print("DEBUG: Loading runtime file:", sw_conf_file)  # add by hang
     sw_conf = json.load(sw_conf_file)  # python2 -> python3
     print("DEBUG: Loaded keys =", list(sw_conf.keys()))
@@ -97,17 +133,18 @@ def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath):
     try:
         check_switch_conf(sw_conf=sw_conf, workdir=workdir)
     except ConfException as e:
-        error("While parsing input runtime configuration: %s" % str(e))
-        return
+        report.errors.append("While parsing input runtime configuration: %s" % str(e))
+        return report
 
-    info('Using P4Info file %s...' % sw_conf['p4info'])
+    info(prefix + 'Using P4Info file %s...' % sw_conf['p4info'])
     p4info_fpath = os.path.join(workdir, sw_conf['p4info'])
     p4info_helper = helper.P4InfoHelper(p4info_fpath)
 
     target = sw_conf['target']
 
-    info("Connecting to P4Runtime server on %s (%s)..." % (addr, target))
+    info(prefix + "Connecting to P4Runtime server on %s (%s)..." % (addr, target))
 
+    t = time.monotonic()
     if target == "bmv2":
         sw = bmv2.Bmv2SwitchConnection(address=addr, device_id=device_id,
                                        proto_dump_file=proto_dump_fpath)
@@ -116,38 +153,74 @@ def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath):
 
     try:
         sw.MasterArbitrationUpdate()
+        report.timings['connect'] = time.monotonic() - t
 
+        t = time.monotonic()
         if target == "bmv2":
-            info("Setting pipeline config (%s)..." % sw_conf['bmv2_json'])
             bmv2_json_fpath = os.path.join(workdir, sw_conf['bmv2_json'])
-            sw.SetForwardingPipelineConfig(p4info=p4info_helper.p4info,
-                                           bmv2_json_file_path=bmv2_json_fpath)
+            cookie = bmv2.pipelineCookie(p4info_helper.p4info, bmv2_json_fpath)
+            if sw.SetForwardingPipelineConfigIfChanged(p4info=p4info_helper.p4info, cookie=cookie,
+                                                       bmv2_json_file_path=bmv2_json_fpath):
+                info(prefix + "Set pipeline config (%s, cookie %016x)" % (sw_conf['bmv2_json'], cookie))
+            else:
+                report.pipeline_kept = True
+                info(prefix + "Pipeline config %s (cookie %016x) already installed, not pushed again"
+                     % (sw_conf['bmv2_json'], cookie))
         else:
             raise Exception("Should not be here")
-
-        if 'table_entries' in sw_conf:
-            table_entries = sw_conf['table_entries']
-            info("Inserting %d table entries..." % len(table_entries))
-            for entry in table_entries:
-                info(tableEntryToString(entry))
-                insertTableEntry(sw, entry, p4info_helper)
-
-        if 'multicast_group_entries' in sw_conf:
-            group_entries = sw_conf['multicast_group_entries']
-            info("Inserting %d group entries..." % len(group_entries))
-            for entry in group_entries:
-                info(groupEntryToString(entry))
-                insertMulticastGroupEntry(sw, entry, p4info_helper)
-
-        if 'clone_session_entries' in sw_conf:
-            clone_entries = sw_conf['clone_session_entries']
-            info("Inserting %d clone entries..." % len(clone_entries))
-            for entry in clone_entries:
-                info(cloneEntryToString(entry))
-                insertCloneGroupEntry(sw, entry, p4info_helper)
+        report.timings['pipeline'] = time.monotonic() - t
+
+        t = time.monotonic()
+        labels = []  # the entry of every update, by its index in the batch
+        with sw.WriteBatch(raise_on_error=False) as batch:
+            if 'table_entries' in sw_conf:
+                table_entries = sw_conf['table_entries']
+                info(prefix + "Inserting %d table entries..." % len(table_entries))
+                for entry in table_entries:
+                    label = tableEntryToString(entry)
+                    info(prefix + label)
+                    labels.append(label)
+                    insertTableEntry(batch, entry, p4info_helper)
+
+            if 'multicast_group_entries' in sw_conf:
+                group_entries = sw_conf['multicast_group_entries']
+                info(prefix + "Inserting %d group entries..." % len(group_entries))
+                for entry in group_entries:
+                    labels.append(groupEntryToString(entry))
+                    info(prefix + labels[-1])
+                    insertMulticastGroupEntry(batch, entry, p4info_helper)
+
+            if 'clone_session_entries' in sw_conf:
+                clone_entries = sw_conf['clone_session_entries']
+                info(prefix + "Inserting %d clone entries..." % len(clone_entries))
+                for entry in clone_entries:
+                    labels.append(cloneEntryToString(entry))
+                    info(prefix + labels[-1])
+                    insertCloneGroupEntry(batch, entry, p4info_helper)
+        failed = [(e.index, e) for e in batch.errors]
+        report.entries = batch.sent
+        report.requests = batch.requests
+        if report.pipeline_kept:
+            # the entries of an earlier run are still there: update them in place
+            existing = [e for e in batch.errors if e.code == 'ALREADY_EXISTS']
+            if existing:
+                with sw.WriteBatch(raise_on_error=False) as retry:
+                    for e in existing:
+                        entity = e.update.entity
+                        if entity.HasField('table_entry'):
+                            retry.ModifyTableEntry(entity.table_entry)
+                        else:
+                            retry.ModifyPREEntry(entity.packet_replication_engine_entry)
+                failed = [(e.index, e) for e in batch.errors if e.code != 'ALREADY_EXISTS']
+                failed += [(existing[e.index].index, e) for e in retry.errors]
+                report.requests += retry.requests
+        report.timings['entries'] = time.monotonic() - t
+        report.errors.extend('%s: %s %s' % (labels[index], e.code, e.message)
+                             for index, e in sorted(failed, key=lambda f: f[0]))
 
     finally:
         sw.shutdown()
+    return report
 
 
 def insertTableEntry(sw, flow, p4info_helper):
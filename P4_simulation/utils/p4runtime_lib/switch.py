@@ -13,15 +13,22 @@
 # limitations under the License.
 #
 from queue import Queue
+import itertools
+import time
 from abc import abstractmethod
-from datetime import datetime
 
 import grpc
+from google.rpc import code_pb2
 from p4.v1 import p4runtime_pb2
 from p4.v1 import p4runtime_pb2_grpc
 from p4.tmp import p4config_pb2
 
+from error_utils import P4RuntimeErrorFormatException, parseGrpcErrorBinaryDetails
+from request_log import BINARY_SUFFIX, DEFAULT_BACKUPS, RequestLogWriter
+
 MSG_LOG_MAX_LEN = 1024
+# Largest number of updates sent in one WriteRequest by WriteBatch
+MAX_BATCH_UPDATES = 512
 
 # List of all active connections
 connections = []
@@ -39,13 +46,19 @@ class SwitchConnection(object):
         self.device_id = device_id
         self.p4info = None
         self.channel = grpc.insecure_channel(self.address)
-        if proto_dump_file is not None:
-            interceptor = GrpcRequestLogger(proto_dump_file)
-            self.channel = grpc.intercept_channel(self.channel, interceptor)
+        # proto_dump_file: a path, or a GrpcRequestLogger (e.g. binary or
+        # sampled, or shared by several connections)
+        self.request_logger = None
+        if isinstance(proto_dump_file, GrpcRequestLogger):
+            self.channel = grpc.intercept_channel(self.channel, proto_dump_file)
+        elif proto_dump_file is not None:
+            self.request_logger = GrpcRequestLogger(proto_dump_file)
+            self.channel = grpc.intercept_channel(self.channel, self.request_logger)
         self.client_stub = p4runtime_pb2_grpc.P4RuntimeStub(self.channel)
         self.requests_stream = IterableQueue()
         self.stream_msg_resp = self.client_stub.StreamChannel(iter(self.requests_stream))
         self.proto_dump_file = proto_dump_file
+        self._write_serialized = None
         connections.append(self)
 
     @abstractmethod
@@ -54,6 +67,8 @@ class SwitchConnection(object):
 
     def shutdown(self):
         self.requests_stream.close()
+        if self.request_logger is not None:
+            self.request_logger.close()
         self.stream_msg_resp.cancel()
 
     def MasterArbitrationUpdate(self, dry_run=False, **kwargs):
@@ -69,7 +84,7 @@ class SwitchConnection(object):
             for item in self.stream_msg_resp:
                 return item # just one
 
-    def SetForwardingPipelineConfig(self, p4info, dry_run=False, **kwargs):
+    def SetForwardingPipelineConfig(self, p4info, dry_run=False, cookie=None, **kwargs):
         device_config = self.buildDeviceConfig(**kwargs)
         request = p4runtime_pb2.SetForwardingPipelineConfigRequest()
         request.election_id.low = 1
@@ -78,6 +93,9 @@ class SwitchConnection(object):
 
         config.p4info.CopyFrom(p4info)
         config.p4_device_config = device_config.SerializeToString()
+        if cookie is not None:
+            # read back by GetForwardingPipelineCookie to recognize this pipeline
+            config.cookie.cookie = cookie
 
         request.action = p4runtime_pb2.SetForwardingPipelineConfigRequest.VERIFY_AND_COMMIT
         if dry_run:
@@ -85,6 +103,30 @@ class SwitchConnection(object):
         else:
             self.client_stub.SetForwardingPipelineConfig(request)
 
+    def GetForwardingPipelineCookie(self):
+        """Cookie of the installed pipeline, or None if there is none or it has no cookie."""
+        request = p4runtime_pb2.GetForwardingPipelineConfigRequest()
+        request.device_id = self.device_id
+        request.response_type = p4runtime_pb2.GetForwardingPipelineConfigRequest.COOKIE_ONLY
+        try:
+            response = self.client_stub.GetForwardingPipelineConfig(request)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.FAILED_PRECONDITION:  # no pipeline set yet
+                return None
+            raise
+        if not response.config.HasField('cookie'):
+            return None
+        return response.config.cookie.cookie
+
+    def SetForwardingPipelineConfigIfChanged(self, p4info, cookie, dry_run=False, **kwargs):
+        """Push the pipeline unless the switch already reports `cookie` (see
+        bmv2.pipelineCookie). Returns True if it was pushed. Pushing resets the
+        table entries, skipping keeps them."""
+        if not dry_run and self.GetForwardingPipelineCookie() == cookie:
+            return False
+        self.SetForwardingPipelineConfig(p4info, dry_run=dry_run, cookie=cookie, **kwargs)
+        return True
+
     def WriteTableEntry(self, table_entry, dry_run=False):
         request = p4runtime_pb2.WriteRequest()
         request.device_id = self.device_id
@@ -173,26 +215,188 @@ class SwitchConnection(object):
         else:
             self.client_stub.Write(request)
 
+    def WriteSerialized(self, request_bytes, dry_run=False):
+        """Send an already serialized WriteRequest (see write_template.TableWriter)."""
+        if dry_run:
+            print("P4Runtime Write:", p4runtime_pb2.WriteRequest.FromString(request_bytes))
+            return
+        if self._write_serialized is None:
+            # no request_serializer: the bytes go on the wire as they are
+            self._write_serialized = self.channel.unary_unary(
+                '/p4.v1.P4Runtime/Write',
+                response_deserializer=p4runtime_pb2.WriteResponse.FromString)
+        self._write_serialized(request_bytes)
+
+    def WriteBatch(self, max_updates=MAX_BATCH_UPDATES, raise_on_error=True, dry_run=False):
+        """New WriteBatch on this connection (see WriteBatch)."""
+        return WriteBatch(self, max_updates, raise_on_error, dry_run)
+
+class WriteError(object):
+    """One failed update of a WriteBatch."""
+
+    def __init__(self, index, update, code, message):
+        self.index = index      # position of the update in the batch (counting all flushes)
+        self.update = update    # the p4runtime_pb2.Update
+        self.code = code        # canonical code name, e.g. "NOT_FOUND"
+        self.message = message
+
+    def __str__(self):
+        return "update %d (%s): %s %s" % (
+            self.index, p4runtime_pb2.Update.Type.Name(self.update.type),
+            self.code, self.message)
+
+    __repr__ = __str__
+
+class WriteBatchError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super(WriteBatchError, self).__init__(
+            "%d update(s) failed: %s" % (len(errors), "; ".join(str(e) for e in errors)))
+
+class WriteBatch(object):
+    """Collects INSERT/MODIFY/DELETE updates and sends them as one WriteRequest.
+
+    Takes the same calls as SwitchConnection (WriteTableEntry, ModifyTableEntry,
+    DeleteTableEntry, WritePREEntry; also ModifyPREEntry), so it can be passed
+    wherever a switch connection is used to write. Pending updates are sent
+    when max_updates is reached, on Flush() and at the end of a `with` block
+    (discarded if the block raises). Failed updates are collected in `errors`; with raise_on_error a
+    flush that had failures raises WriteBatchError.
+
+        with sw.WriteBatch() as batch:
+            for entry in entries:
+                batch.ModifyTableEntry(entry)
+    """
+
+    def __init__(self, connection, max_updates=MAX_BATCH_UPDATES, raise_on_error=True,
+                 dry_run=False):
+        self.connection = connection
+        self.max_updates = max_updates
+        self.raise_on_error = raise_on_error
+        self.dry_run = dry_run
+        self.errors = []
+        self.requests = 0   # WriteRequests sent
+        self.sent = 0       # updates sent
+        self._request = None
+
+    def __len__(self):
+        return len(self._request.updates) if self._request is not None else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.Flush()
+        else:
+            self._request = None
+        return False
+
+    def _add(self, update_type):
+        if self._request is None:
+            self._request = p4runtime_pb2.WriteRequest()
+            self._request.device_id = self.connection.device_id
+            self._request.election_id.low = 1
+        update = self._request.updates.add()
+        update.type = update_type
+        return update
+
+    def _added(self):
+        if len(self._request.updates) >= self.max_updates:
+            self.Flush()
+
+    def WriteTableEntry(self, table_entry, dry_run=False):
+        if table_entry.is_default_action:
+            update = self._add(p4runtime_pb2.Update.MODIFY)
+        else:
+            update = self._add(p4runtime_pb2.Update.INSERT)
+        update.entity.table_entry.CopyFrom(table_entry)
+        self._added()
+
+    def ModifyTableEntry(self, table_entry, dry_run=False):
+        self._add(p4runtime_pb2.Update.MODIFY).entity.table_entry.CopyFrom(table_entry)
+        self._added()
+
+    def DeleteTableEntry(self, table_entry, dry_run=False):
+        self._add(p4runtime_pb2.Update.DELETE).entity.table_entry.CopyFrom(table_entry)
+        self._added()
+
+    def WritePREEntry(self, pre_entry, dry_run=False):
+        update = self._add(p4runtime_pb2.Update.INSERT)
+        update.entity.packet_replication_engine_entry.CopyFrom(pre_entry)
+        self._added()
+
+    def ModifyPREEntry(self, pre_entry, dry_run=False):
+        update = self._add(p4runtime_pb2.Update.MODIFY)
+        update.entity.packet_replication_engine_entry.CopyFrom(pre_entry)
+        self._added()
+
+    def Flush(self):
+        """Send the pending updates; returns the WriteErrors of this request."""
+        request, self._request = self._request, None
+        if request is None or not request.updates:
+            return []
+        first = self.sent
+        self.sent += len(request.updates)
+        self.requests += 1
+        if self.dry_run:
+            print("P4Runtime Write:", request)
+            return []
+        try:
+            self.connection.client_stub.Write(request)
+            return []
+        except grpc.RpcError as e:
+            errors = self._update_errors(request, first, e)
+        self.errors.extend(errors)
+        if self.raise_on_error:
+            raise WriteBatchError(errors)
+        return errors
+
+    @staticmethod
+    def _update_errors(request, first, grpc_error):
+        """One WriteError per failed update. Without per-update details in the
+        status, every update of the request gets the request's error."""
+        try:
+            details = parseGrpcErrorBinaryDetails(grpc_error)
+        except P4RuntimeErrorFormatException:
+            details = None
+        if not details:
+            return [WriteError(first + i, update, grpc_error.code().name, grpc_error.details())
+                    for i, update in enumerate(request.updates)]
+        return [WriteError(first + i, request.updates[i],
+                           code_pb2.Code.Name(p4_error.canonical_code), p4_error.message)
+                for i, p4_error in details]
+
 class GrpcRequestLogger(grpc.UnaryUnaryClientInterceptor,
                         grpc.UnaryStreamClientInterceptor):
-    """Implementation of a gRPC interceptor that logs request to a file"""
+    """Implementation of a gRPC interceptor that logs request to a file.
+
+    The calling thread only serializes the request and queues it; the file is
+    written by a background thread (request_log.RequestLogWriter). Text logs
+    by default, length-prefixed binary protobufs with binary=True or a file
+    name ending in .pblog (read them with request_log.py). sample=N logs only
+    every Nth Write (all other RPCs are logged). max_bytes rotates the log.
+    """
 
-    def __init__(self, log_file):
+    def __init__(self, log_file, binary=None, sample=1, max_bytes=None, backups=DEFAULT_BACKUPS):
         self.log_file = log_file
-        with open(self.log_file, 'w') as f:
-            # Clear content if it exists.
-            f.write("")
+        if binary is None:
+            binary = log_file.endswith(BINARY_SUFFIX)
+        self.sample = max(1, int(sample))
+        self._writes = itertools.count()
+        self.writer = RequestLogWriter(log_file, binary=binary, max_bytes=max_bytes,
+                                       backups=backups, max_len=MSG_LOG_MAX_LEN)
 
     def log_message(self, method_name, body):
-        with open(self.log_file, 'a') as f:
-            ts = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-            msg = str(body)
-            f.write("\n[%s] %s\n---\n" % (ts, method_name))
-            if len(msg) < MSG_LOG_MAX_LEN:
-                f.write(str(body))
-            else:
-                f.write("Message too long (%d bytes)! Skipping log...\n" % len(msg))
-            f.write('---\n')
+        if self.sample > 1 and method_name.endswith('/Write') and next(self._writes) % self.sample:
+            return
+        if not isinstance(body, bytes):
+            # WriteSerialized passes bytes; everything else is rendered by the writer thread
+            body = body.SerializeToString()
+        self.writer.put(time.time(), method_name, body)
+
+    def close(self):
+        self.writer.close()
 
     def intercept_unary_unary(self, continuation, client_call_details, request):
         self.log_message(client_call_details.method, request)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+In-band (flow_id, seq, tx_ns) header of the data packets.
+
+The data senders (send_enhanced.py, raw_sender.py) put it right after the
+"P4 is cool" marker in the UDP payload, in network byte order:
+
+    flow_id  u16
+    seq      u32  1-based per flow
+    tx_ns    u64  send time, ns since epoch; 0 = not known when the packet
+                  was built (send_enhanced.py --fast)
+
+so every received packet says which packet it is and when it was sent.
+Latency, loss, duplicates and reordering are then computed from the
+receivers' logs alone (window_stats.delivery_stats), instead of matching the
+i-th received packet to the i-th logged send.
+
+receive.py records it in both log formats: the text log gets a
+"  stamp flow=<id> seq=<n> tx_ns=<ns>" line before the load line of the
+packet, the binary log (recv_log.py) the seq, flow_id and tx_ns fields.
+"""
+
+import re
+import struct
+
+PAYLOAD_MARKER = b"P4 is cool"
+STAMP = struct.Struct("!HIQ")  # flow_id, seq, tx_ns
+STAMP_OFFSET = len(PAYLOAD_MARKER)
+STAMPED_LEN = STAMP_OFFSET + STAMP.size
+
+STAMP_RE = re.compile(r'stamp flow=(\d+) seq=(\d+) tx_ns=(\d+)')
+
+
+def stamped_payload(flow_id, seq, tx_ns=0):
+    """Marker + stamp bytes of packet `seq` of a flow."""
+    return PAYLOAD_MARKER + STAMP.pack(flow_id, seq & 0xffffffff, tx_ns)
+
+
+def read_stamp(payload):
+    """(flow_id, seq, tx_ns) of a UDP payload (bytes or memoryview), or None
+    if it does not start with the marker and a full stamp."""
+    if payload is None or len(payload) < STAMPED_LEN or payload[:STAMP_OFFSET] != PAYLOAD_MARKER:
+        return None
+    return STAMP.unpack_from(payload, STAMP_OFFSET)
+
+
+def format_stamp(stamp):
+    """Receiver text log line of a stamp (parsed back with STAMP_RE)."""
+    flow_id, seq, tx_ns = stamp
+    return f"  stamp flow={flow_id} seq={seq} tx_ns={tx_ns}"
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Tabular Q-learning engine shared by the WRR controller (program/qos) and QCMP.
+
+All Q values live in one contiguous ndarray `q` of shape
+(n_agents, n_states, n_actions); with the default n_agents=1 that is a single
+(n_states, n_actions) table, available as `table`. States and actions are
+integer indices, and every random draw comes from one seeded
+numpy.random.Generator, so runs are reproducible.
+
+Single-transition calls (what a controller does per probe) avoid building
+arrays:
+    a = qt.choose_action(s, epsilon)
+    qt.update(s, a, reward, s_next)              # s_next=None: no bootstrap
+
+Batched calls take one entry per agent (n_agents > 1, each agent with its own
+table) or any number of transitions on the shared table (n_agents == 1):
+    actions = qt.choose_actions(states, epsilon)  # epsilon: scalar or per agent
+    qt.update_batch(states, actions, rewards, next_states)   # next state -1: terminal
+
+A batch is applied synchronously: every TD target is computed from the table
+as it was before the batch, and transitions that hit the same (state, action)
+cell move it once, toward the mean of their targets.
+
+    Q(s,a) += alpha * (r + gamma * max_a' Q(s',a') - Q(s,a))
+
+`clip=(low, high)` and `decimals` bound and round updated cells (QCMP keeps
+its Q values in [-1, 1] at 3 decimals).
+
+Checkpoints are uncompressed .npz files holding `q` and a JSON `meta` entry
+(format version, table shape and learning parameters, plus whatever the
+controller adds: state encoding, epsilon, schedules):
+    qt.save("q.npz", controller="qos_wrr", epsilon=0.2)
+    qt = QTable.load("q.npz")                    # private, writable copy
+    qt = QTable.load("q.npz", mmap=True)         # read-only, pages shared
+With mmap=True the table is mapped straight from the file, so any number of
+processes can serve one trained table from the page cache; updates on it
+raise ValueError (the array is read-only).
+"""
+
+import json
+import os
+import struct
+import time
+import zipfile
+
+import numpy as np
+
+# Uniforms drawn per Generator call for the single-transition path
+# (one Generator.random() call costs about as much as a whole update)
+RNG_BLOCK = 4096
+
+CHECKPOINT_VERSION = 1
+
+
+class QTable:
+
+    def __init__(self, n_states, n_actions, n_agents=1, alpha=0.1, gamma=0.9,
+                 seed=None, clip=None, decimals=None, dtype=np.float64):
+        self.n_states = n_states
+        self.n_actions = n_actions
+        self.n_agents = n_agents
+        self.alpha = alpha
+        self.gamma = gamma
+        self.clip = clip
+        self.decimals = decimals
+        self.rng = np.random.default_rng(seed)
+        self._uniforms = []
+        self.meta = {}
+        self._bind(np.zeros((n_agents, n_states, n_actions), dtype=dtype))
+        self._offsets = np.arange(n_agents, dtype=np.intp) * n_states
+
+    def _bind(self, q):
+        self.q = q
+        self._rows = q.reshape(self.n_agents * self.n_states, self.n_actions)  # view, one row per (agent, state)
+
+    @property
+    def table(self):
+        """The (n_states, n_actions) table of agent 0."""
+        return self.q[0]
+
+    @property
+    def read_only(self):
+        return not self.q.flags.writeable
+
+    def fill_uniform(self, low, high, decimals=None):
+        """Initialise every Q value uniformly in [low, high) from the engine's Generator."""
+        self.q[...] = self.rng.uniform(low, high, size=self.q.shape)
+        if decimals is not None:
+            np.round(self.q, decimals, out=self.q)
+
+    # ---- single transition -------------------------------------------------
+
+    def _uniform(self):
+        if not self._uniforms:
+            self._uniforms = self.rng.random(RNG_BLOCK).tolist()
+            self._uniforms.reverse()
+        return self._uniforms.pop()
+
+    def greedy_action(self, state, agent=0):
+        return int(self._rows[agent * self.n_states + state].argmax())
+
+    def choose_action(self, state, epsilon, agent=0):
+        """Epsilon-greedy action for one state (ties go to the lowest action index)."""
+        if self._uniform() < epsilon:
+            return int(self._uniform() * self.n_actions)
+        return self.greedy_action(state, agent)
+
+    def update(self, state, action, reward, next_state=None, alpha=None, gamma=None, agent=0):
+        """One Q-learning update; returns the new Q(state, action)."""
+        alpha = self.alpha if alpha is None else alpha
+        gamma = self.gamma if gamma is None else gamma
+        base = agent * self.n_states
+        row = self._rows[base + state]
+        # for a handful of actions a list max is several times cheaper than ndarray.max()
+        max_next = max(self._rows[base + next_state].tolist()) if next_state is not None else 0.0
+        new_q = row[action] + alpha * (reward + gamma * max_next - row[action])
+        if self.clip is not None:
+            new_q = min(self.clip[1], max(self.clip[0], new_q))
+        if self.decimals is not None:
+            new_q = float(np.round(new_q, self.decimals))
+        row[action] = new_q
+        return new_q
+
+    # ---- batches -----------------------------------------------------------
+
+    def _row_index(self, states):
+        states = np.asarray(states, dtype=np.intp)
+        if self.n_agents == 1:
+            return states
+        if states.shape != (self.n_agents,):
+            raise ValueError(f"expected one state per agent ({self.n_agents}), got shape {states.shape}")
+        return states + self._offsets
+
+    def greedy_actions(self, states):
+        return self._rows[self._row_index(states)].argmax(axis=1)
+
+    def choose_actions(self, states, epsilon):
+        """Epsilon-greedy actions for a batch; epsilon is a scalar or one value per entry."""
+        rows = self._row_index(states)
+        greedy = self._rows[rows].argmax(axis=1)
+        explore = self.rng.random(rows.shape[0]) < epsilon
+        if not explore.any():
+            return greedy
+        return np.where(explore, self.rng.integers(self.n_actions, size=rows.shape[0]), greedy)
+
+    def update_batch(self, states, actions, rewards, next_states=None, alpha=None, gamma=None):
+        """Synchronous Q-learning update of a batch (see the module docstring).
+        next_states None or -1 entries: terminal, no bootstrap. Returns the TD errors."""
+        alpha = self.alpha if alpha is None else alpha
+        gamma = self.gamma if gamma is None else gamma
+        rows = self._row_index(states)
+        actions = np.asarray(actions, dtype=np.intp)
+        current = self._rows[rows, actions]
+        target = np.asarray(rewards, dtype=self.q.dtype).copy()
+        if next_states is not None:
+            next_states = np.asarray(next_states, dtype=np.intp)
+            live = next_states >= 0
+            next_rows = self._row_index(np.where(live, next_states, 0))
+            target += np.where(live, gamma * self._rows[next_rows].max(axis=1), 0.0)
+        td = target - current
+
+        flat = rows * self.n_actions + actions
+        if self.n_agents > 1 or flat.shape[0] == 1:
+            cells, delta = flat, td  # one entry per agent: no shared cells
+        else:
+            cells, inverse, counts = np.unique(flat, return_inverse=True, return_counts=True)
+            delta = np.bincount(inverse, weights=td, minlength=cells.shape[0]) / counts
+        values = self.q.reshape(-1)
+        new = values[cells] + alpha * delta
+        if self.clip is not None:
+            np.clip(new, self.clip[0], self.clip[1], out=new)
+        if self.decimals is not None:
+            np.round(new, self.decimals, out=new)
+        values[cells] = new
+        return td
+
+    # ---- checkpoints -------------------------------------------------------
+
+    def save(self, path, **meta):
+        """Write a checkpoint atomically (temp file + rename); `meta` must be JSON-serialisable."""
+        meta = dict(meta, version=CHECKPOINT_VERSION, shape=list(self.q.shape), dtype=self.q.dtype.str,
+                    alpha=self.alpha, gamma=self.gamma, clip=self.clip, decimals=self.decimals,
+                    saved_at=time.time())
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, q=self.q, meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap=False, seed=None):
+        """QTable from a checkpoint; its metadata is in `meta`."""
+        q, meta = read_checkpoint(path, mmap)
+        n_agents, n_states, n_actions = q.shape
+        clip = tuple(meta["clip"]) if meta["clip"] is not None else None
+        qt = cls(n_states, n_actions, n_agents=n_agents, alpha=meta["alpha"], gamma=meta["gamma"],
+                 seed=seed, clip=clip, decimals=meta["decimals"], dtype=q.dtype)
+        qt._bind(q)
+        qt.meta = meta
+        return qt
+
+
+def read_checkpoint(path, mmap=False):
+    """(q, meta) of a checkpoint; with mmap=True q is a read-only np.memmap into the file."""
+    with np.load(path) as npz:
+        meta = json.loads(str(npz["meta"]))
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path}: checkpoint version {meta.get('version')}, expected {CHECKPOINT_VERSION}")
+        if not mmap:
+            return npz["q"], meta
+    return _map_npz_member(path, "q.npy"), meta
+
+
+def _map_npz_member(path, name):
+    # np.load ignores mmap_mode for .npz: locate the stored .npy member and map its data
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"{path}: {name} is compressed and cannot be memory-mapped")
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+        if header[:4] != b"PK\x03\x04":
+            raise ValueError(f"{path}: bad zip local header for {name}")
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        major, _ = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if major == 1 else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran_order else "C")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Raw AF_PACKET sender with pre-serialized frames and sendmmsg batching.
+
+Replaces the Scapy per-packet loop of the senders: the Ether/IPv4/UDP frame
+is serialized once, copied into a fixed batch of send slots, and every packet
+only gets its changing fields patched in place before the slots go out in one
+sendmmsg() call. Per packet that is
+
+    ip.id     the rank (rank & 0xffff), as before
+    payload   "P4 is cool" followed by the (flow_id, seq, tx_ns) stamp of
+              payload_stamp.py
+    lengths   ip.len and udp.len when the packet has its own frame size
+              (workload traces); the slots are zero-padded to max_frame
+    checksums IPv4 header and UDP, from the precomputed one's-complement sum
+              of the constant words plus the patched words (RFC 1624)
+
+tx_ns is read from the clock while the packet is patched, right before its
+batch is handed to the kernel, so every packet carries its own send time.
+Batches only grow when the sender is behind its schedule (--pps), so low
+rates still go out one packet at a time. Without sendmmsg (no libc symbol)
+the slots are sent with one send() each.
+
+Linux only, needs CAP_NET_RAW (the Mininet hosts run as root).
+
+Usage from a sender:
+    tx = RawSender("h1-eth0", "10.0.2.1", 4322, flow_id=1)
+    tx.run(itertools.repeat(1500), pps=2000, deadline=time.time() + 30)
+
+or, replaying one flow of a workload trace (workload_trace.py):
+    trace = load_flow("trace.bin", flow_id=1)
+    tx = RawSender("h1-eth0", "10.0.2.1", 4322, flow_id=1, max_frame=int(trace["size"].max()))
+    tx.run_trace(trace["t_ns"], trace["rank"], trace["size"])
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import os
+import socket
+import struct
+import time
+
+from payload_stamp import STAMP, STAMP_OFFSET, stamped_payload
+
+DEFAULT_BATCH = 32
+DEFAULT_SPORT = 1234
+BROADCAST_MAC = "ff:ff:ff:ff:ff:ff"
+
+ETH_P_IP = 0x0800
+SIOCGIFADDR = 0x8915
+
+_ETH_LEN = 14
+_IP_LEN = 20
+_UDP_LEN = 8
+# offsets in the frame
+_IP_LEN_OFF = _ETH_LEN + 2
+_IP_ID_OFF = _ETH_LEN + 4
+_IP_SUM_OFF = _ETH_LEN + 10
+_UDP_OFF = _ETH_LEN + _IP_LEN
+_UDP_LEN_OFF = _UDP_OFF + 4
+_UDP_SUM_OFF = _UDP_OFF + 6
+_STAMP_OFF = _UDP_OFF + _UDP_LEN + STAMP_OFFSET
+
+_u16 = struct.Struct("!H")
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_iovec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        fn = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_sendmmsg = _load_sendmmsg()
+
+
+def list_ifaces():
+    return sorted(os.listdir("/sys/class/net"))
+
+
+def if_hwaddr(iface):
+    with open(f"/sys/class/net/{iface}/address") as f:
+        return f.read().strip()
+
+
+def if_ipv4(iface):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        ifreq = fcntl.ioctl(s.fileno(), SIOCGIFADDR, struct.pack("256s", iface[:15].encode()))
+    return socket.inet_ntoa(ifreq[20:24])
+
+
+def ones_sum(data):
+    """One's-complement sum of the 16-bit big-endian words of data (even length), unfolded."""
+    return sum(struct.unpack(f"!{len(data) // 2}H", data))
+
+
+def fold(total):
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return total
+
+
+def build_frame(src_mac, dst_mac, src_ip, dst_ip, sport, dport, payload, ttl=64):
+    """Ether/IPv4/UDP frame with ip.id, both checksums and the stamp zeroed."""
+    udp_len = _UDP_LEN + len(payload)
+    eth = bytes.fromhex(dst_mac.replace(":", "")) + bytes.fromhex(src_mac.replace(":", "")) + \
+        _u16.pack(ETH_P_IP)
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, _IP_LEN + udp_len, 0, 0, ttl, socket.IPPROTO_UDP, 0,
+                     socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+    udp = struct.pack("!HHHH", sport, dport, udp_len, 0)
+    return eth + ip + udp + payload
+
+
+class FrameTemplate:
+    """A serialized frame and the checksum sums of its constant words."""
+
+    def __init__(self, src_mac, dst_mac, src_ip, dst_ip, dport, sport=DEFAULT_SPORT, flow_id=0):
+        payload = stamped_payload(flow_id, 0)
+        if len(payload) % 2:
+            payload += b"\x00"
+        self.frame = build_frame(src_mac, dst_mac, src_ip, dst_ip, sport, dport, payload)
+        self.flow_id = flow_id
+        # ip.id, seq and tx_ns are zero in the frame, so these are the sums without them
+        self.ip_base = ones_sum(self.frame[_ETH_LEN:_UDP_OFF])
+        udp = self.frame[_UDP_OFF:]
+        pseudo = self.frame[_ETH_LEN + 12:_UDP_OFF] + struct.pack("!HH", socket.IPPROTO_UDP, len(udp))
+        self.udp_base = ones_sum(pseudo) + ones_sum(udp)
+        # the same sums without the length words (ip.len once, udp.len in the pseudo and UDP headers)
+        self.ip_base_nolen = self.ip_base - (len(self.frame) - _ETH_LEN)
+        self.udp_base_nolen = self.udp_base - 2 * len(udp)
+
+    def patch(self, buf, off, seq, rank, tx_ns, size=None):
+        """Write ip.id, seq, tx_ns and both checksums into the frame copy at buf[off:].
+        With size (>= len(frame); the bytes after the frame must be zero) also
+        write the IP and UDP lengths of a frame of that many bytes."""
+        ip_id = rank & 0xffff
+        seq &= 0xffffffff
+        ip_base, udp_base = self.ip_base, self.udp_base
+        if size is not None:
+            ip_len, udp_len = size - _ETH_LEN, size - _UDP_OFF
+            _u16.pack_into(buf, off + _IP_LEN_OFF, ip_len)
+            _u16.pack_into(buf, off + _UDP_LEN_OFF, udp_len)
+            ip_base = self.ip_base_nolen + ip_len
+            udp_base = self.udp_base_nolen + 2 * udp_len
+        _u16.pack_into(buf, off + _IP_ID_OFF, ip_id)
+        _u16.pack_into(buf, off + _IP_SUM_OFF, ~fold(ip_base + ip_id) & 0xffff)
+        STAMP.pack_into(buf, off + _STAMP_OFF, self.flow_id, seq, tx_ns)
+        total = udp_base + (seq >> 16) + (seq & 0xffff) + (tx_ns >> 48) + \
+            ((tx_ns >> 32) & 0xffff) + ((tx_ns >> 16) & 0xffff) + (tx_ns & 0xffff)
+        udp_sum = ~fold(total) & 0xffff
+        _u16.pack_into(buf, off + _UDP_SUM_OFF, udp_sum or 0xffff)  # 0 means "no checksum"
+
+
+class RawSender:
+    """AF_PACKET socket on one interface sending patched copies of a FrameTemplate."""
+
+    def __init__(self, iface, dst_ip, dport, sport=DEFAULT_SPORT, flow_id=0,
+                 dst_mac=BROADCAST_MAC, batch=DEFAULT_BATCH, max_frame=None):
+        self.iface = iface
+        self.template = FrameTemplate(if_hwaddr(iface), dst_mac, if_ipv4(iface), dst_ip,
+                                      dport, sport, flow_id)
+        self.min_frame = len(self.template.frame)
+        # slot size; frames of other sizes (send_batch sizes=) are the template zero-padded
+        self.frame_len = max(self.min_frame, max_frame or 0)
+        self.batch = batch
+        self.sent = 0       # packets handed to the kernel
+        self.syscalls = 0   # sendmmsg()/send() calls
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self.sock.bind((iface, 0))
+        except Exception:
+            self.sock.close()
+            raise
+        # batch slots, each a copy of the frame; only patched fields change
+        slot = self.template.frame.ljust(self.frame_len, b"\x00")
+        self._slots = ctypes.create_string_buffer(slot * batch, self.frame_len * batch)
+        self._view = memoryview(self._slots).cast("B")
+        base = ctypes.addressof(self._slots)
+        self._iov = (_iovec * batch)(*[_iovec(base + i * self.frame_len, self.min_frame)
+                                       for i in range(batch)])
+        self._msgs = (_mmsghdr * batch)()
+        for i in range(batch):
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self._iov[i])
+            hdr.msg_iovlen = 1
+
+    def close(self):
+        self._view.release()
+        self.sock.close()
+
+    def _flush(self, n):
+        """Send slots 0..n-1."""
+        if _sendmmsg is None:
+            for i in range(n):
+                start = i * self.frame_len
+                self.sock.send(self._view[start:start + self._iov[i].iov_len])
+                self.syscalls += 1
+            return
+        done = 0
+        fd = self.sock.fileno()
+        msgs = ctypes.addressof(self._msgs)
+        while done < n:
+            r = _sendmmsg(fd, msgs + done * ctypes.sizeof(_mmsghdr), n - done, 0)
+            self.syscalls += 1
+            if r < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOBUFS, errno.EAGAIN, errno.EINTR):
+                    time.sleep(0.0005)  # device queue full; retry the rest
+                    continue
+                raise OSError(err, os.strerror(err))
+            done += r
+
+    def send_batch(self, first_seq, ranks, sizes=None):
+        """Patch and send len(ranks) (<= batch) packets numbered from first_seq,
+        optionally with per-packet frame sizes (clamped to min_frame..frame_len).
+        Returns the tx_ns of each packet."""
+        patch = self.template.patch
+        view = self._view
+        stamps = []
+        if sizes is None and self.frame_len > self.min_frame:
+            sizes = [self.min_frame] * len(ranks)  # slots may hold lengths of earlier sized packets
+        if sizes is None:
+            for i, rank in enumerate(ranks):
+                tx_ns = time.time_ns()
+                patch(view, i * self.frame_len, first_seq + i, rank, tx_ns)
+                stamps.append(tx_ns)
+        else:
+            lo, hi, iov = self.min_frame, self.frame_len, self._iov
+            for i, (rank, size) in enumerate(zip(ranks, sizes)):
+                size = min(max(size, lo), hi)
+                iov[i].iov_len = size
+                tx_ns = time.time_ns()
+                patch(view, i * self.frame_len, first_seq + i, rank, tx_ns, size)
+                stamps.append(tx_ns)
+        self._flush(len(stamps))
+        self.sent += len(stamps)
+        return stamps
+
+    def run(self, ranks, pps, max_packets=None, deadline=None, on_batch=None):
+        """Send one packet per rank at pps until ranks, max_packets or the
+        deadline (time.time()) run out. on_batch(first_seq, stamps) is called
+        after every batch. Returns the number of packets sent."""
+        ranks = iter(ranks)
+        interval = 1.0 / pps
+        start = time.monotonic()
+        if deadline is not None:
+            deadline = start + (deadline - time.time())
+        seq = 0
+        while max_packets is None or seq < max_packets:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            # packets due by now, at most one batch
+            due = min(int((now - start) * pps) + 1 - seq, self.batch)
+            if max_packets is not None:
+                due = min(due, max_packets - seq)
+            if due <= 0:
+                time.sleep(max(0.0, start + seq * interval - now))
+                continue
+            batch = [r for _, r in zip(range(due), ranks)]
+            if not batch:
+                break
+            stamps = self.send_batch(seq + 1, batch)
+            if on_batch is not None:
+                on_batch(seq + 1, stamps)
+            seq += len(batch)
+        return seq
+
+    def run_trace(self, t_ns, ranks, sizes=None, max_packets=None, deadline=None, on_batch=None):
+        """Send packet i at t_ns[i] ns after the start with ranks[i] (and frame
+        size sizes[i]), until the trace, max_packets or the deadline
+        (time.time()) run out. t_ns, ranks and sizes are NumPy arrays (one flow
+        of a workload trace); t_ns is sorted. Returns the number of packets sent."""
+        n = len(t_ns) if max_packets is None else min(len(t_ns), max_packets)
+        t_ns = t_ns.astype("int64")  # contiguous: searchsorted on a record field view copies it every call
+        start = time.monotonic_ns()
+        if deadline is not None:
+            deadline = start + int((deadline - time.time()) * 1e9)
+        seq = 0
+        while seq < n:
+            now = time.monotonic_ns()
+            if deadline is not None and now >= deadline:
+                break
+            # packets due by now, at most one batch
+            due = min(int(t_ns.searchsorted(now - start, side="right")), n, seq + self.batch) - seq
+            if due <= 0:
+                time.sleep(max(0, start + int(t_ns[seq]) - now) / 1e9)
+                continue
+            end = seq + due
+            stamps = self.send_batch(seq + 1, ranks[seq:end].tolist(),
+                                     None if sizes is None else sizes[seq:end].tolist())
+            if on_batch is not None:
+                on_batch(seq + 1, stamps)
+            seq = end
+        return seq
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Readiness markers: how a receiver tells the experiment runner it is up.
+
+A receiver started with --ready-file=PATH writes "ready <time>" to PATH once
+its capture socket is open, and appends "first <time>" when its first packet
+arrives (time.time() seconds). The runners (run_sim_enhanced.py, scenario.py)
+remove stale markers before starting the receivers and start the senders as
+soon as every marker says ready, instead of after fixed sleeps. The "first"
+lines give the time to first packet of a run.
+
+    marker = ReadyMarker(path)
+    marker.ready()              # socket open
+    marker.packet(ts)           # every packet; only the first one is written
+
+    clear_marker(path)          # runner, before starting the receiver
+    wait_ready([path], timeout=10)
+    read_marker(path)           # {"ready": t, "first": t}
+"""
+
+import os
+import time
+
+FIRST_DELAY = 0.005  # first backoff delay of wait_ready, doubling up to MAX_DELAY
+MAX_DELAY = 0.1
+DEFAULT_READY_TIMEOUT = 10.0
+
+
+class ReadyMarker:
+    """Writer side, in the receiver."""
+
+    def __init__(self, path):
+        self.path = path
+        self.first_seen = False
+
+    def ready(self):
+        # write-then-rename: a runner never reads a half-written marker
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(f"ready {time.time()}\n")
+        os.replace(tmp, self.path)
+
+    def packet(self, ts):
+        if self.first_seen:
+            return
+        self.first_seen = True
+        with open(self.path, "a") as f:
+            f.write(f"first {ts}\n")
+
+
+def clear_marker(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_marker(path):
+    """{"ready": t, "first": t} with the keys the marker has so far ({} if none)."""
+    marks = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                try:
+                    marks[key] = float(value)
+                except ValueError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return marks
+
+
+def wait_ready(paths, timeout=DEFAULT_READY_TIMEOUT):
+    """Wait with exponential backoff until every marker says ready.
+    Returns the paths still not ready after `timeout` seconds (empty if all are)."""
+    pending = list(paths)
+    deadline = time.monotonic() + timeout
+    delay = FIRST_DELAY
+    while True:
+        pending = [p for p in pending if "ready" not in read_marker(p)]
+        now = time.monotonic()
+        if not pending or now >= deadline:
+            return pending
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * 2, MAX_DELAY)
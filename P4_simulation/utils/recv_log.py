@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Binary receiver log: fixed-width records instead of per-packet text blocks.
+
+File layout (little-endian):
+  header (16 bytes): magic b"RXLOG\\x00\\x02\\x00", record_size (u32), reserved (u32)
+  records (40 bytes each):
+    recv_ns       u64  receive timestamp, ns since epoch
+    tx_ns         u64  send time from the packet's stamp (payload_stamp.py); 0 if unknown
+    seq           u32  sequence number from the packet's stamp; 0 for an unstamped packet
+    flow_id       u16  flow id from the stamp, else the one given to the receiver (--flow-id)
+    ip_id         u16  IPv4 identification (= rank for send_enhanced.py)
+    qdepth        u32  MRI s1 trace: qdepth
+    flow1_qdepth  u32  MRI s1 trace: flow1_qdepth
+    flow2_qdepth  u32  MRI s1 trace: flow2_qdepth
+    q_latency     u32  MRI s1 trace: latency (us); 0 without MRI
+
+Version 1 logs (magic b"RXLOG\\x00\\x01\\x00", 32-byte records without
+tx_ns, seq = receive order) are still read.
+
+The writer only needs the standard library (it runs on the Mininet hosts);
+the reader maps the file with numpy.memmap, so analysis never parses text.
+"""
+
+import os
+import struct
+from pathlib import Path
+
+MAGIC = b"RXLOG\x00\x02\x00"
+MAGIC_V1 = b"RXLOG\x00\x01\x00"
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<QQIHHIIII")
+RECORD_V1 = struct.Struct("<QIHHIIII")
+HEADER_SIZE = HEADER.size
+RECORD_SIZE = RECORD.size
+
+RECORD_FIELDS = [
+    ("recv_ns", "<u8"),
+    ("tx_ns", "<u8"),
+    ("seq", "<u4"),
+    ("flow_id", "<u2"),
+    ("ip_id", "<u2"),
+    ("qdepth", "<u4"),
+    ("flow1_qdepth", "<u4"),
+    ("flow2_qdepth", "<u4"),
+    ("q_latency", "<u4"),
+]
+RECORD_FIELDS_V1 = [field for field in RECORD_FIELDS if field[0] != "tx_ns"]
+
+# magic -> (record struct, numpy fields); all layouts start with recv_ns
+LAYOUTS = {
+    MAGIC: (RECORD, RECORD_FIELDS),
+    MAGIC_V1: (RECORD_V1, RECORD_FIELDS_V1),
+}
+
+CHUNK_RECORDS = 4096  # records buffered in memory before a write()
+FLUSH_INTERVAL_SEC = 1.0  # also write out at least this often (for --follow readers)
+
+
+class RecvLogWriter:
+    """Append fixed-width records to a binary receiver log."""
+
+    def __init__(self, path, flow_id=0, chunk_records=CHUNK_RECORDS, flush_interval=FLUSH_INTERVAL_SEC):
+        self.path = path
+        self.flow_id = flow_id
+        self.flush_interval = flush_interval
+        self._f = open(path, "ab")
+        if self._f.tell() == 0:
+            self._f.write(HEADER.pack(MAGIC, RECORD_SIZE, 0))
+        elif read_header(path)[0] != MAGIC:
+            self._f.close()
+            raise ValueError(f"{path}: older receiver log format, cannot append")
+        self._buf = bytearray(chunk_records * RECORD_SIZE)
+        self._off = 0
+        self._last_flush_ts = 0.0
+        self.count = 0
+
+    def append(self, recv_ts, seq, ip_id=0, trace=None, tx_ns=0, flow_id=None):
+        """Add one packet. recv_ts in seconds; trace is an mri_decoder.MRITrace or None;
+        seq/tx_ns/flow_id come from the packet's stamp (flow_id defaults to the receiver's)."""
+        if trace is not None:
+            qdepth, flow1, flow2, q_latency = trace[1:5]
+        else:
+            qdepth = flow1 = flow2 = q_latency = 0
+        RECORD.pack_into(self._buf, self._off, int(recv_ts * 1e9), tx_ns, seq,
+                         self.flow_id if flow_id is None else flow_id, ip_id,
+                         qdepth, flow1, flow2, q_latency)
+        self._off += RECORD_SIZE
+        self.count += 1
+        if self._off == len(self._buf) or recv_ts - self._last_flush_ts >= self.flush_interval:
+            self.flush(recv_ts)
+
+    def flush(self, now_ts=0.0):
+        if self._off:
+            self._f.write(memoryview(self._buf)[:self._off])
+            self._off = 0
+        self._f.flush()
+        self._last_flush_ts = now_ts
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+
+def read_header(path):
+    """(magic, record_size) of a binary receiver log."""
+    with open(path, "rb") as f:
+        magic, record_size, _ = HEADER.unpack(f.read(HEADER_SIZE))
+    return magic, record_size
+
+
+def record_layout(magic, record_size, path=""):
+    """(record struct, numpy fields) of a log header; ValueError if it is not a receiver log."""
+    layout = LAYOUTS.get(magic)
+    if layout is None or layout[0].size != record_size:
+        raise ValueError(f"{path}: not a receiver log (magic={magic!r}, record_size={record_size})")
+    return layout
+
+
+def is_recv_log(path):
+    """True if path is a binary receiver log of any version (checks the magic)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) in LAYOUTS
+    except OSError:
+        return False
+
+
+def find_receiver_log(outputs_dir, host_index):
+    """receiver_h_r<N>.bin if the receiver wrote a binary log, else receiver_h_r<N>.txt."""
+    outputs_dir = Path(outputs_dir)
+    bin_path = outputs_dir / f"receiver_h_r{host_index}.bin"
+    return bin_path if bin_path.exists() else outputs_dir / f"receiver_h_r{host_index}.txt"
+
+
+def record_dtype(fields=RECORD_FIELDS):
+    import numpy as np
+    return np.dtype(fields)
+
+
+def recv_timestamps(path):
+    """Receive timestamps (float seconds, log order) of a binary receiver log."""
+    return (load_recv_log(path)["recv_ns"] / 1e9).tolist()
+
+
+def load_recv_log(path):
+    """Map a binary receiver log read-only as a numpy structured array.
+    A partially written trailing record (live run) is ignored. Version 1 logs
+    have no tx_ns field."""
+    import numpy as np
+    magic, record_size = read_header(path)
+    _, fields = record_layout(magic, record_size, path)
+    n = (os.path.getsize(path) - HEADER_SIZE) // record_size
+    if n <= 0:
+        return np.zeros(0, dtype=record_dtype(fields))
+    return np.memmap(path, dtype=record_dtype(fields), mode="r", offset=HEADER_SIZE, shape=(n,))
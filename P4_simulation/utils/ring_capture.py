@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Raw AF_PACKET capture backend with a TPACKET_V3 mmap ring and a kernel BPF filter.
+
+Replaces Scapy sniff() for the receivers: the kernel filters packets with a
+classic BPF program, writes them into a shared ring (PACKET_RX_RING) and the
+receiver walks whole blocks of frames without a syscall or a Scapy Packet per
+frame. Each retired block is handed to a callback as one batch of
+(timestamp, frame) tuples, where frame is a memoryview into the ring.
+
+The memoryviews are only valid during the callback; copy (bytes(frame)) what
+has to be kept. Linux only, needs CAP_NET_RAW (the Mininet hosts run as root).
+
+Usage from a receiver:
+    cap = RingCapture(iface, bpf_udp_port(4322))
+    cap.run(lambda batch: [handle_frame(frame, ts) for ts, frame in batch])
+"""
+
+import ctypes
+import mmap
+import select
+import socket
+import struct
+
+# <linux/if_packet.h>, <linux/if_ether.h>, <asm-generic/socket.h>
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+SO_ATTACH_FILTER = 26
+ETH_P_ALL = 0x0003
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+PACKET_OUTGOING = 4
+
+# <linux/filter.h> classic BPF opcodes
+BPF_LD_H_ABS = 0x28
+BPF_LD_B_ABS = 0x30
+BPF_LD_H_IND = 0x48
+BPF_LDX_B_MSH = 0xb1
+BPF_JEQ_K = 0x15
+BPF_JSET_K = 0x45
+BPF_RET_K = 0x06
+BPF_SNAPLEN = 262144
+
+DEFAULT_BLOCK_SIZE = 1 << 20  # 1 MiB per block
+DEFAULT_BLOCK_NR = 16
+DEFAULT_FRAME_SIZE = 2048
+DEFAULT_RETIRE_TOV_MS = 10  # hand over partially filled blocks after 10 ms
+
+_sock_filter = struct.Struct("HBBI")
+_tpacket_req3 = struct.Struct("IIIIIII")
+# tpacket_block_desc: version, offset_to_priv, then tpacket_hdr_v1:
+# block_status, num_pkts, offset_to_first_pkt
+_block_hdr = struct.Struct("III")
+_BLOCK_HDR_OFF = 8
+_block_status = struct.Struct("I")
+# tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac
+_pkt_hdr = struct.Struct("IIIIIIH")
+# sockaddr_ll follows the 48-byte tpacket3_hdr; sll_pkttype is at byte 10 of it
+_SLL_PKTTYPE_OFF = 48 + 10
+
+
+def bpf_udp_port(port):
+    """Classic BPF for tcpdump's "udp and port <port>" on Ethernet
+    (IPv6 and IPv4, IPv4 options and fragments handled like tcpdump -dd)."""
+    return [
+        (BPF_LD_H_ABS, 0, 0, 12),
+        (BPF_JEQ_K, 0, 6, 0x86dd),
+        (BPF_LD_B_ABS, 0, 0, 20),
+        (BPF_JEQ_K, 0, 15, 17),
+        (BPF_LD_H_ABS, 0, 0, 54),
+        (BPF_JEQ_K, 12, 0, port),
+        (BPF_LD_H_ABS, 0, 0, 56),
+        (BPF_JEQ_K, 10, 11, port),
+        (BPF_JEQ_K, 0, 10, 0x0800),
+        (BPF_LD_B_ABS, 0, 0, 23),
+        (BPF_JEQ_K, 0, 8, 17),
+        (BPF_LD_H_ABS, 0, 0, 20),
+        (BPF_JSET_K, 6, 0, 0x1fff),
+        (BPF_LDX_B_MSH, 0, 0, 14),
+        (BPF_LD_H_IND, 0, 0, 14),
+        (BPF_JEQ_K, 2, 0, port),
+        (BPF_LD_H_IND, 0, 0, 16),
+        (BPF_JEQ_K, 0, 1, port),
+        (BPF_RET_K, 0, 0, BPF_SNAPLEN),
+        (BPF_RET_K, 0, 0, 0),
+    ]
+
+
+def bpf_ipv4():
+    """Classic BPF for tcpdump's "ip" on Ethernet."""
+    return [
+        (BPF_LD_H_ABS, 0, 0, 12),
+        (BPF_JEQ_K, 0, 1, 0x0800),
+        (BPF_RET_K, 0, 0, BPF_SNAPLEN),
+        (BPF_RET_K, 0, 0, 0),
+    ]
+
+
+def attach_filter(sock, program):
+    """Attach a classic BPF program (list of (code, jt, jf, k)) to a socket.
+    Returns the instruction buffer, which must stay alive as long as the socket."""
+    insns = b"".join(_sock_filter.pack(*insn) for insn in program)
+    buf = ctypes.create_string_buffer(insns, len(insns))
+    # struct sock_fprog { unsigned short len; struct sock_filter *filter; }
+    fprog = struct.pack("HL", len(program), ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+    return buf
+
+
+class RingCapture:
+    """AF_PACKET socket with a TPACKET_V3 receive ring bound to one interface."""
+
+    def __init__(self, iface, bpf_program=None, block_size=DEFAULT_BLOCK_SIZE,
+                 block_nr=DEFAULT_BLOCK_NR, frame_size=DEFAULT_FRAME_SIZE,
+                 retire_tov_ms=DEFAULT_RETIRE_TOV_MS, ignore_outgoing=True):
+        self.iface = iface
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.ignore_outgoing = ignore_outgoing
+        self.frames = 0
+        self.batches = 0
+        self._running = False
+
+        # Protocol 0 until the filter and ring are in place, so no unfiltered
+        # frames are queued before bind().
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self._filter_buf = attach_filter(self.sock, bpf_program) if bpf_program else None
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            req = _tpacket_req3.pack(block_size, block_nr, frame_size,
+                                     (block_size // frame_size) * block_nr,
+                                     retire_tov_ms, 0, 0)
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self.ring = mmap.mmap(self.sock.fileno(), block_size * block_nr,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            self.sock.bind((iface, ETH_P_ALL))
+        except Exception:
+            self.sock.close()
+            raise
+        self.view = memoryview(self.ring)
+
+    def close(self):
+        self._running = False
+        self.view.release()
+        self.ring.close()
+        self.sock.close()
+
+    def stop(self):
+        """Make run() return after the current batch."""
+        self._running = False
+
+    def _read_block(self, block_off):
+        """Return the batch of a block owned by user space, or None."""
+        view = self.view
+        status, num_pkts, pkt_off = _block_hdr.unpack_from(view, block_off + _BLOCK_HDR_OFF)
+        if not status & TP_STATUS_USER:
+            return None
+        batch = []
+        off = block_off + pkt_off
+        ignore_outgoing = self.ignore_outgoing
+        for _ in range(num_pkts):
+            next_off, sec, nsec, snaplen, _len, _status, mac = _pkt_hdr.unpack_from(view, off)
+            if not (ignore_outgoing and view[off + _SLL_PKTTYPE_OFF] == PACKET_OUTGOING):
+                batch.append((sec + nsec * 1e-9, view[off + mac:off + mac + snaplen]))
+            off += next_off
+        return batch
+
+    def _release_block(self, block_off):
+        _block_status.pack_into(self.view, block_off + _BLOCK_HDR_OFF, TP_STATUS_KERNEL)
+
+    def run(self, on_batch, timeout_ms=200, max_frames=None):
+        """Deliver batches of (timestamp, frame memoryview) to on_batch until
+        stop() is called or max_frames frames have been delivered."""
+        poller = select.poll()
+        poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        block = 0
+        self._running = True
+        while self._running:
+            block_off = block * self.block_size
+            batch = self._read_block(block_off)
+            if batch is None:
+                poller.poll(timeout_ms)
+                continue
+            try:
+                if batch:
+                    on_batch(batch)
+                    self.frames += len(batch)
+                    self.batches += 1
+            finally:
+                # drop our views before the kernel reuses the block
+                for _, frame in batch:
+                    frame.release()
+                self._release_block(block_off)
+            block = (block + 1) % self.block_nr
+            if max_frames is not None and self.frames >= max_frames:
+                break
+
+
+def open_ring_or_none(iface, bpf_program, **kwargs):
+    """RingCapture for iface, or None (with a message) if AF_PACKET rings are unavailable."""
+    try:
+        return RingCapture(iface, bpf_program, **kwargs)
+    except (AttributeError, OSError) as e:
+        print(f"ring capture unavailable on {iface} ({e}); falling back to scapy", flush=True)
+        return None
@@ -19,8 +19,8 @@
 # We encourage you to dissect this script to better understand the BMv2/Mininet
 # environment used by the P4 tutorial.
 #
-import os, sys, json, subprocess, re, argparse
-from time import sleep
+import os, sys, json, subprocess, re, argparse, time, traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from p4_mininet import P4Switch, P4Host
 
@@ -32,6 +32,7 @@ from mininet.cli import CLI
 from p4runtime_switch import P4RuntimeSwitch
 import p4runtime_lib.simple_controller
 from run_sim_enhanced import sending_function
+from scenario import Scenario, ScenarioError, ScenarioRun
 #from run_sim_dummy import sending_function
 #from run_sim_dummy2 import sending_function
 
@@ -194,21 +195,77 @@ class ExerciseRunner:
             and starts the mininet CLI. This is the main method to run after
             initializing the object.
         """
+        self.start_network()
+
+        self.do_net_cli()
+        # stop right after the CLI is exited
+        self.net.stop()
+
+    def start_network(self):
+        """ Creates and starts the mininet instance and programs the hosts and
+            switches. The switches boot concurrently and are probed until they
+            accept connections (P4Switch.batchStartup) and are programmed in
+            parallel (program_switches). No fixed sleeps.
+
+            Returns the startup phase timings in seconds.
+        """
+        t0 = time.monotonic()
         # Initialize mininet with the topology specified by the config
         self.create_network()
         self.net.start()
-        sleep(1)
+        switches_ready = time.monotonic() - t0
 
         # some programming that must happen after the net has started
         self.program_hosts()
-        self.program_switches()
-
-        # wait for that to finish. Not sure how to do this better
-        sleep(1)
-
-        self.do_net_cli()
-        # stop right after the CLI is exited
-        self.net.stop()
+        reports = self.program_switches()
+        programmed = time.monotonic() - t0
+        print('Startup: %d switches ready after %.2f s, programmed after %.2f s' % (
+            len(self.net.switches), switches_ready, programmed))
+        timings = {'switches_ready_s': switches_ready, 'programmed_s': programmed}
+        # slowest switch per programming phase (they run in parallel)
+        for phase in p4runtime_lib.simple_controller.ProgramReport.PHASES:
+            times = [r.timings[phase] for r in reports.values() if phase in r.timings]
+            if times:
+                timings['program_%s_s' % phase] = max(times)
+        return timings
+
+    def run_headless(self, scenario):
+        """ Runs one scenario (scenario.py) instead of the mininet CLI: sets up
+            the network like run_exercise(), runs the scenario's processes until
+            they are done, stops them and the network and collects the outputs.
+
+            Returns (results directory, names of failed processes).
+        """
+        # every run gets the ports and device ids of a fresh start (the controllers connect to them)
+        P4RuntimeSwitch.next_grpc_port = 50051
+        P4RuntimeSwitch.next_thrift_port = 9090
+        P4Switch.device_id = 0
+
+        started = time.time()
+        run = None
+        timings = {}
+        self.net = None
+        try:
+            timings = self.start_network()
+            scenario.check_hosts(self.net)
+
+            run = ScenarioRun(scenario, self.net, self.log_dir, since=started, logger=self.logger)
+            try:
+                run.start()
+                run.wait()
+            finally:
+                run.stop()
+        finally:
+            t = time.monotonic()
+            if self.net is not None:
+                self.net.stop()
+            timings['teardown_s'] = time.monotonic() - t
+        timings['total_s'] = time.time() - started
+        results = run.collect(timings)
+        first = run.first_packet()
+        if first is not None:
+            print('Time to first packet: %.2f s after the start of the run' % first)
+        return results, run.failed()
 
 
     def parse_links(self, unparsed_links):
@@ -277,12 +334,13 @@ class ExerciseRunner:
             outfile = '%s/%s-p4runtime-requests.txt' %(self.log_dir, sw_name)
            # print('Elbediiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiwy')
            # print(sw_name)
-            p4runtime_lib.simple_controller.program_switch(
+            return p4runtime_lib.simple_controller.program_switch(
                 addr='127.0.0.1:%d' % grpc_port,
                 device_id=device_id,
                 sw_conf_file=sw_conf_file,
                 workdir=os.getcwd(),
-                proto_dump_fpath=outfile)
+                proto_dump_fpath=outfile,
+                name=sw_name)
 
     def program_switch_cli(self, sw_name, sw_dict):
         """ This method will start up the CLI and use the contents of the
@@ -298,19 +356,73 @@ class ExerciseRunner:
         with open(cli_input_commands, 'r') as fin:
             cli_outfile = '%s/%s_cli_output.log'%(self.log_dir, sw_name)
             with open(cli_outfile, 'w') as fout:
-                subprocess.Popen([cli, '--thrift-port', str(thrift_port)],
-                                 stdin=fin, stdout=fout)
+                return subprocess.Popen([cli, '--thrift-port', str(thrift_port)],
+                                        stdin=fin, stdout=fout)
 
     def program_switches(self):
         """ This method will program each switch using the BMv2 CLI and/or
             P4Runtime, depending if any command or runtime JSON files were
-            provided for the switches.
+            provided for the switches. The switches are programmed in
+            parallel, one P4Runtime worker thread per switch; returns once all
+            of them are programmed, after printing the time each switch spent
+            per phase and the entries that failed.
+
+            Returns {switch name: simple_controller.ProgramReport}. Raises if
+            a switch could not be programmed.
         """
+        cli_procs = {}
+        p4runtime_switches = []
         for sw_name, sw_dict in self.switches.items():
             if 'cli_input' in sw_dict:
-                self.program_switch_cli(sw_name, sw_dict)
+                cli_procs[sw_name] = self.program_switch_cli(sw_name, sw_dict)
             if 'runtime_json' in sw_dict:
-                self.program_switch_p4runtime(sw_name, sw_dict)
+                p4runtime_switches.append((sw_name, sw_dict))
+
+        reports = {}
+        failures = {}
+        if p4runtime_switches:
+            with ThreadPoolExecutor(max_workers=len(p4runtime_switches)) as pool:
+                futures = {pool.submit(self.program_switch_p4runtime, sw_name, sw_dict): sw_name
+                           for sw_name, sw_dict in p4runtime_switches}
+                for future in as_completed(futures):
+                    sw_name = futures[future]
+                    try:
+                        reports[sw_name] = future.result()
+                    except Exception as e:
+                        failures[sw_name] = ['%s: %s' % (type(e).__name__, e)]
+        # the CLI sessions run in parallel too; wait for them instead of sleeping
+        for sw_name, proc in cli_procs.items():
+            if proc.wait() != 0:
+                failures.setdefault(sw_name, []).append(
+                    'simple_switch_CLI exited with %d (see %s/%s_cli_output.log)'
+                    % (proc.returncode, self.log_dir, sw_name))
+
+        self.print_programming_report(reports, failures)
+        failed = sorted(set(failures) | set(n for n, r in reports.items() if not r.ok))
+        if failed:
+            raise Exception('Programming failed on switch(es) %s' % ', '.join(failed))
+        return reports
+
+    def print_programming_report(self, reports, failures):
+        """ Prints the per-phase programming time of every P4Runtime switch
+            (connect and arbitrate, pipeline push, entries) and the errors
+            collected per switch.
+        """
+        phases = p4runtime_lib.simple_controller.ProgramReport.PHASES
+        if reports:
+            print('Switch programming (s): %-8s %s %8s  %s' % (
+                'switch', ' '.join('%8s' % p for p in phases), 'total', 'updates/requests'))
+            for sw_name in sorted(reports):
+                r = reports[sw_name]
+                print('                        %-8s %s %8.3f  %d/%d%s' % (
+                    sw_name,
+                    ' '.join('%8.3f' % r.timings[p] if p in r.timings else '%8s' % '-' for p in phases),
+                    r.total, r.entries, r.requests,
+                    '  (pipeline already installed)' if r.pipeline_kept else ''))
+        for sw_name in sorted(set(failures) | set(reports)):
+            errors = failures.get(sw_name, []) + (reports[sw_name].errors if sw_name in reports else [])
+            for msg in errors:
+                print('  %s: ERROR %s' % (sw_name, msg))
 
     def program_hosts(self):
         """ Execute any commands provided in the topology.json file on each Mininet host
@@ -385,7 +497,14 @@ def get_args():
     parser.add_argument('-j', '--switch_json', type=str, required=False)
     parser.add_argument('-b', '--behavioral-exe', help='Path to behavioral executable',
                                 type=str, required=False, default='simple_switch')
-    return parser.parse_args()
+    parser.add_argument('--headless', help='Run --scenario files instead of the mininet CLI',
+                        action='store_true', required=False, default=False)
+    parser.add_argument('--scenario', help='Scenario json (scenario.py); repeat to run several back-to-back',
+                        action='append', required=False, default=[])
+    args = parser.parse_args()
+    if args.headless and not args.scenario:
+        parser.error('--headless needs at least one --scenario')
+    return args
 
 
 if __name__ == '__main__':
@@ -396,4 +515,34 @@ if __name__ == '__main__':
     exercise = ExerciseRunner(args.topo, args.log_dir, args.pcap_dir,
                               args.switch_json, args.behavioral_exe, args.quiet)
 
-    exercise.run_exercise()
+    if not args.headless:
+        exercise.run_exercise()
+        sys.exit(0)
+
+    # parse every scenario first: a typo should not surface hours into an overnight batch
+    try:
+        scenarios = [Scenario(path) for path in args.scenario]
+    except (OSError, ScenarioError) as e:
+        print('Invalid scenario: %s' % e)
+        sys.exit(2)
+    all_failed = []
+    for i, scenario in enumerate(scenarios, 1):
+        print('=== Scenario %d/%d: %s' % (i, len(scenarios), scenario.name))
+        try:
+            results, failed = exercise.run_headless(scenario)
+        except ScenarioError as e:
+            print('Scenario %s aborted: %s' % (scenario.name, e))
+            all_failed.append(scenario.name)
+            continue
+        except Exception as e:
+            # programming, startup or process errors: the network is torn down by
+            # run_headless, so the rest of the batch still runs (Ctrl-C still stops it)
+            print('Scenario %s failed: %s: %s' % (scenario.name, type(e).__name__, e))
+            traceback.print_exc()
+            all_failed.append(scenario.name)
+            continue
+        print('Results of %s in %s' % (scenario.name, results))
+        if failed:
+            print('  processes exited with an error: %s' % ', '.join(failed))
+            all_failed.append(scenario.name)
+    sys.exit(1 if all_failed else 0)
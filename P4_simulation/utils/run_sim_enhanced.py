@@ -1,6 +1,12 @@
 import os
-from time import sleep
+import time
 
+from readiness import clear_marker, wait_ready
+
+# Raw mode (default): send_enhanced.py --raw (raw_sender.py: frame template + sendmmsg batches).
+# Real send timestamp of every packet, and sustains thousands of pps per flow; takes precedence over FAST_MODE.
+RAW_MODE = True
+RAW_MODE_PPS = 100    # packets per second per flow when RAW_MODE is True
 # High-speed mode: use send_enhanced.py --fast (pre-build + sendpfast). No per-packet timestamps (not for latency analysis).
 # Requires tcpreplay on each host (apt-get install tcpreplay). If receivers get no "P4 is cool" packets, set FAST_MODE = False.
 FAST_MODE = True
@@ -8,6 +14,10 @@ FAST_MODE_PPS = 100   # packets per second per flow when FAST_MODE is True
 # Normal mode: Python+Scapy per-packet loop can only reach ~18–25 pps regardless of --rate/--pps target. Set target to match.
 NORMAL_MODE_PPS = 25  # target pps per flow in normal mode (for latency analysis; actual will be ~18–25)
 
+# Receiver log format: 'text' (per-packet printout, receiver_h_rN.txt) or 'bin' (fixed-width records,
+# receiver_h_rN.bin, read by analyze_wrr_results.py / measure_bandwidth_allocation.py via numpy.memmap)
+RECEIVER_LOG_FORMAT = 'text'
+
 # Q-learning mode: start h3 telemetry_sender, c1 telemetry_receiver. Run qos_runtime.py on host for controller.
 QLEARNING_MODE = True
 
@@ -24,12 +34,24 @@ def sending_function(self):
     """
     h1, h2, h_r1, h_r2 = self.net.get('h1', 'h2', 'h_r1', 'h_r2')
 
-    # Start receivers on all receiver hosts (UDP port 4322 for data traffic)
-    h_r1.cmd('./receive.py --port 4322 > ./outputs/receiver_h_r1.txt &')
-    sleep(0.05)  # Reduced from 0.1 for faster startup
-    h_r2.cmd('./receive.py --port 4322 > ./outputs/receiver_h_r2.txt &')
-    sleep(0.05)
-    sleep(0.5)  # Reduced from 1.0, but still allow receivers to initialize
+    # Start receivers on all receiver hosts (UDP port 4322 for data traffic). Each one writes
+    # ./outputs/ready_h_rN once it captures (readiness.py); the senders start when all have.
+    t0 = time.monotonic()
+    markers = []
+    for i, h_r in enumerate((h_r1, h_r2), start=1):
+        marker = f'./outputs/ready_h_r{i}'
+        clear_marker(marker)
+        markers.append(marker)
+        if RECEIVER_LOG_FORMAT == 'bin':
+            h_r.cmd(f'./receive.py --port 4322 --log-format=bin --log-file=./outputs/receiver_h_r{i}.bin '
+                    f'--flow-id={i} --ready-file={marker} > ./outputs/receiver_h_r{i}.txt &')
+        else:
+            h_r.cmd(f'./receive.py --port 4322 --ready-file={marker} > ./outputs/receiver_h_r{i}.txt &')
+    late = wait_ready(markers)
+    if late:
+        print(f'Receivers not ready after {time.monotonic() - t0:.2f} s: {late} (starting senders anyway)')
+    else:
+        print(f'Receivers ready in {time.monotonic() - t0:.2f} s')
 
     # Send traffic: h1->h_r1, h2->h_r2
     # Each sender sends to its corresponding receiver
@@ -44,35 +66,41 @@ def sending_function(self):
     # When send rate > scheduler rate, queues will build up and WRR weight differences become visible
     # Note: Python time.sleep() has overhead, so actual rate may be lower than theoretical
 
-    # Build send args: normal mode (rate-based, per-packet log) or fast mode (sendpfast, minimal log)
-    if FAST_MODE:
+    # Build send args: raw mode (sendmmsg, real timestamps), fast mode (sendpfast, minimal log) or normal mode (Scapy per packet)
+    # Packets carry (flow_id, seq, tx_ns) stamps that the receivers log (payload_stamp.py), so raw and
+    # normal mode need no sender log lines; fast mode stamps no send time and keeps its theoretical ones.
+    if RAW_MODE:
+        rate_arg = f'--pps={RAW_MODE_PPS} --raw --log-every=0'
+        # Raw mode: real send time of every packet (no Python/Scapy pps ceiling)
+    elif FAST_MODE:
         rate_arg = f'--pps={FAST_MODE_PPS} --fast --log-every=100'
         # Fast mode: writes theoretical timestamps after send (no impact on pps) for latency analysis
     else:
-        rate_arg = f'--pps={NORMAL_MODE_PPS} --log-every=10'
-        # Normal mode: per-packet timestamps for latency analysis; Python loop ceiling ~18–25 pps (use FAST_MODE for high pps)
+        rate_arg = f'--pps={NORMAL_MODE_PPS} --log-every=0'
+        # Normal mode: Python loop ceiling ~18–25 pps (use RAW_MODE for high pps)
 
     # Flow 1 (h1 -> h_r1): AF flow (quantum fixed 6000)
     h1.cmd('./send_enhanced.py --des=10.0.2.1 --num-packets=100000 '
            f'--rank-value=1500 {rate_arg} --duration=30 --flow-id=1 '
            '> ./outputs/sender_h1.txt &')
-    sleep(0.01)
     # Flow 2 (h2 -> h_r2): EF flow (quantum variable [3000,30000])
     h2.cmd('./send_enhanced.py --des=10.0.2.2 --num-packets=100000 '
            f'--rank-value=1500 {rate_arg} --duration=30 --flow-id=2 '
            '> ./outputs/sender_h2.txt &')
-    sleep(0.01)
 
     if QLEARNING_MODE:
         try:
             h3, c1 = self.net.get('h3', 'c1')
             qos_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'program', 'qos')
-            state_file = os.path.join(qos_dir, 'qos_qlearning_state.txt')
-            c1.cmd(f'./telemetry_receiver.py --state-file={state_file} > ./outputs/telemetry_receiver.txt &')
-            sleep(0.2)
+            state_socket = os.path.join(qos_dir, 'qos_telemetry.sock')
+            marker = './outputs/ready_c1'
+            clear_marker(marker)
+            c1.cmd(f'./telemetry_receiver.py --state-socket={state_socket} --ready-file={marker} '
+                   '> ./outputs/telemetry_receiver.txt &')
+            if wait_ready([marker]):
+                print('telemetry_receiver (c1) not ready, starting telemetry_sender anyway')
             # h3: telemetry sender to c1 (10.0.2.3)
             h3.cmd('./telemetry_sender.py --des=10.0.2.3 -r 2 -d 120 > ./outputs/telemetry_sender.txt &')
-            sleep(0.1)
             print('Q-learning mode: telemetry_sender (h3) and telemetry_receiver (c1) started.')
             print('  Run on host: cd P4_simulation/program/qos && python3 qos_runtime.py')
         except Exception as e:
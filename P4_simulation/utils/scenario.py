@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Headless experiment scenarios for run_exercise.py --headless.
+
+A scenario is a JSON file listing the processes of one run. run_exercise.py
+starts the network, programs the switches, starts the processes in order,
+waits until the processes marked "wait" have exited (or "duration" has
+passed), stops whatever is still running, copies the outputs to a results
+directory and stops the network. No Mininet CLI and no hand-edited
+sending_function().
+
+    {
+      "name": "qlearning_raw",
+      "duration": 45,
+      "processes": [
+        {"name": "receiver_h_r1", "host": "h_r1", "ready": "outputs/ready_h_r1",
+         "cmd": "./receive.py --port 4322 --ready-file=outputs/ready_h_r1"},
+        {"name": "sender_h1", "host": "h1", "wait": true,
+         "cmd": "./send_enhanced.py --des=10.0.2.1 --flow-id=1 --raw --duration=30"},
+        {"name": "qos_runtime", "cmd": "python3 qos_runtime.py --grpc-port 50051"}
+      ]
+    }
+
+Scenario keys:
+  name       results subdirectory prefix (default: the file name)
+  duration   upper bound in seconds on the run after the first process started
+             (default: none; then at least one process needs "wait")
+  linger     seconds to keep the other processes (receivers) running after the
+             last "wait" process exited (default: 1)
+  grace      seconds between SIGINT and SIGKILL at teardown (default: 5); SIGINT
+             lets the scripts run their KeyboardInterrupt/finally paths
+             (qos_runtime.py saves its checkpoint, receive.py flushes its log)
+  outputs    directory the process logs go to (default: outputs)
+  results    results root; every run is copied to <results>/<name>-<time>/
+             (default: results)
+  cwd        working directory of the processes (default: the current one)
+  ready_timeout
+             seconds to wait for a "ready" marker (default: 10)
+
+Process keys:
+  name       unique; stdout and stderr go to <outputs>/<name>.txt
+  cmd        shell command
+  host       Mininet host to run it on; omitted = the host OS (controllers
+             talking to the switches' gRPC/Thrift ports)
+  after      seconds to wait after starting the previous process (default: 0)
+  ready      readiness marker the process writes (readiness.py, receive.py
+             --ready-file): removed before the start, and the next process
+             only starts once it says ready
+  wait       the run ends when all "wait" processes have exited (default: false)
+
+Relative paths are relative to cwd. The results directory gets the outputs
+and switch logs written during the run, the scenario file and summary.json
+(per-process start/exit/ready times and exit codes, phase timings and
+first_packet_s: the time from the start of the run, network startup
+included, to the first packet any "ready" process received).
+"""
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import time
+
+from readiness import DEFAULT_READY_TIMEOUT, clear_marker, read_marker, wait_ready
+
+DEFAULT_LINGER = 1.0
+DEFAULT_GRACE = 5.0
+POLL_INTERVAL = 0.1
+
+
+class ScenarioError(Exception):
+    pass
+
+
+class ProcessSpec:
+    """One process of a scenario."""
+
+    def __init__(self, spec, index):
+        if not isinstance(spec, dict) or "cmd" not in spec:
+            raise ScenarioError(f"process {index}: expected an object with a 'cmd'")
+        self.name = str(spec.get("name", f"process{index}"))
+        self.cmd = spec["cmd"]
+        self.host = spec.get("host")
+        self.after = float(spec.get("after", 0))
+        self.wait = bool(spec.get("wait", False))
+        self.ready = spec.get("ready")
+        unknown = set(spec) - {"name", "cmd", "host", "after", "wait", "ready"}
+        if unknown:
+            raise ScenarioError(f"process {self.name}: unknown keys {sorted(unknown)}")
+
+
+class Scenario:
+    """A parsed scenario file."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(path) as f:
+            try:
+                spec = json.load(f)
+            except ValueError as e:
+                raise ScenarioError(f"{path}: {e}")
+        self.name = spec.get("name", os.path.splitext(os.path.basename(path))[0])
+        self.duration = spec.get("duration")
+        self.linger = float(spec.get("linger", DEFAULT_LINGER))
+        self.grace = float(spec.get("grace", DEFAULT_GRACE))
+        self.cwd = os.path.abspath(spec.get("cwd", os.getcwd()))
+        self.outputs = os.path.join(self.cwd, spec.get("outputs", "outputs"))
+        self.results = os.path.join(self.cwd, spec.get("results", "results"))
+        self.ready_timeout = float(spec.get("ready_timeout", DEFAULT_READY_TIMEOUT))
+        self.processes = [ProcessSpec(p, i) for i, p in enumerate(spec.get("processes", []))]
+
+        names = [p.name for p in self.processes]
+        if not names:
+            raise ScenarioError(f"{path}: no processes")
+        if len(set(names)) != len(names):
+            raise ScenarioError(f"{path}: process names must be unique")
+        if self.duration is None and not any(p.wait for p in self.processes):
+            raise ScenarioError(f"{path}: give a duration or mark at least one process \"wait\"")
+
+    def check_hosts(self, net):
+        """Raise ScenarioError if a process names a host that is not in the network."""
+        known = {h.name for h in net.hosts}
+        missing = sorted({p.host for p in self.processes if p.host is not None} - known)
+        if missing:
+            raise ScenarioError(f"{self.path}: unknown hosts {missing} (topology has {sorted(known)})")
+
+
+class RunningProcess:
+    def __init__(self, spec, popen, log, started):
+        self.spec = spec
+        self.popen = popen
+        self.log = log
+        self.started = started
+        self.exited = None
+        self.stopped = False
+        self.ready = None  # seconds after the run start the marker said ready
+
+    def poll(self, now):
+        if self.exited is None and self.popen.poll() is not None:
+            self.exited = now
+            self.log.close()
+        return self.exited is not None
+
+    def signal(self, sig):
+        # every process leads its own process group (mnexec -d / start_new_session): reach its children too
+        try:
+            os.killpg(self.popen.pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+class ScenarioRun:
+    """Start, wait for, stop and collect the processes of a scenario on a started network."""
+
+    def __init__(self, scenario, net, log_dir, since=None, logger=print):
+        self.scenario = scenario
+        self.net = net
+        self.log_dir = log_dir
+        self.logger = logger
+        self.running = []
+        self.t0 = time.monotonic()
+        # files in the outputs and log directories modified after this (time.time()) belong to the run
+        self.wall_start = time.time() if since is None else since
+        self.timings = {}
+
+    def _elapsed(self):
+        return time.monotonic() - self.t0
+
+    def _popen(self, spec, log):
+        kwargs = dict(stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, cwd=self.scenario.cwd)
+        if spec.host is None:
+            return subprocess.Popen(spec.cmd, shell=True, start_new_session=True, **kwargs)
+        # Node.popen runs the command in the host's namespaces through mnexec -da (new session)
+        return self.net.get(spec.host).popen(spec.cmd, shell=True, **kwargs)
+
+    def start(self):
+        os.makedirs(self.scenario.outputs, exist_ok=True)
+        self.t0 = time.monotonic()
+        for spec in self.scenario.processes:
+            if spec.after > 0:
+                time.sleep(spec.after)
+            if spec.ready:
+                clear_marker(self._marker(spec))
+            log = open(os.path.join(self.scenario.outputs, f"{spec.name}.txt"), "w")
+            try:
+                popen = self._popen(spec, log)
+            except Exception:
+                log.close()
+                raise
+            proc = RunningProcess(spec, popen, log, self._elapsed())
+            self.running.append(proc)
+            self.logger(f"[{self._elapsed():7.2f}s] started {spec.name} on {spec.host or 'host OS'} "
+                        f"(pid {popen.pid}): {spec.cmd}")
+            if spec.ready:
+                if wait_ready([self._marker(spec)], self.scenario.ready_timeout):
+                    self.logger(f"[{self._elapsed():7.2f}s] {spec.name} not ready after "
+                                f"{self.scenario.ready_timeout} s, going on")
+                else:
+                    proc.ready = self._elapsed()
+                    self.logger(f"[{proc.ready:7.2f}s] {spec.name} ready")
+        self.timings["launch_s"] = self._elapsed()
+
+    def _marker(self, spec):
+        return os.path.join(self.scenario.cwd, spec.ready)
+
+    def first_packet(self):
+        """Seconds from the run start (self.wall_start) to the first packet a
+        "ready" process received, or None."""
+        firsts = [read_marker(self._marker(p.spec)).get("first") for p in self.running if p.spec.ready]
+        firsts = [t for t in firsts if t is not None]
+        return min(firsts) - self.wall_start if firsts else None
+
+    def wait(self):
+        """Until every "wait" process has exited (then linger) or the duration is over."""
+        duration = self.scenario.duration
+        waited = [p for p in self.running if p.spec.wait]
+        while True:
+            now = self._elapsed()
+            for p in self.running:
+                if p.exited is None and p.poll(now):
+                    self.logger(f"[{now:7.2f}s] {p.spec.name} exited with {p.popen.returncode}")
+            if duration is not None and now >= duration:
+                self.logger(f"[{now:7.2f}s] duration of {duration} s reached")
+                break
+            if waited and all(p.exited is not None for p in waited):
+                linger = self.scenario.linger
+                if duration is not None:
+                    linger = min(linger, max(0.0, duration - now))
+                time.sleep(linger)
+                break
+            time.sleep(POLL_INTERVAL)
+        self.timings["run_s"] = self._elapsed() - self.timings["launch_s"]
+
+    def stop(self):
+        """SIGINT everything still running, SIGKILL what is left after the grace period."""
+        t = self._elapsed()
+        alive = [p for p in self.running if not p.poll(self._elapsed())]
+        for p in alive:
+            p.stopped = True
+            p.signal(signal.SIGINT)
+        deadline = time.monotonic() + self.scenario.grace
+        while alive and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            alive = [p for p in alive if not p.poll(self._elapsed())]
+        for p in alive:
+            self.logger(f"{p.spec.name} still running {self.scenario.grace} s after SIGINT, killing it")
+            p.signal(signal.SIGKILL)
+            p.popen.wait()
+            p.poll(self._elapsed())
+        self.timings["stop_s"] = self._elapsed() - t
+
+    def collect(self, extra_timings=None):
+        """Copy the outputs and switch logs written during the run, the scenario and
+        summary.json into a new results directory. Returns its path."""
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.wall_start))
+        dest = os.path.join(self.scenario.results, f"{self.scenario.name}-{stamp}")
+        n = 1
+        while os.path.exists(dest):
+            n += 1
+            dest = os.path.join(self.scenario.results, f"{self.scenario.name}-{stamp}-{n}")
+        for src_dir, sub in ((self.scenario.outputs, "outputs"), (self.log_dir, "logs")):
+            copy_newer(src_dir, os.path.join(dest, sub), self.wall_start)
+        os.makedirs(dest, exist_ok=True)
+        shutil.copy2(self.scenario.path, os.path.join(dest, "scenario.json"))
+
+        timings = dict(extra_timings or {})
+        timings.update(self.timings)
+        first = self.first_packet()
+        if first is not None:
+            timings["first_packet_s"] = first
+        summary = {
+            "name": self.scenario.name,
+            "scenario": self.scenario.path,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.wall_start)),
+            "timings": {k: round(v, 3) for k, v in timings.items()},
+            "processes": [{
+                "name": p.spec.name,
+                "host": p.spec.host,
+                "cmd": p.spec.cmd,
+                "started_s": round(p.started, 3),
+                "ready_s": None if p.ready is None else round(p.ready, 3),
+                "exited_s": None if p.exited is None else round(p.exited, 3),
+                "returncode": p.popen.returncode,
+                "stopped": p.stopped,
+            } for p in self.running],
+        }
+        with open(os.path.join(dest, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return dest
+
+    def failed(self):
+        """Names of the "wait" processes that exited with a non-zero code."""
+        return [p.spec.name for p in self.running
+                if p.spec.wait and not p.stopped and p.popen.returncode not in (0, None)]
+
+
+def copy_newer(src_dir, dest_dir, since):
+    """Copy the files directly in src_dir modified at or after `since` (time.time())."""
+    if not os.path.isdir(src_dir):
+        return
+    for entry in os.scandir(src_dir):
+        if entry.is_file() and entry.stat().st_mtime >= since:
+            os.makedirs(dest_dir, exist_ok=True)
+            shutil.copy2(entry.path, os.path.join(dest_dir, entry.name))
@@ -0,0 +1,51 @@
+"""
+Offline discrete-event simulator for the BMv2 user-extern schedulers.
+
+Runs the workload/flow_*.txt rank files through Python models of the WRR, DRR,
+WDRR, PIEO, DR-PIFO, pFabric and PIFO externs and writes sender/receiver logs
+in the Mininet formats, so a policy can be tried without rebuilding BMv2.
+
+    cd P4_simulation/utils
+    python3 -m sched_sim --policy wrr --num-flows 2 --outputs /tmp/sim_out
+    python3 tools/analyze_wrr_results.py /tmp/sim_out --num-flows 2
+"""
+
+from .engine import DEFAULT_INTERVAL, SimResult, default_workload_dir, load_workload, simulate
+from .pifo_core import CalendarPIFO, HeapPIFO, LinkedListPIFO, make_pifo, rank_range
+from .schedulers import (
+    SCHEDULERS,
+    DRPIFOScheduler,
+    DRRScheduler,
+    Packet,
+    PFabricScheduler,
+    PIEOScheduler,
+    PIFOScheduler,
+    Scheduler,
+    WDRRScheduler,
+    WRRScheduler,
+    make_scheduler,
+)
+
+__all__ = [
+    "DEFAULT_INTERVAL",
+    "SimResult",
+    "default_workload_dir",
+    "load_workload",
+    "simulate",
+    "CalendarPIFO",
+    "HeapPIFO",
+    "LinkedListPIFO",
+    "make_pifo",
+    "rank_range",
+    "SCHEDULERS",
+    "DRPIFOScheduler",
+    "DRRScheduler",
+    "Packet",
+    "PFabricScheduler",
+    "PIEOScheduler",
+    "PIFOScheduler",
+    "Scheduler",
+    "WDRRScheduler",
+    "WRRScheduler",
+    "make_scheduler",
+]
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Simulate one scheduler policy on the workload rank files and write Mininet-style logs.
+
+Usage (from P4_simulation/utils):
+    python3 -m sched_sim --policy wrr --num-flows 2 --outputs /tmp/sim_out
+    python3 -m sched_sim --policy wdrr --quantums 7500,3000,4500 --rate 0.0005 --outputs /tmp/sim_out
+    python3 -m sched_sim --policy dr_pifo --use-updated-rank --error-correction --outputs /tmp/sim_out
+    python3 -m sched_sim --policy all --num-flows 3          # summary of every policy, no logs
+
+Then analyze the logs exactly like a Mininet run:
+    python3 tools/analyze_wrr_results.py /tmp/sim_out --num-flows 2
+"""
+
+import argparse
+import sys
+import time
+
+from .engine import DEFAULT_INTERVAL, default_workload_dir, flow_offsets, load_workload, simulate
+from .logs import write_logs
+from .pifo_core import rank_range
+from .schedulers import SCHEDULERS, make_scheduler
+
+
+def parse_quantums(text):
+    if not text:
+        return None
+    return [int(q) for q in text.split(",")]
+
+
+def print_summary(result, wall_s):
+    total_sent = sum(len(s) for s in result.sends)
+    print(f"\n{result.policy}: {total_sent} packets sent, {result.polls} scheduler polls, "
+          f"simulated in {wall_s:.2f} s", flush=True)
+    print(f"  {'Flow':<6}{'Sent':>8}{'Received':>10}{'Dropped':>9}{'Share':>9}{'Mean latency':>15}")
+    for s in result.summary():
+        lat = f"{s['mean_latency_ms']:.2f} ms" if s['mean_latency_ms'] is not None else "-"
+        print(f"  {s['flow']:<6}{s['sent']:>8}{s['received']:>10}{s['dropped']:>9}"
+              f"{s['share']:>8.1f}%{lat:>15}")
+    if result.stranded:
+        print(f"  Warning: {result.stranded} packets never served (rank above the reachable quota)")
+
+
+def fs_rank_range(flows, pifo_core):
+    """Calendar queue range for --pifo-core (None = binary heap)."""
+    if pifo_core == "heap":
+        return None
+    ranks = [r for ranks in flows for r in ranks]
+    found = rank_range(ranks)
+    if found is None and pifo_core == "calendar":
+        raise ValueError("--pifo-core calendar: workload ranks do not fit a bounded integer range")
+    return found
+
+
+def run_policy(policy, flows, args, start_time):
+    quantums = parse_quantums(args.quantums)
+    if args.policy == "all" and policy not in ("wrr", "drr", "wdrr"):
+        quantums = None
+    scheduler = make_scheduler(policy, len(flows), quantums,
+                               args.use_updated_rank, args.error_correction,
+                               fs_rank_range(flows, args.pifo_core))
+    t0 = time.perf_counter()
+    result = simulate(scheduler, flows, start_time, interval=args.rate,
+                      offsets=flow_offsets(len(flows), args.stagger),
+                      duration=args.duration, max_packets=args.num_packets,
+                      delay=args.delay, buffer=args.buffer, service_time=args.service_time)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline discrete-event simulator for the scheduler externs")
+    parser.add_argument("--policy", default="wrr", choices=sorted(SCHEDULERS) + ["all"],
+                        help="Scheduler model (default: wrr); 'all' prints a summary of every policy")
+    parser.add_argument("--workload-dir", default=str(default_workload_dir()),
+                        help="Directory with flow_1.txt, flow_2.txt, ... (default: program/qos/workload)")
+    parser.add_argument("--num-flows", type=int, default=None,
+                        help="Use the first N workload files (default: all)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_INTERVAL,
+                        help="Seconds between packets of one flow, like send_enhanced.py --rate (default: 0.01)")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Stop sending after this many seconds (default: until the workload ends)")
+    parser.add_argument("--num-packets", type=int, default=None,
+                        help="Maximum packets per flow (default: whole workload file)")
+    parser.add_argument("--stagger", type=float, default=0.0,
+                        help="Start flow N this many seconds after flow N-1 (default: 0)")
+    parser.add_argument("--quantums", type=str, default=None,
+                        help="Comma-separated quantums for wrr/drr/wdrr (default: the extern's)")
+    parser.add_argument("--use-updated-rank", action="store_true",
+                        help="Feed each enqueued rank as the flow's updated rank (PIFO family)")
+    parser.add_argument("--error-correction", action="store_true",
+                        help="dr_pifo: enable error correction (internal force dequeue)")
+    parser.add_argument("--pifo-core", choices=("auto", "heap", "calendar"), default="auto",
+                        help="FS structure of the PIFO-family models: calendar queue when the workload "
+                             "ranks fit a bounded integer range, else binary heap (default: auto)")
+    parser.add_argument("--service-time", type=float, default=None,
+                        help="Seconds per dequeue poll (default: the extern's sleep, e.g. 0.01 for wrr)")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="One-way host-to-switch and switch-to-host delay in seconds (default: 0)")
+    parser.add_argument("--buffer", type=int, default=None,
+                        help="Queue capacity in packets, tail drop beyond it (default: unlimited)")
+    parser.add_argument("--start-time", type=float, default=None,
+                        help="Epoch time of the first send (default: now)")
+    parser.add_argument("--outputs", type=str, default=None,
+                        help="Write sender_hN.txt / receiver_h_rN.{txt,bin} here (default: summary only)")
+    parser.add_argument("--log-every", type=int, default=1,
+                        help="Sender log: one line every N packets, like send_enhanced.py (default: 1)")
+    parser.add_argument("--log-format", choices=("text", "bin"), default="text",
+                        help="Receiver log format, as receive.py --log-format (default: text)")
+    args = parser.parse_args()
+
+    try:
+        flows = load_workload(args.workload_dir, args.num_flows)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    start_time = args.start_time if args.start_time is not None else time.time()
+    print(f"Workload: {len(flows)} flows from {args.workload_dir} "
+          f"({', '.join(str(len(r)) for r in flows)} ranks), one packet every {args.rate} s per flow")
+
+    policies = sorted(SCHEDULERS) if args.policy == "all" else [args.policy]
+    if args.policy == "all" and args.outputs:
+        print("Error: --outputs needs a single --policy", file=sys.stderr)
+        sys.exit(1)
+    for policy in policies:
+        try:
+            result, wall_s = run_policy(policy, flows, args, start_time)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print_summary(result, wall_s)
+
+    if args.outputs:
+        paths = write_logs(result, flows, args.outputs, start_time, args.rate,
+                           args.log_every, args.log_format)
+        print(f"\nLogs written to {args.outputs}:")
+        for sender, receiver in paths:
+            print(f"  {sender}  {receiver}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Discrete-event engine: constant-rate senders feeding one scheduler model.
+
+Time model (mirrors the extern's dequeue thread):
+  - flow i sends packet k (k = 0, 1, ...) at start_time + offset_i + k * interval,
+    with the rank taken from line k of its workload file
+  - packets reach the scheduler after `delay` seconds
+  - the scheduler is polled every service_time seconds, starting at the first
+    enqueue (the extern's clock starts there); each poll dequeues at most one
+    packet, which is received `delay` seconds later
+  - with a finite `buffer`, arrivals that find `buffer` packets queued are dropped
+"""
+
+import heapq
+import math
+from pathlib import Path
+
+from .schedulers import Packet
+
+# Same default as run_sim_enhanced.py FAST_MODE_PPS (100 pps per flow)
+DEFAULT_INTERVAL = 0.01
+
+
+def default_workload_dir():
+    """P4_simulation/program/qos/workload next to this utils tree."""
+    utils_dir = Path(__file__).resolve().parent.parent
+    return utils_dir.parent / "program" / "qos" / "workload"
+
+
+def load_workload(workload_dir, num_flows=None):
+    """Rank lists of workload/flow_1.txt, flow_2.txt, ... (same format send_enhanced.py -h reads)."""
+    workload_dir = Path(workload_dir)
+    files = sorted(workload_dir.glob("flow_*.txt"), key=lambda p: int(p.stem.split("_")[1]))
+    if num_flows is not None:
+        files = files[:num_flows]
+    if not files or (num_flows is not None and len(files) < num_flows):
+        raise FileNotFoundError(f"{workload_dir}: expected {num_flows or 'some'} flow_N.txt files, found {len(files)}")
+    flows = []
+    for path in files:
+        with open(path, "r") as f:
+            flows.append([int(line.strip()) for line in f if line.strip()])
+    return flows
+
+
+class SimResult:
+    """Per-flow send/receive timestamps and counters of one run.
+
+    sends[i]: send timestamps of flow i (seq k+1 at index k)
+    recvs[i]: (recv_time, seq, rank) of flow i in receive order
+    """
+
+    def __init__(self, policy, num_flows):
+        self.policy = policy
+        self.sends = [[] for _ in range(num_flows)]
+        self.recvs = [[] for _ in range(num_flows)]
+        self.drops = [0] * num_flows
+        self.stranded = 0  # packets left queued that the policy could never serve
+        self.polls = 0
+        self.end_time = None
+
+    def summary(self):
+        """Per-flow dict: sent, received, dropped, mean latency (ms), throughput share (%)."""
+        total_recv = sum(len(r) for r in self.recvs) or 1
+        out = []
+        for i in range(len(self.sends)):
+            sends, recvs = self.sends[i], self.recvs[i]
+            lat = [(t - sends[seq - 1]) * 1000 for t, seq, _ in recvs]
+            out.append({
+                "flow": i + 1,
+                "sent": len(sends),
+                "received": len(recvs),
+                "dropped": self.drops[i],
+                "mean_latency_ms": sum(lat) / len(lat) if lat else None,
+                "share": 100.0 * len(recvs) / total_recv,
+            })
+        return out
+
+
+def _arrivals(flows, start_time, interval, offsets, duration, max_packets):
+    """Merged (time, flow_id, seq, rank) stream of all senders, in time order."""
+    def one_flow(i, ranks):
+        t0 = start_time + offsets[i]
+        for k, rank in enumerate(ranks):
+            if max_packets is not None and k >= max_packets:
+                return
+            t = t0 + k * interval
+            if duration is not None and t - start_time >= duration:
+                return
+            yield t, i, k + 1, rank
+    return heapq.merge(*(one_flow(i, ranks) for i, ranks in enumerate(flows)))
+
+
+def simulate(scheduler, flows, start_time, interval=DEFAULT_INTERVAL, offsets=None,
+             duration=None, max_packets=None, delay=0.0, buffer=None, service_time=None):
+    """Run `flows` (rank lists) through `scheduler`; returns a SimResult."""
+    num_flows = len(flows)
+    if scheduler.num_flows != num_flows:
+        raise ValueError(f"scheduler built for {scheduler.num_flows} flows, workload has {num_flows}")
+    offsets = offsets or [0.0] * num_flows
+    service_time = service_time or scheduler.service_time
+    result = SimResult(scheduler.name, num_flows)
+
+    arrivals = _arrivals(flows, start_time, interval, offsets, duration, max_packets)
+    nxt = next(arrivals, None)
+    if nxt is None:
+        return result
+    clock_start = nxt[0] + delay
+    poll = 1  # polls happen at clock_start + poll * service_time
+    order = 0
+    misses = 0
+
+    while True:
+        now = clock_start + poll * service_time
+        # enqueue everything that reached the switch by this poll
+        while nxt is not None and nxt[0] + delay <= now:
+            t, flow_id, seq, rank = nxt
+            result.sends[flow_id].append(t)
+            if buffer is not None and scheduler.backlog >= buffer:
+                result.drops[flow_id] += 1
+            else:
+                order += 1
+                scheduler.enqueue(Packet(flow_id, seq, rank, t + delay, order))
+                misses = 0
+            nxt = next(arrivals, None)
+
+        if scheduler.backlog == 0:
+            if nxt is None:
+                break
+            # fast-forward the idle polls up to the next arrival
+            skip = max(0, math.ceil((nxt[0] + delay - now) / service_time))
+            scheduler.idle(skip)
+            result.polls += skip
+            poll += max(skip, 1)
+            continue
+
+        pkt = scheduler.dequeue()
+        result.polls += 1
+        poll += 1
+        if pkt is not None:
+            result.recvs[pkt.flow_id].append((now + delay, pkt.seq, pkt.rank))
+            misses = 0
+            continue
+        misses += 1
+        if nxt is None and misses > num_flows + 1:
+            # no arrivals left and the policy keeps refusing the queued packets
+            # (e.g. a rank above what the quota can ever reach)
+            result.stranded = scheduler.backlog
+            break
+
+    result.end_time = clock_start + poll * service_time + delay
+    return result
+
+
+def flow_offsets(num_flows, stagger):
+    """Start offsets 0, stagger, 2*stagger, ... (senders started one after another)."""
+    return [i * stagger for i in range(num_flows)]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Write a SimResult in the formats of the Mininet run (program/qos/outputs), so
+analyze_wrr_results.py and measure_bandwidth_allocation.py read it unchanged:
+  sender_h<N>.txt      send_enhanced.py output ("This host has sent ... until now : <ts>")
+  receiver_h_r<N>.txt  receive.py text blocks, or
+  receiver_h_r<N>.bin  receive.py --log-format=bin records (recv_log.py)
+Received packets carry the payload stamp of the senders (payload_stamp.py):
+their seq and send time from SimResult.sends.
+"""
+
+import os
+import sys
+
+_utils_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from payload_stamp import PAYLOAD_MARKER, format_stamp
+from recv_log import RecvLogWriter
+
+PAYLOAD = PAYLOAD_MARKER.decode()
+DATA_PORT = 4322
+SPORT = 1234
+
+
+def write_sender_log(path, flow_number, sends, ranks, interval, log_every=1):
+    """send_enhanced.py-style log of one flow (flow_number is 1-based)."""
+    with open(path, "w") as f:
+        f.write(f"Flow {flow_number}: Starting to send traffic to 10.0.2.{flow_number}\n")
+        f.write(f"  Rank value: {ranks[0] if ranks else 0} (from workload)\n")
+        for n, t in enumerate(sends, 1):
+            if log_every > 0 and (n == 1 or n % log_every == 0):
+                f.write(f"This host has sent {n} packets until now : {t}\n")
+        f.write(f"\nFlow {flow_number}: Sending completed\n")
+        f.write(f"  Total packets: {len(sends)}\n")
+        if len(sends) > 1:
+            elapsed = sends[-1] - sends[0] + interval
+            f.write(f"  Total time: {elapsed:.2f} seconds\n")
+            f.write(f"  Average rate: {len(sends) / elapsed:.2f} packets/sec\n")
+
+
+def write_receiver_text(path, flow_number, recvs, sends, start_time):
+    """receive.py text blocks, one per received packet."""
+    with open(path, "w") as f:
+        f.write(f"sniffing on eth0 for UDP port {DATA_PORT}\n")
+        f.write(f"the simulation started at time: {start_time}\n")
+        for recv_ts, seq, rank in recvs:
+            f.write("got a packet\n")
+            f.write(f"packet is received at time : {recv_ts}\n")
+            f.write(f"  id={rank & 0xffff} sport={SPORT} dport={DATA_PORT}\n")
+            f.write(format_stamp((flow_number, seq, round(sends[seq - 1] * 1e9))) + "\n")
+            f.write(f"  load = '{PAYLOAD}'\n")
+            f.write("---\n")
+
+
+def write_receiver_bin(path, flow_number, recvs, sends):
+    """receive.py --log-format=bin records (stamped seq and send time, ip_id = rank, no MRI)."""
+    if os.path.exists(path):
+        os.remove(path)  # RecvLogWriter appends
+    writer = RecvLogWriter(path, flow_id=flow_number, flush_interval=float("inf"))
+    try:
+        for recv_ts, seq, rank in recvs:
+            writer.append(recv_ts, seq, rank & 0xffff, tx_ns=round(sends[seq - 1] * 1e9))
+    finally:
+        writer.close()
+
+
+def write_logs(result, flows, outputs_dir, start_time, interval, log_every=1, log_format="text"):
+    """Write sender_h<N>.txt and receiver_h_r<N>.{txt,bin} for every flow; returns the paths."""
+    os.makedirs(outputs_dir, exist_ok=True)
+    paths = []
+    for i, ranks in enumerate(flows):
+        n = i + 1
+        sender = os.path.join(outputs_dir, f"sender_h{n}.txt")
+        write_sender_log(sender, n, result.sends[i], ranks, interval, log_every)
+        txt = os.path.join(outputs_dir, f"receiver_h_r{n}.txt")
+        binp = os.path.join(outputs_dir, f"receiver_h_r{n}.bin")
+        if log_format == "bin":
+            write_receiver_bin(binp, n, result.recvs[i], result.sends[i])
+            with open(txt, "w") as f:
+                f.write(f"sniffing on eth0 for UDP port {DATA_PORT}\n")
+                f.write(f"writing binary records to {binp}\n")
+            receiver = binp
+        else:
+            # a stale .bin would shadow the new text log (find_receiver_log prefers .bin)
+            if os.path.exists(binp):
+                os.remove(binp)
+            write_receiver_text(txt, n, result.recvs[i], result.sends[i], start_time)
+            receiver = txt
+        paths.append((sender, receiver))
+    return paths
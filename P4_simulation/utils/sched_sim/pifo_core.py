@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+PIFO cores for the flow scheduler (FS) of the PIFO-family models.
+
+The C++ externs (DR_PIFO.h, pieo.h, pifo.h, pFabric.h) keep the FS as a
+shared_ptr linked list: enqueue_FS() walks past every entry with a lower rank
+(or equal rank and earlier arrival_time), and force_dequeue_FS() walks to the
+first entry of a flow. The cores below keep that order with
+    push(rank, arrival, flow_id, item)   insert
+    pop()                                remove the head (lowest rank, then arrival)
+    pop_flow(flow_id)                    force dequeue: remove flow_id's first entry
+    peek(), len(), flow_len(flow_id)
+
+    HeapPIFO          binary heap, any comparable rank                   O(log n)
+    CalendarPIFO      buckets over a bounded integer rank range, with    O(1) per bucket op
+                      a heap for ranks outside the range
+    LinkedListPIFO    line-by-line port of the C++ FS list (reference)   O(n)
+    LinkedListFIFOBank  port of the C++ FB (per-flow chains, tail walk)  O(n)
+
+The extern's arrival_time is the packet pointer (a per-switch counter), so no
+two entries have the same (rank, arrival) and all cores agree on the order.
+Both also keep a heap per flow (O(log k) for a flow with k entries) so that
+pop_flow() does not search. A force-dequeued entry is only marked dead and skipped when it reaches the top
+of the heap or bucket; the heap is compacted when dead entries outnumber live
+ones, and a bucket is dropped once it has no live entry.
+"""
+
+import heapq
+from collections import deque
+from math import gcd
+
+# CalendarPIFO is only used when the rank range needs at most this many buckets
+CALENDAR_MAX_BUCKETS = 1 << 16
+
+# entry layout: [rank, arrival, seq, flow_id, item, alive, bucket]
+_RANK, _ARRIVAL, _SEQ, _FLOW, _ITEM, _ALIVE, _BUCKET = range(7)
+_OVERFLOW = -1
+
+
+class _PIFOBase:
+    """Entry bookkeeping and per-flow heaps shared by HeapPIFO and CalendarPIFO."""
+
+    def __init__(self):
+        self._flows = {}  # flow_id -> heap of that flow's live entries
+        self._seq = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def flow_len(self, flow_id):
+        """Live entries of flow_id (the C++ cores search the FS list for this)."""
+        return len(self._flows.get(flow_id, ()))
+
+    def _new_entry(self, rank, arrival, flow_id, item, bucket):
+        self._seq += 1
+        entry = [rank, arrival, self._seq, flow_id, item, True, bucket]
+        heapq.heappush(self._flows.setdefault(flow_id, []), entry)
+        self._len += 1
+        return entry
+
+    def _forget_head(self, entry):
+        """entry was popped as the overall head, so it is also its flow's head."""
+        heap = self._flows[entry[_FLOW]]
+        heapq.heappop(heap)
+        if not heap:
+            del self._flows[entry[_FLOW]]
+        self._len -= 1
+
+    def _take_flow_head(self, flow_id):
+        """Pop flow_id's first entry from its flow heap and mark it dead."""
+        heap = self._flows.get(flow_id)
+        if not heap:
+            return None
+        entry = heapq.heappop(heap)
+        if not heap:
+            del self._flows[flow_id]
+        entry[_ALIVE] = False
+        self._len -= 1
+        return entry
+
+    def peek(self):
+        entry = self._head()
+        return entry[_ITEM] if entry is not None else None
+
+    def pop(self):
+        """Remove and return the head item (None if empty)."""
+        entry = self._pop_head()
+        if entry is None:
+            return None
+        self._forget_head(entry)
+        return entry[_ITEM]
+
+    def pop_flow(self, flow_id):
+        """Remove and return flow_id's first item in FS order (None if the flow has none)."""
+        entry = self._take_flow_head(flow_id)
+        if entry is None:
+            return None
+        self._discard(entry)
+        return entry[_ITEM]
+
+
+class HeapPIFO(_PIFOBase):
+    """PIFO on a binary heap ordered by (rank, arrival)."""
+
+    def __init__(self):
+        super().__init__()
+        self._heap = []
+        self._dead = 0
+
+    def push(self, rank, arrival, flow_id, item):
+        heapq.heappush(self._heap, self._new_entry(rank, arrival, flow_id, item, _OVERFLOW))
+
+    def _head(self):
+        heap = self._heap
+        while heap and not heap[0][_ALIVE]:
+            heapq.heappop(heap)
+            self._dead -= 1
+        return heap[0] if heap else None
+
+    def _pop_head(self):
+        return heapq.heappop(self._heap) if self._head() is not None else None
+
+    def _discard(self, entry):
+        self._dead += 1
+        if self._dead > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[_ALIVE]]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+
+class _Bucket:
+    """Entries of one calendar bucket: a FIFO for in-order pushes, a heap for the rest."""
+
+    __slots__ = ("fifo", "side", "live")
+
+    def __init__(self):
+        self.fifo = deque()
+        self.side = []
+        self.live = 0
+
+    def head(self):
+        fifo, side = self.fifo, self.side
+        while fifo and not fifo[0][_ALIVE]:
+            fifo.popleft()
+        while side and not side[0][_ALIVE]:
+            heapq.heappop(side)
+        if not side:
+            return fifo[0] if fifo else None
+        if not fifo or side[0] < fifo[0]:
+            return side[0]
+        return fifo[0]
+
+
+class CalendarPIFO(_PIFOBase):
+    """PIFO over integer ranks in [min_rank, max_rank], one bucket per `granularity`
+    ranks. Ranks outside the range (or not integers) go to an overflow heap.
+
+    Pushes whose (rank, arrival) is not below the bucket's last entry are a deque
+    append; the lowest non-empty bucket is found by a cursor that only moves back
+    on a push below it.
+    """
+
+    def __init__(self, min_rank, max_rank, granularity=1):
+        super().__init__()
+        if granularity < 1 or max_rank < min_rank:
+            raise ValueError(f"bad calendar range {min_rank}..{max_rank} step {granularity}")
+        self.min_rank = min_rank
+        self.max_rank = max_rank
+        self.granularity = granularity
+        self._buckets = [None] * ((max_rank - min_rank) // granularity + 1)
+        self._low = len(self._buckets)  # no bucket below this one holds a live entry
+        self._overflow = HeapPIFO()
+
+    def _bucket_index(self, rank):
+        if isinstance(rank, int) and self.min_rank <= rank <= self.max_rank:
+            return (rank - self.min_rank) // self.granularity
+        return _OVERFLOW
+
+    def push(self, rank, arrival, flow_id, item):
+        b = self._bucket_index(rank)
+        entry = self._new_entry(rank, arrival, flow_id, item, b)
+        if b == _OVERFLOW:
+            heapq.heappush(self._overflow._heap, entry)
+            return
+        bucket = self._buckets[b]
+        if bucket is None:
+            bucket = self._buckets[b] = _Bucket()
+        fifo = bucket.fifo
+        if not fifo or fifo[-1] < entry:
+            fifo.append(entry)
+        else:
+            heapq.heappush(bucket.side, entry)
+        bucket.live += 1
+        if b < self._low:
+            self._low = b
+
+    def _calendar_head(self):
+        buckets = self._buckets
+        low = self._low
+        while low < len(buckets) and buckets[low] is None:
+            low += 1
+        self._low = low
+        return buckets[low].head() if low < len(buckets) else None
+
+    def _head(self):
+        head = self._calendar_head()
+        if not self._overflow._heap:
+            return head
+        spill = self._overflow._head()
+        if spill is not None and (head is None or spill < head):
+            return spill
+        return head
+
+    def _pop_head(self):
+        entry = self._head()
+        if entry is None:
+            return None
+        b = entry[_BUCKET]
+        if b == _OVERFLOW:
+            heapq.heappop(self._overflow._heap)
+            return entry
+        bucket = self._buckets[b]
+        if bucket.fifo and bucket.fifo[0] is entry:
+            bucket.fifo.popleft()
+        else:
+            heapq.heappop(bucket.side)
+        bucket.live -= 1
+        if not bucket.live:
+            self._buckets[b] = None
+        return entry
+
+    def _discard(self, entry):
+        b = entry[_BUCKET]
+        if b == _OVERFLOW:
+            self._overflow._discard(entry)
+        else:
+            bucket = self._buckets[b]
+            bucket.live -= 1
+            if not bucket.live:
+                self._buckets[b] = None
+
+
+def rank_range(ranks, max_buckets=CALENDAR_MAX_BUCKETS):
+    """(min_rank, max_rank, granularity) for a CalendarPIFO holding `ranks`, or None
+    if they are not integers or need more than max_buckets buckets.
+    granularity is the gcd of the rank offsets (1500-step ranks -> 1500)."""
+    ranks = set(ranks)
+    if not ranks or not all(isinstance(r, int) for r in ranks):
+        return None
+    lo, hi = min(ranks), max(ranks)
+    step = 0
+    for r in ranks:
+        step = gcd(step, r - lo)
+    step = step or 1
+    if (hi - lo) // step + 1 > max_buckets:
+        return None
+    return lo, hi, step
+
+
+def make_pifo(rank_range=None):
+    """CalendarPIFO over rank_range=(min_rank, max_rank, granularity), else HeapPIFO."""
+    if rank_range is None:
+        return HeapPIFO()
+    return CalendarPIFO(*rank_range)
+
+
+class _FSNode:
+    __slots__ = ("rank", "arrival", "flow_id", "item", "next")
+
+    def __init__(self, rank, arrival, flow_id, item):
+        self.rank = rank
+        self.arrival = arrival
+        self.flow_id = flow_id
+        self.item = item
+        self.next = None
+
+
+class LinkedListPIFO:
+    """Port of the C++ FS list: enqueue_FS() sorted walk, dequeue_FS() head,
+    force_dequeue_FS() walk to the flow's first node."""
+
+    def __init__(self):
+        self.head = None
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def flow_len(self, flow_id):
+        n, cur = 0, self.head
+        while cur is not None:
+            n += cur.flow_id == flow_id
+            cur = cur.next
+        return n
+
+    def push(self, rank, arrival, flow_id, item):
+        node = _FSNode(rank, arrival, flow_id, item)
+        prev, cur = None, self.head
+        while cur is not None and (cur.rank < rank or (cur.rank == rank and cur.arrival < arrival)):
+            prev, cur = cur, cur.next
+        node.next = cur
+        if prev is None:
+            self.head = node
+        else:
+            prev.next = node
+        self._len += 1
+
+    def peek(self):
+        return self.head.item if self.head is not None else None
+
+    def pop(self):
+        node = self.head
+        if node is None:
+            return None
+        self.head = node.next
+        self._len -= 1
+        return node.item
+
+    def pop_flow(self, flow_id):
+        prev, cur = None, self.head
+        while cur is not None and cur.flow_id != flow_id:
+            prev, cur = cur, cur.next
+        if cur is None:
+            return None
+        if prev is None:
+            self.head = cur.next
+        else:
+            prev.next = cur.next
+        self._len -= 1
+        return cur.item
+
+
+class _FBNode:
+    __slots__ = ("flow_id", "item", "left", "bottom")
+
+    def __init__(self, flow_id=None, item=None):
+        self.flow_id = flow_id
+        self.item = item
+        self.left = None    # next packet of the same flow
+        self.bottom = None  # next flow row
+
+
+class LinkedListFIFOBank:
+    """Port of the C++ FB: a column of flow rows, each a chain walked to its tail
+    on enqueue_FB(); dequeue_FB() unlinks the row's first packet."""
+
+    def __init__(self):
+        self.head = None
+
+    def enqueue(self, flow_id, item):
+        node = _FBNode(flow_id, item)
+        prev, row = None, self.head
+        while row is not None:
+            if row.flow_id == flow_id:
+                cur = row
+                while cur.left is not None:
+                    cur = cur.left
+                cur.left = node
+                return
+            prev, row = row, row.bottom
+        row = _FBNode(flow_id)
+        row.left = node
+        if prev is None:
+            self.head = row
+        else:
+            prev.bottom = row
+
+    def dequeue(self, flow_id):
+        row = self.head
+        while row is not None and row.flow_id != flow_id:
+            row = row.bottom
+        if row is None or row.left is None:
+            return None
+        node = row.left
+        row.left = node.left
+        return node.item
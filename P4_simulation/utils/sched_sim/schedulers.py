@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Python models of the BMv2 user-extern schedulers (single level).
+
+Each scheduler keeps its state exactly like the C++ core it mirrors and exposes
+    enqueue(pkt)   add a packet (pkt.flow_id, pkt.rank, pkt.arrival)
+    dequeue()      one service opportunity of the extern's dequeue thread;
+                   returns the departing packet or None
+    backlog        packets currently held
+
+Round-robin family (FIFO bank, packet cost = rank):
+    WRR   user_externs_WRR/WRR.h     rotating start flow, quota reset to the quantum
+    DRR   user_externs_DRR/DRR.h     fixed order, quantum added to the deficit
+    WDRR  user_externs_WDRR/WDRR.h   DRR with per-flow quantums
+
+Sorted flow scheduler (FS, one head packet per flow, ordered by (rank, arrival),
+kept in a pifo_core heap or calendar queue)
+plus FIFO bank (FB) for the rest of each flow:
+    PIEO     user_externs_pieo/pieo.h
+    DR-PIFO  user_externs_dr_pifo/DR_PIFO.h   + force dequeue, error correction
+    pFabric  user_externs_pFabric/pFabric.h   serves the flow with the lowest updated rank
+    PIFO     user_externs_pifo/pifo.h         every packet in FS, served in per-flow FIFO order
+
+Shaping (pred / time_now eligibility) is not modelled: packets are eligible as
+soon as they are enqueued, which is how the qos programs run the externs.
+"""
+
+from collections import deque
+
+from .pifo_core import make_pifo
+
+# Defaults of the C++ cores (minimal topology: 3 flows)
+WRR_QUANTUM = 6000
+DRR_QUANTUM = 3000
+WDRR_QUANTUMS = (7500, 3000, 4500)
+
+# Service time of one dequeue call (the sleep in each extern's dequeue thread), seconds
+WRR_SERVICE_TIME = 0.010
+DRR_SERVICE_TIME = 0.00081
+WDRR_SERVICE_TIME = 0.00001
+PIFO_SERVICE_TIME = 0.00081
+
+
+class Packet:
+    """One simulated packet. seq is the 1-based per-flow sequence number."""
+
+    __slots__ = ("flow_id", "seq", "rank", "arrival", "order")
+
+    def __init__(self, flow_id, seq, rank, arrival, order=0):
+        self.flow_id = flow_id
+        self.seq = seq
+        self.rank = rank
+        self.arrival = arrival
+        self.order = order  # global enqueue order: the extern's arrival_time (packet pointer)
+
+    def __repr__(self):
+        return f"Packet(flow={self.flow_id}, seq={self.seq}, rank={self.rank}, arrival={self.arrival:.6f})"
+
+
+class Scheduler:
+    """Base class: per-flow FIFO bank shared by all models."""
+
+    name = None
+    service_time = PIFO_SERVICE_TIME
+
+    def __init__(self, num_flows):
+        self.num_flows = num_flows
+        self.fifos = [deque() for _ in range(num_flows)]
+        self.backlog = 0
+
+    def enqueue(self, pkt):
+        raise NotImplementedError
+
+    def dequeue(self):
+        raise NotImplementedError
+
+    def idle(self, ticks):
+        """Account for `ticks` dequeue calls made while the scheduler was empty."""
+        if ticks > 0:
+            self.dequeue()
+
+
+class _QuotaScheduler(Scheduler):
+    """Shared core of WRR/DRR/WDRR: per-flow FIFOs, quota debited by packet rank.
+
+    First round: serve the first flow (in first_order) whose head fits its quota.
+    Otherwise every flow's quota below its quantum is topped up (second_order)
+    and the first flow that fits, in that order, is served.
+    """
+
+    def __init__(self, num_flows, quantums, initial_quotas):
+        super().__init__(num_flows)
+        if len(quantums) != num_flows:
+            raise ValueError(f"{self.name}: {len(quantums)} quantums for {num_flows} flows")
+        self.quantums = list(quantums)
+        self.quotas = list(initial_quotas)
+
+    def set_quantum(self, flow_id, value, reset_quota=False):
+        """Mirror of the extern's set_quantum(): new quantum, optionally reset the quota."""
+        self.quantums[flow_id] = value
+        if reset_quota:
+            self.quotas[flow_id] = value
+
+    def enqueue(self, pkt):
+        self.fifos[pkt.flow_id].append(pkt)
+        self.backlog += 1
+
+    def _order(self):
+        return range(self.num_flows), range(self.num_flows)
+
+    def _top_up(self, flow_id):
+        raise NotImplementedError
+
+    def _fits(self, flow_id):
+        fifo = self.fifos[flow_id]
+        return bool(fifo) and fifo[0].rank <= self.quotas[flow_id]
+
+    def dequeue(self):
+        first_order, second_order = self._order()
+        selected = None
+        for i in first_order:
+            if self._fits(i):
+                selected = i
+                break
+        if selected is None:
+            for i in second_order:
+                self._top_up(i)
+                if selected is None and self._fits(i):
+                    selected = i
+        if selected is None:
+            return None
+        pkt = self.fifos[selected].popleft()
+        self.backlog -= 1
+        self.quotas[selected] -= pkt.rank
+        return pkt
+
+
+class WRRScheduler(_QuotaScheduler):
+    """WRR.h: the first round starts one flow later on every dequeue call and an
+    exhausted quota is reset (not added) to the quantum."""
+
+    name = "wrr"
+    service_time = WRR_SERVICE_TIME
+
+    def __init__(self, num_flows, quantums=None):
+        quantums = quantums or [WRR_QUANTUM] * num_flows
+        super().__init__(num_flows, quantums, [0] * num_flows)
+        self.start_flow = 0
+
+    def _order(self):
+        start = self.start_flow
+        self.start_flow = (start + 1) % self.num_flows
+        order = [(start + k) % self.num_flows for k in range(self.num_flows)]
+        return order, order
+
+    def _top_up(self, flow_id):
+        if self.quotas[flow_id] < self.quantums[flow_id]:
+            self.quotas[flow_id] = self.quantums[flow_id]
+
+    def idle(self, ticks):
+        if ticks > 0:
+            self.dequeue()
+            self.start_flow = (self.start_flow + ticks - 1) % self.num_flows
+
+
+class DRRScheduler(_QuotaScheduler):
+    """DRR.h: fixed first round 0..n-1, deficits topped up from the last flow down."""
+
+    name = "drr"
+    service_time = DRR_SERVICE_TIME
+
+    def __init__(self, num_flows, quantums=None):
+        quantums = quantums or [DRR_QUANTUM] * num_flows
+        super().__init__(num_flows, quantums, quantums)
+
+    def _order(self):
+        return range(self.num_flows), range(self.num_flows - 1, -1, -1)
+
+    def _top_up(self, flow_id):
+        if self.quotas[flow_id] < self.quantums[flow_id]:
+            self.quotas[flow_id] += self.quantums[flow_id]
+
+
+class WDRRScheduler(DRRScheduler):
+    """WDRR.h: DRR with per-flow quantums, both rounds in flow order."""
+
+    name = "wdrr"
+    service_time = WDRR_SERVICE_TIME
+
+    def __init__(self, num_flows, quantums=None):
+        if quantums is None:
+            quantums = list(WDRR_QUANTUMS[:num_flows]) + [WDRR_QUANTUMS[-1]] * (num_flows - len(WDRR_QUANTUMS))
+        super().__init__(num_flows, quantums)
+
+    def _order(self):
+        return range(self.num_flows), range(self.num_flows)
+
+
+class _FlowSchedulerBase(Scheduler):
+    """FS/FB structure of the PIFO-family cores.
+
+    fs is a pifo_core PIFO ordered like the C++ FS linked list (lower rank first,
+    then earlier arrival_time, i.e. enqueue order). rank_range selects a
+    CalendarPIFO for bounded integer ranks (see pifo_core.rank_range).
+    """
+
+    def __init__(self, num_flows, use_updated_rank=False, rank_range=None):
+        super().__init__(num_flows)
+        self.fs = make_pifo(rank_range)
+        self.use_updated_rank = use_updated_rank
+        # pass_updated_rank_values(): latest rank reported per flow (0 = none)
+        self.flow_ranks = [0] * num_flows
+
+    def set_flow_rank(self, flow_id, rank):
+        """Mirror of pass_updated_rank_values() for one flow."""
+        self.flow_ranks[flow_id] = rank
+
+    def flow_not_empty(self, flow_id):
+        return self.fs.flow_len(flow_id) > 0 or bool(self.fifos[flow_id])
+
+    def _fs_insert(self, pkt, rank=None):
+        self.fs.push(pkt.rank if rank is None else rank, pkt.order, pkt.flow_id, pkt)
+
+    def _fs_pop(self):
+        return self.fs.pop()
+
+    def _fs_remove_flow(self, flow_id):
+        """force_dequeue_FS(): take the first FS entry of flow_id (None if absent)."""
+        return self.fs.pop_flow(flow_id)
+
+    def enqueue(self, pkt):
+        self.backlog += 1
+        if self.use_updated_rank:
+            self.flow_ranks[pkt.flow_id] = pkt.rank
+        if self.fs.flow_len(pkt.flow_id):
+            self.fifos[pkt.flow_id].append(pkt)
+        else:
+            self._fs_insert(pkt)
+
+    def _refill(self, flow_id):
+        """After a dequeue, move the flow's next FB packet into FS. False if the flow emptied."""
+        fifo = self.fifos[flow_id]
+        if not fifo:
+            return False
+        nxt = fifo.popleft()
+        rank = None
+        if self.use_updated_rank and self.flow_ranks[flow_id]:
+            rank = self.flow_ranks[flow_id]
+        self._fs_insert(nxt, rank)
+        return True
+
+    def _select(self):
+        return self._fs_pop()
+
+    def dequeue(self):
+        pkt = self._select()
+        if pkt is None:
+            return None
+        self.backlog -= 1
+        emptied = not self._refill(pkt.flow_id)
+        self._after_dequeue(pkt, emptied)
+        return pkt
+
+    def _after_dequeue(self, pkt, emptied):
+        pass
+
+
+class PIEOScheduler(_FlowSchedulerBase):
+    """pieo.h: serve the FS head; the flow's next packet then joins FS."""
+
+    name = "pieo"
+
+
+class DRPIFOScheduler(_FlowSchedulerBase):
+    """DR_PIFO.h: PIEO plus force dequeue of a given flow and, with error
+    correction, an internal force dequeue of a flow whose updated rank is
+    lower than that of the flow just served."""
+
+    name = "dr_pifo"
+
+    def __init__(self, num_flows, use_updated_rank=False, enable_error_correction=False, rank_range=None):
+        super().__init__(num_flows, use_updated_rank, rank_range)
+        self.enable_error_correction = enable_error_correction
+        self.force_flow_id = None
+        self.error_detected = False
+        self.internal_force_flow_id = 0
+
+    def force_dequeue(self, flow_id):
+        """Serve flow_id's FS entry on the next dequeue (in_force_deq / in_force_deq_flow_id)."""
+        self.force_flow_id = flow_id
+
+    def _ranked(self, flow_id):
+        return self.flow_not_empty(flow_id) and self.flow_ranks[flow_id] != 0
+
+    def _select(self):
+        if self.force_flow_id is not None:
+            flow_id, self.force_flow_id = self.force_flow_id, None
+            return self._fs_remove_flow(flow_id)
+        if self.error_detected:
+            self.error_detected = False
+            return self._fs_remove_flow(self.internal_force_flow_id)
+        pkt = super()._select()
+        if self.enable_error_correction and pkt is not None:
+            if self.use_updated_rank and self._ranked(pkt.flow_id):
+                min_rank = self.flow_ranks[pkt.flow_id]
+            else:
+                min_rank = pkt.rank
+            min_flow = pkt.flow_id
+            for i in range(self.num_flows):
+                if not self._ranked(i):
+                    continue
+                rank = self.flow_ranks[i]
+                if (rank < min_rank and i != pkt.flow_id) or (rank == min_rank and i < min_flow):
+                    self.error_detected = True
+                    self.internal_force_flow_id = i
+                    min_rank, min_flow = rank, i
+        return pkt
+
+    def _after_dequeue(self, pkt, emptied):
+        if not (emptied and self.enable_error_correction and not self.error_detected):
+            return
+        # The served flow ran dry: hand over to the lowest-id flow with the same rank
+        for i in range(self.num_flows):
+            if i != pkt.flow_id and self._ranked(i) and self.flow_ranks[i] == pkt.rank:
+                self.error_detected = True
+                self.internal_force_flow_id = i
+                return
+
+
+class PFabricScheduler(_FlowSchedulerBase):
+    """pFabric.h: serve the non-empty flow with the lowest updated rank (remaining
+    flow size; ties to the lower flow id) by force-dequeuing its FS entry.
+    Updated ranks are always fed from the enqueued packets."""
+
+    name = "pfabric"
+
+    def __init__(self, num_flows, rank_range=None):
+        super().__init__(num_flows, use_updated_rank=True, rank_range=rank_range)
+
+    def _select(self):
+        best = None
+        for i in range(self.num_flows):
+            if self.flow_not_empty(i) and self.flow_ranks[i] != 0:
+                if best is None or self.flow_ranks[i] < self.flow_ranks[best]:
+                    best = i
+        if best is None:
+            return super()._select()
+        return self._fs_remove_flow(best)
+
+
+class PIFOScheduler(_FlowSchedulerBase):
+    """pifo.h: every packet is pushed into both FS and FB. A dequeue pops the FS
+    head and sends the oldest packet of that flow, so flows are picked by rank
+    but each flow stays in FIFO order."""
+
+    name = "pifo"
+
+    def enqueue(self, pkt):
+        self.backlog += 1
+        self.fifos[pkt.flow_id].append(pkt)
+        self._fs_insert(pkt)
+
+    def dequeue(self):
+        if not self.fs:
+            return None
+        flow_id = self._fs_pop().flow_id
+        self.backlog -= 1
+        return self.fifos[flow_id].popleft()
+
+
+SCHEDULERS = {
+    cls.name: cls
+    for cls in (WRRScheduler, DRRScheduler, WDRRScheduler, PIEOScheduler,
+                DRPIFOScheduler, PFabricScheduler, PIFOScheduler)
+}
+
+
+def make_scheduler(policy, num_flows, quantums=None, use_updated_rank=False,
+                   enable_error_correction=False, rank_range=None):
+    """Build a scheduler by policy name (see SCHEDULERS). rank_range (min, max,
+    granularity) puts the FS of the PIFO-family models in a calendar queue."""
+    try:
+        cls = SCHEDULERS[policy]
+    except KeyError:
+        raise ValueError(f"unknown policy {policy!r} (choose from {', '.join(SCHEDULERS)})") from None
+    if issubclass(cls, _QuotaScheduler):
+        return cls(num_flows, quantums)
+    if quantums:
+        raise ValueError(f"{policy}: quantums only apply to wrr/drr/wdrr")
+    if cls is DRPIFOScheduler:
+        return cls(num_flows, use_updated_rank, enable_error_correction, rank_range)
+    if cls is PFabricScheduler:
+        return cls(num_flows, rank_range)
+    return cls(num_flows, use_updated_rank, rank_range)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Telemetry observations from telemetry_receiver.py to qos_runtime.py over a
+Unix datagram socket.
+
+The receiver used to rewrite qos_qlearning_state.txt for every probe and the
+controller polled it every CONTROL_INTERVAL_SEC, which added up to one interval
+of control latency and could return a half-written line. Here every
+observation is one fixed-size datagram (no per-packet filesystem syscalls:
+the socket is connected once), and the controller wakes as soon as a probe
+has been decoded.
+
+Datagram layout (little-endian, 32 bytes, OBSERVATION.size):
+    0   seq         u64  probe sequence number (0 if the payload had none)
+    8   probe_ts    f64  sender timestamp from the probe payload (0.0 if none)
+    16  recv_ts     f64  receive timestamp on c1
+    24  latency_ms  f32  probe latency (recv_ts - probe_ts)
+    28  q_ef        u16  EF queue depth (s1 trace, flow2_qdepth, clamped)
+    30  q_af        u16  AF queue depth (s1 trace, flow1_qdepth, clamped)
+
+Pathname Unix sockets are reached through the filesystem, so this works
+between Mininet hosts (separate network namespaces, shared filesystem).
+The publisher never blocks: datagrams are dropped while no controller is
+bound or its receive queue is full, and the subscriber only hands the newest
+observation to the controller anyway.
+"""
+
+import errno
+import os
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+OBSERVATION = struct.Struct("<QddfHH")
+DEFAULT_SOCKET_NAME = "qos_telemetry.sock"
+RECONNECT_INTERVAL_SEC = 1.0
+
+Observation = namedtuple("Observation", "seq probe_ts recv_ts latency_ms q_ef q_af")
+
+
+class TelemetryPublisher:
+    """Send observations to the controller's socket (receiver side)."""
+
+    def __init__(self, path, reconnect_interval=RECONNECT_INTERVAL_SEC):
+        self.path = path
+        self.reconnect_interval = reconnect_interval
+        self.sent = 0
+        self.dropped = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._connected = False
+        self._next_connect = 0.0
+
+    def _connect(self):
+        now = time.monotonic()
+        if now < self._next_connect:
+            return False
+        try:
+            self._sock.connect(self.path)
+        except OSError:
+            # no controller yet: try again later, not on every probe
+            self._next_connect = now + self.reconnect_interval
+            return False
+        self._connected = True
+        return True
+
+    def publish(self, seq, probe_ts, recv_ts, latency_ms, q_ef, q_af):
+        """Send one observation; returns False if it was dropped."""
+        if not self._connected and not self._connect():
+            self.dropped += 1
+            return False
+        try:
+            self._sock.send(OBSERVATION.pack(seq, probe_ts, recv_ts, latency_ms, q_ef, q_af))
+        except OSError as e:
+            self.dropped += 1
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+                # controller restarted (ECONNREFUSED/ENOENT): reconnect to the new socket
+                self._sock.close()
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sock.setblocking(False)
+                self._connected = False
+            return False
+        self.sent += 1
+        return True
+
+    def close(self):
+        self._sock.close()
+
+
+class TelemetrySubscriber:
+    """Receive observations (controller side). Binds `path`, replacing a stale socket file.
+
+    A reader thread drains the socket as datagrams arrive and keeps only the
+    newest one, so a controller busy with a P4Runtime write never finds the
+    (short, net.unix.max_dgram_qlen) socket queue full of stale observations.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.received = 0
+        self.coalesced = 0
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(path)
+        self._latest = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        while True:
+            try:
+                data = self._sock.recv(OBSERVATION.size)
+            except OSError:
+                return  # socket closed
+            if len(data) != OBSERVATION.size:
+                continue
+            with self._cond:
+                if self._latest is not None:
+                    self.coalesced += 1
+                self._latest = data
+                self.received += 1
+                self._cond.notify()
+
+    def recv_latest(self, timeout=None):
+        """Block until an observation is pending (at most `timeout` seconds) and return
+        the newest one, or None on timeout. Observations that arrived since the last
+        call and were superseded are counted in `coalesced`."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest is not None, timeout):
+                return None
+            data, self._latest = self._latest, None
+        return Observation(*OBSERVATION.unpack(data))
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)  # wakes the reader thread
+        except OSError:
+            pass
+        self._sock.close()
+        self._thread.join(timeout=1.0)
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LatencyStats:
+    """Running probe-to-decision latency samples (ms) with percentile summaries."""
+
+    def __init__(self):
+        self.samples = []
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    def summary(self):
+        if not self.samples:
+            return "no samples"
+        s = sorted(self.samples)
+
+        def pct(p):
+            return s[min(len(s) - 1, int(p / 100.0 * len(s)))]
+        return (f"n={len(s)} mean={sum(s) / len(s):.2f} p50={pct(50):.2f} "
+                f"p99={pct(99):.2f} max={s[-1]:.2f} ms")
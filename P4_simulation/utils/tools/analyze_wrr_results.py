@@ -4,22 +4,36 @@ Unified analysis script for WRR bandwidth allocation and latency
 This script ensures consistency between bandwidth and latency measurements
 """
 
+import os
 import re
 import sys
 from pathlib import Path
 from collections import defaultdict
-import statistics
 
-# Maximum valid latency (ms). Latencies above this are rejected to avoid wrong matches.
-# WRR congestion can cause tens of seconds delay; 120 s gives margin without being too loose.
-MAX_LATENCY_MS = 120000  # 120 seconds
+import numpy as np
 
+_utils_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
 
-def parse_receiver_log(receiver_file, payload_marker="P4 is cool"):
+from log_follow import DEFAULT_LATENESS, DEFAULT_POLL_INTERVAL, WindowFollower, follow_logs
+from payload_stamp import STAMP_RE
+from recv_log import find_receiver_log, is_recv_log, load_recv_log, recv_timestamps
+from window_stats import (
+    LATENCY_EXCEEDS_MAX, LATENCY_NEGATIVE, MAX_LATENCY_MS, NO_SEND_TIMESTAMP,
+    analyze_windows, delivery_stats, latency_failures, packet_latencies,
+)
+
+
+def parse_receiver_log(receiver_file, payload_marker="P4 is cool", stamps=None):
     """
     Parse receiver log and extract packet reception timestamps.
     Only counts packets that contain the given payload (e.g. load = 'P4 is cool'),
     so that ICMPv6 and other non-sent packets are excluded.
+    Binary logs (receive.py --log-format=bin) only hold data packets and are
+    read through numpy.memmap.
+    With a stamps list, (seq, tx_ns) of every counted text-log packet is appended
+    to it ((0, 0) for a packet without a stamp line).
     """
     timestamps = []
 
@@ -27,21 +41,34 @@ def parse_receiver_log(receiver_file, payload_marker="P4 is cool"):
         print(f"Warning: {receiver_file} not found")
         return timestamps
 
+    if is_recv_log(receiver_file):
+        # receive.py --log-format=bin: one record per data packet, no text to parse
+        return recv_timestamps(receiver_file)
+
     pending_ts = None
+    pending_stamp = (0, 0)
     with open(receiver_file, 'r') as f:
         for line in f:
             # New packet block started; discard any pending timestamp from previous block
             if 'got a packet' in line:
                 pending_ts = None
+                pending_stamp = (0, 0)
                 continue
             # Format: "packet is received at time : 1234567890.123"
             match = re.search(r'received at time : ([\d.]+)', line)
             if match:
                 pending_ts = float(match.group(1))
                 continue
+            # Format: "  stamp flow=1 seq=12 tx_ns=1234567890123456789" (before the load line)
+            match = STAMP_RE.search(line)
+            if match:
+                pending_stamp = (int(match.group(2)), int(match.group(3)))
+                continue
             # Only count this packet if it has our payload (e.g. load = 'P4 is cool')
             if payload_marker in line and pending_ts is not None:
                 timestamps.append(pending_ts)
+                if stamps is not None:
+                    stamps.append(pending_stamp)
                 pending_ts = None
 
     return timestamps
@@ -67,68 +94,149 @@ def parse_sender_log(sender_file):
     return send_times
 
 
-def calculate_latency(send_times, recv_times, window_start, window_end):
+def load_receiver_log(receiver_file):
+    """(receive times, seqs, tx times) arrays of one receiver log (log order).
+
+    seqs and tx times (seconds, NaN where not stamped) come from the packets'
+    stamps; both are None for a log without any stamped packet (the packets are
+    then matched to the sender log by position)."""
+    if receiver_file.exists() and is_recv_log(receiver_file):
+        log = load_recv_log(receiver_file)
+        recv = log["recv_ns"] / 1e9
+        if "tx_ns" not in log.dtype.names:
+            return recv, None, None  # version 1: seq is the receive order
+        seqs = log["seq"].astype(np.int64)
+        tx_ns = log["tx_ns"]
+    else:
+        stamps = []
+        recv = np.asarray(parse_receiver_log(receiver_file, stamps=stamps), dtype=np.float64)
+        pairs = np.array(stamps, dtype=np.uint64).reshape(-1, 2)
+        seqs = pairs[:, 0].astype(np.int64)
+        tx_ns = pairs[:, 1]
+    if not np.any(seqs):
+        return recv, None, None
+    return recv, seqs, np.where(tx_ns > 0, tx_ns / 1e9, np.nan)
+
+
+def sender_total_packets(sender_file):
+    """Packets a sender reported sending ("Total packets: N"), 0 if not (yet) in its log."""
+    total = 0
+    if sender_file.exists():
+        with open(sender_file, 'r') as f:
+            for line in f:
+                match = re.search(r'Total packets: (\d+)', line)
+                if match:
+                    total = int(match.group(1))
+    return total
+
+
+def load_sender_times(sender_file):
+    """(seq_nums, send timestamps) arrays of one sender log."""
+    send_times = parse_sender_log(sender_file)
+    seqs = np.fromiter((seq for seq, _ in send_times), dtype=np.int64, count=len(send_times))
+    times = np.fromiter((t for _, t in send_times), dtype=np.float64, count=len(send_times))
+    return seqs, times
+
+
+def calculate_latency(send_times, recv_times, window_start, window_end, seqs=None, tx_times=None):
     """
     Calculate latency for packets received in the time window.
-    Uses seq_num matching: recv_idx (0-based) corresponds to packet seq_num = recv_idx+1.
-    Lookup send_time by seq_num, so works with sparse logs (log_every > 1).
+    With stamped receiver logs (seqs, tx_times from load_receiver_log) each packet's
+    own send time is used, else the sender log's time of its own seq, so drops and
+    reordering do not shift later packets. Unstamped logs fall back to position
+    matching: recv_idx (0-based) corresponds to packet seq_num = recv_idx+1.
     """
-    latencies = []
-
-    # Build seq_num -> send_time map (adaptive to log_every: sparse or dense)
-    send_time_by_seq = {seq_num: t for seq_num, t in send_times}
-
-    for recv_idx, recv_time in enumerate(recv_times):
-        if not (window_start <= recv_time <= window_end):
-            continue
-        packet_seq = recv_idx + 1  # 1-based packet number
-        if packet_seq not in send_time_by_seq:
-            continue
-        send_time = send_time_by_seq[packet_seq]
-        latency_ms = (recv_time - send_time) * 1000
-        if 0 <= latency_ms < MAX_LATENCY_MS:
-            latencies.append(latency_ms)
-
-    return latencies
-
-
-def diagnose_latency_failures(flow_id, send_times, recv_times):
+    send_seqs = [seq_num for seq_num, _ in send_times]
+    times = [t for _, t in send_times]
+    recv = np.asarray(recv_times, dtype=np.float64)
+    latency_ms = packet_latencies(recv, send_seqs, times, seqs, tx_times)
+    in_window = (recv >= window_start) & (recv <= window_end) & ~np.isnan(latency_ms)
+    return latency_ms[in_window].tolist()
+
+
+_FAILURE_REASONS = {
+    NO_SEND_TIMESTAMP: 'no_send_timestamp (packet {seq} not stamped nor in sender log; log_every may omit it)',
+    LATENCY_NEGATIVE: 'latency_negative (recv time before send time, reorder or clock skew)',
+    LATENCY_EXCEEDS_MAX: f'latency_exceeds_max (>= {MAX_LATENCY_MS} ms)',
+}
+
+
+def _failure_dicts(recv_times, failures, limit=None):
+    idx, seq, send, latency_ms, reason = (a[:limit] for a in failures)
+    out = []
+    for i, q, s, lat, r in zip(idx.tolist(), seq.tolist(), send.tolist(), latency_ms.tolist(), reason.tolist()):
+        no_ts = r == NO_SEND_TIMESTAMP
+        out.append({
+            'recv_idx': i,
+            'seq': q,
+            'recv_time': float(recv_times[i]),
+            'send_time': None if no_ts else s,
+            'latency_ms': None if no_ts else lat,
+            'reason': _FAILURE_REASONS[r].format(seq=q),
+        })
+    return out
+
+
+def diagnose_latency_failures(flow_id, send_times, recv_times, seqs=None, tx_times=None):
     """
     Find which received packets failed to get a latency and why (seq_num matching).
-    Returns a list of dicts: {'recv_idx', 'recv_time', 'send_time' or None, 'latency_ms' or None, 'reason'}
+    Returns a list of dicts: {'recv_idx', 'seq', 'recv_time', 'send_time' or None, 'latency_ms' or None, 'reason'}
     """
-    send_time_by_seq = {seq_num: t for seq_num, t in send_times}
-    failures = []
-    for recv_idx, recv_time in enumerate(recv_times):
-        packet_seq = recv_idx + 1
-        if packet_seq not in send_time_by_seq:
-            failures.append({
-                'recv_idx': recv_idx,
-                'recv_time': recv_time,
-                'send_time': None,
-                'latency_ms': None,
-                'reason': f'no_send_timestamp (packet {packet_seq} not in sender log; log_every may omit it)'
-            })
-            continue
-        send_time = send_time_by_seq[packet_seq]
-        latency_ms = (recv_time - send_time) * 1000
-        if latency_ms < 0:
-            failures.append({
-                'recv_idx': recv_idx,
-                'recv_time': recv_time,
-                'send_time': send_time,
-                'latency_ms': latency_ms,
-                'reason': 'latency_negative (recv time before send time, reorder or clock skew)'
-            })
-        elif latency_ms >= MAX_LATENCY_MS:
-            failures.append({
-                'recv_idx': recv_idx,
-                'recv_time': recv_time,
-                'send_time': send_time,
-                'latency_ms': latency_ms,
-                'reason': f'latency_exceeds_max (>= {MAX_LATENCY_MS} ms)'
-            })
-    return failures
+    send_seqs = [seq_num for seq_num, _ in send_times]
+    times = [t for _, t in send_times]
+    return _failure_dicts(recv_times, latency_failures(recv_times, send_seqs, times, seqs, tx_times))
+
+
+def _print_latency_stats(lat, indent, count_label):
+    print(f"{indent}{count_label}: {lat['samples']}")
+    print(f"{indent}Min: {lat['min']:.2f} ms")
+    print(f"{indent}Median: {lat['median']:.2f} ms")
+    print(f"{indent}Max: {lat['max']:.2f} ms")
+    print(f"{indent}Mean: {lat['mean']:.2f} ms")
+    if lat['std'] is not None:
+        print(f"{indent}Std: {lat['std']:.2f} ms")
+    else:
+        print(f"{indent}Std: N/A (need >= 2 samples)")
+
+
+def print_window(window_num, window_start, window_end, window_stats):
+    """Print one window: window_stats[flow_id] = {'packets', 'rate', 'share', 'latency'}."""
+    print(f"Window {window_num}: {window_start:.2f} - {window_end:.2f} seconds")
+    print("-" * 60)
+
+    total_packets = 0
+    total_rate = 0.0
+    for flow_id, stats in window_stats.items():
+        lat = stats['latency']
+        total_packets += stats['packets']
+        total_rate += stats['rate']
+
+        # Print bandwidth stats
+        print(f"  Flow {flow_id}: {stats['packets']} packets, {stats['rate']:.2f} pps", end="")
+        if lat:
+            print(f" | Latency: {lat['samples']} samples, "
+                  f"median={lat['median']:.2f} ms, "
+                  f"mean={lat['mean']:.2f} ms")
+        else:
+            print(" | Latency: No samples")
+
+    # Print percentages
+    if total_rate > 0:
+        print(f"\n  Total: {total_packets} packets, {total_rate:.2f} pps")
+        print("  Bandwidth allocation:")
+        for flow_id, stats in window_stats.items():
+            print(f"    Flow {flow_id}: {stats['share']:.2f}%")
+
+    # Print latency statistics
+    print("\n  Latency Statistics:")
+    for flow_id, stats in window_stats.items():
+        lat = stats['latency']
+        if lat:
+            print(f"    Flow {flow_id}:")
+            _print_latency_stats(lat, "      ", "Samples")
+        else:
+            print(f"    Flow {flow_id}: No latency samples")
+    print()
 
 
 def analyze_wrr_results(outputs_dir, start_time=None, end_time=None, window_size=10, start_offset=0, num_flows=2):
@@ -136,13 +244,21 @@ def analyze_wrr_results(outputs_dir, start_time=None, end_time=None, window_size
     Unified analysis of WRR bandwidth allocation and latency.
 
     Expects in outputs_dir (num_flows=2 by default):
-      - receiver_h_r1.txt ... receiver_h_rN.txt  (receiver logs)
+      - receiver_h_r1.txt ... receiver_h_rN.txt  (receiver logs; receiver_h_rN.bin is
+        used instead when receive.py ran with --log-format=bin)
       - sender_h1.txt ... sender_hN.txt          (sender logs)
 
     Receiver log: only packets with load = 'P4 is cool' are counted (ICMPv6 etc. excluded).
     Receiver block format: "packet is received at time : <timestamp>" then later "load = 'P4 is cool'"
     Sender log line format: "This host has sent <N> packets until now : <timestamp>"
 
+    Packets stamped by the senders (payload_stamp.py) are matched on their own seq and
+    send time, which also gives loss, duplicates and reordering per flow; the sender
+    log is then only needed for packets without a stamped send time (--fast).
+
+    Per-window counts and latencies are computed by window_stats.analyze_windows
+    (NumPy arrays + searchsorted) rather than rescanning every packet per window.
+
     Args:
         outputs_dir: Directory containing sender and receiver logs (e.g. program/qos/outputs)
         start_time: Start time for measurement (if None, use first packet time + start_offset)
@@ -159,53 +275,42 @@ def analyze_wrr_results(outputs_dir, start_time=None, end_time=None, window_size
 
     # Parse logs for each flow
     flow_recv_times = {}
-    flow_send_times = {}
+    flow_send = {}
+    flow_stamps = {}
+    flow_sent = {}
 
     for flow_id in flow_ids:
-        receiver_file = outputs_path / f"receiver_h_r{flow_id+1}.txt"
+        receiver_file = find_receiver_log(outputs_path, flow_id + 1)
         sender_file = outputs_path / f"sender_h{flow_id+1}.txt"
 
-        recv_times = parse_receiver_log(receiver_file)
-        send_times = parse_sender_log(sender_file)
+        recv_times, seqs, tx_times = load_receiver_log(receiver_file)
+        send_seqs, send_times = load_sender_times(sender_file)
 
         flow_recv_times[flow_id] = recv_times
-        flow_send_times[flow_id] = send_times
+        flow_send[flow_id] = (send_seqs, send_times)
+        flow_sent[flow_id] = max(sender_total_packets(sender_file), int(send_seqs.max()) if len(send_seqs) else 0)
+        if seqs is not None:
+            flow_stamps[flow_id] = (seqs, tx_times)
 
         print(f"Flow {flow_id}:")
-        print(f"  Received: {len(recv_times)} packets")
-        print(f"  Sent: {len(send_times)} packets")
+        print(f"  Received: {len(recv_times)} packets"
+              + (" (stamped: matched by seq)" if seqs is not None else " (unstamped: matched by position)"))
+        print(f"  Sent: {flow_sent[flow_id]} packets ({len(send_times)} send timestamps logged)")
 
-    if not any(flow_recv_times.values()):
+    if not any(len(t) for t in flow_recv_times.values()):
         print("Error: No packets found in receiver logs")
         return
 
-    # Determine measurement time window
-    all_recv_times = []
-    for recv_times in flow_recv_times.values():
-        all_recv_times.extend(recv_times)
-
-    if not all_recv_times:
-        print("Error: No timestamps found")
-        return
-
-    # Also consider send times to get the earliest packet time
-    all_send_times = []
-    for send_times in flow_send_times.values():
-        for seq_num, send_time in send_times:
-            all_send_times.append(send_time)
-
     # Use the earliest time (either send or receive) as the reference
-    earliest_time = min(min(all_recv_times) if all_recv_times else float('inf'),
-                       min(all_send_times) if all_send_times else float('inf'))
-    if earliest_time == float('inf'):
-        print("Error: No timestamps found in sender or receiver logs")
-        return
+    earliest_time = min([float(t.min()) for t in flow_recv_times.values() if len(t)] +
+                        [float(t.min()) for _, t in flow_send.values() if len(t)] +
+                        [float(np.nanmin(t)) for _, t in flow_stamps.values() if np.any(~np.isnan(t))])
 
     if start_time is None:
         start_time = earliest_time + start_offset  # Start from first packet + offset
     if end_time is None:
         # Include all packets: use last packet time (no tail exclusion by default)
-        end_time = max(all_recv_times)
+        end_time = max(float(t.max()) for t in flow_recv_times.values() if len(t))
     if end_time <= start_time:
         print("Error: Measurement window is empty (end_time <= start_time)")
         return
@@ -215,99 +320,29 @@ def analyze_wrr_results(outputs_dir, start_time=None, end_time=None, window_size
     print(f"Window size: {window_size} seconds")
     print(f"{'='*60}\n")
 
-    # Analyze each time window
-    current_time = start_time
-    window_num = 1
-    all_window_stats = []
-
-    while current_time < end_time:
-        window_end = min(current_time + window_size, end_time)
-
-        print(f"Window {window_num}: {current_time:.2f} - {window_end:.2f} seconds")
-        print("-" * 60)
+    result = analyze_windows(flow_recv_times, flow_send, start_time, end_time, window_size, flow_stamps)
+    flows = result['flows']
 
-        window_stats = {}
-        total_packets = 0
-        total_rate = 0.0
-
-        for flow_id in flow_ids:
-            recv_times = flow_recv_times[flow_id]
-            send_times = flow_send_times[flow_id]
-
-            # Count packets in window
-            packets_in_window = [t for t in recv_times if current_time <= t <= window_end]
-            packet_count = len(packets_in_window)
-            window_duration = window_end - current_time
-            rate = packet_count / window_duration if window_duration > 0 else 0.0
-
-            # Calculate latency
-            latencies = calculate_latency(send_times, recv_times, current_time, window_end)
-
-            window_stats[flow_id] = {
-                'packets': packet_count,
-                'rate': rate,
-                'latencies': latencies
-            }
-
-            total_packets += packet_count
-            total_rate += rate
-
-            # Print bandwidth stats
-            print(f"  Flow {flow_id}: {packet_count} packets, {rate:.2f} pps", end="")
-            if latencies:
-                print(f" | Latency: {len(latencies)} samples, "
-                      f"median={statistics.median(latencies):.2f} ms, "
-                      f"mean={statistics.mean(latencies):.2f} ms")
-            else:
-                print(" | Latency: No samples")
-
-        # Calculate percentages
-        if total_rate > 0:
-            print(f"\n  Total: {total_packets} packets, {total_rate:.2f} pps")
-            print("  Bandwidth allocation:")
-            for flow_id in flow_ids:
-                percentage = (window_stats[flow_id]['rate'] / total_rate) * 100
-                print(f"    Flow {flow_id}: {percentage:.2f}%")
-
-        # Print latency statistics
-        print("\n  Latency Statistics:")
-        for flow_id in flow_ids:
-            latencies = window_stats[flow_id]['latencies']
-            if latencies:
-                print(f"    Flow {flow_id}:")
-                print(f"      Samples: {len(latencies)}")
-                print(f"      Min: {min(latencies):.2f} ms")
-                if len(latencies) >= 1:
-                    print(f"      Median: {statistics.median(latencies):.2f} ms")
-                else:
-                    print(f"      Median: N/A")
-                print(f"      Max: {max(latencies):.2f} ms")
-                print(f"      Mean: {statistics.mean(latencies):.2f} ms")
-                if len(latencies) >= 2:
-                    print(f"      Std: {statistics.stdev(latencies):.2f} ms")
-                else:
-                    print(f"      Std: N/A (need >= 2 samples)")
-            else:
-                print(f"    Flow {flow_id}: No latency samples")
-
-        all_window_stats.append(window_stats)
-        current_time = window_end
-        window_num += 1
-        print()
+    # Print each time window
+    for w, (window_start, window_end) in enumerate(zip(result['starts'].tolist(), result['ends'].tolist())):
+        print_window(w + 1, window_start, window_end, {
+            flow_id: {
+                'packets': int(flows[flow_id]['counts'][w]),
+                'rate': float(flows[flow_id]['rates'][w]),
+                'share': float(flows[flow_id]['shares'][w]),
+                'latency': flows[flow_id]['latency'][w],
+            } for flow_id in flow_ids
+        })
 
     # Overall statistics across all windows
     print("=" * 60)
     print("Overall Statistics (all windows combined):")
     print("=" * 60)
 
-    # Combine all latencies
-    overall_latencies = {flow_id: [] for flow_id in flow_ids}
-    total_packets_all = {flow_id: 0 for flow_id in flow_ids}
-
-    for window_stats in all_window_stats:
-        for flow_id in flow_ids:
-            overall_latencies[flow_id].extend(window_stats[flow_id]['latencies'])
-            total_packets_all[flow_id] += window_stats[flow_id]['packets']
+    total_packets_all = {flow_id: flows[flow_id]['total_packets'] for flow_id in flow_ids}
+    overall_latency = {flow_id: flows[flow_id]['overall_latency'] for flow_id in flow_ids}
+    latency_count = {flow_id: overall_latency[flow_id]['samples'] if overall_latency[flow_id] else 0
+                     for flow_id in flow_ids}
 
     print("\nBandwidth Allocation (all windows):")
     total_all = sum(total_packets_all.values())
@@ -317,31 +352,28 @@ def analyze_wrr_results(outputs_dir, start_time=None, end_time=None, window_size
 
     print("\nLatency Statistics (all windows combined):")
     for flow_id in flow_ids:
-        latencies = overall_latencies[flow_id]
-        if latencies:
+        lat = overall_latency[flow_id]
+        if lat:
             print(f"\n  Flow {flow_id}:")
-            print(f"    Packets: {len(latencies)}")
-            print(f"    Min: {min(latencies):.2f} ms")
-            if len(latencies) >= 1:
-                print(f"    Median: {statistics.median(latencies):.2f} ms")
-            else:
-                print(f"    Median: N/A")
-            print(f"    Max: {max(latencies):.2f} ms")
-            print(f"    Mean: {statistics.mean(latencies):.2f} ms")
-            if len(latencies) >= 2:
-                print(f"    Std: {statistics.stdev(latencies):.2f} ms")
-            else:
-                print(f"    Std: N/A (need >= 2 samples)")
+            _print_latency_stats(lat, "    ", "Packets")
         else:
             print(f"\n  Flow {flow_id}: No latency samples")
 
+    if flow_stamps:
+        print("\nDelivery (stamped flows, whole run):")
+        for flow_id, (seqs, _) in flow_stamps.items():
+            d = delivery_stats(seqs, flow_sent[flow_id])
+            print(f"  Flow {flow_id}: {d['unique']} of {d['expected']} packets delivered, "
+                  f"lost {d['lost']} ({d['loss_rate'] * 100:.2f}%), duplicates {d['duplicates']}, "
+                  f"reordered {d['reordered']} (max depth {d['max_reorder_depth']})")
+
     # Consistency check
     print("\n" + "=" * 60)
     print("Consistency Check:")
     print("=" * 60)
     for flow_id in flow_ids:
         bandwidth_packets = total_packets_all[flow_id]
-        latency_packets = len(overall_latencies[flow_id])
+        latency_packets = latency_count[flow_id]
         diff = bandwidth_packets - latency_packets
         print(f"  Flow {flow_id}:")
         print(f"    Bandwidth measurement: {bandwidth_packets} packets")
@@ -356,30 +388,81 @@ def analyze_wrr_results(outputs_dir, start_time=None, end_time=None, window_size
             print(f"    ⚠️  Warning: {abs(diff)} more latency samples than received packets")
 
     # Diagnose unmatched packets for flows where bandwidth > latency count
-    flows_with_gap = [f for f in flow_ids if total_packets_all[f] > len(overall_latencies[f])]
+    flows_with_gap = [f for f in flow_ids if total_packets_all[f] > latency_count[f]]
     if flows_with_gap:
         print("\n" + "=" * 60)
         print("Unmatched packet diagnosis (seq_num matching):")
         print("=" * 60)
         for flow_id in flows_with_gap:
-            send_times = flow_send_times[flow_id]
             recv_times = flow_recv_times[flow_id]
-            failures = diagnose_latency_failures(flow_id, send_times, recv_times)
-            latency_count = len(overall_latencies[flow_id])
+            failures = latency_failures(recv_times, *flow_send[flow_id], *flow_stamps.get(flow_id, (None, None)))
+            n_failures = len(failures[0])
             # When sender log is sparse (log_every > 1), most failures are no_send_timestamp; print summary only
-            no_ts_count = sum(1 for f in failures if 'no_send_timestamp' in f.get('reason', ''))
-            if len(failures) > 20 and no_ts_count == len(failures):
-                print(f"\n  Flow {flow_id}: {len(failures)} packets have no send timestamp (expected with log_every > 1)")
-                print(f"    Latency computed for {latency_count} packets (those with send timestamps)")
+            no_ts_count = int(np.count_nonzero(failures[4] == NO_SEND_TIMESTAMP))
+            if n_failures > 20 and no_ts_count == n_failures:
+                print(f"\n  Flow {flow_id}: {n_failures} packets have no send timestamp (expected with log_every > 1)")
+                print(f"    Latency computed for {latency_count[flow_id]} packets (those with send timestamps)")
             else:
-                print(f"\n  Flow {flow_id}: {len(failures)} packet(s) failed to get latency")
-                for i, fail in enumerate(failures[:50]):  # limit to first 50
-                    print(f"    [{i+1}] recv_idx={fail['recv_idx']}, recv_time={fail['recv_time']:.6f}")
+                print(f"\n  Flow {flow_id}: {n_failures} packet(s) failed to get latency")
+                for i, fail in enumerate(_failure_dicts(recv_times, failures, limit=50)):  # limit to first 50
+                    print(f"    [{i+1}] recv_idx={fail['recv_idx']}, seq={fail['seq']}, recv_time={fail['recv_time']:.6f}")
                     if fail['send_time'] is not None:
                         print(f"        send_time={fail['send_time']:.6f}, latency_ms={fail['latency_ms']:.2f}")
                     print(f"        reason: {fail['reason']}")
-                if len(failures) > 50:
-                    print(f"    ... and {len(failures) - 50} more")
+                if n_failures > 50:
+                    print(f"    ... and {n_failures - 50} more")
+
+
+def follow_wrr_results(outputs_dir, start_time=None, end_time=None, window_size=10, start_offset=0, num_flows=2,
+                       lateness=DEFAULT_LATENESS, poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=None):
+    """
+    --follow: tail the logs of a running experiment and print each window as soon
+    as it closes (see log_follow.py). Stops on Ctrl-C, after idle_timeout seconds
+    without new log lines, or once end_time has passed; then prints run totals.
+    """
+    outputs_path = Path(outputs_dir)
+    if not outputs_path.is_dir():
+        print(f"Error: outputs_dir is not a directory: {outputs_path}")
+        return
+
+    flow_ids = range(num_flows)
+    follower = WindowFollower(num_flows, window_size, start_time, start_offset, end_time, lateness)
+    print(f"Following logs in {outputs_path} (window size: {window_size} s, lateness: {lateness} s, Ctrl-C to stop)\n",
+          flush=True)
+
+    def on_window(window):
+        print_window(window['num'], window['start'], window['end'], window['flows'])
+        sys.stdout.flush()
+
+    follow_logs(outputs_path, follower, on_window, payload_marker="P4 is cool",
+                poll_interval=poll_interval, idle_timeout=idle_timeout)
+
+    print("=" * 60)
+    print(f"Overall Statistics ({follower.closed_windows} windows followed):")
+    print("=" * 60)
+    print("\nBandwidth Allocation (all windows):")
+    total_all = sum(follower.total_packets)
+    for flow_id in flow_ids:
+        packets = follower.total_packets[flow_id]
+        percentage = (packets / total_all * 100) if total_all > 0 else 0
+        print(f"  Flow {flow_id}: {packets} packets ({percentage:.2f}%)")
+    print("\nLatency Statistics (all windows combined; median is per window only in --follow):")
+    for flow_id in flow_ids:
+        lat = follower.overall_latency(flow_id)
+        if lat:
+            print(f"\n  Flow {flow_id}:")
+            print(f"    Packets: {lat['samples']}")
+            print(f"    Min: {lat['min']:.2f} ms")
+            print(f"    Max: {lat['max']:.2f} ms")
+            print(f"    Mean: {lat['mean']:.2f} ms")
+            if lat['std'] is not None:
+                print(f"    Std: {lat['std']:.2f} ms")
+            else:
+                print(f"    Std: N/A (need >= 2 samples)")
+        else:
+            print(f"\n  Flow {flow_id}: No latency samples")
+    if follower.late_packets:
+        print(f"\n  {follower.late_packets} packet(s) arrived after their window closed (raise --lateness)")
 
 
 def main():
@@ -400,9 +483,31 @@ def main():
                        help="Offset in seconds from first packet time (default: 0, start from first packet)")
     parser.add_argument("--num-flows", type=int, default=2,
                        help="Number of sender/receiver flows to analyze (default: 2)")
+    parser.add_argument("--follow", action="store_true",
+                       help="Tail the logs of a running experiment and print each window when it closes")
+    parser.add_argument("--lateness", type=float, default=DEFAULT_LATENESS,
+                       help=f"--follow: seconds a window stays open after its end (default: {DEFAULT_LATENESS})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                       help=f"--follow: seconds between polls at end of file (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument("--idle-timeout", type=float,
+                       help="--follow: stop after this many seconds without new log data (default: run until Ctrl-C)")
 
     args = parser.parse_args()
 
+    if args.follow:
+        follow_wrr_results(
+            args.outputs_dir,
+            args.start_time,
+            args.end_time,
+            args.window_size,
+            args.start_offset,
+            args.num_flows,
+            args.lateness,
+            args.poll_interval,
+            args.idle_timeout
+        )
+        return
+
     analyze_wrr_results(
         args.outputs_dir,
         args.start_time,
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: MRI telemetry decoding, packets per second before and after
+utils/mri_decoder.py.
+
+Compared decoders (same synthetic frames, 20-byte traces by default):
+  - scapy:   Ether(raw) dissection + IPOption_MRI lookup (old receive.py path;
+             only if scapy is installed)
+  - legacy:  old receive.parse_mri_manual (bytes slicing + int.from_bytes,
+             dict per trace)
+  - decoder: mri_decoder.decode_frame (memoryview + struct.Struct)
+
+Usage:
+    python3 bench_mri_decoder.py [--packets 200000] [--hops 1] [--trace-bytes 20]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+_utils_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from mri_decoder import decode_frame
+
+
+def build_frame(hops, trace_bytes, payload=b"0,1700000000.123456,telemetry"):
+    """Build an Ethernet/IPv4(MRI option)/UDP frame the way the switch emits it."""
+    n_fields = trace_bytes // 4
+    traces = b"".join(
+        struct.pack("!%dI" % n_fields, *([hop + 1] + [hop * 3 + i for i in range(1, n_fields)]))
+        for hop in range(hops)
+    )
+    option = struct.pack("!BBH", 31, 4 + len(traces), hops) + traces
+    ihl = (20 + len(option)) // 4
+    if ihl > 15:
+        raise ValueError("%d x %d-byte traces exceed the 60-byte IPv4 header" % (hops, trace_bytes))
+    udp = struct.pack("!HHHH", 1234, 4321, 8 + len(payload), 0) + payload
+    ip = struct.pack("!BBHHHBBH4s4s", 0x40 | ihl, 0, 20 + len(option) + len(udp), 1500, 0, 64, 17, 0,
+                     bytes([10, 0, 1, 3]), bytes([10, 0, 2, 3]))
+    eth = b"\xff" * 6 + b"\x00\x00\x00\x00\x01\x03" + b"\x08\x00"
+    return eth + ip + option + udp
+
+
+def legacy_parse_mri_manual(raw):
+    """Copy of the former receive.parse_mri_manual (on raw frame bytes)."""
+    try:
+        if len(raw) < 34:
+            return None
+        raw = raw[14:]
+        ihl = (raw[0] & 0x0f) * 4
+        if ihl < 20:
+            return None
+        opt_start = 20
+        while opt_start < ihl - 1:
+            opt_type = raw[opt_start]
+            opt_len = raw[opt_start + 1]
+            if opt_len < 2:
+                break
+            if opt_type == 31:
+                if opt_len < 6:
+                    return None
+                count = (raw[opt_start + 2] << 8) | raw[opt_start + 3]
+                trace_bytes = opt_len - 4
+                if count == 0:
+                    return []
+                bytes_per_trace = trace_bytes // count
+                if bytes_per_trace not in (16, 20):
+                    return None
+                traces = []
+                off = opt_start + 4
+                for _ in range(count):
+                    t = {
+                        "swid": int.from_bytes(raw[off:off+4], "big"),
+                        "qdepth": int.from_bytes(raw[off+4:off+8], "big"),
+                        "flow1_qdepth": int.from_bytes(raw[off+8:off+12], "big"),
+                        "flow2_qdepth": int.from_bytes(raw[off+12:off+16], "big"),
+                        "latency": int.from_bytes(raw[off+16:off+20], "big") if bytes_per_trace == 20 else 0,
+                    }
+                    traces.append(t)
+                    off += bytes_per_trace
+                return traces
+            opt_start += opt_len
+    except Exception:
+        pass
+    return None
+
+
+def make_scapy_decoder():
+    """Old receive.py path: Scapy dissection of the frame + option lookup. None if scapy is missing."""
+    try:
+        from scapy.all import Ether, IP
+    except ImportError:
+        return None
+
+    def scapy_decode(raw):
+        pkt = Ether(raw)
+        if IP not in pkt:
+            return None
+        for opt in pkt[IP].options:
+            if getattr(opt, "option", None) == 31:
+                return opt
+        return None
+
+    return scapy_decode
+
+
+def run(name, fn, frames):
+    t0 = time.perf_counter()
+    for f in frames:
+        fn(f)
+    elapsed = time.perf_counter() - t0
+    pps = len(frames) / elapsed if elapsed > 0 else float("inf")
+    print(f"  {name:<8} {len(frames):>9} pkts  {elapsed:8.3f} s  {pps:>12,.0f} pkts/s")
+    return pps
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark MRI decoding (pkts/s before vs after)")
+    ap.add_argument("--packets", type=int, default=200000, help="Frames per decoder (default: 200000)")
+    ap.add_argument("--hops", type=int, default=1, help="Switch traces per frame (default: 1)")
+    ap.add_argument("--trace-bytes", type=int, choices=(16, 20), default=20, help="Trace layout (default: 20)")
+    args = ap.parse_args()
+
+    frame = build_frame(args.hops, args.trace_bytes)
+    frames = [frame] * args.packets
+
+    expected = [(t["swid"], t["qdepth"], t["flow1_qdepth"], t["flow2_qdepth"], t["latency"])
+                for t in legacy_parse_mri_manual(frame)]
+    assert [tuple(t) for t in decode_frame(frame).traces] == expected, "decoder disagrees with legacy parser"
+
+    print(f"MRI decode benchmark: {args.hops} hops x {args.trace_bytes}-byte traces, {len(frame)}-byte frame")
+    results = {}
+    scapy_decode = make_scapy_decoder()
+    if scapy_decode is not None:
+        n = max(1, args.packets // 20)  # scapy is slow; keep the run short
+        results["scapy"] = run("scapy", scapy_decode, frames[:n])
+    else:
+        print("  scapy    (not installed, skipped)")
+    results["legacy"] = run("legacy", legacy_parse_mri_manual, frames)
+    results["decoder"] = run("decoder", decode_frame, frames)
+
+    print("Speedup of decoder:")
+    for name in ("scapy", "legacy"):
+        if name in results:
+            print(f"  vs {name:<7} {results['decoder'] / results[name]:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk table-entry construction with P4InfoHelper.
+
+buildTableEntry() resolves the table id, every match field, the action id and
+every action param. The helper used to scan p4info.tables / p4info.actions for
+each of these (and compile the get_*_id regex on every call); it now looks them
+up in dicts built at load time, with the field encoders resolved per bitwidth.
+
+LinearP4InfoHelper below keeps the old scans as the reference. Both helpers
+build the same entries from the same p4info, the results are compared
+byte-for-byte, and the time per entry is reported.
+
+The p4info is synthetic (--tables tables with --fields exact/lpm/ternary match
+fields each, --actions actions with --params params each), or a real file with
+--p4info, e.g. program/qos/build/qos.p4.p4info.txt.
+
+Usage:
+    python3 bench_p4info_helper.py [--entries 20000] [--tables 200] [--actions 400]
+                                   [--fields 3] [--params 3] [--p4info FILE]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, UTILS_DIR)
+sys.path.insert(0, os.path.join(UTILS_DIR, 'p4runtime_lib'))
+
+import google.protobuf.text_format
+from p4.config.v1 import p4info_pb2
+from p4.v1 import p4runtime_pb2
+
+from p4runtime_lib.helper import P4InfoHelper
+from convert import encode
+
+MATCH_TYPES = (p4info_pb2.MatchField.EXACT, p4info_pb2.MatchField.LPM, p4info_pb2.MatchField.TERNARY)
+
+
+class LinearP4InfoHelper(P4InfoHelper):
+    """The previous lookups: a scan of the p4info per call."""
+
+    def get(self, entity_type, name=None, id=None):
+        for o in getattr(self.p4info, entity_type):
+            pre = o.preamble
+            if name:
+                if (pre.name == name or pre.alias == name):
+                    return o
+            else:
+                if pre.id == id:
+                    return o
+        raise AttributeError("Could not find %r of type %s" % (name or id, entity_type))
+
+    def __getattr__(self, attr):
+        m = re.search(r"^get_(\w+)_id$", attr)
+        if m:
+            primitive = m.group(1)
+            return lambda name: self.get_id(primitive, name)
+        raise AttributeError(attr)
+
+    def get_match_field(self, table_name, name=None, id=None):
+        for t in self.p4info.tables:
+            if t.preamble.name == table_name:
+                for mf in t.match_fields:
+                    if mf.name == name:
+                        return mf
+        raise AttributeError("%r has no attribute %r" % (table_name, name))
+
+    def get_match_field_pb(self, table_name, match_field_name, value):
+        p4info_match = self.get_match_field(table_name, match_field_name)
+        bitwidth = p4info_match.bitwidth
+        p4runtime_match = p4runtime_pb2.FieldMatch()
+        p4runtime_match.field_id = p4info_match.id
+        match_type = p4info_match.match_type
+        if match_type == p4info_pb2.MatchField.EXACT:
+            p4runtime_match.exact.value = encode(value, bitwidth)
+        elif match_type == p4info_pb2.MatchField.LPM:
+            p4runtime_match.lpm.value = encode(value[0], bitwidth)
+            p4runtime_match.lpm.prefix_len = value[1]
+        elif match_type == p4info_pb2.MatchField.TERNARY:
+            p4runtime_match.ternary.value = encode(value[0], bitwidth)
+            p4runtime_match.ternary.mask = encode(value[1], bitwidth)
+        return p4runtime_match
+
+    def get_action_param(self, action_name, name=None, id=None):
+        for a in self.p4info.actions:
+            if a.preamble.name == action_name:
+                for p in a.params:
+                    if p.name == name:
+                        return p
+        raise AttributeError("action %r has no param %r" % (action_name, name))
+
+    def get_action_param_pb(self, action_name, param_name, value):
+        p4info_param = self.get_action_param(action_name, param_name)
+        p4runtime_param = p4runtime_pb2.Action.Param()
+        p4runtime_param.param_id = p4info_param.id
+        p4runtime_param.value = encode(value, p4info_param.bitwidth)
+        return p4runtime_param
+
+    def buildTableEntry(self, table_name, match_fields=None, action_name=None, action_params=None):
+        table_entry = p4runtime_pb2.TableEntry()
+        table_entry.table_id = self.get_tables_id(table_name)
+        if match_fields:
+            table_entry.match.extend([
+                self.get_match_field_pb(table_name, match_field_name, value)
+                for match_field_name, value in match_fields.items()
+            ])
+        if action_name:
+            action = table_entry.action.action
+            action.action_id = self.get_actions_id(action_name)
+            if action_params:
+                action.params.extend([
+                    self.get_action_param_pb(action_name, field_name, value)
+                    for field_name, value in action_params.items()
+                ])
+        return table_entry
+
+
+def synthetic_p4info(n_tables, n_actions, n_fields, n_params, seed):
+    """P4Info text with n_tables tables (n_fields match fields each, one of
+    three actions) and n_actions actions (n_params params each)."""
+    rng = random.Random(seed)
+    p4info = p4info_pb2.P4Info()
+    for a in range(n_actions):
+        action = p4info.actions.add()
+        action.preamble.id = 0x01000000 + a
+        action.preamble.name = "MyIngress.action_%d" % a
+        action.preamble.alias = "action_%d" % a
+        for p in range(n_params):
+            param = action.params.add()
+            param.id = p + 1
+            param.name = "param_%d" % p
+            param.bitwidth = rng.choice((9, 16, 32, 48))
+    for t in range(n_tables):
+        table = p4info.tables.add()
+        table.preamble.id = 0x02000000 + t
+        table.preamble.name = "MyIngress.table_%d" % t
+        table.preamble.alias = "table_%d" % t
+        for f in range(n_fields):
+            mf = table.match_fields.add()
+            mf.id = f + 1
+            mf.name = "hdr.field_%d" % f
+            mf.bitwidth = 32
+            mf.match_type = MATCH_TYPES[f % len(MATCH_TYPES)]
+        for a in rng.sample(range(n_actions), min(3, n_actions)):
+            table.action_refs.add().id = 0x01000000 + a
+    return google.protobuf.text_format.MessageToString(p4info)
+
+
+def match_value(mf, rng):
+    v = rng.getrandbits(mf.bitwidth)
+    if mf.match_type == p4info_pb2.MatchField.LPM:
+        return (v, rng.randint(0, mf.bitwidth))
+    if mf.match_type in (p4info_pb2.MatchField.TERNARY, p4info_pb2.MatchField.RANGE):
+        return (v, (1 << mf.bitwidth) - 1)
+    return v
+
+
+def entry_specs(p4info, n, seed):
+    """n buildTableEntry() argument sets over the tables that have actions."""
+    rng = random.Random(seed)
+    actions = {a.preamble.id: a for a in p4info.actions}
+    tables = [t for t in p4info.tables if any(r.id in actions for r in t.action_refs)
+              and all(mf.match_type in MATCH_TYPES + (p4info_pb2.MatchField.RANGE,) for mf in t.match_fields)]
+    if not tables:
+        raise SystemExit("p4info has no table with actions to build entries for")
+    specs = []
+    for _ in range(n):
+        t = rng.choice(tables)
+        a = actions[rng.choice([r.id for r in t.action_refs if r.id in actions])]
+        specs.append((t.preamble.name,
+                      {mf.name: match_value(mf, rng) for mf in t.match_fields},
+                      a.preamble.name,
+                      {p.name: rng.getrandbits(p.bitwidth) for p in a.params}))
+    return specs
+
+
+def build_all(helper, specs):
+    t0 = time.perf_counter()
+    entries = [helper.buildTableEntry(table_name=t, match_fields=m, action_name=a, action_params=p)
+               for t, m, a, p in specs]
+    return time.perf_counter() - t0, entries
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark indexed P4InfoHelper lookups against linear scans")
+    ap.add_argument("--entries", type=int, default=20000, help="Table entries to build (default: 20000)")
+    ap.add_argument("--tables", type=int, default=200, help="Synthetic p4info: tables (default: 200)")
+    ap.add_argument("--actions", type=int, default=400, help="Synthetic p4info: actions (default: 400)")
+    ap.add_argument("--fields", type=int, default=3, help="Synthetic p4info: match fields per table (default: 3)")
+    ap.add_argument("--params", type=int, default=3, help="Synthetic p4info: params per action (default: 3)")
+    ap.add_argument("--p4info", type=str, default=None, help="Use this p4info text file instead")
+    args = ap.parse_args()
+
+    if args.p4info:
+        path = args.p4info
+    else:
+        fd, path = tempfile.mkstemp(suffix=".p4info.txt")
+        with os.fdopen(fd, "w") as f:
+            f.write(synthetic_p4info(args.tables, args.actions, args.fields, args.params, seed=1))
+    try:
+        t0 = time.perf_counter()
+        indexed = P4InfoHelper(path)
+        load_s = time.perf_counter() - t0
+        linear = LinearP4InfoHelper(path)
+    finally:
+        if not args.p4info:
+            os.unlink(path)
+
+    p4info = indexed.p4info
+    print(f"p4info: {len(p4info.tables)} tables, {len(p4info.actions)} actions "
+          f"(load + index {load_s * 1e3:.1f} ms)", flush=True)
+    specs = entry_specs(p4info, args.entries, seed=2)
+
+    linear_s, expect = build_all(linear, specs)
+    indexed_s, got = build_all(indexed, specs)
+    if [e.SerializeToString() for e in got] != [e.SerializeToString() for e in expect]:
+        raise SystemExit("indexed helper built different entries than the linear scan")
+
+    for label, s in (("linear scan", linear_s), ("indexed", indexed_s)):
+        print(f"  {label:<14}{s / len(specs) * 1e6:>10.1f} us/entry{len(specs) / s:>12,.0f} entries/s")
+    print(f"  speedup: {linear_s / indexed_s:.1f}x, entries identical")
+
+
+if __name__ == "__main__":
+    main()
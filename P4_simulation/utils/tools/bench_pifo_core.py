@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PIFO flow-scheduler cores (sched_sim.pifo_core) at 10k-1M queued packets.
+
+Compares the port of the C++ shared_ptr linked lists (LinkedListPIFO for the
+FS, LinkedListFIFOBank for the FB) with HeapPIFO, CalendarPIFO and a deque FB.
+Each core is filled to the target occupancy, then timed on a hold workload
+(pop the head + push a new packet, so the occupancy stays constant), on force
+dequeues (pop_flow + push) and, for the FIFO bank, enqueue + dequeue of one
+flow. Ranks are 1500-step integers like send_enhanced.py's, so CalendarPIFO
+runs on its buckets.
+
+The linked list is built directly in sorted order (an enqueue_FS() fill is
+O(n^2)) and timed on --linked-ops operations only. All cores run the same
+operation sequence and their outputs are checked against each other.
+
+Usage:
+    python3 bench_pifo_core.py [--sizes 10000,100000,1000000] [--ops 100000]
+                               [--linked-ops 200] [--flows 64] [--rank-levels 64]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sched_sim.pifo_core import (CalendarPIFO, HeapPIFO, LinkedListFIFOBank, LinkedListPIFO,
+                                 _FBNode, _FSNode)
+
+RANK_STEP = 1500
+
+
+def workload(n, ops, flows, levels, seed):
+    """Initial (rank, arrival, flow) entries and a list of ops: ('hold'|'force', rank, flow, victim)."""
+    rng = random.Random(seed)
+    initial = [(RANK_STEP * rng.randint(1, levels), i, rng.randrange(flows)) for i in range(n)]
+    seq = [(RANK_STEP * rng.randint(1, levels), rng.randrange(flows), rng.randrange(flows))
+           for _ in range(ops)]
+    return initial, seq
+
+
+def build_linked(initial):
+    """LinkedListPIFO holding `initial`, linked in sorted order in O(n log n)."""
+    core = LinkedListPIFO()
+    prev = None
+    for rank, arrival, flow in sorted(initial):
+        node = _FSNode(rank, arrival, flow, (rank, arrival, flow))
+        if prev is None:
+            core.head = node
+        else:
+            prev.next = node
+        prev = node
+    core._len = len(initial)
+    return core
+
+
+def build_linked_fb(initial):
+    """LinkedListFIFOBank holding `initial` (per-flow chains in arrival order), built in O(n)."""
+    bank = LinkedListFIFOBank()
+    rows, tails = {}, {}
+    for rank, arrival, flow in initial:
+        if flow not in rows:
+            row = rows[flow] = _FBNode(flow)
+            tails[flow] = row
+            row.bottom, bank.head = bank.head, row
+        node = _FBNode(flow, (rank, arrival, flow))
+        tails[flow].left = node
+        tails[flow] = node
+    return bank
+
+
+def fill(core, initial):
+    t0 = time.perf_counter()
+    for rank, arrival, flow in initial:
+        core.push(rank, arrival, flow, (rank, arrival, flow))
+    return time.perf_counter() - t0
+
+
+def run_fs_ops(core, seq, first_arrival, force):
+    """Hold (force=False) or force-dequeue ops; returns (seconds, popped items)."""
+    out = []
+    arrival = first_arrival
+    t0 = time.perf_counter()
+    for rank, flow, victim in seq:
+        out.append(core.pop_flow(victim) if force else core.pop())
+        arrival += 1
+        core.push(rank, arrival, flow, (rank, arrival, flow))
+    return time.perf_counter() - t0, out
+
+
+def run_fb_ops(enqueue, dequeue, seq, first_arrival):
+    out = []
+    arrival = first_arrival
+    t0 = time.perf_counter()
+    for rank, flow, victim in seq:
+        arrival += 1
+        enqueue(flow, (rank, arrival, flow))
+        out.append(dequeue(victim))
+    return time.perf_counter() - t0, out
+
+
+def report(label, n_ops, seconds):
+    print(f"    {label:<22}{seconds / n_ops * 1e6:>12.2f} us/op{n_ops / seconds:>14,.0f} ops/s", flush=True)
+
+
+def bench_size(n, args):
+    print(f"\n{n:,} queued packets, {args.flows} flows, {args.rank_levels} rank levels", flush=True)
+    initial, seq = workload(n, args.ops, args.flows, args.rank_levels, seed=n)
+    linked_seq = seq[:args.linked_ops]
+
+    factories = {
+        "heap": HeapPIFO,
+        "calendar": lambda: CalendarPIFO(RANK_STEP, RANK_STEP * args.rank_levels, RANK_STEP),
+    }
+    for force in (False, True):
+        kind = "force-dequeue" if force else "hold"
+        linked_s, expect = run_fs_ops(build_linked(initial), linked_seq, n, force)
+        report(f"linked {kind}", len(linked_seq), linked_s)
+        for name, factory in factories.items():
+            core = factory()
+            fill_s = fill(core, initial)
+            if not force:
+                report(f"{name} fill", n, fill_s)
+            # the prefix the linked list ran is checked against it, then the rest is timed too
+            prefix_s, got = run_fs_ops(core, linked_seq, n, force)
+            if got != expect:
+                raise SystemExit(f"{name} {kind}: output differs from the linked-list port")
+            rest_s, _ = run_fs_ops(core, seq[len(linked_seq):], n + len(linked_seq), force)
+            s = prefix_s + rest_s
+            report(f"{name} {kind}", len(seq), s)
+            print(f"      speedup vs linked: {linked_s / len(linked_seq) / (s / len(seq)):,.0f}x")
+
+    bank = build_linked_fb(initial)
+    linked_s, expect = run_fb_ops(bank.enqueue, bank.dequeue, linked_seq, n)
+    report("linked FB enq+deq", len(linked_seq), linked_s)
+    fifos = {}
+    for rank, arrival, flow in initial:
+        fifos.setdefault(flow, deque()).append((rank, arrival, flow))
+
+    def fb_enqueue(flow, item):
+        fifos.setdefault(flow, deque()).append(item)
+
+    def fb_dequeue(flow):
+        fifo = fifos.get(flow)
+        return fifo.popleft() if fifo else None
+
+    deque_s, got = run_fb_ops(fb_enqueue, fb_dequeue, linked_seq, n)
+    if got != expect:
+        raise SystemExit("deque FB: output differs from the linked-list port")
+    rest_s, _ = run_fb_ops(fb_enqueue, fb_dequeue, seq[len(linked_seq):], n + len(linked_seq))
+    s = deque_s + rest_s
+    report("deque FB enq+deq", len(seq), s)
+    print(f"      speedup vs linked: {linked_s / len(linked_seq) / (s / len(seq)):,.0f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PIFO cores against the linked-list port")
+    ap.add_argument("--sizes", default="10000,100000,1000000",
+                    help="Comma-separated queue occupancies (default: 10000,100000,1000000)")
+    ap.add_argument("--ops", type=int, default=100_000, help="Operations timed per core (default: 100000)")
+    ap.add_argument("--linked-ops", type=int, default=200,
+                    help="Operations timed on the O(n) linked-list port (default: 200)")
+    ap.add_argument("--flows", type=int, default=64, help="Number of flows (default: 64)")
+    ap.add_argument("--rank-levels", type=int, default=64,
+                    help="Distinct ranks 1500, 3000, ... (default: 64)")
+    args = ap.parse_args()
+    args.linked_ops = min(args.linked_ops, args.ops)
+
+    for n in (int(s) for s in args.sizes.split(",")):
+        bench_size(n, args)
+    print("\nAll cores returned the same packets as the linked-list port.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: packets per second of raw_sender.RawSender against a per-packet
+build-and-send loop, unpaced, on one interface (default: lo).
+
+    rebuild   the old normal-mode pattern without Scapy: serialize the whole
+              Ether/IP/UDP frame per packet, full checksums, one send() each
+    template  FrameTemplate.patch into the batch slots + one sendmmsg() per
+              --batch packets (RawSender.send_batch)
+
+Before timing, --check frames patched by FrameTemplate are compared with
+frames built from scratch with full checksums for random seq/rank/tx_ns.
+Needs CAP_NET_RAW.
+
+Usage:
+    python3 bench_raw_sender.py [--iface lo] [--packets 200000] [--batch 1,8,32,64] [--check 10000]
+"""
+
+import argparse
+import os
+import random
+import socket
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payload_stamp import stamped_payload
+from raw_sender import (BROADCAST_MAC, FrameTemplate, RawSender, build_frame, fold, if_hwaddr, if_ipv4,
+                        ones_sum)
+
+DPORT = 4322
+SPORT = 1234
+
+
+def full_frame(src_mac, src_ip, dst_ip, flow_id, seq, rank, tx_ns):
+    """Frame built from scratch with both checksums computed over the whole header/segment."""
+    frame = bytearray(build_frame(src_mac, BROADCAST_MAC, src_ip, dst_ip, SPORT, DPORT,
+                                  stamped_payload(flow_id, seq, tx_ns)))
+    struct.pack_into("!H", frame, 18, rank & 0xffff)
+    struct.pack_into("!H", frame, 24, ~fold(ones_sum(bytes(frame[14:34]))) & 0xffff)
+    udp = bytes(frame[34:])
+    pseudo = bytes(frame[26:34]) + struct.pack("!HH", socket.IPPROTO_UDP, len(udp))
+    struct.pack_into("!H", frame, 40, (~fold(ones_sum(pseudo + udp)) & 0xffff) or 0xffff)
+    return bytes(frame)
+
+
+def check(src_mac, src_ip, dst_ip, n):
+    template = FrameTemplate(src_mac, BROADCAST_MAC, src_ip, dst_ip, DPORT, SPORT, flow_id=2)
+    buf = bytearray(template.frame)
+    rng = random.Random(0)
+    for _ in range(n):
+        seq, rank, tx_ns = rng.getrandbits(32), rng.getrandbits(20), rng.getrandbits(64)
+        template.patch(buf, 0, seq, rank, tx_ns)
+        if bytes(buf) != full_frame(src_mac, src_ip, dst_ip, 2, seq, rank, tx_ns):
+            raise SystemExit(f"patched frame differs from a full build (seq={seq} rank={rank} tx_ns={tx_ns})")
+
+
+def run_rebuild(iface, src_mac, src_ip, dst_ip, packets):
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    sock.bind((iface, 0))
+    t0 = time.perf_counter()
+    for seq in range(1, packets + 1):
+        sock.send(full_frame(src_mac, src_ip, dst_ip, 1, seq, 1500, time.time_ns()))
+    seconds = time.perf_counter() - t0
+    sock.close()
+    return seconds, packets
+
+
+def run_template(iface, dst_ip, packets, batch):
+    tx = RawSender(iface, dst_ip, DPORT, SPORT, flow_id=1, batch=batch)
+    ranks = [1500] * batch
+    t0 = time.perf_counter()
+    for first in range(1, packets + 1, batch):
+        tx.send_batch(first, ranks[:min(batch, packets + 1 - first)])
+    seconds = time.perf_counter() - t0
+    tx.close()
+    return seconds, tx.syscalls
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the raw AF_PACKET sender")
+    ap.add_argument("--iface", default="lo", help="Interface to send on (default: lo)")
+    ap.add_argument("--dst", default="127.0.0.1", help="Destination IPv4 in the frames (default: 127.0.0.1)")
+    ap.add_argument("--packets", type=int, default=200_000, help="Packets per run (default: 200000)")
+    ap.add_argument("--batch", default="1,8,32,64", help="Comma-separated sendmmsg batch sizes (default: 1,8,32,64)")
+    ap.add_argument("--check", type=int, default=10_000, help="Frames compared with a full build (default: 10000)")
+    args = ap.parse_args()
+
+    src_mac, src_ip = if_hwaddr(args.iface), if_ipv4(args.iface)
+    check(src_mac, src_ip, args.dst, args.check)
+    print(f"{args.check:,} patched frames match frames built with full checksums.\n")
+
+    print(f"{args.packets:,} packets on {args.iface}:", flush=True)
+    base, _ = run_rebuild(args.iface, src_mac, src_ip, args.dst, args.packets)
+    print(f"    {'rebuild':<14}{args.packets / base:>12,.0f} pps  {args.packets:>9,} send calls", flush=True)
+    for batch in (int(b) for b in args.batch.split(",")):
+        seconds, calls = run_template(args.iface, args.dst, args.packets, batch)
+        print(f"    {f'template x{batch}':<14}{args.packets / seconds:>12,.0f} pps  {calls:>9,} send calls"
+              f"{base / seconds:>8.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
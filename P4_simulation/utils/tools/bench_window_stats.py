@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: windowed bandwidth/latency analysis, per-window Python rescans
+(former analyze_wrr_results loop) vs window_stats.analyze_windows (NumPy).
+
+A synthetic two-flow log is generated in memory (Poisson sends, random queueing
+delay, a sparse sender log for flow 1). The NumPy engine runs on the full log
+(10M packets by default); the legacy loop is O(windows x packets), so it runs
+on a --legacy-packets log of the same duration and both are compared there.
+
+Usage:
+    python3 bench_window_stats.py [--packets 10000000] [--legacy-packets 1000000]
+                                  [--duration 300] [--window-size 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from window_stats import MAX_LATENCY_MS, analyze_windows
+
+
+def synthetic_log(packets, duration, seed=1):
+    """{flow_id: recv_times}, {flow_id: (seqs, send_times)} for two flows sharing `packets`."""
+    rng = np.random.default_rng(seed)
+    t0 = 1700000000.0
+    flow_recv, flow_send = {}, {}
+    for flow_id, (share, log_every) in enumerate(((0.8, 1), (0.2, 7))):
+        n = int(packets * share)
+        send = t0 + np.cumsum(rng.exponential(duration / n, n))
+        recv = send + rng.uniform(-0.001, 0.3, n)
+        seqs = np.arange(1, n + 1)
+        logged = (seqs % log_every == 0) | (seqs == 1)
+        flow_recv[flow_id] = recv
+        flow_send[flow_id] = (seqs[logged], send[logged])
+    return flow_recv, flow_send
+
+
+def legacy_windows(flow_recv, flow_send, start_time, end_time, window_size):
+    """Former analyze_wrr_results per-window loop (lists, dict rebuilt per window)."""
+    out = {flow_id: [] for flow_id in flow_recv}
+    current_time = start_time
+    while current_time < end_time:
+        window_end = min(current_time + window_size, end_time)
+        for flow_id, recv_times in flow_recv.items():
+            send_times = flow_send[flow_id]
+            packets_in_window = [t for t in recv_times if current_time <= t <= window_end]
+            send_time_by_seq = {seq_num: t for seq_num, t in send_times}
+            latencies = []
+            for recv_idx, recv_time in enumerate(recv_times):
+                if not (current_time <= recv_time <= window_end):
+                    continue
+                packet_seq = recv_idx + 1
+                if packet_seq not in send_time_by_seq:
+                    continue
+                latency_ms = (recv_time - send_time_by_seq[packet_seq]) * 1000
+                if 0 <= latency_ms < MAX_LATENCY_MS:
+                    latencies.append(latency_ms)
+            out[flow_id].append((len(packets_in_window),
+                                 statistics.median(latencies) if latencies else None,
+                                 statistics.mean(latencies) if latencies else None))
+        current_time = window_end
+    return out
+
+
+def bounds(flow_recv, flow_send):
+    start = min(min(float(t.min()) for t in flow_recv.values()),
+                min(float(t.min()) for _, t in flow_send.values()))
+    end = max(float(t.max()) for t in flow_recv.values())
+    return start, end
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark windowed WRR analysis (legacy loop vs NumPy engine)")
+    ap.add_argument("--packets", type=int, default=10_000_000, help="Packets in the synthetic log (default: 10M)")
+    ap.add_argument("--legacy-packets", type=int, default=1_000_000,
+                    help="Packets given to the legacy loop (default: 1M; 0 skips it)")
+    ap.add_argument("--duration", type=float, default=300.0, help="Synthetic run length in seconds (default: 300)")
+    ap.add_argument("--window-size", type=float, default=10.0, help="Window size in seconds (default: 10)")
+    args = ap.parse_args()
+
+    print(f"Generating synthetic log: {args.packets:,} packets over {args.duration:.0f} s")
+    flow_recv, flow_send = synthetic_log(args.packets, args.duration)
+    start, end = bounds(flow_recv, flow_send)
+
+    t0 = time.perf_counter()
+    result = analyze_windows(flow_recv, flow_send, start, end, args.window_size)
+    engine_s = time.perf_counter() - t0
+    n_windows = len(result['starts'])
+    print(f"  engine  {args.packets:>11,} pkts  {n_windows} windows  {engine_s:8.3f} s  "
+          f"{args.packets / engine_s:>14,.0f} pkts/s")
+
+    if args.legacy_packets <= 0:
+        return
+    # Smaller log over the same duration, so both see the same number of windows
+    sub_recv, sub_send = synthetic_log(args.legacy_packets, args.duration)
+    n_sub = sum(len(r) for r in sub_recv.values())
+    start, end = bounds(sub_recv, sub_send)
+
+    t0 = time.perf_counter()
+    sub_result = analyze_windows(sub_recv, sub_send, start, end, args.window_size)
+    sub_engine_s = time.perf_counter() - t0
+
+    legacy_recv = {f: r.tolist() for f, r in sub_recv.items()}
+    legacy_send = {f: list(zip(s.tolist(), t.tolist())) for f, (s, t) in sub_send.items()}
+    t0 = time.perf_counter()
+    legacy = legacy_windows(legacy_recv, legacy_send, start, end, args.window_size)
+    legacy_s = time.perf_counter() - t0
+    print(f"  legacy  {n_sub:>11,} pkts  {len(legacy[0])} windows  {legacy_s:8.3f} s  "
+          f"{n_sub / legacy_s:>14,.0f} pkts/s")
+    print(f"  engine  {n_sub:>11,} pkts  {len(sub_result['starts'])} windows  {sub_engine_s:8.3f} s  "
+          f"{n_sub / sub_engine_s:>14,.0f} pkts/s")
+    print(f"Speedup on {n_sub:,} packets: {legacy_s / sub_engine_s:.1f}x")
+
+    # Output check: counts exact, latency median/mean to the printed precision
+    for flow_id, windows in legacy.items():
+        f = sub_result['flows'][flow_id]
+        for w, (count, median, mean) in enumerate(windows):
+            lat = f['latency'][w]
+            assert count == int(f['counts'][w]), f"flow {flow_id} window {w}: count mismatch"
+            if median is None:
+                assert lat is None, f"flow {flow_id} window {w}: latency mismatch"
+            else:
+                assert f"{median:.2f} {mean:.2f}" == f"{lat['median']:.2f} {lat['mean']:.2f}", \
+                    f"flow {flow_id} window {w}: latency mismatch"
+    print("Per-window counts and latency median/mean match the legacy loop.")
+
+
+if __name__ == "__main__":
+    main()
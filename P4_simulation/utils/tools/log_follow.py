@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+--follow mode for analyze_wrr_results.py and measure_bandwidth_allocation.py.
+
+Tails the sender and receiver logs of a running experiment (like tail -f) and
+keeps per-window accumulators, so each window's allocation and latency stats
+are emitted as soon as the window closes instead of after the run.
+
+  - Readers remember their file offset and only parse what was appended since
+    the last poll (text logs line by line, binary receiver logs record by record).
+  - A window [start, end] closes once the newest receive timestamp (or the wall
+    clock, when every log is idle at EOF) is past end + lateness.
+  - Memory is bounded by the open windows: only their counters and latency
+    samples are kept; send timestamps are dropped once the receiver has passed
+    their seq_num.
+
+Window and seq_num matching semantics follow window_stats.py (inclusive window
+boundaries; a stamped packet's own send time, else the sender log's time of its
+stamped seq, else received packet i <-> sender seq_num i+1).
+"""
+
+import re
+import time
+
+from payload_stamp import STAMP_RE
+from recv_log import HEADER, HEADER_SIZE, find_receiver_log, record_layout
+
+READ_CHUNK = 1 << 20  # bytes read per log per poll
+DEFAULT_LATENESS = 2.0  # seconds a window stays open after its end
+DEFAULT_POLL_INTERVAL = 0.5
+
+RECV_TIME_RE = re.compile(r'received at time : ([\d.]+)')
+SENT_RE = re.compile(r'sent (\d+) packets until now : ([\d.]+)')
+
+
+class LineTail:
+    """Complete lines appended to a text file since the last call."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+        self._partial = b""
+
+    def read_lines(self):
+        """Returns (lines, at_eof). A missing file counts as EOF."""
+        if self._f is None:
+            try:
+                self._f = open(self.path, "rb")
+            except FileNotFoundError:
+                return [], True
+        data = self._f.read(READ_CHUNK)
+        if not data:
+            return [], True
+        at_eof = len(data) < READ_CHUNK
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        return [line.decode("utf-8", "replace") for line in lines], at_eof
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+
+class ReceiverTextParser:
+    """Incremental form of parse_receiver_log(): feed lines, get packets as
+    (receive timestamp, seq, tx time) tuples; seq 0 and tx None when not stamped.
+
+    With a payload_marker, a timestamp only counts once the marker line of the
+    same packet block is seen (analyze_wrr_results); without one every
+    "received at time" line counts (measure_bandwidth_allocation).
+    """
+
+    def __init__(self, payload_marker=None):
+        self.payload_marker = payload_marker
+        self._pending_ts = None
+        self._pending_stamp = (0, None)
+
+    def feed(self, line):
+        if self.payload_marker is None:
+            match = RECV_TIME_RE.search(line)
+            return (float(match.group(1)), 0, None) if match else None
+        if 'got a packet' in line:
+            self._pending_ts = None
+            self._pending_stamp = (0, None)
+            return None
+        match = RECV_TIME_RE.search(line)
+        if match:
+            self._pending_ts = float(match.group(1))
+            return None
+        match = STAMP_RE.search(line)
+        if match:
+            tx_ns = int(match.group(3))
+            self._pending_stamp = (int(match.group(2)), tx_ns / 1e9 if tx_ns else None)
+            return None
+        if self.payload_marker in line and self._pending_ts is not None:
+            ts, self._pending_ts = self._pending_ts, None
+            return (ts,) + self._pending_stamp
+        return None
+
+
+class BinTail:
+    """(receive timestamp, seq, tx time) of records appended to a binary receiver log."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+        self._record = None
+        self._stamped = False
+        self._partial = b""
+
+    def read_packets(self):
+        if self._f is None:
+            f = open(self.path, "rb")
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                f.close()
+                return [], True
+            magic, record_size, _ = HEADER.unpack(header)
+            try:
+                self._record, fields = record_layout(magic, record_size, self.path)
+            except ValueError:
+                f.close()
+                raise
+            self._stamped = any(name == "tx_ns" for name, _ in fields)
+            self._f = f
+        size = self._record.size
+        chunk = READ_CHUNK - READ_CHUNK % size
+        data = self._f.read(chunk)
+        if not data:
+            return [], True
+        at_eof = len(data) < chunk
+        data = self._partial + data
+        whole = len(data) - len(data) % size
+        self._partial = data[whole:]
+        records = self._record.iter_unpack(data[:whole])
+        if self._stamped:
+            # recv_ns, tx_ns, seq, ...
+            packets = [(rec[0] / 1e9, rec[2], rec[1] / 1e9 if rec[1] else None) for rec in records]
+        else:
+            packets = [(rec[0] / 1e9, 0, None) for rec in records]
+        return packets, at_eof
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+
+class ReceiverTail:
+    """receiver_h_r<N> log of either format; the format is picked when the file appears."""
+
+    def __init__(self, outputs_dir, host_index, payload_marker=None):
+        self.outputs_dir = outputs_dir
+        self.host_index = host_index
+        self.payload_marker = payload_marker
+        self.count = 0
+        self._src = None
+        self._parser = None
+
+    def _open(self):
+        path = find_receiver_log(self.outputs_dir, self.host_index)
+        if not path.exists():
+            return False
+        if path.suffix == ".bin":
+            self._src = BinTail(path)
+        else:
+            self._src = LineTail(path)
+            self._parser = ReceiverTextParser(self.payload_marker)
+        return True
+
+    def read_packets(self):
+        """(receive timestamp, seq, tx time) of the packets appended since the last call,
+        and whether the log is at EOF. seq is 0 and tx None for unstamped packets."""
+        # receive.py --log-format=bin creates the .bin just after its stdout .txt
+        if isinstance(self._src, LineTail) and self.count == 0 and \
+                find_receiver_log(self.outputs_dir, self.host_index).suffix == ".bin":
+            self._src.close()
+            self._src = self._parser = None
+        if self._src is None and not self._open():
+            return [], True
+        if self._parser is None:
+            packets, eof = self._src.read_packets()
+        else:
+            lines, eof = self._src.read_lines()
+            packets = [p for p in map(self._parser.feed, lines) if p is not None]
+        self.count += len(packets)
+        return packets, eof
+
+    def close(self):
+        if self._src is not None:
+            self._src.close()
+
+
+class _Window:
+    __slots__ = ("num", "start", "end", "counts", "latencies")
+
+    def __init__(self, num, start, end, num_flows):
+        self.num = num
+        self.start = start
+        self.end = end
+        self.counts = [0] * num_flows
+        self.latencies = [[] for _ in range(num_flows)]
+
+
+class WindowFollower:
+    """Per-window accumulators fed one packet at a time.
+
+    add_send()/add_recv() take log entries in file order; advance(watermark)
+    returns the windows that closed, as dicts:
+      {'num', 'start', 'end', 'flows': {flow_id: {'packets', 'rate', 'share', 'latency'}}}
+    where latency is a window_stats.latency_summary() (None without samples or
+    when with_latency is False).
+    """
+
+    def __init__(self, num_flows, window_size, start_time=None, start_offset=0.0, end_time=None,
+                 lateness=DEFAULT_LATENESS, with_latency=True):
+        self.num_flows = num_flows
+        self.window_size = window_size
+        self.start_time = start_time
+        self.start_offset = start_offset
+        self.end_time = end_time
+        self.lateness = lateness
+        self.with_latency = with_latency
+        if with_latency:
+            # NumPy is only needed for latency summaries (bandwidth-only follow stays stdlib)
+            import numpy as np
+            from window_stats import MAX_LATENCY_MS, latency_summary
+            self._max_latency_ms = MAX_LATENCY_MS
+            self._summary = lambda samples: latency_summary(np.asarray(samples))
+        self.max_recv = None
+        self.late_packets = 0
+        self.closed_windows = 0
+        self._windows = []  # open windows, oldest first
+        self._next_start = None
+        self._recv_count = [0] * num_flows
+        self._send_max_seq = [0] * num_flows
+        self._send_by_seq = [{} for _ in range(num_flows)]  # sends not yet received
+        self._pending_recv = [{} for _ in range(num_flows)]  # seq -> recv time, send not yet logged
+        # Run totals: packets; latency count/mean/M2/min/max (Welford)
+        self.total_packets = [0] * num_flows
+        self.total_latency = [[0, 0.0, 0.0, float("inf"), float("-inf")] for _ in range(num_flows)]
+
+    def _set_start(self, t):
+        if self._next_start is None:
+            if self.start_time is None:
+                self.start_time = t + self.start_offset
+            self._next_start = self.start_time
+
+    def _windows_for(self, t):
+        """Open windows containing t (boundaries inclusive), opening new ones as needed."""
+        if t < self.start_time or (self.end_time is not None and t > self.end_time):
+            return []
+        self._open_until(t)
+        hits = [w for w in self._windows if w.start <= t <= w.end]
+        if not hits:
+            self.late_packets += 1
+        return hits
+
+    def _open_until(self, t):
+        """Open windows (empty ones included) until the newest one covers t."""
+        while (t > self._windows[-1].end) if self._windows else (t >= self._next_start):
+            if self.end_time is not None and self._next_start >= self.end_time:
+                break
+            start = self._next_start
+            end = start + self.window_size
+            if self.end_time is not None:
+                end = min(end, self.end_time)
+            num = (self._windows[-1].num + 1) if self._windows else self.closed_windows + 1
+            self._windows.append(_Window(num, start, end, self.num_flows))
+            self._next_start = end
+
+    def add_send(self, flow_id, seq, t):
+        self._set_start(t)
+        if not self.with_latency:
+            return
+        if seq > self._send_max_seq[flow_id]:
+            self._send_max_seq[flow_id] = seq
+        recv_t = self._pending_recv[flow_id].pop(seq, None)
+        if recv_t is not None:
+            self._add_latency(flow_id, recv_t, (recv_t - t) * 1000)
+        elif seq > self._recv_count[flow_id]:
+            self._send_by_seq[flow_id][seq] = t
+
+    def add_recv(self, flow_id, t, seq=0, tx=None):
+        """One received packet; seq/tx (send time) from its stamp, if it had one."""
+        self._set_start(t)
+        self._recv_count[flow_id] += 1
+        if self.max_recv is None or t > self.max_recv:
+            self.max_recv = t
+        windows = self._windows_for(t)
+        for w in windows:
+            w.counts[flow_id] += 1
+        self.total_packets[flow_id] += len(windows)
+        if not self.with_latency:
+            return
+        if tx is not None:
+            self._add_latency(flow_id, t, (t - tx) * 1000)
+            return
+        if not seq:
+            seq = self._recv_count[flow_id]
+        send_t = self._send_by_seq[flow_id].pop(seq, None)
+        if send_t is not None:
+            self._add_latency(flow_id, t, (t - send_t) * 1000)
+        elif seq > self._send_max_seq[flow_id] and windows:
+            self._pending_recv[flow_id][seq] = t
+
+    def _add_latency(self, flow_id, recv_t, latency_ms):
+        if not (0 <= latency_ms < self._max_latency_ms):
+            return
+        for w in self._windows:
+            if w.start <= recv_t <= w.end:
+                w.latencies[flow_id].append(latency_ms)
+                acc = self.total_latency[flow_id]
+                acc[0] += 1
+                delta = latency_ms - acc[1]
+                acc[1] += delta / acc[0]
+                acc[2] += delta * (latency_ms - acc[1])
+                acc[3] = min(acc[3], latency_ms)
+                acc[4] = max(acc[4], latency_ms)
+
+    def _close(self, w, end=None):
+        if end is not None and w.start < end < w.end:
+            w.end = end
+        duration = w.end - w.start
+        rates = [c / duration if duration > 0 else 0.0 for c in w.counts]
+        total_rate = sum(rates)
+        flows = {}
+        for flow_id in range(self.num_flows):
+            flows[flow_id] = {
+                'packets': w.counts[flow_id],
+                'rate': rates[flow_id],
+                'share': rates[flow_id] / total_rate * 100 if total_rate > 0 else 0.0,
+                'latency': self._summary(w.latencies[flow_id]) if self.with_latency else None,
+            }
+        self.closed_windows = w.num
+        return {'num': w.num, 'start': w.start, 'end': w.end, 'flows': flows}
+
+    def _prune(self):
+        """Forget sends the receivers have passed and receives whose windows are closed."""
+        oldest = self._windows[0].start if self._windows else self._next_start
+        for flow_id in range(self.num_flows):
+            received = self._recv_count[flow_id]
+            send_by_seq = self._send_by_seq[flow_id]
+            for seq in [s for s in send_by_seq if s <= received]:
+                del send_by_seq[seq]
+            pending = self._pending_recv[flow_id]
+            max_seq = self._send_max_seq[flow_id]
+            for seq in [s for s, t in pending.items() if s <= max_seq or oldest is None or t < oldest]:
+                del pending[seq]
+
+    def advance(self, watermark, idle=False):
+        """Close and return the windows whose end + lateness is before watermark.
+        idle: the watermark is the wall clock with all logs at EOF, so a window past
+        the last packet is the last one of the run and is cut there (see flush())."""
+        cut = self.max_recv if idle and self.end_time is None else None
+        if idle and self.end_time is not None and self._next_start is not None:
+            # report the empty windows up to end_time as well
+            self._open_until(min(watermark - self.lateness, self.end_time))
+        closed = []
+        while self._windows and self._windows[0].end + self.lateness < watermark:
+            closed.append(self._close(self._windows.pop(0), cut))
+        if closed:
+            self._prune()
+        return closed
+
+    def flush(self):
+        """Close all open windows (end of run); without an end_time the last one is
+        cut at the last packet, like the batch analysis."""
+        cut = self.max_recv if self.end_time is None else None
+        closed = [self._close(w, cut) for w in self._windows]
+        self._windows = []
+        return closed
+
+    def done(self):
+        """True once end_time is set and every window up to it has closed."""
+        return self.end_time is not None and self.max_recv is not None and \
+            not self._windows and self._next_start is not None and self._next_start >= self.end_time
+
+    def overall_latency(self, flow_id):
+        """Run totals of the latency samples: {'samples', 'min', 'max', 'mean', 'std'} or None."""
+        n, mean, m2, lo, hi = self.total_latency[flow_id]
+        if n == 0:
+            return None
+        return {'samples': n, 'min': lo, 'max': hi, 'mean': mean,
+                'std': (m2 / (n - 1)) ** 0.5 if n >= 2 else None}
+
+
+def follow_logs(outputs_dir, follower, on_window, payload_marker=None, with_sender=True,
+                poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=None):
+    """Tail receiver_h_r<N> (and sender_h<N>.txt) logs in outputs_dir, feed follower and
+    call on_window(window) for every closed window. Returns on Ctrl-C, after
+    idle_timeout seconds without new log data, or when follower.done()."""
+    flow_ids = range(follower.num_flows)
+    receivers = [ReceiverTail(outputs_dir, flow_id + 1, payload_marker) for flow_id in flow_ids]
+    senders = [LineTail(outputs_dir / f"sender_h{flow_id + 1}.txt") for flow_id in flow_ids] \
+        if with_sender else []
+    last_data = time.time()
+    try:
+        while True:
+            all_eof = True
+            got_data = False
+            # senders first, so a packet's send time is usually known when it is received
+            for flow_id, tail in enumerate(senders):
+                lines, eof = tail.read_lines()
+                all_eof &= eof
+                for line in lines:
+                    match = SENT_RE.search(line)
+                    if match:
+                        got_data = True
+                        follower.add_send(flow_id, int(match.group(1)), float(match.group(2)))
+            for flow_id, tail in enumerate(receivers):
+                packets, eof = tail.read_packets()
+                all_eof &= eof
+                got_data |= bool(packets)
+                for t, seq, tx in packets:
+                    follower.add_recv(flow_id, t, seq, tx)
+
+            now = time.time()
+            if got_data:
+                last_data = now
+            watermark = follower.max_recv if follower.max_recv is not None else float("-inf")
+            if all_eof:
+                # nothing buffered: windows older than the wall clock cannot get more packets
+                watermark = max(watermark, now)
+            for window in follower.advance(watermark, idle=all_eof):
+                on_window(window)
+            if follower.done():
+                return
+            if idle_timeout is not None and now - last_data > idle_timeout:
+                break
+            if all_eof:
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for tail in receivers + senders:
+            tail.close()
+    for window in follower.flush():
+        on_window(window)
@@ -4,21 +4,33 @@ Measure WRR bandwidth allocation from receiver logs
 Analyzes packet reception rates in time windows during congestion
 """
 
+import os
 import re
 import sys
 from pathlib import Path
 from collections import defaultdict
+
+_utils_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _utils_dir not in sys.path:
+    sys.path.insert(0, _utils_dir)
+
+from log_follow import DEFAULT_LATENESS, DEFAULT_POLL_INTERVAL, WindowFollower, follow_logs
+from recv_log import find_receiver_log, is_recv_log, recv_timestamps
 from datetime import datetime
 
 
 def parse_receiver_log(receiver_file):
-    """Parse receiver log and extract packet reception timestamps"""
+    """Parse receiver log and extract packet reception timestamps (text or binary log)"""
     timestamps = []
 
     if not receiver_file.exists():
         print(f"Warning: {receiver_file} not found")
         return timestamps
 
+    if is_recv_log(receiver_file):
+        # receive.py --log-format=bin: one record per data packet, no text to parse
+        return recv_timestamps(receiver_file)
+
     with open(receiver_file, 'r') as f:
         for line in f:
             # Format: "packet is received at time : 1234567890.123"
@@ -48,6 +60,53 @@ def expected_allocation_from_quantums(quantums):
     return [q / total * 100.0 for q in quantums]
 
 
+def print_window(window_num, window_start, window_end, flow_stats):
+    """Print one window: flow_stats[flow_id] = {'packets', 'rate'}."""
+    print(f"\nWindow {window_num}: {window_start:.2f} - {window_end:.2f} seconds")
+    print("-" * 60)
+
+    total_packets = 0
+    total_rate = 0.0
+    for flow_id, stats in flow_stats.items():
+        total_packets += stats['packets']
+        total_rate += stats['rate']
+        print(f"  Flow {flow_id}: {stats['packets']} packets, {stats['rate']:.2f} pps")
+
+    # Calculate percentages
+    if total_rate > 0:
+        print(f"\n  Total: {total_packets} packets, {total_rate:.2f} pps")
+        print("  Bandwidth allocation:")
+        for flow_id, stats in flow_stats.items():
+            percentage = (stats['rate'] / total_rate) * 100
+            print(f"    Flow {flow_id}: {percentage:.2f}%")
+
+
+def print_allocation(flow_stats_all, quantums, stat_start, stat_end, title):
+    """Print overall per-flow packets/rates over a time range and compare with the quantums."""
+    flow_ids = list(flow_stats_all)
+    total_packets_all = sum(stats['packets'] for stats in flow_stats_all.values())
+    total_rate_all = sum(stats['rate'] for stats in flow_stats_all.values())
+    print(f"\n{title}")
+    print(f"Time range: {stat_start:.2f} - {stat_end:.2f} seconds")
+    print("-" * 60)
+    for flow_id in flow_ids:
+        print(f"Flow {flow_id}: {flow_stats_all[flow_id]['packets']} packets, {flow_stats_all[flow_id]['rate']:.2f} pps")
+    if total_rate_all > 0:
+        print(f"\nTotal: {total_packets_all} packets, {total_rate_all:.2f} pps")
+        print("Bandwidth allocation:")
+        for flow_id in flow_ids:
+            actual_pct = (flow_stats_all[flow_id]['rate'] / total_rate_all) * 100
+            print(f"  Flow {flow_id}: {actual_pct:.2f}%")
+        expected = expected_allocation_from_quantums(quantums)
+        ratio_str = ":".join(str(q) for q in quantums)
+        print(f"\nExpected allocation (quantums {ratio_str}):")
+        for flow_id in flow_ids:
+            actual_pct = (flow_stats_all[flow_id]['rate'] / total_rate_all) * 100
+            diff = abs(actual_pct - expected[flow_id])
+            print(f"  Flow {flow_id}: {expected[flow_id]:.2f}% (actual: {actual_pct:.2f}%, diff: {diff:.2f}%)")
+    return flow_stats_all, total_rate_all
+
+
 def measure_bandwidth_allocation(outputs_dir, start_time=None, end_time=None, window_size=10, quantums=None, num_flows=2,
                                  min_active_pps=1.0):
     """
@@ -68,7 +127,7 @@ def measure_bandwidth_allocation(outputs_dir, start_time=None, end_time=None, wi
     # Parse receiver logs for each flow
     flow_timestamps = {}
     for flow_id in flow_ids:
-        receiver_file = outputs_path / f"receiver_h_r{flow_id+1}.txt"
+        receiver_file = find_receiver_log(outputs_path, flow_id + 1)
         timestamps = parse_receiver_log(receiver_file)
         flow_timestamps[flow_id] = timestamps
         print(f"Flow {flow_id}: {len(timestamps)} packets received")
@@ -104,68 +163,29 @@ def measure_bandwidth_allocation(outputs_dir, start_time=None, end_time=None, wi
     while current_time < end_time:
         window_end = min(current_time + window_size, end_time)
 
-        print(f"\nWindow {window_num}: {current_time:.2f} - {window_end:.2f} seconds")
-        print("-" * 60)
-
-        total_packets = 0
-        total_rate = 0.0
         flow_stats = {}
-
         for flow_id in flow_ids:
             timestamps = flow_timestamps[flow_id]
             packet_count, rate = calculate_window_rates(timestamps, current_time, window_end)
             flow_stats[flow_id] = {'packets': packet_count, 'rate': rate}
-            total_packets += packet_count
-            total_rate += rate
-
-            print(f"  Flow {flow_id}: {packet_count} packets, {rate:.2f} pps")
+        print_window(window_num, current_time, window_end, flow_stats)
 
         # Determine if this window should count as steady state
         is_active_window = all(flow_stats[f]['rate'] >= min_active_pps for f in flow_ids)
         if is_active_window:
             steady_state_end = window_end
 
-        # Calculate percentages
-        if total_rate > 0:
-            print(f"\n  Total: {total_packets} packets, {total_rate:.2f} pps")
-            print("  Bandwidth allocation:")
-            for flow_id in flow_ids:
-                percentage = (flow_stats[flow_id]['rate'] / total_rate) * 100
-                print(f"    Flow {flow_id}: {percentage:.2f}%")
-
         current_time = window_end
         window_num += 1
 
     # Helper to print overall stats and expected comparison over a time range
     def print_overall_stats(stat_start, stat_end, title):
-        total_packets_all = 0
-        total_rate_all = 0.0
         flow_stats_all = {}
         for flow_id in flow_ids:
             timestamps = flow_timestamps[flow_id]
             packet_count, rate = calculate_window_rates(timestamps, stat_start, stat_end)
             flow_stats_all[flow_id] = {'packets': packet_count, 'rate': rate}
-            total_packets_all += packet_count
-            total_rate_all += rate
-        print(f"\n{title}")
-        print(f"Time range: {stat_start:.2f} - {stat_end:.2f} seconds")
-        print("-" * 60)
-        for flow_id in flow_ids:
-            print(f"Flow {flow_id}: {flow_stats_all[flow_id]['packets']} packets, {flow_stats_all[flow_id]['rate']:.2f} pps")
-        if total_rate_all > 0:
-            print(f"\nTotal: {total_packets_all} packets, {total_rate_all:.2f} pps")
-            print("Bandwidth allocation:")
-            for flow_id in flow_ids:
-                actual_pct = (flow_stats_all[flow_id]['rate'] / total_rate_all) * 100
-                print(f"  Flow {flow_id}: {actual_pct:.2f}%")
-            expected = expected_allocation_from_quantums(quantums)
-            ratio_str = ":".join(str(q) for q in quantums)
-            print(f"\nExpected allocation (quantums {ratio_str}):")
-            for flow_id in flow_ids:
-                actual_pct = (flow_stats_all[flow_id]['rate'] / total_rate_all) * 100
-                diff = abs(actual_pct - expected[flow_id])
-                print(f"  Flow {flow_id}: {expected[flow_id]:.2f}% (actual: {actual_pct:.2f}%, diff: {diff:.2f}%)")
-        return flow_stats_all, total_rate_all
+        return print_allocation(flow_stats_all, quantums, stat_start, stat_end, title)
 
     # Overall statistics: steady state only (all flows active) — use this for WRR comparison
     print("\n" + "=" * 60)
@@ -181,6 +201,61 @@ def measure_bandwidth_allocation(outputs_dir, start_time=None, end_time=None, wi
         print_overall_stats(start_time, end_time, "")
 
 
+def follow_bandwidth_allocation(outputs_dir, start_time=None, end_time=None, window_size=10, quantums=None,
+                                num_flows=2, min_active_pps=1.0, lateness=DEFAULT_LATENESS,
+                                poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=None):
+    """
+    --follow: tail the receiver logs of a running experiment and print each window
+    as soon as it closes (see log_follow.py). The steady-state summary is built
+    from the closed windows' counters when following stops.
+    """
+    if quantums is None:
+        quantums = [30000, 6000] if num_flows == 2 else [20000 for _ in range(num_flows)]
+    outputs_path = Path(outputs_dir)
+    flow_ids = range(num_flows)
+    # Start 5 seconds after first packet, like the batch measurement
+    follower = WindowFollower(num_flows, window_size, start_time, 5.0, end_time, lateness, with_latency=False)
+    print(f"Following receiver logs in {outputs_path} (window size: {window_size} s, lateness: {lateness} s, "
+          f"Ctrl-C to stop)", flush=True)
+
+    totals = [0] * num_flows  # packets in all closed windows
+    steady = {'end': None, 'packets': [0] * num_flows}  # up to the last window with all flows active
+
+    def on_window(window):
+        flow_stats = window['flows']
+        print_window(window['num'], window['start'], window['end'], flow_stats)
+        sys.stdout.flush()
+        for flow_id in flow_ids:
+            totals[flow_id] += flow_stats[flow_id]['packets']
+        if all(flow_stats[f]['rate'] >= min_active_pps for f in flow_ids):
+            steady['end'] = window['end']
+            steady['packets'] = list(totals)
+
+    follow_logs(outputs_path, follower, on_window, with_sender=False,
+                poll_interval=poll_interval, idle_timeout=idle_timeout)
+    if follower.closed_windows == 0:
+        print("Error: No packets found in receiver logs")
+        return
+
+    def overall(stat_end, packets):
+        duration = stat_end - follower.start_time
+        return {flow_id: {'packets': packets[flow_id],
+                          'rate': packets[flow_id] / duration if duration > 0 else 0.0}
+                for flow_id in flow_ids}
+
+    print("\n" + "=" * 60)
+    print("Overall Statistics (steady state only - all flows active):")
+    print("=" * 60)
+    steady_end = steady['end'] if steady['end'] is not None else follower.start_time
+    print_allocation(overall(steady_end, steady['packets']), quantums, follower.start_time, steady_end, "")
+    last_end = follower.max_recv if follower.end_time is None else min(follower.max_recv, follower.end_time)
+    if steady_end < last_end - 1.0:
+        print("\n" + "=" * 60)
+        print("Overall Statistics (entire measurement window, includes wind-down):")
+        print("=" * 60)
+        print_allocation(overall(last_end, totals), quantums, follower.start_time, last_end, "")
+
+
 def main():
     import argparse
 
@@ -199,6 +274,14 @@ def main():
                        help="WRR quantums per flow (comma-separated). Default: 30000,6000")
     parser.add_argument("--min-active-pps", type=float, default=1.0,
                        help="Minimum per-flow pps to consider a flow active for steady-state detection (default: 1.0)")
+    parser.add_argument("--follow", action="store_true",
+                       help="Tail the receiver logs of a running experiment and print each window when it closes")
+    parser.add_argument("--lateness", type=float, default=DEFAULT_LATENESS,
+                       help=f"--follow: seconds a window stays open after its end (default: {DEFAULT_LATENESS})")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                       help=f"--follow: seconds between polls at end of file (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument("--idle-timeout", type=float,
+                       help="--follow: stop after this many seconds without new log data (default: run until Ctrl-C)")
 
     args = parser.parse_args()
 
@@ -208,6 +291,21 @@ def main():
     if any(q <= 0 for q in quantums):
         parser.error("--quantums must be positive")
 
+    if args.follow:
+        follow_bandwidth_allocation(
+            args.outputs_dir,
+            args.start_time,
+            args.end_time,
+            args.window_size,
+            quantums,
+            args.num_flows,
+            args.min_active_pps,
+            args.lateness,
+            args.poll_interval,
+            args.idle_timeout
+        )
+        return
+
     measure_bandwidth_allocation(
         args.outputs_dir,
         args.start_time,
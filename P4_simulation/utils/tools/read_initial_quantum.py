@@ -102,6 +102,9 @@ except ImportError as e:
     traceback.print_exc()
     sys.exit(1)
 
+# Register reads over a pooled Thrift connection (utils/thrift_pool.py)
+import thrift_pool
+
 # Define helper functions directly (to avoid import issues)
 def connect_to_switch(grpc_port=50051, device_id=0):
     """Connect to BMv2 switch"""
@@ -136,13 +139,18 @@ def setup_p4_program(sw, p4info_helper, bmv2_json_path):
         sw.MasterArbitrationUpdate()
         print("  ✓ Master arbitration successful")
 
-        # Then set the forwarding pipeline config
+        # Then set the forwarding pipeline config, unless the switch already runs
+        # this one (pushing it again would wipe the table entries)
         print("  Setting forwarding pipeline config...")
-        sw.SetForwardingPipelineConfig(
+        cookie = bmv2.pipelineCookie(p4info_helper.p4info, bmv2_json_path)
+        if sw.SetForwardingPipelineConfigIfChanged(
             p4info=p4info_helper.p4info,
+            cookie=cookie,
             bmv2_json_file_path=bmv2_json_path
-        )
-        print("✓ P4 program initialized successfully")
+        ):
+            print("✓ P4 program initialized successfully")
+        else:
+            print(f"✓ P4 program already installed (cookie {cookie:016x}), not pushed again")
     except Exception as e:
         print(f"✗ Failed to initialize P4 program: {e}")
         import traceback
@@ -314,88 +322,30 @@ def read_register_via_cli(thrift_port=9090, register_name="quantum_storage", ind
         return None
 
 
-def read_register_via_thrift(thrift_port=9090, register_name="quantum_storage", index=0):
-    """Read register value using Thrift API"""
-    try:
-        # Add BMv2 Thrift API to path
-        paths = get_project_paths()
-        project_root = paths['project_root']
-        bm_runtime_path = os.path.join(project_root, "behavioral-model", "tools")
-        if bm_runtime_path not in sys.path:
-            sys.path.insert(0, bm_runtime_path)
-        sys.path.insert(0, os.path.join(bm_runtime_path, "bm_runtime"))
-
-        from bm_runtime.standard import Standard
-        from thrift.transport import TTransport
-        from thrift.transport import TSocket
-        from thrift.protocol import TBinaryProtocol
-        from thrift.protocol import TMultiplexedProtocol
-
-        # Connect to switch via Thrift with multiplexed protocol
-        transport = TSocket.TSocket('localhost', thrift_port)
-        transport = TTransport.TBufferedTransport(transport)
-        protocol = TMultiplexedProtocol.TMultiplexedProtocol(
-            TBinaryProtocol.TBinaryProtocol(transport), "Standard")
-        client = Standard.Client(protocol)
-
-        transport.open()
-        try:
-            value = client.bm_register_read(0, register_name, index)
-            return value
-        finally:
-            transport.close()
-    except Exception as e:
-        return None
-
+def read_register_array(thrift_port=9090, register_name="quantum_storage", count=None, method="auto"):
+    """Read the first `count` cells of a register (all of it if None)
 
-def read_register(sw, p4info_helper, register_name, index, thrift_port=9090, method="auto"):
-    """Read register value using available methods
+    Over Thrift this is a single call for the whole array; the CLI fallback
+    reads cell by cell.
 
     Returns:
-        tuple: (value, actual_method_used) where actual_method_used is "cli" or "thrift"
-        If value is None, actual_method_used indicates which method was attempted last
-    """
-    if method == "auto":
-        # Try CLI first (most reliable)
-        value = read_register_via_cli(thrift_port, register_name, index)
-        if value is not None:
-            return value, "cli"
-        # Fall back to Thrift
-        value = read_register_via_thrift(thrift_port, register_name, index)
-        return value, "thrift" if value is not None else (None, "thrift")
-    elif method == "cli":
-        value = read_register_via_cli(thrift_port, register_name, index)
-        return value, "cli"
-    elif method == "thrift":
-        value = read_register_via_thrift(thrift_port, register_name, index)
-        return value, "thrift"
-    else:
-        raise ValueError(f"Unknown method: {method}")
-
-
-def printRegister(p4info_helper, sw, register_name, index, thrift_port=9090, method="auto", show_method=True):
-    """Print register value - similar to printCounter
-
-    Args:
-        show_method: If True, display which method was used (cli or thrift)
+        tuple: (values, actual_method_used); values is a list with None for
+        cells that could not be read, or None if nothing could be read
     """
-    try:
-        value, actual_method = read_register(sw, p4info_helper, register_name, index, thrift_port, method)
-        if value is not None:
-            if show_method:
-                print(f"  {register_name}[{index}] = {value} (via {actual_method})")
-            else:
-                print(f"  {register_name}[{index}] = {value}")
-            return value, actual_method
-        else:
-            if show_method:
-                print(f"  {register_name}[{index}] = (read failed via {actual_method})")
-            else:
-                print(f"  {register_name}[{index}] = (read failed)")
-            return None, actual_method
-    except Exception as e:
-        print(f"  Error reading {register_name}[{index}]: {e}")
-        return None, None
+    if method in ("auto", "thrift"):
+        client = thrift_pool.get_client_or_none(thrift_port)
+        if client is not None:
+            try:
+                values = [int(v) for v in client.register_read_all(register_name)]
+                return (values if count is None else values[:count]), "thrift"
+            except Exception:
+                pass
+        if method == "thrift":
+            return None, "thrift"
+    if count is None:
+        raise ValueError("count is required to read a register via the CLI")
+    values = [read_register_via_cli(thrift_port, register_name, i) for i in range(count)]
+    return (values if any(v is not None for v in values) else None), "cli"
 
 
 def read_initial_quantum_values(grpc_port=50051, device_id=0,
@@ -533,10 +483,14 @@ def read_initial_quantum_values(grpc_port=50051, device_id=0,
         initial_quantums = {}
         all_success = True
 
+        # All three cells in one read (one Thrift call, or the CLI per cell)
+        values, actual_method = read_register_array(thrift_port, "quantum_storage", count=3)
         for queue_idx in range(3):
-            # Try to read from register
-            value, actual_method = printRegister(p4info_helper, sw, "quantum_storage", queue_idx,
-                                                 thrift_port=thrift_port, method="auto", show_method=True)
+            value = values[queue_idx] if values is not None else None
+            if value is not None:
+                print(f"  quantum_storage[{queue_idx}] = {value} (via {actual_method})")
+            else:
+                print(f"  quantum_storage[{queue_idx}] = (read failed via {actual_method})")
 
             if value is not None and value != 0:
                 initial_quantums[queue_idx] = value
@@ -49,6 +49,7 @@ try:
     from p4runtime_lib.switch import ShutdownAllSwitchConnections
     from p4.v1 import p4runtime_pb2
     from p4runtime_lib.convert import encode
+    import thrift_pool
 except ImportError as e:
     print(f"Error: Failed to import P4Runtime library: {e}")
     print(f"  utils_dir: {utils_dir}, p4runtime_lib_path: {p4runtime_lib_path}")
@@ -85,13 +86,18 @@ def setup_p4_program(sw, p4info_helper, bmv2_json_path):
         sw.MasterArbitrationUpdate()
         print("  ✓ Master arbitration successful")
 
-        # Then set the forwarding pipeline config
+        # Then set the forwarding pipeline config, unless the switch already runs
+        # this one (pushing it again would wipe the table entries)
         print("  Setting forwarding pipeline config...")
-        sw.SetForwardingPipelineConfig(
+        cookie = bmv2.pipelineCookie(p4info_helper.p4info, bmv2_json_path)
+        if sw.SetForwardingPipelineConfigIfChanged(
             p4info=p4info_helper.p4info,
+            cookie=cookie,
             bmv2_json_file_path=bmv2_json_path
-        )
-        print("✓ P4 program initialized successfully")
+        ):
+            print("✓ P4 program initialized successfully")
+        else:
+            print(f"✓ P4 program already installed (cookie {cookie:016x}), not pushed again")
     except Exception as e:
         print(f"✗ Failed to initialize P4 program: {e}")
         import traceback
@@ -120,44 +126,16 @@ def read_register_via_cli(thrift_port=9090, register_name="quantum_storage", ind
         return None
 
 
-def read_register_via_thrift(thrift_port=9090, register_name="quantum_storage", index=0):
-    """Read register value using Thrift API (P4Runtime doesn't support register reads)."""
-    try:
-        paths = get_project_paths()
-        project_root = paths['project_root']
-        bm_runtime_path = os.path.join(project_root, "behavioral-model", "tools")
-        bm_runtime_path = os.path.abspath(bm_runtime_path)
-        for p in (bm_runtime_path, os.path.join(bm_runtime_path, "bm_runtime")):
-            if p not in sys.path:
-                sys.path.insert(0, p)
-        from bm_runtime.standard import Standard
-        from thrift.transport import TTransport, TSocket
-        from thrift.protocol import TBinaryProtocol, TMultiplexedProtocol
-
-        transport = TTransport.TBufferedTransport(TSocket.TSocket('localhost', thrift_port))
-        protocol = TMultiplexedProtocol.TMultiplexedProtocol(
-            TBinaryProtocol.TBinaryProtocol(transport), "Standard")
-        client = Standard.Client(protocol)
-        transport.open()
+def read_registers(thrift_port=9090, register_name="quantum_storage", count=1):
+    """First `count` cells of a register: one Thrift call for the whole array, else the CLI per cell.
+    Returns ([value or None, ...], method_used)."""
+    client = thrift_pool.get_client_or_none(thrift_port)
+    if client is not None:
         try:
-            return client.bm_register_read(0, register_name, index)
-        finally:
-            transport.close()
-    except Exception:
-        return None
-
-
-def read_register(sw, p4info_helper, register_name, index, thrift_port=9090, method="auto"):
-    """Read register value. method: 'auto' (cli then thrift), 'cli', or 'thrift'. Returns (value, method_used)."""
-    if method == "auto":
-        v = read_register_via_cli(thrift_port, register_name, index)
-        if v is not None:
-            return v, "cli"
-        v = read_register_via_thrift(thrift_port, register_name, index)
-        return v, "thrift"
-    if method == "cli":
-        return read_register_via_cli(thrift_port, register_name, index), "cli"
-    return read_register_via_thrift(thrift_port, register_name, index), "thrift"
+            return [int(v) for v in client.register_read_all(register_name)[:count]], "thrift"
+        except Exception:
+            pass
+    return [read_register_via_cli(thrift_port, register_name, i) for i in range(count)], "cli"
 
 
 def setup_get_quantum_table(sw, p4info_helper, num_flows=2):
@@ -376,9 +354,9 @@ def test_quantum_operations(grpc_port=50051, device_id=0, p4info_path=None, bmv2
         else:
             print("  ⚠ No interface for packets; register read may fail.")
 
-        print("  Reading quantum_storage register (CLI then Thrift)...")
-        for q in range(num_flows):
-            value, method = read_register(sw, p4info_helper, "quantum_storage", q, thrift_port=thrift_port)
+        print("  Reading quantum_storage register (Thrift, else CLI)...")
+        values, method = read_registers(thrift_port, "quantum_storage", num_flows)
+        for q, value in enumerate(values):
             if value is not None and value != 0:
                 initial_quantums[q] = value
                 print(f"    Queue {q}: {value} (via {method})")
@@ -417,8 +395,8 @@ def test_quantum_operations(grpc_port=50051, device_id=0, p4info_path=None, bmv2
 
         print("  Reading quantum_storage register (updated values)...")
         updated_quantums = {}
-        for q in range(num_flows):
-            value, method = read_register(sw, p4info_helper, "quantum_storage", q, thrift_port=thrift_port)
+        values, method = read_registers(thrift_port, "quantum_storage", num_flows)
+        for q, value in enumerate(values):
             if value is not None:
                 updated_quantums[q] = value
                 print(f"    Queue {q}: {value} (via {method})")
@@ -432,7 +410,7 @@ def test_quantum_operations(grpc_port=50051, device_id=0, p4info_path=None, bmv2
         print(f"  Initial:  {initial_quantums}")
         print(f"  Set to:   {new_quantums}")
         print(f"  Updated:  {updated_quantums}")
-        print("\n  Notes: set_quantum via P4Runtime; get_quantum triggered by packets; register read via CLI/Thrift.")
+        print("\n  Notes: set_quantum via P4Runtime; get_quantum triggered by packets; register read via Thrift (pooled), else CLI.")
 
     except Exception as e:
         print(f"\n✗ Error: {e}")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Vectorized windowed bandwidth/latency engine for the WRR analysis tools.
+
+Timestamps are held in NumPy arrays; each flow's receive times are sorted once
+and window boundaries are located with np.searchsorted, so a run is
+O(packets log packets) instead of O(windows x packets) Python loops.
+
+Semantics are those of analyze_wrr_results.py:
+  - windows start at start_time and step by window_size; the last one is cut at end_time
+  - a packet counts in a window if window_start <= t <= window_end (boundaries inclusive,
+    so a packet exactly on a boundary is counted in both windows)
+  - a received packet's send time is its stamped tx time (payload_stamp.py),
+    else the sender log's time of its stamped seq; packets of unstamped logs
+    are matched by position (received packet i, 0-based, <-> sender seq_num i+1)
+  - a latency is kept if 0 <= latency_ms < MAX_LATENCY_MS
+
+delivery_stats() gives loss, duplicates and reordering of a flow from the
+stamped seqs of its received packets in O(packets + highest seq).
+"""
+
+import numpy as np
+
+# Maximum valid latency (ms). Latencies above this are rejected to avoid wrong matches.
+# WRR congestion can cause tens of seconds delay; 120 s gives margin without being too loose.
+MAX_LATENCY_MS = 120000  # 120 seconds
+
+# Reasons returned by latency_failures()
+NO_SEND_TIMESTAMP = 0
+LATENCY_NEGATIVE = 1
+LATENCY_EXCEEDS_MAX = 2
+
+
+def window_edges(start_time, end_time, window_size):
+    """(starts, ends) arrays of the measurement windows, built exactly like the
+    original per-window loop (so boundaries are bit-identical)."""
+    starts, ends = [], []
+    current_time = start_time
+    while current_time < end_time:
+        window_end = min(current_time + window_size, end_time)
+        starts.append(current_time)
+        ends.append(window_end)
+        current_time = window_end
+    return np.array(starts, dtype=np.float64), np.array(ends, dtype=np.float64)
+
+
+def send_times_by_seq(send_seqs, send_times, max_seq):
+    """Array a where a[seq] is the send time of seq_num (NaN if not logged), seq in 1..max_seq."""
+    by_seq = np.full(max_seq + 1, np.nan)
+    seqs = np.asarray(send_seqs, dtype=np.int64)
+    keep = (seqs >= 1) & (seqs <= max_seq)
+    by_seq[seqs[keep]] = np.asarray(send_times, dtype=np.float64)[keep]
+    return by_seq
+
+
+def packet_seqs(n_recv, seqs=None):
+    """Seq of each received packet: the stamped ones, or 1..n_recv (receive order) without stamps."""
+    if seqs is None:
+        return np.arange(1, n_recv + 1, dtype=np.int64)
+    return np.asarray(seqs, dtype=np.int64)
+
+
+def packet_send_times(n_recv, send_seqs, send_times, seqs=None, tx_times=None):
+    """Send time of each received packet: its stamped tx time (tx_times, NaN where
+    unknown), else the sender log's time of its seq; NaN if neither is known."""
+    seqs = packet_seqs(n_recv, seqs)
+    max_seq = int(seqs.max()) if len(seqs) else 0
+    send = send_times_by_seq(send_seqs, send_times, max_seq)[seqs]
+    if tx_times is not None:
+        tx = np.asarray(tx_times, dtype=np.float64)
+        send = np.where(np.isnan(tx), send, tx)
+    return send
+
+
+def packet_latencies(recv_times, send_seqs, send_times, seqs=None, tx_times=None):
+    """Per received packet latency in ms (NaN where the packet has no valid latency)."""
+    recv = np.asarray(recv_times, dtype=np.float64)
+    latency_ms = (recv - packet_send_times(len(recv), send_seqs, send_times, seqs, tx_times)) * 1000
+    latency_ms[~((latency_ms >= 0) & (latency_ms < MAX_LATENCY_MS))] = np.nan
+    return latency_ms
+
+
+def latency_failures(recv_times, send_seqs, send_times, seqs=None, tx_times=None):
+    """Received packets without a latency: (recv_idx, seq, send_time, latency_ms, reason) arrays."""
+    recv = np.asarray(recv_times, dtype=np.float64)
+    seqs = packet_seqs(len(recv), seqs)
+    send = packet_send_times(len(recv), send_seqs, send_times, seqs, tx_times)
+    latency_ms = (recv - send) * 1000
+    reason = np.full(len(recv), -1, dtype=np.int8)
+    reason[latency_ms >= MAX_LATENCY_MS] = LATENCY_EXCEEDS_MAX
+    reason[latency_ms < 0] = LATENCY_NEGATIVE
+    reason[np.isnan(send)] = NO_SEND_TIMESTAMP
+    idx = np.flatnonzero(reason >= 0)
+    return idx, seqs[idx], send[idx], latency_ms[idx], reason[idx]
+
+
+def delivery_stats(seqs, sent=0):
+    """Loss, duplicates and reordering of one flow from the stamped seq of each
+    received packet (receive order; seq 0 = unstamped, ignored).
+
+    sent is the number of packets the sender sent if known (else the highest
+    received seq is used, so losses at the tail are not seen). Per packet:
+      duplicate      a copy of a seq received before
+      reorder_depth  for a packet arriving after a higher seq: how many packets
+                     arrived since the first one with a higher seq (RFC 4737
+                     reordering extent); 0 otherwise
+    """
+    seqs = np.asarray(seqs, dtype=np.int64)
+    n = len(seqs)
+    idx = np.arange(n)
+    stamped = seqs > 0
+    top = int(seqs.max()) if n else 0
+    # first arrival of every seq (np.unique returns the index of the first occurrence)
+    first = np.full(top + 1, n)
+    values, first_idx = np.unique(seqs, return_index=True)
+    first[values] = first_idx
+    duplicate = stamped & (first[seqs] != idx)
+    # a packet is late if a higher seq arrived before it; the running max finds the first such arrival
+    run_max = np.maximum.accumulate(np.where(stamped, seqs, 0)) if n else seqs
+    late = stamped & ~duplicate & (seqs < np.concatenate(([0], run_max[:-1])))
+    reorder_depth = np.zeros(n, dtype=np.int64)
+    reorder_depth[late] = idx[late] - np.searchsorted(run_max, seqs[late], side='right')
+    unique = n - int(np.count_nonzero(duplicate)) - int(np.count_nonzero(~stamped))
+    expected = max(top, sent)
+    return {
+        'received': int(np.count_nonzero(stamped)),
+        'unique': unique,
+        'expected': expected,
+        'lost': expected - unique,
+        'loss_rate': (expected - unique) / expected if expected else 0.0,
+        'duplicates': int(np.count_nonzero(duplicate)),
+        'reordered': int(np.count_nonzero(late)),
+        'max_reorder_depth': int(reorder_depth.max()) if n else 0,
+        'duplicate': duplicate,
+        'reorder_depth': reorder_depth,
+    }
+
+
+def latency_summary(latencies):
+    """Summary of a latency sample (ms), or None if empty. std is None below 2 samples."""
+    n = len(latencies)
+    if n == 0:
+        return None
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+    return {
+        'samples': n,
+        'min': float(latencies.min()),
+        'median': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'max': float(latencies.max()),
+        'mean': float(latencies.mean()),
+        'std': float(latencies.std(ddof=1)) if n >= 2 else None,
+    }
+
+
+def flow_windows(recv_times, latency_ms, starts, ends):
+    """Per-window packet counts, rates and latency samples of one flow.
+
+    Returns (counts, rates, window_latencies) where window_latencies[w] is the
+    array of valid latencies of the packets received in window w.
+    """
+    recv = np.asarray(recv_times, dtype=np.float64)
+    order = np.argsort(recv, kind='stable')
+    recv_sorted = recv[order]
+    lat_sorted = latency_ms[order]
+    lo = np.searchsorted(recv_sorted, starts, side='left')
+    hi = np.searchsorted(recv_sorted, ends, side='right')
+    counts = hi - lo
+    durations = ends - starts
+    rates = np.divide(counts, durations, out=np.zeros(len(counts)), where=durations > 0)
+    window_latencies = []
+    for a, b in zip(lo.tolist(), hi.tolist()):
+        lat = lat_sorted[a:b]
+        window_latencies.append(lat[~np.isnan(lat)])
+    return counts, rates, window_latencies
+
+
+def analyze_windows(flow_recv_times, flow_send, start_time, end_time, window_size, flow_stamps=None):
+    """Windowed bandwidth and latency statistics for all flows.
+
+    flow_recv_times: {flow_id: receive timestamps (log order)}
+    flow_send: {flow_id: (seq_nums, send timestamps)}
+    flow_stamps: {flow_id: (seqs, tx times)} of stamped receiver logs (either may be
+        None: match by position / no stamped send times); flows not in it are unstamped
+
+    Returns a dict with the window 'starts'/'ends' and per flow ('flows'[flow_id]):
+      counts, rates, shares (percent of the summed rate per window),
+      latency (per-window latency_summary), overall_latency, total_packets.
+    """
+    starts, ends = window_edges(start_time, end_time, window_size)
+    flows = {}
+    for flow_id, recv_times in flow_recv_times.items():
+        send_seqs, send_times = flow_send[flow_id]
+        seqs, tx_times = (flow_stamps or {}).get(flow_id, (None, None))
+        latency_ms = packet_latencies(recv_times, send_seqs, send_times, seqs, tx_times)
+        counts, rates, window_latencies = flow_windows(recv_times, latency_ms, starts, ends)
+        overall = np.concatenate(window_latencies) if window_latencies else np.zeros(0)
+        flows[flow_id] = {
+            'counts': counts,
+            'rates': rates,
+            'latency': [latency_summary(lat) for lat in window_latencies],
+            'overall_latency': latency_summary(overall),
+            'total_packets': int(counts.sum()),
+        }
+    if flows:
+        total_rate = np.sum([f['rates'] for f in flows.values()], axis=0)
+        for f in flows.values():
+            f['shares'] = np.divide(f['rates'], total_rate, out=np.zeros(len(starts)),
+                                    where=total_rate > 0) * 100
+    return {'starts': starts, 'ends': ends, 'flows': flows}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Binary workload trace: the packets every sender flow sends, with their send
+time, rank and size, as fixed-width records (written by workload_gen.py).
+
+File layout (little-endian):
+  header (16 bytes): magic b"WLTRC\\x00\\x01\\x00", record_size (u32), num_flows (u32)
+  records (16 bytes each, in send time order, all flows merged):
+    t_ns     u64  send time, ns after the start of the trace
+    rank     u32  rank of the packet (the senders put rank & 0xffff into ip.id)
+    flow_id  u16  sender flow, 1-based (send_enhanced.py --flow-id)
+    size     u16  Ethernet frame size in bytes (without FCS)
+
+Senders map the file with numpy.memmap and take their flow's records:
+
+    trace = load_flow(path, flow_id=1)
+    trace["t_ns"], trace["rank"], trace["size"]
+"""
+
+import os
+import struct
+
+MAGIC = b"WLTRC\x00\x01\x00"
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<QIHH")
+HEADER_SIZE = HEADER.size
+RECORD_SIZE = RECORD.size
+
+RECORD_FIELDS = [
+    ("t_ns", "<u8"),
+    ("rank", "<u4"),
+    ("flow_id", "<u2"),
+    ("size", "<u2"),
+]
+
+
+def record_dtype():
+    import numpy as np
+    return np.dtype(RECORD_FIELDS)
+
+
+def is_trace(path):
+    """True if path is a workload trace (checks the magic)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_trace(path, records, num_flows):
+    """Write a structured array of record_dtype() (sorted by t_ns) as a trace."""
+    import numpy as np
+    records = np.ascontiguousarray(records, dtype=record_dtype())
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, RECORD_SIZE, num_flows))
+        records.tofile(f)
+    os.replace(tmp, path)
+
+
+def load_trace(path):
+    """Map a workload trace read-only: (records, num_flows)."""
+    import numpy as np
+    with open(path, "rb") as f:
+        magic, record_size, num_flows = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or record_size != RECORD_SIZE:
+        raise ValueError(f"{path}: not a workload trace (magic={magic!r}, record_size={record_size})")
+    n = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+    if n <= 0:
+        return np.zeros(0, dtype=record_dtype()), num_flows
+    return np.memmap(path, dtype=record_dtype(), mode="r", offset=HEADER_SIZE, shape=(n,)), num_flows
+
+
+def load_flow(path, flow_id):
+    """Records of one flow (in send time order) as an in-memory structured array."""
+    records, num_flows = load_trace(path)
+    if not 1 <= flow_id <= num_flows:
+        raise ValueError(f"{path}: flow {flow_id} not in trace (flows 1..{num_flows})")
+    return records[records["flow_id"] == flow_id]
@@ -8,37 +8,75 @@
 # Copyright (c) Computing Infrastructure Group, Department of Engineering Science, University of Oxford
 
 #!/usr/bin/env python3
+import os
+import sys
 import numpy as np
 import math
 
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '../P4_simulation/utils/'))
+from qtable_engine import QTable
+
+ACTIONS = ('updown', 'downup', 'no_change')
+QUEUE_BINS = 11  # per-path queue length in tenths, 0..10
+
+def queue_state(path_queues):
+    # State index of the two path queue lengths
+    return math.ceil(min(10, path_queues[0] / 10)) * QUEUE_BINS + math.ceil(min(10, path_queues[1] / 10))
+
 class q_table():
-    def __init__(self):
+    def __init__(self, seed=None, checkpoint=None, checkpoint_every=0):
+        # Q values in [-1, 1] at 3 decimals, one row per (path1, path2) queue state
+        self.engine = QTable(QUEUE_BINS * QUEUE_BINS, len(ACTIONS), seed=seed, clip=(-1, 1), decimals=3)
         self.q_table = self.init_q_table()
         self.parameters = {'LEARNING_RATE': 0.2,
                         'DISCOUNT': 0.1,
                         'epsilon': 0.4,
                         'action_weight': 5,
                         'pkt_counter': 0}
+        self.steps = 0
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
 
     def init_q_table(self):
-        actions = ('updown', 'downup', 'no_change')
-        q_table = np.random.rand(len(actions), 11, 11) * 0.1 - 0.05
-        q_table = np.round(q_table, decimals=3)
-        return q_table
+        self.engine.fill_uniform(-0.05, 0.05, decimals=3)
+        return self.engine.table
 
     def update_q_table(self, LEARNING_RATE, DISCOUNT, old_paths, new_paths):
-        # Calculate new Q-value
-        # Old state indices (for current Q-value)
-        old_indices = [old_paths.action, math.ceil(min(10, old_paths.path_queues[0] / 10)), math.ceil(min(10, old_paths.path_queues[1] / 10))]
-        # New state indices (for future Q-value)
-        new_state_indices = [math.ceil(min(10, new_paths.path_queues[0] / 10)), math.ceil(min(10, new_paths.path_queues[1] / 10))]
-        # Maximum Q-value over all actions in the new state
-        max_future_q = np.max(self.q_table[:, new_state_indices[0], new_state_indices[1]])
-        current_q = self.q_table[old_indices[0], old_indices[1], old_indices[2]]
-        new_q = (1 - LEARNING_RATE)* current_q + LEARNING_RATE * (old_paths.reward + DISCOUNT * max_future_q)
-        new_q = np.round(max(-1, min(new_q, 1)), decimals=3)
-        self.q_table[old_indices[0], old_indices[1], old_indices[2]] = new_q
-        # print(current_q, new_q)
+        # Q(old state, old action) towards reward + DISCOUNT * max Q(new state), clipped and rounded
+        if not self.engine.read_only:  # a memory-mapped checkpoint is served as-is
+            self.engine.update(queue_state(old_paths.path_queues), old_paths.action, old_paths.reward,
+                               queue_state(new_paths.path_queues), alpha=LEARNING_RATE, gamma=DISCOUNT)
+        self.steps += 1
+        if self.checkpoint and self.checkpoint_every and self.steps % self.checkpoint_every == 0:
+            self.save_checkpoint(self.checkpoint)
+
+    def save_checkpoint(self, path):
+        # Q table plus the schedule state of update_parameters/reset_parameters
+        self.engine.save(path,
+                         controller='qcmp',
+                         state_encoding={'index': 'path1_bin * queue_bins + path2_bin', 'queue_bins': QUEUE_BINS},
+                         actions=list(ACTIONS),
+                         parameters={k: float(v) for k, v in self.parameters.items()},
+                         schedule={'every': 80, 'epsilon_step': -0.1, 'epsilon_min': 0.1,
+                                   'learning_rate_factor': 0.85, 'learning_rate_min': 0.05},
+                         steps=self.steps)
+
+    def load_checkpoint(self, path, mmap=False):
+        # mmap=True: read-only table shared between processes, no more updates
+        engine = QTable.load(path, mmap=mmap)
+        meta = engine.meta
+        if meta.get('controller') != 'qcmp' or meta.get('state_encoding', {}).get('queue_bins') != QUEUE_BINS \
+                or meta.get('actions') != list(ACTIONS):
+            raise ValueError('%s: not a QCMP checkpoint for %d queue bins and actions %s' % (path, QUEUE_BINS, ACTIONS))
+        self.engine = engine
+        self.q_table = engine.table
+        self.parameters.update(meta['parameters'])
+        self.parameters['action_weight'] = int(self.parameters['action_weight'])
+        self.parameters['pkt_counter'] = int(self.parameters['pkt_counter'])
+        self.steps = meta['steps']
+        return meta
 
     def update_parameters(self):
         self.parameters['pkt_counter'] += 1
@@ -77,11 +115,7 @@ class path_stats():
         return (-queue_difference + 50) + weight_avg_queue
 
     def get_next_action(self, table, epsilon):
-        if np.random.random() < epsilon:
-            self.action = np.random.choice(np.arange(3))
-        else:
-            # print(q_table[:, math.ceil(paths.path_queues[0] / 10), math.ceil(paths.path_queues[1] / 10)])
-            self.action = np.argmax(table.q_table[:, math.ceil(min(10, self.path_queues[0] / 10)), math.ceil(min(10, self.path_queues[1] / 10))])
+        self.action = table.engine.choose_action(queue_state(self.path_queues), epsilon)
 
     def get_new_weights(self, old_paths, action_weight):
         if self.action == 2:
@@ -107,23 +141,26 @@ class path_stats():
             self.reward = 0
         # print(old_average, new_average, new_paths.reward)
 
-    def change_path_weights(self, old_paths, p4info_helper, ingress_sw, nhop_dmacs, nhop_ipv4s, ports):
+    def change_path_weights(self, old_paths, path_writer, ingress_sw, nhop_dmacs, nhop_ipv4s, ports):
+        # The ecmp_nhop slots that moved to the other path go out in a single WriteRequest;
+        # path_writer (a write_template.TableWriter) drops slots already pointing there
         if self.path_weights[0] > old_paths.path_weights[0]:
-            for i in range(old_paths.path_weights[0], self.path_weights[0]):
-                update_path_weights(p4info_helper, ingress_sw=ingress_sw, value=i,
-                    nhop_dmac=nhop_dmacs[0], nhop_ipv4=nhop_ipv4s[0], port=ports[0])
+            slots, nhop = range(old_paths.path_weights[0], self.path_weights[0]), 0
         elif self.path_weights[0] < old_paths.path_weights[0]:
-            for i in range(self.path_weights[0], old_paths.path_weights[0]):
-                update_path_weights(p4info_helper, ingress_sw=ingress_sw, value=i,
-                    nhop_dmac=nhop_dmacs[1], nhop_ipv4=nhop_ipv4s[1], port=ports[1])
+            slots, nhop = range(self.path_weights[0], old_paths.path_weights[0]), 1
+        else:
+            return
+        path_writer.write(ingress_sw, [((i,), (nhop_dmacs[nhop], nhop_ipv4s[nhop], ports[nhop])) for i in slots])
 
 def init_path_weights(p4info_helper, ingress_sw, nhop_dmacs, nhop_ipv4s, ports):
-    for i in range(50):
-        write_path_weights(p4info_helper, ingress_sw=ingress_sw, value=i,
-            nhop_dmac=nhop_dmacs[0], nhop_ipv4=nhop_ipv4s[0], port=ports[0])
-    for i in range(50, 100):
-        write_path_weights(p4info_helper, ingress_sw=ingress_sw, value=i,
-            nhop_dmac=nhop_dmacs[1], nhop_ipv4=nhop_ipv4s[1], port=ports[1])
+    # The 100 ecmp_nhop entries go out in a single WriteRequest
+    with ingress_sw.WriteBatch() as batch:
+        for i in range(50):
+            write_path_weights(p4info_helper, ingress_sw=batch, value=i,
+                nhop_dmac=nhop_dmacs[0], nhop_ipv4=nhop_ipv4s[0], port=ports[0])
+        for i in range(50, 100):
+            write_path_weights(p4info_helper, ingress_sw=batch, value=i,
+                nhop_dmac=nhop_dmacs[1], nhop_ipv4=nhop_ipv4s[1], port=ports[1])
 
 def write_path_weights(p4info_helper, ingress_sw, value, nhop_dmac, nhop_ipv4, port):
     # Create table entry
@@ -141,22 +178,6 @@ def write_path_weights(p4info_helper, ingress_sw, value, nhop_dmac, nhop_ipv4, p
     ingress_sw.WriteTableEntry(table_entry)
     # print("Installed ingress tunnel rule on %s" % ingress_sw.name)
 
-def update_path_weights(p4info_helper, ingress_sw, value, nhop_dmac, nhop_ipv4, port):
-    # Modify table entry
-    table_entry = p4info_helper.buildTableEntry(
-        table_name="MyIngress.ecmp_nhop",
-        match_fields={
-            "meta.ecmp_select": (value),
-        },
-        action_name="MyIngress.set_nhop",
-        action_params={
-            "nhop_dmac": nhop_dmac,
-            "nhop_ipv4": nhop_ipv4,
-            "port": port,
-        })
-    ingress_sw.ModifyTableEntry(table_entry)
-    # print("Installed ingress tunnel rule on %s" % ingress_sw.name)
-
 def readTableRules(p4info_helper, sw):
     """
     Reads the table entries from all tables on the switch.
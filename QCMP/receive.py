@@ -8,6 +8,7 @@
 # Copyright (c) Computing Infrastructure Group, Department of Engineering Science, University of Oxford
 
 #!/usr/bin/env python3
+import argparse
 import os
 import sys
 
@@ -15,6 +16,11 @@ from scapy.all import *
 
 from scapy.layers.inet import _IPOption_HDR
 
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '../P4_simulation/utils/'))
+from ring_capture import bpf_ipv4, open_ring_or_none
+
 counter = 0
 
 class SwitchTrace(Packet):
@@ -46,10 +52,34 @@ def handle_pkt(pkt):
 
     sys.stdout.flush()
 
+def handle_batch(batch):
+    global counter
+    for ts, frame in batch:
+        counter += 1
+        print(counter)
+        if counter % 50 == 0:
+            Ether(bytes(frame)).show2()
+            print(len(frame))
+
+    sys.stdout.flush()
+
 def main():
-    iface = 'eth0'
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iface', default='eth0')
+    parser.add_argument('--capture-backend', choices=('scapy', 'ring'), default='scapy',
+                        help='scapy: sniff(); ring: AF_PACKET TPACKET_V3 ring + kernel BPF (falls back to scapy)')
+    args = parser.parse_args()
+    iface = args.iface
     print("sniffing on %s" % iface)
     sys.stdout.flush()
+    if args.capture_backend == 'ring':
+        cap = open_ring_or_none(iface, bpf_ipv4())
+        if cap is not None:
+            try:
+                cap.run(handle_batch)
+            finally:
+                cap.close()
+            return
     sniff(filter="ip", iface = iface,
           prn = lambda x: handle_pkt(x))
 
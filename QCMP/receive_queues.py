@@ -8,6 +8,7 @@
 # Copyright (c) Computing Infrastructure Group, Department of Engineering Science, University of Oxford
 
 #!/usr/bin/env python3
+import argparse
 import os
 import sys
 import grpc
@@ -15,50 +16,46 @@ import math
 import numpy as np
 
 from scapy.all import *
-from scapy.layers.inet import _IPOption_HDR
 
 sys.path.append(
     os.path.join(os.path.dirname(os.path.abspath(__file__)),
                  '../utils/'))
-import p4runtime_lib.bmv2
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '../P4_simulation/utils/'))
 import p4runtime_lib.helper
+from p4runtime_lib.pool import SwitchConnectionPool, SwitchUnavailable
+from p4runtime_lib.switch import WriteBatchError
+from p4runtime_lib.write_template import TableWriter
+from mri_decoder import decode_frame, frame_bytes
+from ring_capture import bpf_ipv4, open_ring_or_none
 
 from q_table import (path_stats,
                      q_table)
 
 old_paths = [path_stats([0, 0], [50, 50]), path_stats([0, 0], [50, 50]), path_stats([0, 0], [50, 50])]
 
-class SwitchTrace(Packet):
-    fields_desc = [ IntField("swid", 0),
-                  IntField("qdepth", 0)]
-    def extract_padding(self, p):
-                return "", p
-
-class IPOption_MRI(IPOption):
-    name = "MRI"
-    option = 31
-    fields_desc = [ _IPOption_HDR,
-                    FieldLenField("length", None, fmt="B",
-                                  length_of="swtraces",
-                                  adjust=lambda pkt,l:l*2+4),
-                    ShortField("count", 0),
-                    PacketListField("swtraces",
-                                   [],
-                                   SwitchTrace,
-                                   count_from=lambda pkt:(pkt.count*1)) ]
-
-def runthat(switch_q_table, switch, mri, path_dicts, counter, index1, index2, index3, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params):
+# One arbitrated P4Runtime connection per switch, kept open for the whole run
+switch_pool = SwitchConnectionPool()
+# (name, address, device_id) of the path-defining switches
+S1 = ('s1', '127.0.0.1:50051', 0)
+S2 = ('s2', '127.0.0.1:50052', 1)
+S3 = ('s3', '127.0.0.1:50053', 2)
+# ecmp_nhop writer per switch name: knows the slots on the switch, sends only changed ones
+path_writers = {}
+
+def runthat(switch_q_table, switch, swtraces, path_dicts, counter, index1, index2, index3, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params):
     # index1 : index for where switch queue data is stored in path_dicts (list of dicts)
     # index2 : which switch trace contains the queue length
     # index3 : swid for path defining switch
 
     switch_q_table.update_parameters()
-    queue_length = mri.swtraces[index2].qdepth
-        # print(mri.swtraces[i].swid, mri.swtraces[i].qdepth)
-    if mri.swtraces[index3].swid == diff_switches[0]:
+    queue_length = swtraces[index2].qdepth
+        # print(swtraces[i].swid, swtraces[i].qdepth)
+    if swtraces[index3].swid == diff_switches[0]:
         path_dicts[index1]['path1'] = int(queue_length/2)
         counter[index1][0] += 1
-    elif mri.swtraces[index3].swid == diff_switches[1]:
+    elif swtraces[index3].swid == diff_switches[1]:
         path_dicts[index1]['path2'] = int(queue_length/2)
         counter[index1][1] += 1
 
@@ -81,70 +78,64 @@ def runthat(switch_q_table, switch, mri, path_dicts, counter, index1, index2, in
 
 
         p4info_file_path = os.path.join(os.getcwd(), 'build/load_balance_advanced.p4.p4info.txt')
-        p4info_helper = p4runtime_lib.helper.P4InfoHelper(p4info_file_path)
-
-        switch.MasterArbitrationUpdate()
-
-        new_paths.change_path_weights(old_paths[index1], p4info_helper, switch, nhop_dmacs, nhop_ipv4s, ports)
-
-        switch.shutdown()
-
-        switch_q_table.reset_parameters(new_paths, reset_params[index1])
+        p4info_helper = p4runtime_lib.helper.get_p4info_helper(p4info_file_path)
+        if switch[0] not in path_writers:
+            path_writers[switch[0]] = TableWriter(p4info_helper, "MyIngress.ecmp_nhop", "MyIngress.set_nhop")
+
+        try:
+            with switch_pool.connection(*switch) as sw:
+                new_paths.change_path_weights(old_paths[index1], path_writers[switch[0]], sw, nhop_dmacs, nhop_ipv4s, ports)
+        except (SwitchUnavailable, WriteBatchError, grpc.RpcError) as e:
+            # the switch keeps the old weights: diff against them on the next step
+            print('s{0}: weights not written: {1}'.format(index1+1, e))
+        else:
+            switch_q_table.reset_parameters(new_paths, reset_params[index1])
+            old_paths[index1] = new_paths
 
-        old_paths[index1] = new_paths
         path_dicts[index1].clear()
         for i in range(len(counter[index1])):
             counter[index1][i] = 0
 
 
 def handle_pkt(pkt, s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, reset_params):
-
     # pkt.show2()
-    if pkt[IP]:
+    handle_frame(frame_bytes(pkt), s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, reset_params)
 
-        mri=pkt[IP][IPOption_MRI]
-        path_len = len(mri.swtraces)
+def handle_frame(frame, s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, reset_params):
 
-        if path_len == 3:
+    decoded = decode_frame(frame)
+    if decoded is not None:
+        swtraces = decoded.traces
+        if not swtraces:
+            sys.stdout.flush()
+            return
+        path_len = len(swtraces)
 
-            s1 = p4runtime_lib.bmv2.Bmv2SwitchConnection(
-                name='s1',
-                address='127.0.0.1:50051',
-                device_id=0)
+        if path_len == 3:
 
             nhop_dmacs = ["00:00:00:00:01:04", "00:00:00:00:01:05"]
             nhop_ipv4s = ["10.0.2.0", "10.0.3.0"]
             ports = [4, 5]
             diff_switches = [2, 3]
 
-            runthat(s1_q_table, s1, mri, path_dicts, counter, 0, 2, 1, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params)
+            runthat(s1_q_table, S1, swtraces, path_dicts, counter, 0, 2, 1, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params)
 
         else:
-            if mri.swtraces[3].swid == 2:
-                s2 = p4runtime_lib.bmv2.Bmv2SwitchConnection(
-                    name='s2',
-                    address='127.0.0.1:50052',
-                    device_id=1)
-
+            if swtraces[3].swid == 2:
                 nhop_dmacs = ["00:00:00:00:02:03", "00:00:00:00:02:04"]
                 nhop_ipv4s = ["10.0.4.0", "10.0.5.0"]
                 ports = [3, 4]
                 diff_switches = [4, 5]
 
-                runthat(s2_q_table, s2, mri, path_dicts, counter, 1, 3, 2, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params)
-
-            elif mri.swtraces[3].swid == 3:
-                s3 = p4runtime_lib.bmv2.Bmv2SwitchConnection(
-                    name='s3',
-                    address='127.0.0.1:50053',
-                    device_id=2)
+                runthat(s2_q_table, S2, swtraces, path_dicts, counter, 1, 3, 2, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params)
 
+            elif swtraces[3].swid == 3:
                 nhop_dmacs = ["00:00:00:00:03:03", "00:00:00:00:03:04"]
                 nhop_ipv4s = ["10.0.4.0", "10.0.5.0"]
                 ports = [3, 4]
                 diff_switches = [4, 5]
 
-                runthat(s3_q_table, s3, mri, path_dicts, counter, 2, 3, 2, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params)
+                runthat(s3_q_table, S3, swtraces, path_dicts, counter, 2, 3, 2, diff_switches, nhop_dmacs, nhop_ipv4s, ports, reset_params)
 
 
     else:
@@ -153,20 +144,61 @@ def handle_pkt(pkt, s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, res
     sys.stdout.flush()
 
 def main():
-    s1_q_table = q_table()
-    s2_q_table = q_table()
-    s3_q_table = q_table()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iface', default='s1-eth3')
+    parser.add_argument('--capture-backend', choices=('scapy', 'ring'), default='scapy',
+                        help='scapy: sniff(); ring: AF_PACKET TPACKET_V3 ring + kernel BPF (falls back to scapy)')
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help='Save s1/s2/s3 Q tables as <dir>/s<N>_q_table.npz (periodically and on exit)')
+    parser.add_argument('--checkpoint-every', type=int, default=200,
+                        help='Checkpoint a switch every N of its Q updates (0: only on exit)')
+    parser.add_argument('--warm-start', default=None,
+                        help='Directory with s<N>_q_table.npz checkpoints to resume from')
+    parser.add_argument('--read-only', action='store_true',
+                        help='Memory-map the --warm-start tables read-only (shared, no learning, no checkpoints)')
+    args = parser.parse_args()
+    if args.read_only and not args.warm_start:
+        parser.error('--read-only needs --warm-start')
+    checkpoint_dir = None if args.read_only else args.checkpoint_dir
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    tables = []
+    for i in (1, 2, 3):
+        name = 's%d_q_table.npz' % i
+        table = q_table(checkpoint=os.path.join(checkpoint_dir, name) if checkpoint_dir else None,
+                        checkpoint_every=args.checkpoint_every)
+        if args.warm_start:
+            meta = table.load_checkpoint(os.path.join(args.warm_start, name), mmap=args.read_only)
+            print('s%d: warm start from %s (%d steps)' % (i, args.warm_start, meta['steps']))
+        tables.append(table)
+    s1_q_table, s2_q_table, s3_q_table = tables
     s1_path_dict = {}
     s2_path_dict = {}
     s3_path_dict = {}
     path_dicts = [s1_path_dict, s2_path_dict, s3_path_dict]
     counter = [[0, 0], [0, 0], [0, 0]]
     reset_params = [[],[],[]]
-    iface = 's1-eth3'
+    iface = args.iface
     print("sniffing on %s" % iface)
     sys.stdout.flush()
-    sniff(filter="ip", iface = iface,
-          prn = lambda x: handle_pkt(x, s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, reset_params))
+    try:
+        if args.capture_backend == 'ring':
+            # s1-eth3 is a switch port in the root namespace: keep both directions like sniff()
+            cap = open_ring_or_none(iface, bpf_ipv4(), ignore_outgoing=False)
+            if cap is not None:
+                try:
+                    cap.run(lambda batch: [handle_frame(frame, s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, reset_params)
+                                           for ts, frame in batch])
+                finally:
+                    cap.close()
+                return
+        sniff(filter="ip", iface = iface,
+              prn = lambda x: handle_pkt(x, s1_q_table, s2_q_table, s3_q_table, path_dicts, counter, reset_params))
+    finally:
+        for table in tables:
+            if table.checkpoint and table.steps:
+                table.save_checkpoint(table.checkpoint)
 
 if __name__ == '__main__':
     main()
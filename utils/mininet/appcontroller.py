@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 import subprocess
 
+import thrift_pool
 from shortest_path import ShortestPath
 
 
@@ -33,6 +34,11 @@ class AppController:
 
     def read_register(self, register, idx, thrift_port=9090, sw=None):
         if sw: thrift_port = sw.thrift_port
+        try:
+            # one pooled connection per switch instead of a CLI process per read
+            return int(thrift_pool.get_client(thrift_port).register_read(register, idx))
+        except thrift_pool.ThriftUnavailable:
+            pass
         p = subprocess.Popen(['simple_switch_CLI', '--thrift-port', str(thrift_port)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         stdout, stderr = p.communicate(input="register_read %s %d" % (register, idx))
         reg_val = [l for l in stdout.split('\n') if ' %s[%d]' % (register, idx) in l][0].split('= ', 1)[1]
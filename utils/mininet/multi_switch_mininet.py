@@ -24,6 +24,10 @@ import re
 import sys
 from time import sleep
 
+# appcontroller imports thrift_pool from utils/; appended so that
+# utils/p4_mininet.py does not shadow the one next to this script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
 import appcontroller
 import apptopo
 from mininet.cli import CLI
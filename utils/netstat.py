@@ -14,11 +14,41 @@
 # limitations under the License.
 #
 
-import psutil
+import os
+import socket
+import time
 
+PROBE_TIMEOUT = 0.5      # seconds per connect attempt
+FIRST_DELAY = 0.005      # first backoff delay of wait_for_port
+MAX_DELAY = 0.25
 
-def check_listening_on_port(port):
-    for c in psutil.net_connections(kind='inet'):
-        if c.status == 'LISTEN' and c.laddr[1] == port:
+
+def check_listening_on_port(port, host='127.0.0.1'):
+    """True if host:port accepts TCP connections. A single connect() probe
+    instead of a walk over every inet socket of the machine."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.settimeout(PROBE_TIMEOUT)
+    try:
+        return s.connect_ex((host, port)) == 0
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
+def wait_for_port(port, pid=None, timeout=10, host='127.0.0.1'):
+    """Probe host:port with exponential backoff (FIRST_DELAY doubling up to
+    MAX_DELAY) until it accepts connections. False if process `pid` exits
+    first or nothing listens within `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    delay = FIRST_DELAY
+    while True:
+        if check_listening_on_port(port, host):
             return True
-    return False
+        if pid is not None and not os.path.exists(os.path.join("/proc", str(pid))):
+            return False
+        now = time.monotonic()
+        if now >= deadline:
+            return False
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * 2, MAX_DELAY)
@@ -0,0 +1,145 @@
+"""
+Process-wide registry of arbitrated P4Runtime switch connections.
+
+A controller that reacts to telemetry packets should not open a gRPC channel,
+a StreamChannel and a master arbitration for every packet. SwitchConnectionPool
+keeps one arbitrated connection per (address, device_id) for the life of the
+process. A connection is dropped when its stream dies or an RPC fails with a
+transport/mastership error, and reopened on a later call; consecutive failed
+connects back off exponentially so a switch that is down does not stall the
+control loop.
+
+    pool = SwitchConnectionPool()
+    with pool.connection('s1', '127.0.0.1:50051', 0) as sw:
+        sw.WriteTableEntry(table_entry)
+"""
+from contextlib import contextmanager
+from queue import Empty
+import threading
+import time
+
+import grpc
+
+from . import switch
+from .bmv2 import Bmv2SwitchConnection
+
+# Seconds to wait for the channel to become ready and for the arbitration reply
+CONNECT_TIMEOUT = 2.0
+MIN_BACKOFF = 0.1
+MAX_BACKOFF = 5.0
+
+# RPC errors after which the connection is reopened (the channel or stream is
+# gone, or this client is no longer primary for the device)
+RECONNECT_CODES = frozenset((
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.CANCELLED,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.PERMISSION_DENIED,
+))
+
+
+class SwitchUnavailable(Exception):
+    """The switch could not be reached, or the pool is still backing off after a failure."""
+
+
+def CloseSwitchConnection(conn):
+    """Shut down conn's stream, close its channel and drop it from switch.connections."""
+    conn.shutdown()
+    conn.channel.close()
+    if conn in switch.connections:
+        switch.connections.remove(conn)
+
+
+class _PoolEntry(object):
+    __slots__ = ("conn", "failures", "retry_at")
+
+    def __init__(self):
+        self.conn = None
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class SwitchConnectionPool(object):
+
+    def __init__(self, connection_class=Bmv2SwitchConnection,
+                 connect_timeout=CONNECT_TIMEOUT,
+                 min_backoff=MIN_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.connection_class = connection_class
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, address, device_id):
+        """Arbitrated connection for (address, device_id), opened on first use.
+        Raises SwitchUnavailable if it cannot be opened now."""
+        key = (address, device_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _PoolEntry()
+            if entry.conn is not None:
+                if entry.conn.dispatcher.thread.is_alive():
+                    return entry.conn
+                # the StreamChannel ended: the switch restarted or the channel broke
+                self._drop(entry)
+            now = time.monotonic()
+            if now < entry.retry_at:
+                raise SwitchUnavailable(
+                    "%s (device %d): reconnect in %.2f s" % (address, device_id, entry.retry_at - now))
+            try:
+                entry.conn = self._connect(name, address, device_id)
+            except (grpc.RpcError, grpc.FutureTimeoutError, Empty) as e:
+                self._backoff(entry)
+                raise SwitchUnavailable(
+                    "%s (device %d): connect failed (%s)" % (address, device_id, type(e).__name__)) from e
+            entry.failures = 0
+            return entry.conn
+
+    @contextmanager
+    def connection(self, name, address, device_id):
+        """get() as a context manager; an RPC error that leaves the connection
+        unusable drops it so the next call reconnects."""
+        conn = self.get(name, address, device_id)
+        try:
+            yield conn
+        except grpc.RpcError as e:
+            if e.code() in RECONNECT_CODES:
+                self.invalidate(address, device_id)
+            raise
+
+    def invalidate(self, address, device_id):
+        """Close the pooled connection for (address, device_id); the next get() reopens it
+        once the backoff has passed."""
+        with self._lock:
+            entry = self._entries.get((address, device_id))
+            if entry is not None and entry.conn is not None:
+                self._drop(entry)
+                self._backoff(entry)
+
+    def close(self):
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.conn is not None:
+                    self._drop(entry)
+            self._entries.clear()
+
+    def _connect(self, name, address, device_id):
+        conn = self.connection_class(name=name, address=address, device_id=device_id)
+        try:
+            grpc.channel_ready_future(conn.channel).result(timeout=self.connect_timeout)
+            conn.MasterArbitrationUpdate(timeout=self.connect_timeout)
+        except BaseException:
+            CloseSwitchConnection(conn)
+            raise
+        return conn
+
+    def _drop(self, entry):
+        conn, entry.conn = entry.conn, None
+        CloseSwitchConnection(conn)
+
+    def _backoff(self, entry):
+        delay = min(self.max_backoff, self.min_backoff * (2 ** entry.failures))
+        entry.failures += 1
+        entry.retry_at = time.monotonic() + delay
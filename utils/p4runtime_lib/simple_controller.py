@@ -19,6 +19,7 @@ import argparse
 import json
 import os
 import sys
+import time
 
 from p4.config.v1 import p4info_pb2
 
@@ -39,6 +40,29 @@ class InvalidFileContentException(ConfException):
     pass
 
 
+class ProgramReport(object):
+    """What program_switch did on one switch: the time spent in each phase and
+    the entries that could not be written."""
+
+    PHASES = ('connect', 'pipeline', 'entries')
+
+    def __init__(self, addr, device_id):
+        self.addr = addr
+        self.device_id = device_id
+        self.timings = {}   # phase -> seconds
+        self.entries = 0    # updates sent
+        self.requests = 0   # WriteRequests they were sent in
+        self.errors = []    # one message per configuration error or failed entry
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+
 def main():
     parser = argparse.ArgumentParser(description='P4Runtime Simple Controller')
 
@@ -61,11 +85,16 @@ def main():
         parser.error("File %s does not exist!" % args.runtime_conf_file)
     workdir = os.path.dirname(os.path.abspath(args.runtime_conf_file))
     with open(args.runtime_conf_file, 'r') as sw_conf_file:
-        program_switch(addr=args.p4runtime_server_addr,
-                       device_id=args.device_id,
-                       sw_conf_file=sw_conf_file,
-                       workdir=workdir,
-                       proto_dump_fpath=args.proto_dump_file)
+        report = program_switch(addr=args.p4runtime_server_addr,
+                                device_id=args.device_id,
+                                sw_conf_file=sw_conf_file,
+                                workdir=workdir,
+                                proto_dump_fpath=args.proto_dump_file,
+                                runtime_json=args.runtime_conf_file)
+    for msg in report.errors:
+        error(msg)
+    if not report.ok:
+        sys.exit(1)
 
 
 def check_switch_conf(sw_conf, workdir):
@@ -100,22 +129,30 @@ def check_switch_conf(sw_conf, workdir):
                     raise InvalidFileContentException(f"Invalid JSON content in {real_path}: {e}")
 
 
-def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath, runtime_json):
+def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath, runtime_json, name=None):
+    """Program one switch: arbitrate, push the pipeline and write the entries of
+    the runtime configuration. The entries are sent as batched WriteRequests;
+    failed entries are collected in the returned ProgramReport instead of
+    stopping the others. name prefixes the log lines (switches programmed in
+    parallel). Connection and pipeline errors are raised."""
+    prefix = '' if name is None else '[%s] ' % name
+    report = ProgramReport(addr, device_id)
     sw_conf = json_load_byteified(sw_conf_file)
     try:
         check_switch_conf(sw_conf=sw_conf, workdir=workdir)
     except ConfException as e:
-        error("While parsing input runtime configuration: %s" % str(e))
-        return
+        report.errors.append("While parsing input runtime configuration: %s" % str(e))
+        return report
 
-    info('Using P4Info file %s...' % sw_conf['p4info'])
+    info(prefix + 'Using P4Info file %s...' % sw_conf['p4info'])
     p4info_fpath = os.path.join(workdir, sw_conf['p4info'])
     p4info_helper = helper.P4InfoHelper(p4info_fpath)
 
     target = sw_conf['target']
 
-    info("Connecting to P4Runtime server on %s (%s)..." % (addr, target))
+    info(prefix + "Connecting to P4Runtime server on %s (%s)..." % (addr, target))
 
+    t = time.monotonic()
     if target == "bmv2":
         sw = bmv2.Bmv2SwitchConnection(address=addr, device_id=device_id,
                                        proto_dump_file=proto_dump_fpath)
@@ -124,39 +161,59 @@ def program_switch(addr, device_id, sw_conf_file, workdir, proto_dump_fpath, run
 
     try:
         sw.MasterArbitrationUpdate()
+        report.timings['connect'] = time.monotonic() - t
 
+        t = time.monotonic()
         if target == "bmv2":
-            info("Setting pipeline config (%s)..." % sw_conf['bmv2_json'])
+            info(prefix + "Setting pipeline config (%s)..." % sw_conf['bmv2_json'])
             bmv2_json_fpath = os.path.join(workdir, sw_conf['bmv2_json'])
             sw.SetForwardingPipelineConfig(p4info=p4info_helper.p4info,
                                            bmv2_json_file_path=bmv2_json_fpath)
         else:
             raise Exception("Should not be here")
-
-        if 'table_entries' in sw_conf:
-            table_entries = sw_conf['table_entries']
-            info("Inserting %d table entries..." % len(table_entries))
-            for entry in table_entries:
-                info(tableEntryToString(entry))
-                validateTableEntry(entry, p4info_helper, runtime_json)
-                insertTableEntry(sw, entry, p4info_helper)
-
-        if 'multicast_group_entries' in sw_conf:
-            group_entries = sw_conf['multicast_group_entries']
-            info("Inserting %d group entries..." % len(group_entries))
-            for entry in group_entries:
-                info(groupEntryToString(entry))
-                insertMulticastGroupEntry(sw, entry, p4info_helper)
-
-        if 'clone_session_entries' in sw_conf:
-            clone_entries = sw_conf['clone_session_entries']
-            info("Inserting %d clone entries..." % len(clone_entries))
-            for entry in clone_entries:
-                info(cloneEntryToString(entry))
-                insertCloneGroupEntry(sw, entry, p4info_helper)
+        report.timings['pipeline'] = time.monotonic() - t
+
+        t = time.monotonic()
+        labels = []  # the entry of every update, by its index in the batch
+        with sw.WriteBatch(raise_on_error=False) as batch:
+            if 'table_entries' in sw_conf:
+                table_entries = sw_conf['table_entries']
+                info(prefix + "Inserting %d table entries..." % len(table_entries))
+                for entry in table_entries:
+                    label = tableEntryToString(entry)
+                    info(prefix + label)
+                    try:
+                        validateTableEntry(entry, p4info_helper, runtime_json)
+                    except AssertionError as e:
+                        report.errors.append('%s: %s' % (label, e))
+                        continue
+                    labels.append(label)
+                    insertTableEntry(batch, entry, p4info_helper)
+
+            if 'multicast_group_entries' in sw_conf:
+                group_entries = sw_conf['multicast_group_entries']
+                info(prefix + "Inserting %d group entries..." % len(group_entries))
+                for entry in group_entries:
+                    labels.append(groupEntryToString(entry))
+                    info(prefix + labels[-1])
+                    insertMulticastGroupEntry(batch, entry, p4info_helper)
+
+            if 'clone_session_entries' in sw_conf:
+                clone_entries = sw_conf['clone_session_entries']
+                info(prefix + "Inserting %d clone entries..." % len(clone_entries))
+                for entry in clone_entries:
+                    labels.append(cloneEntryToString(entry))
+                    info(prefix + labels[-1])
+                    insertCloneGroupEntry(batch, entry, p4info_helper)
+        report.timings['entries'] = time.monotonic() - t
+        report.entries = batch.sent
+        report.requests = batch.requests
+        report.errors.extend('%s: %s %s' % (labels[e.index], e.code, e.message)
+                             for e in batch.errors)
 
     finally:
         sw.shutdown()
+    return report
 
 
 def validateTableEntry(flow, p4info_helper, runtime_json):
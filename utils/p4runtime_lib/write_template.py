@@ -0,0 +1,209 @@
+#
+# Precompiled P4Runtime writes for entries a controller rewrites every step.
+#
+# EntryTemplate serializes one (table, action) pair once: a p4.v1.Update
+# skeleton per update type, with fixed-width slots for the exact-match key
+# and the action params. A write copies the skeleton and patches the slots, so
+# no TableEntry is built and no P4Info is looked up per step.
+#
+# TableWriter keeps the entries of that table as this controller last wrote
+# (or read) them. It sends INSERT for new keys and MODIFY for existing ones
+# (no MODIFY-fails-then-INSERT retries), skips entries whose values did not
+# change, and sends the rest as one serialized WriteRequest:
+#
+#     writer = TableWriter(p4info_helper, "set_quantum_table", "set_wrr_quantum")
+#     writer.write(sw, [((1,), (1, 7500, 1))])   # -> 1 update sent
+#     writer.write(sw, [((1,), (1, 7500, 1))])   # -> 0, nothing sent
+#
+# The entry state is read from the switch on the first write and dropped
+# after a failed write (the next write reads it again).
+#
+import grpc
+from p4.v1 import p4runtime_pb2
+
+from .convert import bitwidthToBytes, encode
+from .switch import WriteBatch, WriteBatchError
+
+
+_MISSING = object()
+
+
+def _varint(n):
+    out = bytearray()
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+# (bytes, [slot offsets]) pieces of a serialized message
+def _piece(message):
+    return message.SerializeToString(), []
+
+
+def _slot(tag, width):
+    return _field(tag, (bytes(width), [0]))
+
+
+def _field(tag, piece):
+    body, offsets = piece
+    head = tag + _varint(len(body))
+    return head + body, [o + len(head) for o in offsets]
+
+
+def _concat(*pieces):
+    out = b""
+    offsets = []
+    for body, o in pieces:
+        offsets += [x + len(out) for x in o]
+        out += body
+    return out, offsets
+
+
+class EntryTemplate(object):
+    """Serialized Update skeletons of one (table, action) with patchable key/param slots."""
+
+    def __init__(self, p4info_helper, table_name, action_name, match_fields=None, params=None):
+        table = p4info_helper.get("tables", name=table_name)
+        action = p4info_helper.get("actions", name=action_name)
+        mfs = table.match_fields if match_fields is None else \
+            [p4info_helper.get_match_field(table_name, name=n) for n in match_fields]
+        ps = action.params if params is None else \
+            [p4info_helper.get_action_param(action_name, name=n) for n in params]
+        for mf in mfs:
+            if mf.match_type != mf.EXACT:
+                raise ValueError("%s: match field %s is not exact" % (table_name, mf.name))
+        self.table_id = table.preamble.id
+        self.action_id = action.preamble.id
+        self.match_field_ids = [mf.id for mf in mfs]
+        self.param_ids = [p.id for p in ps]
+        self.bitwidths = [mf.bitwidth for mf in mfs] + [p.bitwidth for p in ps]
+        self.widths = [bitwidthToBytes(b) for b in self.bitwidths]
+        self.n_key = len(mfs)
+
+        # Update{type, entity{table_entry{table_id, match[]{field_id, exact{value}},
+        #                                 action{action{action_id, params[]{param_id, value}}}}}}
+        matches = [_concat(_piece(p4runtime_pb2.FieldMatch(field_id=mf.id)),
+                           _field(b"\x12", _slot(b"\x0a", bitwidthToBytes(mf.bitwidth)))) for mf in mfs]
+        params = [_concat(_piece(p4runtime_pb2.Action.Param(param_id=p.id)),
+                          _slot(b"\x1a", bitwidthToBytes(p.bitwidth))) for p in ps]
+        action_piece = _concat(_piece(p4runtime_pb2.Action(action_id=self.action_id)),
+                               *[_field(b"\x22", p) for p in params])
+        entry = _concat(_piece(p4runtime_pb2.TableEntry(table_id=self.table_id)),
+                        *[_field(b"\x12", m) for m in matches],
+                        _field(b"\x1a", _field(b"\x0a", action_piece)))
+        entity = _field(b"\x12", _field(b"\x12", entry))  # Update.entity{table_entry}
+        # update type -> (Update bytes, [(slot offset, width)])
+        self._skeletons = {}
+        for update_type in (p4runtime_pb2.Update.INSERT, p4runtime_pb2.Update.MODIFY,
+                            p4runtime_pb2.Update.DELETE):
+            body, offsets = _concat(_piece(p4runtime_pb2.Update(type=update_type)), entity)
+            self._skeletons[update_type] = (body, list(zip(offsets, self.widths)))
+
+    def encode(self, key, values):
+        """Fixed-width bytes of key + values (ints, or MAC/IPv4 strings like helper)."""
+        fields = tuple(key) + tuple(values)
+        if len(fields) != len(self.widths):
+            raise ValueError("expected %d key and %d param values, got %d" % (
+                self.n_key, len(self.param_ids), len(fields)))
+        out = []
+        for x, bitwidth, width in zip(fields, self.bitwidths, self.widths):
+            if type(x) == int:
+                if not 0 <= x < 1 << bitwidth:
+                    raise ValueError("%d does not fit in %d bits" % (x, bitwidth))
+                out.append(x.to_bytes(width, 'big'))
+                continue
+            b = encode(x, bitwidth)
+            if len(b) != width:
+                raise ValueError("%r encodes to %d bytes, field has %d" % (x, len(b), width))
+            out.append(b)
+        return out
+
+    def update(self, update_type, encoded):
+        """Serialized p4.v1.Update of `update_type` with the slots set to `encoded`."""
+        skeleton, slots = self._skeletons[update_type]
+        buf = bytearray(skeleton)
+        for (offset, width), b in zip(slots, encoded):
+            buf[offset:offset + width] = b
+        return bytes(buf)
+
+    def decode(self, table_entry):
+        """(key, values) of a read-back TableEntry as ints; values None for another action."""
+        matches = {m.field_id: m.exact.value for m in table_entry.match}
+        key = tuple(int.from_bytes(matches.get(i, b""), 'big') for i in self.match_field_ids)
+        action = table_entry.action.action
+        if action.action_id != self.action_id:
+            return key, None
+        params = {p.param_id: p.value for p in action.params}
+        return key, tuple(int.from_bytes(params.get(i, b""), 'big') for i in self.param_ids)
+
+
+class TableWriter(object):
+    """Writes entries of one table through an EntryTemplate, sending only changes."""
+
+    def __init__(self, p4info_helper, table_name, action_name, match_fields=None, params=None):
+        self.template = EntryTemplate(p4info_helper, table_name, action_name, match_fields, params)
+        self.entries = None     # {key ints: value ints or None}; None: not read yet
+        self.requests = 0       # WriteRequests sent
+        self.sent = 0           # updates sent
+        self.skipped = 0        # unchanged entries not sent
+
+    def forget(self):
+        """Drop the entry state; the next write reads it from the switch."""
+        self.entries = None
+
+    def sync(self, connection):
+        """Read the table's current entries from the switch."""
+        entries = {}
+        for response in connection.ReadTableEntries(table_id=self.template.table_id):
+            for entity in response.entities:
+                key, values = self.template.decode(entity.table_entry)
+                entries[key] = values
+        self.entries = entries
+
+    def write(self, connection, changes):
+        """Set (key, values) pairs in one WriteRequest; returns the number of updates sent.
+        Raises WriteBatchError (like WriteBatch) or grpc.RpcError if the read fails."""
+        if self.entries is None:
+            self.sync(connection)
+        template = self.template
+        n = template.n_key
+        pending = {}  # key -> (values, encoded); the last change of a key wins
+        for key, values in changes:
+            encoded = template.encode(key, values)
+            key_ints = tuple(int.from_bytes(b, 'big') for b in encoded[:n])
+            pending[key_ints] = (tuple(int.from_bytes(b, 'big') for b in encoded[n:]), encoded)
+        updates = []
+        for key_ints, (value_ints, encoded) in pending.items():
+            current = self.entries.get(key_ints, _MISSING)
+            if current == value_ints:
+                self.skipped += 1
+                continue
+            update_type = p4runtime_pb2.Update.INSERT if current is _MISSING else p4runtime_pb2.Update.MODIFY
+            updates.append(template.update(update_type, encoded))
+        if not updates:
+            return 0
+        body = _write_request(connection.device_id, updates)
+        self.requests += 1
+        self.sent += len(updates)
+        try:
+            connection.WriteSerialized(body)
+        except grpc.RpcError as e:
+            self.entries = None  # unknown which updates were applied
+            raise WriteBatchError(WriteBatch._update_errors(p4runtime_pb2.WriteRequest.FromString(body), 0, e))
+        for key_ints, (value_ints, _) in pending.items():
+            self.entries[key_ints] = value_ints
+        return len(updates)
+
+
+_headers = {}  # device_id -> serialized WriteRequest{device_id, election_id}
+
+
+def _write_request(device_id, updates):
+    header = _headers.get(device_id)
+    if header is None:
+        request = p4runtime_pb2.WriteRequest(device_id=device_id)
+        request.election_id.low = 1
+        header = _headers[device_id] = request.SerializeToString()
+    return header + b"".join(b"\x22" + _varint(len(u)) + u for u in updates)
@@ -17,12 +17,11 @@
 
 import os
 import tempfile
-from time import sleep
 
 from mininet.log import debug, error, info
 from mininet.moduledeps import pathCheck
 from mininet.node import Switch
-from netstat import check_listening_on_port
+from netstat import check_listening_on_port, wait_for_port
 from p4_mininet import SWITCH_START_TIMEOUT, P4Switch
 
 
@@ -96,12 +95,8 @@ class P4RuntimeSwitch(P4Switch):
 
 
     def check_switch_started(self, pid):
-        for _ in range(SWITCH_START_TIMEOUT * 2):
-            if not os.path.exists(os.path.join("/proc", str(pid))):
-                return False
-            if check_listening_on_port(self.grpc_port):
-                return True
-            sleep(0.5)
+        # gRPC connect probe with exponential backoff
+        return wait_for_port(self.grpc_port, pid, SWITCH_START_TIMEOUT)
 
     def start(self, controllers):
         info("Starting P4 switch {}.\n".format(self.name))
@@ -139,7 +134,6 @@ class P4RuntimeSwitch(P4Switch):
             self.cmd(cmd + ' >' + self.log_file + ' 2>&1 & echo $! >> ' + f.name)
             pid = int(f.read())
         debug("P4 switch {} PID is {}.\n".format(self.name, pid))
-        if not self.check_switch_started(pid):
-            error("P4 switch {} did not start correctly.\n".format(self.name))
-            exit(1)
-        info("P4 switch {} has been started.\n".format(self.name))
+        # readiness is checked for all switches at once in batchStartup(); not
+        # self.pid, which Mininet keeps for the node shell (popen, mnexec)
+        self.sw_pid = pid
@@ -24,7 +24,8 @@ import argparse
 import json
 import os
 import subprocess
-from time import sleep
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import p4runtime_lib.simple_controller
 from mininet.cli import CLI
@@ -195,17 +196,19 @@ class ExerciseRunner:
             and starts the mininet CLI. This is the main method to run after
             initializing the object.
         """
+        t0 = time.monotonic()
         # Initialize mininet with the topology specified by the config
         self.create_network()
+        # switches boot concurrently and are probed until they accept
+        # connections (P4Switch.batchStartup), so no fixed sleep is needed
         self.net.start()
-        sleep(1)
+        switches_ready = time.monotonic() - t0
 
         # some programming that must happen after the net has started
         self.program_hosts()
         self.program_switches()
-
-        # wait for that to finish. Not sure how to do this better
-        sleep(1)
+        print('Startup: %d switches ready after %.2f s, programmed after %.2f s' % (
+            len(self.net.switches), switches_ready, time.monotonic() - t0))
 
         self.do_net_cli()
         # stop right after the CLI is exited
@@ -274,13 +277,14 @@ class ExerciseRunner:
         self.logger('Configuring switch %s using P4Runtime with file %s' % (sw_name, runtime_json))
         with open(runtime_json, 'r') as sw_conf_file:
             outfile = '%s/%s-p4runtime-requests.txt' %(self.log_dir, sw_name)
-            p4runtime_lib.simple_controller.program_switch(
+            return p4runtime_lib.simple_controller.program_switch(
                 addr='127.0.0.1:%d' % grpc_port,
                 device_id=device_id,
                 sw_conf_file=sw_conf_file,
                 workdir=os.getcwd(),
                 proto_dump_fpath=outfile,
-                runtime_json=runtime_json
+                runtime_json=runtime_json,
+                name=sw_name
             )
 
     def program_switch_cli(self, sw_name, sw_dict):
@@ -297,22 +301,75 @@ class ExerciseRunner:
         with open(cli_input_commands, 'r') as fin:
             cli_outfile = '%s/%s_cli_output.log'%(self.log_dir, sw_name)
             with open(cli_outfile, 'w') as fout:
-                subprocess.Popen([cli, '--thrift-port', str(thrift_port)],
-                                 stdin=fin, stdout=fout)
+                return subprocess.Popen([cli, '--thrift-port', str(thrift_port)],
+                                        stdin=fin, stdout=fout)
 
     def program_switches(self):
         """ This method will program each switch using the BMv2 CLI and/or
             P4Runtime, depending if any command or runtime JSON files were
-            provided for the switches.
+            provided for the switches. The switches are programmed in
+            parallel, one P4Runtime worker thread per switch; returns once all
+            of them are programmed, after printing the time each switch spent
+            per phase and the entries that failed.
+
+            Returns {switch name: simple_controller.ProgramReport}. Raises if
+            a switch could not be programmed.
         """
+        cli_procs = {}
+        p4runtime_switches = []
         for sw_name, sw_dict in self.switches.items():
             if 'cli_input' not in sw_dict and 'runtime_json' not in sw_dict:
                 self.logger('Warning: No control plane file provided for switch %s.' % sw_name)
                 continue
             if 'cli_input' in sw_dict:
-                self.program_switch_cli(sw_name, sw_dict)
+                cli_procs[sw_name] = self.program_switch_cli(sw_name, sw_dict)
             if 'runtime_json' in sw_dict:
-                self.program_switch_p4runtime(sw_name, sw_dict)
+                p4runtime_switches.append((sw_name, sw_dict))
+
+        reports = {}
+        failures = {}
+        if p4runtime_switches:
+            with ThreadPoolExecutor(max_workers=len(p4runtime_switches)) as pool:
+                futures = {pool.submit(self.program_switch_p4runtime, sw_name, sw_dict): sw_name
+                           for sw_name, sw_dict in p4runtime_switches}
+                for future in as_completed(futures):
+                    sw_name = futures[future]
+                    try:
+                        reports[sw_name] = future.result()
+                    except Exception as e:
+                        failures[sw_name] = ['%s: %s' % (type(e).__name__, e)]
+        # the CLI sessions run in parallel too; wait for them instead of sleeping
+        for sw_name, proc in cli_procs.items():
+            if proc.wait() != 0:
+                failures.setdefault(sw_name, []).append(
+                    'simple_switch_CLI exited with %d (see %s/%s_cli_output.log)'
+                    % (proc.returncode, self.log_dir, sw_name))
+
+        self.print_programming_report(reports, failures)
+        failed = sorted(set(failures) | set(n for n, r in reports.items() if not r.ok))
+        if failed:
+            raise Exception('Programming failed on switch(es) %s' % ', '.join(failed))
+        return reports
+
+    def print_programming_report(self, reports, failures):
+        """ Prints the per-phase programming time of every P4Runtime switch
+            (connect and arbitrate, pipeline push, entries) and the errors
+            collected per switch.
+        """
+        phases = p4runtime_lib.simple_controller.ProgramReport.PHASES
+        if reports:
+            print('Switch programming (s): %-8s %s %8s  %s' % (
+                'switch', ' '.join('%8s' % p for p in phases), 'total', 'updates/requests'))
+            for sw_name in sorted(reports):
+                r = reports[sw_name]
+                print('                        %-8s %s %8.3f  %d/%d' % (
+                    sw_name,
+                    ' '.join('%8.3f' % r.timings[p] if p in r.timings else '%8s' % '-' for p in phases),
+                    r.total, r.entries, r.requests))
+        for sw_name in sorted(set(failures) | set(reports)):
+            errors = failures.get(sw_name, []) + (reports[sw_name].errors if sw_name in reports else [])
+            for msg in errors:
+                print('  %s: ERROR %s' % (sw_name, msg))
 
     def program_hosts(self):
         """ Execute any commands provided in the topology.json file on each Mininet host
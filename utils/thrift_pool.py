@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Long-lived BMv2 Thrift clients for register, counter and meter reads.
+
+P4Runtime cannot read BMv2 registers, so the tools and controllers read them
+over the switch's Thrift port. Spawning simple_switch_CLI or opening a Thrift
+transport per read costs 10-500 ms each; a ThriftClient keeps one connection
+per switch open and reads whole arrays in one call:
+
+    client = get_client(9090)                       # shared, one per (host, port)
+    client.register_read("quantum_storage", 1)      # one cell
+    client.register_read_all("quantum_storage")     # numpy int64 array
+    client.counter_read_all("MyIngress.pkts")       # numpy (size, 2): bytes, packets
+
+A client that loses its connection (switch restarted) reconnects on the next
+call and retries it once.
+
+RegisterPoller snapshots registers (and counters) at a fixed period from a
+background thread, with the change since the previous snapshot:
+
+    poller = RegisterPoller(client, ["quantum_storage"], period=0.1).start()
+    snap = poller.latest()      # snap.t, snap.values[name], snap.deltas[name]
+    t, values, deltas = poller.series("quantum_storage")
+    poller.stop()
+
+From the command line it prints the snapshots:
+
+    thrift_pool.py --thrift-port 9090 --period 0.5 quantum_storage
+
+The bm_runtime Thrift bindings come with BMv2 (installed next to
+simple_switch_CLI) or in a behavioral-model/ checkout next to utils/; elsewhere,
+set BM_RUNTIME_PATH to behavioral-model/tools.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+DEFAULT_HOST = "localhost"
+DEFAULT_THRIFT_PORT = 9090
+DEFAULT_PERIOD = 0.1
+DEFAULT_HISTORY = 1000
+# behavioral-model/ checked out next to utils/ (the bindings are in its tools/)
+CHECKOUT_BM_RUNTIME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                                        "behavioral-model", "tools")
+
+
+class ThriftUnavailable(Exception):
+    """The bm_runtime/thrift modules are missing or the switch cannot be reached."""
+
+
+def bm_runtime_paths():
+    """Where the bm_runtime bindings live in a source checkout (tried after the
+    installed ones, by the shared pool)."""
+    return [os.path.abspath(CHECKOUT_BM_RUNTIME_PATH)]
+
+
+def import_bm_runtime(extra_paths=()):
+    """(Standard, TTransport, TSocket, TBinaryProtocol, TMultiplexedProtocol),
+    looking in extra_paths and $BM_RUNTIME_PATH if they are not installed."""
+    paths = list(extra_paths)
+    if os.environ.get("BM_RUNTIME_PATH"):
+        paths.append(os.environ["BM_RUNTIME_PATH"])
+    for path in [None] + paths:
+        if path is not None:
+            for p in (path, os.path.join(path, "bm_runtime")):
+                if p not in sys.path:
+                    sys.path.insert(0, p)
+        try:
+            from bm_runtime.standard import Standard
+            from thrift.protocol import TBinaryProtocol, TMultiplexedProtocol
+            from thrift.transport import TSocket, TTransport
+            return Standard, TTransport, TSocket, TBinaryProtocol, TMultiplexedProtocol
+        except ImportError as e:
+            error = e
+    raise ThriftUnavailable("BMv2 Thrift bindings not found (%s); set BM_RUNTIME_PATH "
+                            "to behavioral-model/tools" % error)
+
+
+class ThriftClient(object):
+    """One open connection to a switch's Thrift "Standard" service.
+
+    Calls are serialized with a lock (a Thrift client is not thread-safe), so a
+    client can be shared by the threads of a process.
+    """
+
+    def __init__(self, thrift_port=DEFAULT_THRIFT_PORT, host=DEFAULT_HOST, cxt_id=0,
+                 timeout=None, bm_runtime_paths=()):
+        self.host = host
+        self.thrift_port = thrift_port
+        self.cxt_id = cxt_id
+        self.timeout = timeout
+        self._modules = import_bm_runtime(bm_runtime_paths)
+        self._lock = threading.Lock()
+        self._transport = None
+        self._client = None
+        self._arrays = None
+        self.connects = 0
+        self.calls = 0
+        self._connect()
+
+    def _connect(self):
+        Standard, TTransport, TSocket, TBinaryProtocol, TMultiplexedProtocol = self._modules
+        socket = TSocket.TSocket(self.host, self.thrift_port)
+        if self.timeout is not None:
+            socket.setTimeout(self.timeout * 1000.0)
+        transport = TTransport.TBufferedTransport(socket)
+        protocol = TMultiplexedProtocol.TMultiplexedProtocol(
+            TBinaryProtocol.TBinaryProtocol(transport), "Standard")
+        try:
+            transport.open()
+        except TTransport.TTransportException as e:
+            raise ThriftUnavailable("cannot connect to %s:%d: %s" % (self.host, self.thrift_port, e))
+        self._transport = transport
+        self._client = Standard.Client(protocol)
+        self.connects += 1
+
+    def close(self):
+        with self._lock:
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
+
+    def call(self, method, *args):
+        """client.<method>(*args), reconnecting and retrying once if the connection broke."""
+        TTransportException = self._modules[1].TTransportException
+        with self._lock:
+            self.calls += 1
+            for attempt in (0, 1):
+                if self._transport is None:
+                    self._connect()
+                try:
+                    return getattr(self._client, method)(*args)
+                except (TTransportException, EOFError, OSError):
+                    self._transport.close()
+                    self._transport = None
+                    self._arrays = None  # the switch may run another program now
+                    if attempt:
+                        raise
+
+    def array_sizes(self):
+        """{"register_arrays"|"counter_arrays"|"meter_arrays": {name: size}} of the
+        running program (read from the switch once per connection)."""
+        if self._arrays is None:
+            config = json.loads(self.call("bm_get_config"))
+            self._arrays = {kind: {a["name"]: a["size"] for a in config.get(kind, [])}
+                            for kind in ("register_arrays", "counter_arrays", "meter_arrays")}
+        return self._arrays
+
+    def _size(self, kind, name):
+        sizes = self.array_sizes()[kind]
+        if name not in sizes:
+            raise KeyError("no %s %r on %s:%d (has %s)" % (
+                kind[:-1].replace("_", " "), name, self.host, self.thrift_port, ", ".join(sorted(sizes))))
+        return sizes[name]
+
+    def register_read(self, name, index):
+        return self.call("bm_register_read", self.cxt_id, name, index)
+
+    def register_read_all(self, name):
+        """All cells of a register array in one call, as a numpy int64 array."""
+        import numpy as np
+        return np.array(self.call("bm_register_read_all", self.cxt_id, name), dtype=np.int64)
+
+    def register_write(self, name, index, value):
+        self.call("bm_register_write", self.cxt_id, name, index, value)
+
+    def counter_read(self, name, index):
+        """(bytes, packets) of one counter cell."""
+        value = self.call("bm_counter_read", self.cxt_id, name, index)
+        return value.bytes, value.packets
+
+    def counter_read_all(self, name):
+        """numpy int64 array of shape (size, 2): bytes, packets of every cell.
+        Thrift has no bulk counter read: one call per cell on the open connection."""
+        import numpy as np
+        out = np.empty((self._size("counter_arrays", name), 2), dtype=np.int64)
+        for i in range(len(out)):
+            out[i] = self.counter_read(name, i)
+        return out
+
+    def meter_rates(self, name, index):
+        """[(units per microsecond, burst size)] of one meter cell (committed, peak)."""
+        return [(r.units_per_micros, r.burst_size)
+                for r in self.call("bm_meter_get_rates", self.cxt_id, name, index)]
+
+    def meter_rates_all(self, name):
+        return [self.meter_rates(name, i) for i in range(self._size("meter_arrays", name))]
+
+
+class ThriftClientPool(object):
+    """One ThriftClient per (host, port) for the life of the process."""
+
+    def __init__(self, **client_args):
+        self.client_args = client_args
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, thrift_port=DEFAULT_THRIFT_PORT, host=DEFAULT_HOST, **client_args):
+        key = (host, thrift_port)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                args = dict(self.client_args, **client_args)
+                client = self._clients[key] = ThriftClient(thrift_port, host, **args)
+            return client
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+_pool = ThriftClientPool(bm_runtime_paths=bm_runtime_paths())
+atexit.register(_pool.close)
+
+
+def get_client(thrift_port=DEFAULT_THRIFT_PORT, host=DEFAULT_HOST, **client_args):
+    """The process-wide client of a switch (opened on first use)."""
+    return _pool.get(thrift_port, host, **client_args)
+
+
+def get_client_or_none(thrift_port=DEFAULT_THRIFT_PORT, host=DEFAULT_HOST, **client_args):
+    """get_client(), or None if the bindings are missing or the switch cannot be
+    reached (for tools that fall back to simple_switch_CLI)."""
+    try:
+        return get_client(thrift_port, host, **client_args)
+    except ThriftUnavailable:
+        return None
+
+
+class Snapshot(object):
+    __slots__ = ("t", "values", "deltas")
+
+    def __init__(self, t, values, deltas):
+        self.t = t              # time.time() of the read
+        self.values = values    # {name: array}
+        self.deltas = deltas    # {name: values - previous values} (zeros for the first snapshot)
+
+
+class RegisterPoller(object):
+    """Snapshots whole registers (int64 arrays) and counters ((size, 2) arrays of
+    bytes, packets) every `period` seconds from a background thread, keeping the
+    last `history` snapshots. A poll that overruns the period skips the missed
+    ticks instead of bunching up (counted in `overruns`)."""
+
+    def __init__(self, client, registers=(), counters=(), period=DEFAULT_PERIOD,
+                 history=DEFAULT_HISTORY, on_snapshot=None):
+        self.client = client
+        self.registers = list(registers)
+        self.counters = list(counters)
+        self.period = period
+        self.snapshots = deque(maxlen=history)
+        self.on_snapshot = on_snapshot
+        self.polls = 0
+        self.overruns = 0
+        self.error = None  # exception that stopped the thread
+        self._previous = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Take one snapshot now."""
+        import numpy as np
+        values = {name: self.client.register_read_all(name) for name in self.registers}
+        values.update((name, self.client.counter_read_all(name)) for name in self.counters)
+        t = time.time()
+        previous = self._previous
+        deltas = {name: v - previous[name] if previous is not None and previous[name].shape == v.shape
+                  else np.zeros_like(v) for name, v in values.items()}
+        self._previous = values
+        self.polls += 1
+        snap = Snapshot(t, values, deltas)
+        self.snapshots.append(snap)
+        if self.on_snapshot is not None:
+            self.on_snapshot(snap)
+        return snap
+
+    def latest(self):
+        return self.snapshots[-1] if self.snapshots else None
+
+    def series(self, name):
+        """(times, values, deltas) of the kept snapshots, stacked: times is 1-D,
+        values and deltas have one row per snapshot."""
+        import numpy as np
+        snaps = list(self.snapshots)
+        if not snaps:
+            return np.zeros(0), None, None
+        return (np.array([s.t for s in snaps]),
+                np.stack([s.values[name] for s in snaps]),
+                np.stack([s.deltas[name] for s in snaps]))
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="register-poller", daemon=True)
+        self._thread.start()
+        return self
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.error = e
+                return
+            next_t += self.period
+            now = time.monotonic()
+            if now > next_t:
+                missed = int((now - next_t) / self.period) + 1
+                self.overruns += missed
+                next_t += missed * self.period
+            self._stop.wait(next_t - now)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Print BMv2 register/counter snapshots over Thrift")
+    parser.add_argument("registers", nargs="*", help="register arrays to read")
+    parser.add_argument("--counter", action="append", default=[], help="counter array to read (repeatable)")
+    parser.add_argument("--thrift-port", type=int, default=DEFAULT_THRIFT_PORT)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--period", type=float, default=1.0, help="seconds between snapshots (default: 1)")
+    parser.add_argument("--count", type=int, default=0, help="stop after this many snapshots (default: run until ^C)")
+    parser.add_argument("--once", action="store_true", help="print one snapshot and exit")
+    parser.add_argument("--list", action="store_true", help="list the register, counter and meter arrays")
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    try:
+        client = get_client(args.thrift_port, args.host)
+        if args.list:
+            for kind, arrays in sorted(client.array_sizes().items()):
+                for name, size in sorted(arrays.items()):
+                    print("%-16s %-40s %d" % (kind[:-7], name, size))
+            return
+        if not args.registers and not args.counter:
+            sys.exit("give register names (or --counter NAME, or --list)")
+
+        def show(snap):
+            stamp = time.strftime("%H:%M:%S", time.localtime(snap.t)) + ("%.3f" % (snap.t % 1))[1:]
+            for name, values in snap.values.items():
+                print("%s %s = %s  delta %s" % (stamp, name, values.tolist(), snap.deltas[name].tolist()))
+            sys.stdout.flush()
+
+        poller = RegisterPoller(client, args.registers, args.counter, period=args.period, on_snapshot=show)
+        if args.once:
+            poller.poll()
+            return
+        poller.start()
+        try:
+            while poller.running() and (not args.count or poller.polls < args.count):
+                time.sleep(min(args.period, 0.2))
+        except KeyboardInterrupt:
+            pass
+        poller.stop()
+        if poller.error is not None:
+            raise poller.error
+    except (ThriftUnavailable, KeyError) as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()